@@ -5,6 +5,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.http import JsonResponse
 from django.contrib import messages
 from django.utils import timezone
+from django.conf import settings
 
 from mobilize.authentication.decorators import super_admin_required, office_admin_required
 from mobilize.authentication.models import User
@@ -81,7 +82,7 @@ class OfficeUserListView(LoginRequiredMixin, ListView):
         # Check if user has permission to view this office's users
         if not (self.request.user.role == 'super_admin' or 
                 (self.request.user.role == 'office_admin' and 
-                 UserOffice.objects.filter(user=self.request.user, office=self.office).exists())):
+                 self.request.user.has_office_permission(self.office.id))):
             return UserOffice.objects.none()
         
         return UserOffice.objects.filter(office=self.office).select_related('user')
@@ -99,7 +100,7 @@ class AddUserToOfficeView(LoginRequiredMixin, View):
         # Check if user has permission to add users to this office
         if not (request.user.role == 'super_admin' or 
                 (request.user.role == 'office_admin' and 
-                 UserOffice.objects.filter(user=request.user, office=office).exists())):
+                 request.user.has_office_permission(office.id))):
             messages.error(request, "You don't have permission to add users to this office.")
             return redirect('admin_panel:office_detail', pk=office_id)
         
@@ -118,7 +119,7 @@ class AddUserToOfficeView(LoginRequiredMixin, View):
         # Check if user has permission to add users to this office
         if not (request.user.role == 'super_admin' or 
                 (request.user.role == 'office_admin' and 
-                 UserOffice.objects.filter(user=request.user, office=office).exists())):
+                 request.user.has_office_permission(office.id))):
             messages.error(request, "You don't have permission to add users to this office.")
             return redirect('admin_panel:office_detail', pk=office_id)
         
@@ -151,7 +152,7 @@ class RemoveUserFromOfficeView(LoginRequiredMixin, View):
         # Check if user has permission to remove users from this office
         if not (request.user.role == 'super_admin' or 
                 (request.user.role == 'office_admin' and 
-                 UserOffice.objects.filter(user=request.user, office=office).exists() and 
+                 request.user.has_office_permission(office.id) and 
                  user_id != request.user.id)):  # Can't remove yourself
             messages.error(request, "You don't have permission to remove this user.")
             return redirect('admin_panel:office_users', office_id=office_id)
@@ -172,7 +173,7 @@ class UpdateUserOfficePrimaryView(LoginRequiredMixin, View):
         # Check if user has permission to update office assignments
         if not (request.user.role == 'super_admin' or 
                 (request.user.role == 'office_admin' and 
-                 UserOffice.objects.filter(user=request.user, office=office).exists() and 
+                 request.user.has_office_permission(office.id) and 
                  user_id != request.user.id)):  # Can't change your own primary office
             messages.error(request, "You don't have permission to update this user's office assignment.")
             return redirect('admin_panel:office_users', office_id=office_id)
@@ -209,9 +210,6 @@ class CrossOfficeReportView(LoginRequiredMixin, View):
             messages.error(request, "You don't have permission to view cross-office reports.")
             return redirect('admin_panel:office_list')
         
-        from mobilize.contacts.models import Person
-        from mobilize.churches.models import Church
-        from mobilize.tasks.models import Task
         from django.db.models import Count, Q
         
         # Get all offices with statistics
@@ -220,7 +218,64 @@ class CrossOfficeReportView(LoginRequiredMixin, View):
             admin_count_db=Count('useroffice', filter=Q(useroffice__user__role__in=['super_admin', 'office_admin']), distinct=True)
         ).order_by('name')
         
-        # Calculate additional metrics for each office
+        # Per-office counts come from the dashboard rollups once they are built
+        rollup_stats = self._get_rollup_stats(offices)
+        if rollup_stats is not None:
+            stats_by_office, totals = rollup_stats
+            office_data = []
+            for office in offices:
+                stats = stats_by_office[office.id]
+                office_data.append({
+                    'office': office,
+                    'people_count': stats['people_count'],
+                    'churches_count': stats['churches_count'],
+                    'pending_tasks': stats['pending_tasks'],
+                    'total_contacts': stats['people_count'] + stats['churches_count']
+                })
+            
+            total_stats = {
+                'total_offices': offices.count(),
+                'active_offices': offices.filter(is_active=True).count(),
+                'total_users': User.objects.count(),
+                **totals,
+            }
+        else:
+            office_data, total_stats = self._get_live_stats(offices)
+        
+        return render(request, 'admin_panel/cross_office_report.html', {
+            'office_data': office_data,
+            'total_stats': total_stats,
+        })
+    
+    def _get_rollup_stats(self, offices):
+        """
+        Read per-office counts from the dashboard rollups.
+        
+        Returns:
+            Tuple (per-office stats, totals), or None if rollups are unavailable
+        """
+        if not getattr(settings, 'DASHBOARD_USE_ROLLUPS', True):
+            return None
+        
+        from mobilize.core.rollups import get_office_rollup_stats
+        
+        office_members = {office.id: set() for office in offices}
+        for office_id, user_id in UserOffice.objects.values_list('office_id', 'user_id'):
+            office_members.setdefault(office_id, set()).add(user_id)
+        return get_office_rollup_stats(office_members)
+    
+    def _get_live_stats(self, offices):
+        """
+        Count per-office statistics directly from the source tables.
+        
+        Returns:
+            Tuple (office_data, total_stats)
+        """
+        from mobilize.contacts.models import Person
+        from mobilize.churches.models import Church
+        from mobilize.tasks.models import Task
+        from django.db.models import Q
+        
         office_data = []
         for office in offices:
             # Get contact counts for this office
@@ -256,7 +311,4 @@ class CrossOfficeReportView(LoginRequiredMixin, View):
             'total_tasks': Task.objects.count(),
         }
         
-        return render(request, 'admin_panel/cross_office_report.html', {
-            'office_data': office_data,
-            'total_stats': total_stats,
-        })
+        return office_data, total_stats
@@ -5,6 +5,8 @@ from django.contrib.auth.decorators import user_passes_test, login_required
 from django.core.exceptions import PermissionDenied
 from django.urls import reverse
 
+from mobilize.core.permission_context import get_permission_context
+
 
 def role_required(required_role):
     """
@@ -130,7 +132,7 @@ def office_data_filter(queryset, user, office_field='office'):
         return queryset
     
     # Get user's office assignments
-    user_offices = user.useroffice_set.values_list('office_id', flat=True)
+    user_offices = get_permission_context(user).office_ids
     
     if not user_offices:
         # User not assigned to any office - return empty queryset
@@ -163,7 +165,7 @@ def office_object_permission_required(model_class, lookup_field='office'):
                 return view_func(request, *args, **kwargs)
             
             # Get user's office assignments
-            user_offices = request.user.useroffice_set.values_list('office_id', flat=True)
+            user_offices = get_permission_context(request.user).office_ids
             
             if not user_offices:
                 raise PermissionDenied("User not assigned to any office")
@@ -260,7 +262,7 @@ def ensure_user_office_assignment(view_func):
             return view_func(request, *args, **kwargs)
         
         # Check if user has office assignments
-        if not request.user.useroffice_set.exists():
+        if not get_permission_context(request.user).has_offices:
             raise PermissionDenied("Access denied. User not assigned to any office. Please contact an administrator.")
         
         return view_func(request, *args, **kwargs)
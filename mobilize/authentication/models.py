@@ -57,21 +57,11 @@ class User(AbstractUser):
         Returns:
             bool: True if user has permission, False otherwise
         """
-        # Super admins have access to everything
-        if self.role == 'super_admin':
-            return True
-            
-        # Check if user is assigned to this office
-        user_office = self.useroffice_set.filter(office_id=office_id).first()
+        from mobilize.core.permission_context import get_permission_context
         
-        if not user_office:
-            return False
-            
-        # If a specific role is required, check for it
-        if required_role and user_office.role != required_role:
-            return False
-            
-        return True
+        # Super admins have access to everything; office roles follow the
+        # user's overall role once membership is confirmed
+        return get_permission_context(self).has_office(office_id, required_role)
     
     def has_perm(self, perm, obj=None):
         """
@@ -105,10 +105,8 @@ class ChurchForm(forms.ModelForm):
             self.fields['zip_code'].initial = contact.zip_code
             self.fields['country'].initial = contact.country
             self.fields['notes'].initial = contact.notes
-            # Get pipeline stage through the pipeline system
-            current_stage = contact.get_current_pipeline_stage()
-            if current_stage:
-                self.fields['pipeline_stage'].initial = current_stage.name
+            # Stage code from the contact's denormalized main pipeline stage
+            self.fields['pipeline_stage'].initial = contact.pipeline_stage
             self.fields['priority'].initial = contact.priority
             self.fields['status'].initial = contact.status
         
@@ -286,6 +284,11 @@ class ImportChurchesForm(forms.Form):
         help_text='Please upload a CSV file with church information.',
         validators=[FileExtensionValidator(allowed_extensions=['csv'])]
     )
+    dry_run = forms.BooleanField(
+        label='Preview only',
+        required=False,
+        help_text='Check the file and see what would be created, updated or rejected without saving anything.'
+    )
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -299,15 +302,15 @@ class ImportChurchesForm(forms.Form):
         
         self.helper.layout = Layout(
             'csv_file',
+            'dry_run',
             HTML('''
                 <div class="alert alert-info mt-3">
                     <h5>CSV Format Instructions</h5>
                     <p>Your CSV file should have the following columns:</p>
                     <ul>
-                        <li><strong>Required:</strong> church_name, city, state</li>
-                        <li><strong>Optional:</strong> denomination, email, phone, street_address, zip_code, country, location, website,
-                            congregation_size, weekly_attendance, year_founded, notes, church_pipeline, priority, assigned_to, source, referred_by</li>
-                        <li><strong>Pastor Info (Optional):</strong> senior_pastor_name, senior_pastor_email, senior_pastor_phone</li>
+                        <li><strong>Required:</strong> name</li>
+                        <li><strong>Optional:</strong> denomination, email, phone, street_address, city, state, zip_code, country, location, website,
+                            congregation_size, weekly_attendance, notes, church_pipeline, priority</li>
                     </ul>
                     <p>Download a <a href="#" class="alert-link">sample CSV template</a>.</p>
                 </div>
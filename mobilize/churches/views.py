@@ -1,66 +1,92 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import JsonResponse
 from django.core.paginator import Paginator
-from django.db.models import Q
 from django.db import models
-import csv
-from datetime import datetime
+from django.urls import reverse
 
 from .models import Church, ChurchMembership
 from .forms import ChurchForm, ImportChurchesForm
 from mobilize.pipeline.models import MAIN_CHURCH_PIPELINE_STAGES
+from mobilize.core.exports import EXPORT_DATETIME_FORMAT, export_column, streaming_csv_response
+from mobilize.core.search import filter_by_search
 
 # ChurchContact and ChurchInteraction models have been removed as they don't exist in Supabase
 
+# Fields matched by list searches until the search index has been built
+CHURCH_SEARCH_FIELDS = [
+    'name', 'contact__church_name', 'location', 'denomination', 'contact__email', 'contact__phone',
+]
 
-@login_required
-def church_list(request):
+# Columns of the churches CSV export
+CHURCH_EXPORT_COLUMNS = [
+    export_column('Name', 'name'),
+    export_column('Denomination', 'denomination'),
+    export_column('Website', 'website'),
+    export_column('Email', 'pastor_email'),
+    export_column('Phone', 'pastor_phone'),
+    export_column('Address', 'contact__street_address'),
+    export_column('Location', 'location'),
+    export_column('Congregation Size', 'congregation_size'),
+    export_column('Weekly Attendance', 'weekly_attendance'),
+    export_column('Year Founded', 'year_founded'),
+    export_column('Pipeline Stage', 'church_pipeline'),
+    export_column('Priority', 'contact__priority'),
+    export_column('Notes', 'contact__notes'),
+    export_column('Created At', 'contact__created_at', EXPORT_DATETIME_FORMAT),
+]
+
+
+def filter_churches(request, churches):
     """
-    Display a list of churches with filtering and pagination.
+    Apply the church list filters from a request.
+    
+    Shared by the list page and the CSV export, so an export holds the
+    same churches as the list it was started from.
+    
+    Args:
+        request: Request whose GET carries 'q', 'pipeline_stage' and 'priority'
+        churches: Church queryset to filter
+    
+    Returns:
+        Filtered Church queryset
     """
-    # Get query parameters for filtering
     query = request.GET.get('q', '')
     pipeline_stage = request.GET.get('pipeline_stage', '')
     priority = request.GET.get('priority', '')
     
-    # Start with all churches - use select_related to optimize queries
-    churches = Church.objects.select_related('contact').all()
-    
-    # Apply filters if provided
     if query:
-        churches = churches.filter(
-            Q(name__icontains=query) | 
-            Q(contact__church_name__icontains=query) |
-            Q(location__icontains=query) | 
-            Q(denomination__icontains=query) |
-            Q(contact__email__icontains=query) |
-            Q(contact__phone__icontains=query)
-        )
+        churches = filter_by_search(churches, query, 'church', CHURCH_SEARCH_FIELDS)
     
     if pipeline_stage:
-        # Filter by pipeline stage through the pipeline system
-        from mobilize.pipeline.models import PipelineContact, PipelineStage
-        try:
-            # Get church contacts that have the specified pipeline stage
-            stage_objects = PipelineStage.objects.filter(name__iexact=pipeline_stage.title())
-            if stage_objects.exists():
-                pipeline_contacts = PipelineContact.objects.filter(
-                    current_stage__in=stage_objects,
-                    contact_type='church'
-                ).values_list('contact_id', flat=True)
-                churches = churches.filter(contact_id__in=pipeline_contacts)
-            else:
-                # If no matching stage found, also check church_pipeline field
-                churches = churches.filter(church_pipeline=pipeline_stage)
-        except Exception:
-            # Fallback to church_pipeline field
-            churches = churches.filter(church_pipeline=pipeline_stage)
+        # Stage codes are kept on the contact, so no pipeline tables are joined;
+        # churches outside the main pipeline fall back to the church_pipeline field
+        from mobilize.pipeline.contact_stages import stage_code
+        churches = churches.filter(
+            models.Q(contact__pipeline_stage=stage_code(pipeline_stage.replace('_', ' ')))
+            | models.Q(contact__pipeline_stage__isnull=True, church_pipeline=pipeline_stage)
+        )
     
     if priority:
         churches = churches.filter(contact__priority=priority)
     
+    return churches
+
+
+@login_required
+def church_list(request):
+    """
+    Display a list of churches with filtering and pagination.
+    """
+    # Get query parameters for filtering
+    query = request.GET.get('q', '')
+    pipeline_stage = request.GET.get('pipeline_stage', '')
+    priority = request.GET.get('priority', '')
+    
+    # Start with all churches - use select_related to optimize queries
+    churches = filter_churches(request, Church.objects.select_related('contact'))
+    
     # Pagination
     paginator = Paginator(churches, 25)  # Show 25 churches per page
     page_number = request.GET.get('page', 1)
@@ -200,150 +226,46 @@ def church_contacts(request, pk):
 def import_churches(request):
     """
     Import churches from CSV file.
+    
+    The upload is imported by a background job, matching existing churches
+    by name. The page then polls the job for progress and failed rows.
     """
+    from mobilize.core.import_jobs import get_import_office_id, start_import_job
+    from mobilize.core.imports import ImportFormatError
+    from mobilize.core.models import ImportJob
+    
     if request.method == 'POST':
         form = ImportChurchesForm(request.POST, request.FILES)
         if form.is_valid():
-            csv_file = request.FILES['csv_file']
-            
-            # Check if file is CSV
-            if not csv_file.name.endswith('.csv'):
-                messages.error(request, 'Please upload a CSV file')
-                return redirect('churches:import_churches')
-            
-            # Check if file is empty
-            if csv_file.size == 0:
-                form.add_error('csv_file', 'The uploaded file is empty')
-                return render(request, 'churches/import_churches.html', {'form': form})
-            
-            # Process CSV file
             try:
-                decoded_file = csv_file.read().decode('utf-8').splitlines()
-                if not decoded_file:
-                    form.add_error('csv_file', 'The CSV file appears to be empty')
-                    return render(request, 'churches/import_churches.html', {'form': form})
-                    
-                reader = csv.DictReader(decoded_file)
-                
-                # Check for required columns
-                if 'name' not in reader.fieldnames:
-                    form.add_error('csv_file', 'Required column "name" not found in CSV file')
-                    return render(request, 'churches/import_churches.html', {'form': form})
-                
-                # Track import results
-                created_count = 0
-                updated_count = 0
-                error_count = 0
-                
-                for row in reader:
-                    try:
-                        # Check if church exists by name and location
-                        name = row.get('name', '').strip()
-                        location = row.get('location', '').strip()
-                        
-                        if name:  # Only name is required
-                            church, created = Church.objects.update_or_create(
-                                name=name,
-                                defaults={
-                                    'location': location,
-                                    'denomination': row.get('denomination', '').strip(),
-                                    'website': row.get('website', '').strip(),
-                                    'congregation_size': int(row.get('congregation_size', 0)) if row.get('congregation_size', '').strip() else None,
-                                    'weekly_attendance': int(row.get('weekly_attendance', 0)) if row.get('weekly_attendance', '').strip() else None,
-                                    'church_pipeline': row.get('church_pipeline', '').strip(),
-                                    'priority': row.get('priority', '').strip(),
-                                    'office_id': request.POST.get('office_id') or 1,  # Use office_id from form
-                                }
-                            )
-                            
-                            if created:
-                                created_count += 1
-                            else:
-                                updated_count += 1
-                        else:
-                            # Missing required fields
-                            error_count += 1
-                    except Exception as e:
-                        error_count += 1
-                        print(f"Error importing row: {e}")
-                
-                messages.success(
-                    request, 
-                    f"Import complete: {created_count} created, {updated_count} updated, {error_count} errors"
+                job = start_import_job(
+                    request.user, 'churches', form.cleaned_data['csv_file'],
+                    {'office_id': get_import_office_id(request)},
+                    dry_run=form.cleaned_data['dry_run'],
                 )
-                return redirect('churches:church_list')
-                
-            except Exception as e:
-                form.add_error('csv_file', f"Error processing CSV: {str(e)}")
-                return render(request, 'churches/import_churches.html', {'form': form})
+            except ImportFormatError as e:
+                form.add_error('csv_file', str(e))
+            else:
+                return redirect(f"{reverse('churches:import_churches')}?job={job.pk}")
     else:
         form = ImportChurchesForm()
     
-    return render(request, 'churches/import_churches.html', {'form': form})
+    job_id = request.GET.get('job', '')
+    import_job = ImportJob.objects.filter(pk=job_id, user=request.user).first() if job_id.isdigit() else None
+    
+    return render(request, 'churches/import_churches.html', {'form': form, 'import_job': import_job})
 
 
 @login_required
 def export_churches(request):
     """
-    Export churches to CSV file.
-    """
-    # Get query parameters for filtering
-    query = request.GET.get('q', '')
-    pipeline_stage = request.GET.get('pipeline_stage', '')
-    priority = request.GET.get('priority', '')
-    
-    # Start with all churches
-    churches = Church.objects.all()
-    
-    # Apply filters if provided
-    if query:
-        churches = churches.filter(
-            Q(name__icontains=query) | 
-            Q(location__icontains=query) | 
-            Q(denomination__icontains=query)
-        )
-    
-    if pipeline_stage:
-        churches = churches.filter(church_pipeline=pipeline_stage)
+    Export the churches shown by the list view to a CSV file.
     
-    if priority:
-        churches = churches.filter(priority=priority)
-    
-    # Create the HttpResponse object with CSV header
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="churches_export_{timestamp}.csv"'
-    
-    # Create CSV writer
-    writer = csv.writer(response)
-    
-    # Write header row
-    writer.writerow([
-        'Name', 'Denomination', 'Website', 'Email', 'Phone', 
-        'Address', 'Location', 'Congregation Size', 'Weekly Attendance', 'Year Founded',
-        'Pipeline Stage', 'Priority', 'Notes', 'Created At'
-    ])
-    
-    # Write data rows
-    for church in churches:
-        writer.writerow([
-            church.name or '',
-            church.denomination or '',
-            church.website or '',
-            church.pastor_email or '',  # Use pastor_email instead of email
-            church.pastor_phone or '',  # Use pastor_phone instead of phone
-            getattr(church, 'address', '') or '',
-            church.location or '',
-            str(church.congregation_size) if church.congregation_size is not None else '',
-            str(church.weekly_attendance) if church.weekly_attendance is not None else '',
-            str(church.year_founded) if church.year_founded is not None else '',
-            church.church_pipeline or '',
-            church.priority or '',  # Use priority directly since get_priority_display() doesn't exist
-            getattr(church, 'notes', '') or '',
-            getattr(church, 'created_at', '').strftime('%Y-%m-%d %H:%M:%S') if getattr(church, 'created_at', None) else ''
-        ])
-    
-    return response
+    Takes the list view's filters and streams the rows so large exports
+    start downloading right away.
+    """
+    churches = filter_churches(request, Church.objects.all())
+    return streaming_csv_response(churches, CHURCH_EXPORT_COLUMNS, 'churches_export')
 
 
 @login_required
@@ -383,7 +305,7 @@ def add_church_member(request, pk):
                     )
                     
                     messages.success(request, f"Successfully added {person.name} to {church.name} as {membership.get_role_display()}.")
-                    
+            
             except Person.DoesNotExist:
                 messages.error(request, "Selected person not found.")
         else:
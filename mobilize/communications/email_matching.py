@@ -0,0 +1,161 @@
+"""
+Bulk matching of synced Gmail messages to stored communications and contacts.
+
+A Gmail sync works through pages of messages. Checking each message for an
+existing communication and looking its sender up as a person and as a church
+costs three queries per message; EmailMatcher resolves a whole page with one
+query for the known message IDs and one for the contacts, matched on the
+lowercased email address so the Lower('email') index on contacts is used.
+New communications are then inserted with a single bulk_create() that skips
+messages already stored by a concurrent sync through the unique constraint
+on (user, gmail_message_id); the inserted rows are then registered with
+the dashboard rollups and search index, which bulk_create() bypasses.
+"""
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from mobilize.contacts.models import Contact
+from mobilize.core.report_jobs import bump_data_version
+from mobilize.core.rollups import rollup_batch
+from mobilize.core.search import search_index_batch
+
+from .models import Communication
+
+
+def normalize_email(address):
+    """Normalize an email address for matching, None for an empty one."""
+    address = (address or '').strip().lower()
+    return address or None
+
+
+def stored_message_ids(user, message_ids):
+    """
+    Find which Gmail messages are already stored for a user.
+    
+    Args:
+        user: User whose mailbox the messages come from
+        message_ids: Gmail message IDs
+    
+    Returns:
+        Set of the IDs stored as communications, by either Gmail sync or
+        as sent emails
+    """
+    message_ids = list(message_ids)
+    if not message_ids:
+        return set()
+    stored = Communication.objects.filter(
+        Q(gmail_message_id__in=message_ids) | Q(external_id__in=message_ids),
+        user=user
+    ).values_list('gmail_message_id', 'external_id')
+    return {message_id for pair in stored for message_id in pair if message_id}
+
+
+class EmailMatcher:
+    """
+    Resolves a page of parsed Gmail messages in set queries.
+    """
+    
+    def __init__(self, user, messages):
+        """
+        Match the messages of a page.
+        
+        Args:
+            user: User whose mailbox the messages come from
+            messages: Messages from GmailService.with_addresses()
+        """
+        self.user = user
+        self.messages = list(messages)
+        self.known_ids = stored_message_ids(user, [message['id'] for message in self.messages])
+        self.contacts = self._contacts_by_email()
+    
+    def _contacts_by_email(self):
+        """Contacts, with their person or church, keyed by lowercase email."""
+        addresses = set()
+        for message in self.messages:
+            addresses.update(filter(None, map(normalize_email, self.addresses(message))))
+        if not addresses:
+            return {}
+        contacts = Contact.objects.annotate(
+            email_lower=Lower('email')
+        ).filter(
+            email_lower__in=addresses
+        ).select_related('person_details', 'church_details')
+        return {contact.email_lower: contact for contact in contacts}
+    
+    @staticmethod
+    def addresses(message):
+        """Addresses of a message, sender first."""
+        return [message.get('sender_email', '')] + list(message.get('recipient_emails', []))
+    
+    def new_messages(self):
+        """Messages not stored yet, each once."""
+        seen = set(self.known_ids)
+        new = []
+        for message in self.messages:
+            if message['id'] not in seen:
+                seen.add(message['id'])
+                new.append(message)
+        return new
+    
+    def contact_for(self, message, sender_only=False):
+        """
+        Find the contact a message is about.
+        
+        Args:
+            message: One of the matched messages
+            sender_only: Match the sender only, not the recipients
+        
+        Returns:
+            The contact of the sender, else of the first known recipient,
+            or None
+        """
+        addresses = self.addresses(message)[:1] if sender_only else self.addresses(message)
+        for address in addresses:
+            contact = self.contacts.get(normalize_email(address))
+            if contact is not None:
+                return contact
+        return None
+    
+    @staticmethod
+    def person_and_church(contact):
+        """
+        Get the person and church details of a contact.
+        
+        Returns:
+            Tuple (Person or None, Church or None)
+        """
+        if contact is None:
+            return None, None
+        return getattr(contact, 'person_details', None), getattr(contact, 'church_details', None)
+    
+    def insert(self, communications):
+        """
+        Insert new communications for the matched messages.
+        
+        Args:
+            communications: Unsaved Communication objects with gmail_message_id set
+        
+        Returns:
+            Number of communications inserted; those already stored by a
+            concurrent sync are skipped
+        """
+        if not communications:
+            return 0
+        message_ids = [communication.gmail_message_id for communication in communications]
+        before = self._stored_ids(message_ids)
+        # Bulk writes skip the signals that keep rollups, search and reports current
+        with rollup_batch() as rollups, search_index_batch() as search:
+            Communication.objects.bulk_create(communications, ignore_conflicts=True)
+            inserted = self._stored_ids(message_ids) - before
+            rollups.touch('communication', inserted, snapshot=False)
+            search.touch('communication', inserted)
+        if inserted:
+            bump_data_version('communications.Communication')
+        return len(inserted)
+    
+    def _stored_ids(self, message_ids):
+        return set(
+            Communication.objects.filter(
+                user=self.user, gmail_message_id__in=message_ids
+            ).values_list('pk', flat=True)
+        )
@@ -0,0 +1,179 @@
+"""
+Batched Gmail message fetching.
+
+Getting messages with one users().messages().get() call each costs one HTTP
+round trip per message. GmailBatchFetcher groups the gets into Gmail batch
+requests of up to BATCH_SIZE messages and sends a few batches at a time,
+each over its own HTTP connection because httplib2 connections are not
+thread-safe. Messages refused for rate limits or transient server errors
+are retried in later batches after an exponential backoff.
+"""
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+
+# Gmail accepts up to 100 calls per batch but recommends no more than 50
+BATCH_SIZE = 50
+
+# Batches sent at the same time, when each can get its own connection
+MAX_CONCURRENT_BATCHES = 4
+
+# Retry rounds for rate-limited messages before they are given up on
+MAX_RETRIES = 5
+
+# Delay before the first retry round in seconds, doubled every round
+BACKOFF_SECONDS = 1.0
+
+MESSAGE_FORMATS = ('minimal', 'metadata', 'full', 'raw')
+
+# Headers fetched in metadata format, those read by GmailService._parse_message()
+METADATA_HEADERS = ['Subject', 'From', 'To', 'Cc', 'Date']
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = (b'rateLimitExceeded', b'userRateLimitExceeded')
+
+
+def is_retryable(error):
+    """
+    Check whether a Gmail API error is worth retrying.
+    
+    Args:
+        error: HttpError raised by the API client
+    
+    Returns:
+        True for rate limits (429, or 403 with a rate limit reason) and
+        transient server errors
+    """
+    status = error.resp.status
+    if status in RETRY_STATUSES:
+        return True
+    return status == 403 and any(reason in (error.content or b'') for reason in RATE_LIMIT_REASONS)
+
+
+class GmailBatchFetcher:
+    """
+    Fetches Gmail messages by ID through batch requests.
+    """
+    
+    def __init__(self, service, http_factory=None, batch_size=BATCH_SIZE,
+                 max_concurrency=MAX_CONCURRENT_BATCHES, max_retries=MAX_RETRIES,
+                 backoff_seconds=BACKOFF_SECONDS, sleep=time.sleep):
+        """
+        Initialize the fetcher.
+        
+        Args:
+            service: Gmail API service built with googleapiclient
+            http_factory: Callable returning a new authorized HTTP object for
+                each batch; without it batches are sent one at a time over the
+                service's own connection
+            batch_size: Messages per batch request, at most 100
+            max_concurrency: Batches sent at the same time
+            max_retries: Retry rounds for rate-limited messages
+            backoff_seconds: Delay before the first retry round
+            sleep: Function used to wait between retry rounds
+        """
+        self.service = service
+        self.http_factory = http_factory
+        self.batch_size = max(1, min(batch_size, 100))
+        self.max_concurrency = max(1, max_concurrency) if http_factory else 1
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.sleep = sleep
+        # IDs given up on by the last fetch() after running out of retries
+        self.failed = []
+    
+    def fetch(self, message_ids, message_format='full', metadata_headers=None):
+        """
+        Fetch messages by ID.
+        
+        Args:
+            message_ids: Gmail message IDs
+            message_format: 'minimal', 'metadata', 'full' or 'raw'
+            metadata_headers: Headers returned in metadata format, defaulting
+                to METADATA_HEADERS
+        
+        Returns:
+            List of Gmail message resources in the order of message_ids;
+            messages that could not be fetched are left out, and those still
+            rate limited after the last retry are listed in self.failed
+        
+        Raises:
+            ValueError: If the format is not supported
+            HttpError: If a whole batch fails with a non-retryable error
+        """
+        if message_format not in MESSAGE_FORMATS:
+            raise ValueError(f"Unsupported Gmail message format: {message_format}")
+        if message_format == 'metadata':
+            metadata_headers = metadata_headers or METADATA_HEADERS
+        else:
+            metadata_headers = None
+        
+        message_ids = list(dict.fromkeys(message_ids))
+        self.failed = []
+        messages = {}
+        pending = message_ids
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._backoff(attempt)
+            chunks = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+            pending = []
+            for fetched, retry in self._execute_all(chunks, message_format, metadata_headers):
+                messages.update(fetched)
+                pending.extend(retry)
+            if not pending:
+                break
+        
+        if pending:
+            self.failed = pending
+            logger.warning(f"Gave up fetching {len(pending)} Gmail messages after {self.max_retries} retries")
+        return [messages[message_id] for message_id in message_ids if message_id in messages]
+    
+    def _backoff(self, attempt):
+        """Wait before a retry round, with jitter so workers spread out."""
+        delay = self.backoff_seconds * 2 ** (attempt - 1)
+        self.sleep(delay + random.uniform(0, self.backoff_seconds))
+    
+    def _execute_all(self, chunks, message_format, metadata_headers):
+        """Send the batches, at most max_concurrency at a time."""
+        if len(chunks) <= 1 or self.max_concurrency == 1:
+            return [self._execute(chunk, message_format, metadata_headers) for chunk in chunks]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(chunks))) as executor:
+            return list(executor.map(lambda chunk: self._execute(chunk, message_format, metadata_headers), chunks))
+    
+    def _execute(self, chunk, message_format, metadata_headers):
+        """
+        Send one batch request.
+        
+        Returns:
+            Tuple (dict of message ID to message, list of IDs to retry)
+        """
+        fetched, retry = {}, []
+        
+        def callback(request_id, response, exception):
+            if exception is None:
+                fetched[request_id] = response
+            elif isinstance(exception, HttpError) and is_retryable(exception):
+                retry.append(request_id)
+            else:
+                logger.warning(f"Skipping Gmail message {request_id}: {exception}")
+        
+        batch = self.service.new_batch_http_request(callback=callback)
+        for message_id in chunk:
+            params = {'userId': 'me', 'id': message_id, 'format': message_format}
+            if metadata_headers:
+                params['metadataHeaders'] = metadata_headers
+            batch.add(self.service.users().messages().get(**params), request_id=message_id)
+        
+        try:
+            batch.execute(http=self.http_factory() if self.http_factory else None)
+        except HttpError as error:
+            if not is_retryable(error):
+                raise
+            return fetched, [message_id for message_id in chunk if message_id not in fetched]
+        return fetched, retry
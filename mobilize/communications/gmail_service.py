@@ -6,18 +6,19 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
 import json
-from typing import Optional, List, Dict, Any
+from datetime import timedelta
+from typing import Optional, List, Dict, Any, Tuple
 
-from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
-from .models import Communication, EmailTemplate, EmailSignature
+from .gmail_batch import GmailBatchFetcher
+from .google_clients import build, forget_google_clients, get_google_client, load_user_credentials, save_user_credentials
+from .models import Communication, EmailTemplate, EmailSignature, GmailSyncState
 
 User = get_user_model()
 
@@ -33,21 +34,25 @@ class GmailService:
         'https://www.googleapis.com/auth/calendar.events'
     ]
     
+    # Page size when listing message IDs; the Gmail API allows up to 500
+    LIST_PAGE_SIZE = 500
+    
+    # Page size when listing mailbox history; the Gmail API allows up to 500
+    HISTORY_PAGE_SIZE = 500
+    
     def __init__(self, user):
         self.user = user
         self.service = None
+        self.credentials = None
         self._initialize_service()
     
     def _initialize_service(self):
-        """Initialize Gmail API service with user credentials"""
+        """Initialize Gmail API service with user credentials, cached per process"""
         try:
-            credentials = self._get_user_credentials()
-            if credentials and credentials.valid:
-                self.service = build('gmail', 'v1', credentials=credentials)
-            elif credentials and credentials.expired and credentials.refresh_token:
-                credentials.refresh(Request())
-                self._save_user_credentials(credentials)
-                self.service = build('gmail', 'v1', credentials=credentials)
+            self.service, self.credentials = get_google_client(
+                self.user, 'gmail', 'v1',
+                self._get_user_credentials, self._save_user_credentials, build_client=build
+            )
         except Exception as e:
             print(f"Error initializing Gmail service: {e}")
             self.service = None
@@ -55,21 +60,8 @@ class GmailService:
     def _get_user_credentials(self) -> Optional[Credentials]:
         """Get stored credentials for the user"""
         try:
-            # Look for stored credentials in user profile or GoogleToken model
-            from mobilize.authentication.models import GoogleToken
-            token = GoogleToken.objects.filter(user=self.user).first()
-            if token and token.access_token:
-                # Use the actual stored scopes instead of hardcoded ones
-                stored_scopes = token.scopes if token.scopes else self.SCOPES
-                creds_data = {
-                    'token': token.access_token,
-                    'refresh_token': token.refresh_token,
-                    'token_uri': 'https://oauth2.googleapis.com/token',
-                    'client_id': settings.GOOGLE_CLIENT_ID,
-                    'client_secret': settings.GOOGLE_CLIENT_SECRET,
-                    'scopes': stored_scopes
-                }
-                return Credentials.from_authorized_user_info(creds_data)
+            # Use the actual stored scopes instead of hardcoded ones
+            return load_user_credentials(self.user, self.SCOPES)
         except Exception as e:
             print(f"Error getting user credentials: {e}")
         return None
@@ -77,12 +69,7 @@ class GmailService:
     def _save_user_credentials(self, credentials: Credentials):
         """Save updated credentials for the user"""
         try:
-            from mobilize.authentication.models import GoogleToken
-            token, created = GoogleToken.objects.get_or_create(user=self.user)
-            token.access_token = credentials.token
-            token.refresh_token = credentials.refresh_token
-            token.expires_at = credentials.expiry
-            token.save()
+            save_user_credentials(self.user, credentials)
         except Exception as e:
             print(f"Error saving user credentials: {e}")
     
@@ -129,6 +116,7 @@ class GmailService:
         credentials = flow.credentials
         
         self._save_user_credentials(credentials)
+        forget_google_clients(self.user)
         self._initialize_service()
         
         return credentials
@@ -232,7 +220,7 @@ class GmailService:
                 'message_id': result.get('id'),
                 'thread_id': result.get('threadId')
             }
-            
+        
         except HttpError as error:
             return {'success': False, 'error': f'Gmail API error: {error}'}
         except Exception as error:
@@ -276,37 +264,214 @@ class GmailService:
         except Exception as e:
             print(f"Error creating communication record: {e}")
     
-    def get_messages(self, query: str = '', max_results: int = 10) -> List[Dict]:
-        """Get Gmail messages matching query"""
+    def get_batch_fetcher(self, **kwargs) -> GmailBatchFetcher:
+        """
+        Get a batch fetcher for this user's messages.
+        
+        Each batch gets its own authorized connection, so several batches
+        can be in flight at once.
+        
+        Args:
+            **kwargs: Options passed to GmailBatchFetcher
+        """
+        factory = self._authorized_http if self.credentials is not None else None
+        return GmailBatchFetcher(self.service, http_factory=factory, **kwargs)
+    
+    def _authorized_http(self):
+        """Build a new HTTP connection authorized with this user's credentials"""
+        import google_auth_httplib2
+        from googleapiclient.http import build_http
+        
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=build_http())
+    
+    def list_message_ids(self, query: str = '', max_results: int = 10) -> List[str]:
+        """List the IDs of messages matching a query, following result pages"""
+        message_ids = []
+        page_token = None
+        while len(message_ids) < max_results:
+            results = self.service.users().messages().list(
+                userId='me',
+                q=query,
+                maxResults=min(max_results - len(message_ids), self.LIST_PAGE_SIZE),
+                pageToken=page_token
+            ).execute()
+            message_ids.extend(message['id'] for message in results.get('messages', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        return message_ids[:max_results]
+    
+    def get_messages(self, query: str = '', max_results: int = 10, message_format: str = 'full') -> List[Dict]:
+        """
+        Get Gmail messages matching query.
+        
+        Messages are fetched through batch requests rather than one request
+        each; use message_format='metadata' when only headers are needed.
+        """
         if not self.service:
             return []
         
         try:
-            results = self.service.users().messages().list(
-                userId='me', 
-                q=query, 
-                maxResults=max_results
-            ).execute()
-            
-            messages = results.get('messages', [])
-            detailed_messages = []
-            
-            for message in messages:
-                msg_detail = self.service.users().messages().get(
-                    userId='me', 
-                    id=message['id']
-                ).execute()
-                detailed_messages.append(self._parse_message(msg_detail))
-            
-            return detailed_messages
-            
+            message_ids = self.list_message_ids(query=query, max_results=max_results)
+            messages = self.get_batch_fetcher().fetch(message_ids, message_format=message_format)
+            return [self._parse_message(message) for message in messages]
+        
         except HttpError as error:
             print(f'Gmail API error: {error}')
             return []
     
+    def get_emails(self, since_date, max_results: int = 100) -> List[Dict]:
+        """
+        Get messages received since a date, with parsed addresses and dates.
+        
+        Returns:
+            Parsed messages as from with_addresses()
+        """
+        query = f"after:{since_date.strftime('%Y/%m/%d')}"
+        return [self.with_addresses(message) for message in self.get_messages(query=query, max_results=max_results)]
+    
+    def with_addresses(self, message: Dict) -> Dict:
+        """
+        Add parsed addresses and dates to a message from get_messages().
+        
+        Returns:
+            The message plus 'sender_email', 'recipient_emails' (lowercase
+            addresses) and 'sent_at' (datetime or None)
+        """
+        from email.utils import getaddresses, parsedate_to_datetime
+        
+        senders = [address.lower() for _, address in getaddresses([message['sender']]) if address]
+        try:
+            sent_at = parsedate_to_datetime(message['date']) if message['date'] else None
+        except (TypeError, ValueError):
+            sent_at = None
+        return {
+            **message,
+            'sender_email': senders[0] if senders else '',
+            'recipient_emails': [address.lower() for _, address in getaddresses([message['to']]) if address],
+            'sent_at': sent_at,
+        }
+    
+    def get_history_id(self) -> str:
+        """Get the current historyId of the mailbox"""
+        return str(self.service.users().getProfile(userId='me').execute()['historyId'])
+    
+    def list_history_message_ids(self, start_history_id: str) -> Tuple[List[str], str]:
+        """
+        List the IDs of messages added to the mailbox after a historyId.
+        
+        Args:
+            start_history_id: historyId of the last sync checkpoint
+        
+        Returns:
+            Tuple (message IDs oldest first, drafts left out, historyId to
+            continue from next time)
+        
+        Raises:
+            HttpError: 404 if Gmail no longer keeps history that far back
+        """
+        message_ids = {}
+        page_token = None
+        while True:
+            results = self.service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=['messageAdded'],
+                maxResults=self.HISTORY_PAGE_SIZE,
+                pageToken=page_token
+            ).execute()
+            for record in results.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message = added['message']
+                    if 'DRAFT' not in message.get('labelIds', []):
+                        message_ids[message['id']] = None
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return list(message_ids), str(results.get('historyId', start_history_id))
+    
+    def get_new_messages(self, days_back: int = 7, max_results: int = 100, message_format: str = 'full',
+                         scope: str = 'all') -> Dict:
+        """
+        Get the messages added since the user's last sync checkpoint.
+        
+        Each scope of GmailSyncState has its own checkpoint, so a sync keeping
+        only messages about contacts never skips messages for one keeping all.
+        
+        With a checkpoint only the messages added after it are fetched, however
+        many there are. Without one, or once Gmail no longer keeps history that
+        far back, the messages of the last days_back days are fetched instead,
+        up to max_results. Messages already stored as communications are not
+        fetched again.
+        
+        Returns:
+            Dict with 'messages' (parsed as by get_messages()), 'full_sync',
+            'scope' and 'history_id', the checkpoint to pass to save_sync_checkpoint()
+            once the messages are stored; None when some messages could not be
+            fetched, so that the next sync asks for them again
+        
+        Raises:
+            HttpError: If listing or fetching the messages fails
+        """
+        if not self.service:
+            return {'messages': [], 'full_sync': False, 'scope': scope, 'history_id': None}
+        
+        checkpoint = GmailSyncState.objects.filter(
+            user=self.user, scope=scope
+        ).values_list('history_id', flat=True).first()
+        message_ids = None
+        full_sync = False
+        if checkpoint:
+            try:
+                message_ids, history_id = self.list_history_message_ids(checkpoint)
+            except HttpError as error:
+                if error.resp.status != 404:
+                    raise
+                print(f'Gmail history {checkpoint} expired, syncing the last {days_back} days')
+        
+        if message_ids is None:
+            # Read the checkpoint before listing so mail arriving meanwhile
+            # is picked up by the next sync rather than missed
+            history_id = self.get_history_id()
+            since_date = timezone.now() - timedelta(days=days_back)
+            message_ids = self.list_message_ids(f"after:{since_date.strftime('%Y/%m/%d')}", max_results)
+            full_sync = True
+        
+        fetcher = self.get_batch_fetcher()
+        messages = fetcher.fetch(self._unsynced_message_ids(message_ids), message_format=message_format)
+        return {
+            'messages': [self._parse_message(message) for message in messages],
+            'full_sync': full_sync,
+            'scope': scope,
+            'history_id': None if fetcher.failed else history_id,
+        }
+    
+    def save_sync_checkpoint(self, sync: Dict):
+        """
+        Record a sync from get_new_messages() once its messages are stored.
+        
+        Args:
+            sync: Result of get_new_messages()
+        """
+        now = timezone.now()
+        fields = {'last_sync_at': now}
+        if sync['history_id']:
+            fields['history_id'] = sync['history_id']
+            if sync['full_sync']:
+                fields['last_full_sync_at'] = now
+        GmailSyncState.objects.update_or_create(user=self.user, scope=sync['scope'], defaults=fields)
+    
+    def _unsynced_message_ids(self, message_ids: List[str]) -> List[str]:
+        """Drop the IDs of messages already stored for the user, in one query"""
+        from .email_matching import stored_message_ids
+        
+        stored = stored_message_ids(self.user, message_ids)
+        return [message_id for message_id in message_ids if message_id not in stored]
+    
     def _parse_message(self, message: Dict) -> Dict:
         """Parse Gmail message into readable format"""
-        headers = message['payload'].get('headers', [])
+        # Minimal format has no payload, metadata format has no body
+        payload = message.get('payload', {})
+        headers = payload.get('headers', [])
         
         # Extract headers
         subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
@@ -315,7 +480,7 @@ class GmailService:
         to = next((h['value'] for h in headers if h['name'] == 'To'), '')
         
         # Extract body
-        body = self._get_message_body(message['payload'])
+        body = self._get_message_body(payload)
         
         return {
             'id': message['id'],
@@ -342,67 +507,51 @@ class GmailService:
                     data = part['body']['data']
                     body = base64.urlsafe_b64decode(data).decode('utf-8')
         else:
-            if payload['body'].get('data'):
+            if payload.get('body', {}).get('data'):
                 body = base64.urlsafe_b64decode(
                     payload['body']['data']
                 ).decode('utf-8')
         
         return body
     
-    def sync_emails_to_communications(self, days_back: int = 7):
-        """Sync recent Gmail messages to communications table"""
+    def sync_emails_to_communications(self, days_back: int = 7, max_results: int = 100):
+        """
+        Sync new Gmail messages to communications table.
+        
+        Only messages added since the last sync checkpoint are fetched; see
+        get_new_messages() for when the last days_back days are synced instead.
+        """
         if not self.service:
             return {'success': False, 'error': 'Gmail service not authenticated'}
         
-        from datetime import datetime, timedelta
-        
-        # Query for recent emails
-        since_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y/%m/%d')
-        query = f'after:{since_date}'
-        
-        messages = self.get_messages(query=query, max_results=100)
-        synced_count = 0
-        
-        for message in messages:
-            # Check if communication already exists
-            if not Communication.objects.filter(
-                gmail_message_id=message['id']
-            ).exists():
-                
-                # Try to match to contacts by email
-                person = self._find_person_by_email(message['sender'])
-                church = self._find_church_by_email(message['sender'])
-                
-                Communication.objects.create(
-                    type='email',
-                    subject=message['subject'],
-                    message=message['body'][:250],  # Truncate for database field
-                    direction='inbound',
-                    date=timezone.now().date(),
-                    person=person,
-                    church=church,
-                    gmail_message_id=message['id'],
-                    gmail_thread_id=message['thread_id'],
-                    email_status='received',
-                    sender=message['sender'],
-                    user=self.user
-                )
-                synced_count += 1
-        
-        return {'success': True, 'synced_count': synced_count}
-    
-    def _find_person_by_email(self, email_address: str):
-        """Find person by email address"""
         try:
-            from mobilize.contacts.models import Person
-            return Person.objects.filter(contact__email=email_address).first()
-        except:
-            return None
-    
-    def _find_church_by_email(self, email_address: str):
-        """Find church by email address"""
-        try:
-            from mobilize.churches.models import Church
-            return Church.objects.filter(contact__email=email_address).first()
-        except:
-            return None
\ No newline at end of file
+            sync = self.get_new_messages(days_back=days_back, max_results=max_results)
+        except HttpError as error:
+            print(f'Gmail API error: {error}')
+            return {'success': False, 'error': str(error)}
+        
+        from .email_matching import EmailMatcher
+        
+        # Match the whole page to stored messages and contacts in set queries
+        matcher = EmailMatcher(self.user, [self.with_addresses(message) for message in sync['messages']])
+        communications = []
+        for message in matcher.new_messages():
+            person, church = matcher.person_and_church(matcher.contact_for(message, sender_only=True))
+            communications.append(Communication(
+                type='email',
+                subject=message['subject'],
+                message=message['body'][:250],  # Truncate for database field
+                direction='inbound',
+                date=timezone.now().date(),
+                person=person,
+                church=church,
+                gmail_message_id=message['id'],
+                gmail_thread_id=message['thread_id'],
+                email_status='received',
+                sender=message['sender'],
+                user=self.user
+            ))
+        synced_count = matcher.insert(communications)
+        
+        self.save_sync_checkpoint(sync)
+        return {'success': True, 'synced_count': synced_count, 'full_sync': sync['full_sync']}
@@ -4,15 +4,15 @@ from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 import pytz
 
-from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
+from .google_clients import build, forget_google_clients, get_google_client, load_user_credentials, save_user_credentials
+
 User = get_user_model()
 
 
@@ -30,15 +30,12 @@ class GoogleCalendarService:
         self._initialize_service()
     
     def _initialize_service(self):
-        """Initialize Calendar API service with user credentials"""
+        """Initialize Calendar API service with user credentials, cached per process"""
         try:
-            credentials = self._get_user_credentials()
-            if credentials and credentials.valid:
-                self.service = build('calendar', 'v3', credentials=credentials)
-            elif credentials and credentials.expired and credentials.refresh_token:
-                credentials.refresh(Request())
-                self._save_user_credentials(credentials)
-                self.service = build('calendar', 'v3', credentials=credentials)
+            self.service, _ = get_google_client(
+                self.user, 'calendar', 'v3',
+                self._get_user_credentials, self._save_user_credentials, build_client=build
+            )
         except Exception as e:
             print(f"Error initializing Calendar service: {e}")
             self.service = None
@@ -46,20 +43,8 @@ class GoogleCalendarService:
     def _get_user_credentials(self) -> Optional[Credentials]:
         """Get stored credentials for the user"""
         try:
-            from mobilize.authentication.models import GoogleToken
-            token = GoogleToken.objects.filter(user=self.user).first()
-            if token and token.access_token:
-                # Use the user's actual scopes, not the service's required scopes
-                user_scopes = token.scopes if token.scopes else self.SCOPES
-                creds_data = {
-                    'token': token.access_token,
-                    'refresh_token': token.refresh_token,
-                    'token_uri': 'https://oauth2.googleapis.com/token',
-                    'client_id': settings.GOOGLE_CLIENT_ID,
-                    'client_secret': settings.GOOGLE_CLIENT_SECRET,
-                    'scopes': user_scopes
-                }
-                return Credentials.from_authorized_user_info(creds_data)
+            # Use the user's actual scopes, not the service's required scopes
+            return load_user_credentials(self.user, self.SCOPES)
         except Exception as e:
             print(f"Error getting user credentials: {e}")
         return None
@@ -67,12 +52,7 @@ class GoogleCalendarService:
     def _save_user_credentials(self, credentials: Credentials):
         """Save updated credentials for the user"""
         try:
-            from mobilize.authentication.models import GoogleToken
-            token, created = GoogleToken.objects.get_or_create(user=self.user)
-            token.access_token = credentials.token
-            token.refresh_token = credentials.refresh_token
-            token.expires_at = credentials.expiry
-            token.save()
+            save_user_credentials(self.user, credentials)
         except Exception as e:
             print(f"Error saving user credentials: {e}")
     
@@ -119,6 +99,7 @@ class GoogleCalendarService:
         credentials = flow.credentials
         
         self._save_user_credentials(credentials)
+        forget_google_clients(self.user)
         self._initialize_service()
         
         return credentials
@@ -144,7 +125,7 @@ class GoogleCalendarService:
                 'access_role': calendar.get('accessRole', 'reader'),
                 'color_id': calendar.get('colorId', '1')
             } for calendar in calendars]
-            
+        
         except HttpError as error:
             print(f'Calendar API error: {error}')
             return []
@@ -242,7 +223,7 @@ class GoogleCalendarService:
                 'event_link': created_event.get('htmlLink'),
                 'event': created_event
             }
-            
+        
         except HttpError as error:
             return {'success': False, 'error': f'Calendar API error: {error}'}
         except Exception as error:
@@ -302,7 +283,7 @@ class GoogleCalendarService:
                 'event_link': updated_event.get('htmlLink'),
                 'event': updated_event
             }
-            
+        
         except HttpError as error:
             return {'success': False, 'error': f'Calendar API error: {error}'}
         except Exception as error:
@@ -321,7 +302,7 @@ class GoogleCalendarService:
             ).execute()
             
             return {'success': True}
-            
+        
         except HttpError as error:
             return {'success': False, 'error': f'Calendar API error: {error}'}
         except Exception as error:
@@ -374,7 +355,7 @@ class GoogleCalendarService:
                 'organizer': event.get('organizer', {}),
                 'status': event.get('status', 'confirmed')
             } for event in events]
-            
+        
         except HttpError as error:
             print(f'Calendar API error: {error}')
             return []
@@ -477,7 +458,7 @@ class GoogleCalendarService:
                 'time_min': time_min.isoformat(),
                 'time_max': time_max.isoformat()
             }
-            
+        
         except HttpError as error:
             return {'success': False, 'error': f'Calendar API error: {error}'}
         except Exception as error:
@@ -568,7 +549,7 @@ class GoogleCalendarService:
                 }
             else:
                 return result
-                
+        
         except Exception as error:
             return {'success': False, 'error': f'Error creating calendar event from task: {error}'}
     
@@ -594,7 +575,7 @@ class GoogleCalendarService:
             
             if frequency not in freq_map:
                 return None
-                
+            
             rrule_parts.append(f"FREQ={freq_map[frequency]}")
             
             # Interval
@@ -623,7 +604,7 @@ class GoogleCalendarService:
             rrule = "RRULE:" + ";".join(rrule_parts)
             
             return [rrule]
-            
+        
         except Exception as e:
             print(f"Error converting recurrence to RRULE: {e}")
             return None
\ No newline at end of file
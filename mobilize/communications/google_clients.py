@@ -0,0 +1,257 @@
+"""
+Shared construction of Google API clients.
+
+GmailService, GoogleCalendarService, GoogleContactsService and
+GoogleMeetService used to load the user's GoogleToken and build their API
+client from scratch on every construction, once per request or task.
+get_google_client() keeps the built clients of a process in an LRU keyed by
+user, API and thread, since the httplib2 connection inside a client must not
+be shared between threads. Cached clients are rebuilt from the stored token
+after CLIENT_TTL_SECONDS, so reconnected or revoked accounts are picked up.
+
+Discovery documents are read once per process from the copies bundled with
+googleapiclient. Access tokens are refreshed REFRESH_MARGIN before they
+expire rather than on a failed request. Refreshes are single-flight: threads
+of a process queue on a lock per user and other processes wait on a short
+lived lock in the shared cache, then reuse the token the first refresh
+stored instead of refreshing it again.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Callable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from googleapiclient import discovery
+from googleapiclient.discovery_cache import get_static_doc
+
+TOKEN_URI = 'https://oauth2.googleapis.com/token'
+
+# Built clients kept per process
+CLIENT_CACHE_SIZE = 128
+
+# Seconds a cached client is used before the stored token is read again
+CLIENT_TTL_SECONDS = 300
+
+# Tokens expiring within this margin are refreshed before use
+REFRESH_MARGIN = timedelta(minutes=5)
+
+# Seconds a refresh holds the shared lock, and other processes wait for it
+REFRESH_LOCK_TIMEOUT = 30
+REFRESH_WAIT_SECONDS = 10
+REFRESH_POLL_SECONDS = 0.2
+
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+_refresh_locks = {}
+_refresh_locks_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def discovery_document(api: str, version: str) -> Optional[str]:
+    """Get the bundled discovery document of an API, read once per process"""
+    return get_static_doc(api, version)
+
+
+def build(api: str, version: str, credentials=None, **kwargs):
+    """
+    Build an API client like googleapiclient.discovery.build().
+    
+    The discovery document comes from discovery_document() rather than
+    being read again, or fetched when the API is not bundled.
+    """
+    document = discovery_document(api, version)
+    if document is None:
+        return discovery.build(api, version, credentials=credentials, cache_discovery=False, **kwargs)
+    return discovery.build_from_document(document, credentials=credentials, **kwargs)
+
+
+def load_user_credentials(user, default_scopes) -> Optional[Credentials]:
+    """
+    Load the stored Google credentials of a user.
+    
+    Args:
+        user: User whose GoogleToken is loaded
+        default_scopes: Scopes assumed when the token has none stored
+    
+    Returns:
+        Credentials including the token expiry, or None without a token
+    """
+    from mobilize.authentication.models import GoogleToken
+    
+    token = GoogleToken.objects.filter(user=user).first()
+    if not token or not token.access_token:
+        return None
+    expiry = token.expires_at
+    if expiry is not None and timezone.is_aware(expiry):
+        # google-auth compares expiry with naive UTC times
+        expiry = timezone.make_naive(expiry, dt_timezone.utc)
+    return Credentials(
+        token=token.access_token,
+        refresh_token=token.refresh_token,
+        token_uri=TOKEN_URI,
+        client_id=settings.GOOGLE_CLIENT_ID,
+        client_secret=settings.GOOGLE_CLIENT_SECRET,
+        scopes=token.scopes or default_scopes,
+        expiry=expiry,
+    )
+
+
+def save_user_credentials(user, credentials: Credentials):
+    """Store refreshed or newly authorized credentials for a user"""
+    from mobilize.authentication.models import GoogleToken
+    
+    expiry = credentials.expiry
+    if expiry is not None and timezone.is_naive(expiry):
+        expiry = timezone.make_aware(expiry, dt_timezone.utc)
+    token = GoogleToken.objects.filter(user=user).first() or GoogleToken(user=user)
+    token.access_token = credentials.token
+    token.refresh_token = credentials.refresh_token
+    token.expires_at = expiry
+    token.save()
+
+
+def needs_refresh(credentials: Credentials) -> bool:
+    """Check whether credentials expire within REFRESH_MARGIN"""
+    if not credentials.token:
+        return True
+    expiry = getattr(credentials, 'expiry', None)
+    if not isinstance(expiry, datetime):
+        # Unknown expiry; google-auth refreshes on the first rejected request
+        return False
+    return expiry - REFRESH_MARGIN <= datetime.utcnow()
+
+
+def refresh_credentials(user, credentials: Credentials, load_credentials: Callable,
+                        save_credentials: Callable) -> Credentials:
+    """
+    Refresh credentials about to expire, once for all workers.
+    
+    Args:
+        user: User the credentials belong to
+        credentials: Credentials to refresh in place
+        load_credentials: Returns the user's stored credentials
+        save_credentials: Stores the refreshed credentials
+    
+    Returns:
+        The credentials, refreshed or given the token another worker stored
+    """
+    if not needs_refresh(credentials) or not credentials.refresh_token:
+        return credentials
+    
+    with _refresh_lock(user.pk):
+        if not needs_refresh(credentials):
+            # Refreshed by another thread sharing these credentials
+            return credentials
+        
+        lock_key = f'google_token_refresh:{user.pk}'
+        if cache.add(lock_key, 1, timeout=REFRESH_LOCK_TIMEOUT):
+            try:
+                # Another process may have refreshed the token since it was loaded
+                if _adopt_stored_token(credentials, load_credentials):
+                    return credentials
+                credentials.refresh(Request())
+                save_credentials(credentials)
+            finally:
+                cache.delete(lock_key)
+            return credentials
+        
+        deadline = time.monotonic() + REFRESH_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(REFRESH_POLL_SECONDS)
+            if _adopt_stored_token(credentials, load_credentials):
+                return credentials
+        
+        # The other refresh did not finish in time
+        credentials.refresh(Request())
+        save_credentials(credentials)
+        return credentials
+
+
+def _adopt_stored_token(credentials: Credentials, load_credentials: Callable) -> bool:
+    """Take over the stored token if it is fresh, returning whether it was"""
+    stored = load_credentials()
+    if stored is None or needs_refresh(stored):
+        return False
+    credentials.token = stored.token
+    credentials.expiry = stored.expiry
+    return True
+
+
+def _refresh_lock(user_id):
+    with _refresh_locks_lock:
+        return _refresh_locks.setdefault(user_id, threading.Lock())
+
+
+def get_google_client(user, api: str, version: str, load_credentials: Callable,
+                      save_credentials: Callable, build_client: Callable = build) -> Tuple:
+    """
+    Get a built API client for a user, from the process cache when possible.
+    
+    Args:
+        user: User the client acts for
+        api: API name, e.g. 'gmail'
+        version: API version, e.g. 'v1'
+        load_credentials: Returns the user's stored credentials or None
+        save_credentials: Stores refreshed credentials
+        build_client: Builds a client from (api, version, credentials=...)
+    
+    Returns:
+        Tuple (client, credentials), or (None, None) without usable credentials
+    """
+    size = getattr(settings, 'GOOGLE_CLIENT_CACHE_SIZE', CLIENT_CACHE_SIZE)
+    key = (user.pk, api, version, threading.get_ident())
+    
+    entry = _cached_client(key) if size else None
+    if entry is not None:
+        client, credentials = entry
+        refresh_credentials(user, credentials, load_credentials, save_credentials)
+        return client, credentials
+    
+    credentials = load_credentials()
+    if credentials is None:
+        return None, None
+    refresh_credentials(user, credentials, load_credentials, save_credentials)
+    if not credentials.valid:
+        return None, None
+    
+    client = build_client(api, version, credentials=credentials)
+    if size:
+        with _clients_lock:
+            _clients[key] = (client, credentials, time.monotonic())
+            _clients.move_to_end(key)
+            while len(_clients) > size:
+                _clients.popitem(last=False)
+    return client, credentials
+
+
+def _cached_client(key):
+    with _clients_lock:
+        entry = _clients.get(key)
+        if entry is None:
+            return None
+        client, credentials, built_at = entry
+        if time.monotonic() - built_at > getattr(settings, 'GOOGLE_CLIENT_TTL', CLIENT_TTL_SECONDS):
+            del _clients[key]
+            return None
+        _clients.move_to_end(key)
+        return client, credentials
+
+
+def forget_google_clients(user=None):
+    """
+    Drop cached clients, e.g. after a user authorized again.
+    
+    Args:
+        user: User whose clients are dropped, or None for all
+    """
+    with _clients_lock:
+        for key in list(_clients):
+            if user is None or key[0] == user.pk:
+                del _clients[key]
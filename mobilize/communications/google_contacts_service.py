@@ -2,9 +2,7 @@ import os
 import json
 from typing import Optional, List, Dict, Any, Tuple
 
-from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -13,6 +11,7 @@ from django.db import transaction
 
 from .models import Communication
 from .gmail_service import GmailService
+from .google_clients import build, get_google_client
 
 User = get_user_model()
 
@@ -31,18 +30,14 @@ class GoogleContactsService:
         self._initialize_service()
     
     def _initialize_service(self):
-        """Initialize Google Contacts API service with user credentials"""
+        """Initialize Google Contacts API service with user credentials, cached per process"""
         try:
             # Reuse Gmail service credentials since they should include contacts scope
             gmail_service = GmailService(self.user)
-            credentials = gmail_service._get_user_credentials()
-            
-            if credentials and credentials.valid:
-                self.service = build('people', 'v1', credentials=credentials)
-            elif credentials and credentials.expired and credentials.refresh_token:
-                credentials.refresh(Request())
-                gmail_service._save_user_credentials(credentials)
-                self.service = build('people', 'v1', credentials=credentials)
+            self.service, _ = get_google_client(
+                self.user, 'people', 'v1',
+                gmail_service._get_user_credentials, gmail_service._save_user_credentials, build_client=build
+            )
         except Exception as e:
             print(f"Error initializing Google Contacts service: {e}")
             self.service = None
@@ -80,7 +75,7 @@ class GoogleContactsService:
                     break
             
             return contacts
-            
+        
         except HttpError as error:
             print(f'Google Contacts API error: {error}')
             return []
@@ -165,7 +160,7 @@ class GoogleContactsService:
                 return self._sync_crm_contacts_only()
             elif sync_settings.sync_preference == 'all_contacts':
                 return self._sync_all_contacts_to_crm()
-            
+        
         except Exception as e:
             error_msg = f"Contact sync failed: {str(e)}"
             print(error_msg)
@@ -205,7 +200,7 @@ class GoogleContactsService:
                 
                 if updated:
                     synced_count += 1
-                    
+            
             except Exception as e:
                 errors.append(f"Error syncing contact {parsed.get('email', 'unknown')}: {str(e)}")
         
@@ -253,7 +248,7 @@ class GoogleContactsService:
                     # Create new contact
                     self._create_contact_from_google(parsed)
                     created_count += 1
-                    
+            
             except Exception as e:
                 errors.append(f"Error importing contact {parsed.get('email', 'unknown')}: {str(e)}")
         
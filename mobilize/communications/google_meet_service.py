@@ -2,14 +2,13 @@ import os
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 
-from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
+from .google_clients import build, get_google_client, load_user_credentials, save_user_credentials
+
 User = get_user_model()
 
 
@@ -27,15 +26,12 @@ class GoogleMeetService:
         self._initialize_service()
     
     def _initialize_service(self):
-        """Initialize Google Calendar API service with user credentials"""
+        """Initialize Google Calendar API service with user credentials, cached per process"""
         try:
-            credentials = self._get_user_credentials()
-            if credentials and credentials.valid:
-                self.service = build('calendar', 'v3', credentials=credentials)
-            elif credentials and credentials.expired and credentials.refresh_token:
-                credentials.refresh(Request())
-                self._save_user_credentials(credentials)
-                self.service = build('calendar', 'v3', credentials=credentials)
+            self.service, _ = get_google_client(
+                self.user, 'calendar', 'v3',
+                self._get_user_credentials, self._save_user_credentials, build_client=build
+            )
         except Exception as e:
             print(f"Error initializing Google Calendar service: {e}")
             self.service = None
@@ -43,20 +39,8 @@ class GoogleMeetService:
     def _get_user_credentials(self) -> Optional[Credentials]:
         """Get stored credentials for the user"""
         try:
-            from mobilize.authentication.models import GoogleToken
-            token = GoogleToken.objects.filter(user=self.user).first()
-            if token and token.access_token:
-                # Use the actual stored scopes instead of hardcoded ones
-                stored_scopes = token.scopes if token.scopes else self.SCOPES
-                creds_data = {
-                    'token': token.access_token,
-                    'refresh_token': token.refresh_token,
-                    'token_uri': 'https://oauth2.googleapis.com/token',
-                    'client_id': settings.GOOGLE_CLIENT_ID,
-                    'client_secret': settings.GOOGLE_CLIENT_SECRET,
-                    'scopes': stored_scopes
-                }
-                return Credentials.from_authorized_user_info(creds_data)
+            # Use the actual stored scopes instead of hardcoded ones
+            return load_user_credentials(self.user, self.SCOPES)
         except Exception as e:
             print(f"Error getting user credentials: {e}")
         return None
@@ -64,12 +48,7 @@ class GoogleMeetService:
     def _save_user_credentials(self, credentials: Credentials):
         """Save updated credentials for the user"""
         try:
-            from mobilize.authentication.models import GoogleToken
-            token, created = GoogleToken.objects.get_or_create(user=self.user)
-            token.access_token = credentials.token
-            token.refresh_token = credentials.refresh_token
-            token.expires_at = credentials.expiry
-            token.save()
+            save_user_credentials(self.user, credentials)
         except Exception as e:
             print(f"Error saving user credentials: {e}")
     
@@ -84,7 +63,7 @@ class GoogleMeetService:
         Args:
             title: Title for the calendar event
             duration_minutes: Duration of the meeting in minutes
-            
+        
         Returns:
             Dict with success status, meet_link, and event_id
         """
@@ -144,7 +123,7 @@ class GoogleMeetService:
                 'start_time': start_time.isoformat(),
                 'end_time': end_time.isoformat()
             }
-            
+        
         except HttpError as error:
             return {'success': False, 'error': f'Google Calendar API error: {error}'}
         except Exception as error:
@@ -162,7 +141,7 @@ class GoogleMeetService:
             end_datetime: When the meeting ends
             description: Description for the meeting
             attendee_emails: List of email addresses to invite
-            
+        
         Returns:
             Dict with success status, meet_link, and event_id
         """
@@ -220,7 +199,7 @@ class GoogleMeetService:
                 'start_time': start_datetime.isoformat(),
                 'end_time': end_datetime.isoformat()
             }
-            
+        
         except HttpError as error:
             return {'success': False, 'error': f'Google Calendar API error: {error}'}
         except Exception as error:
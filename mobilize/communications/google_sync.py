@@ -0,0 +1,145 @@
+"""
+Coordination of the per-user Google syncs.
+
+The sync_google_accounts task fans a sync_google_user task per user out as a
+Celery chord, so users sync side by side across the workers instead of one
+after another. The runs are kept apart through the shared cache:
+
+- a per-user lock, so two runs for the same user never overlap;
+- a fixed number of global slots, capping how many users sync at once
+  however many workers pick the tasks up;
+- a per-user budget of Google API quota units per hour, charged with the
+  estimated cost of each service sync before it runs.
+
+These only hold across workers because the 'google_sync:' keys skip the
+in-process LRU and live in the shared Redis tier of the default cache.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+SERVICES = ('gmail', 'calendar', 'contacts')
+
+KEY_PREFIX = 'google_sync:'
+
+# Seconds a lock or slot outlives a worker that died while holding it
+LOCK_TIMEOUT = 30 * 60
+
+# Users synced at the same time, over all workers
+MAX_CONCURRENT_USERS = 8
+
+# Google API quota units a user's syncs may spend per window
+USER_QUOTA_UNITS = 10000
+QUOTA_WINDOW_SECONDS = 3600
+
+# Estimated quota units of one sync: Gmail charges 5 units per message get
+# and list call, Calendar and People about one per page of results
+GMAIL_UNITS_PER_MESSAGE = 5
+GMAIL_LIST_UNITS = 10
+CALENDAR_SYNC_UNITS = 5
+CONTACTS_SYNC_UNITS = 10
+
+
+def sync_cost(service, max_messages):
+    """
+    Estimate the quota units of one service sync.
+    
+    Args:
+        service: 'gmail', 'calendar' or 'contacts'
+        max_messages: Messages fetched at most by a full Gmail sync
+    
+    Returns:
+        Quota units to charge against the user's budget
+    """
+    if service == 'gmail':
+        return GMAIL_LIST_UNITS + GMAIL_UNITS_PER_MESSAGE * max_messages
+    if service == 'calendar':
+        return CALENDAR_SYNC_UNITS
+    return CONTACTS_SYNC_UNITS
+
+
+def acquire_user_lock(user_id):
+    """
+    Take the sync lock of a user.
+    
+    Returns:
+        Token to release the lock with, or None if a sync of the user is
+        already running
+    """
+    token = uuid.uuid4().hex
+    if cache.add(f'{KEY_PREFIX}lock:{user_id}', token, timeout=LOCK_TIMEOUT):
+        return token
+    return None
+
+
+def release_user_lock(user_id, token):
+    """Release a user's sync lock, unless it expired and was taken over."""
+    key = f'{KEY_PREFIX}lock:{user_id}'
+    if cache.get(key) == token:
+        cache.delete(key)
+
+
+def acquire_slot():
+    """
+    Take one of the global sync slots.
+    
+    Returns:
+        (cache key, token) of the slot to release it with, or None if all
+        slots are busy
+    """
+    token = uuid.uuid4().hex
+    for slot in range(getattr(settings, 'GOOGLE_SYNC_MAX_CONCURRENCY', MAX_CONCURRENT_USERS)):
+        key = f'{KEY_PREFIX}slot:{slot}'
+        if cache.add(key, token, timeout=LOCK_TIMEOUT):
+            return key, token
+    return None
+
+
+def release_slot(key, token):
+    """Give a global sync slot back, unless it expired and was taken over."""
+    if cache.get(key) == token:
+        cache.delete(key)
+
+
+class QuotaBudget:
+    """
+    Per-user budget of Google API quota units over a fixed window.
+    """
+    
+    def __init__(self, user_id, limit=None, window=QUOTA_WINDOW_SECONDS):
+        """
+        Initialize the budget.
+        
+        Args:
+            user_id: ID of the user whose syncs are charged
+            limit: Units per window, defaulting to GOOGLE_SYNC_USER_QUOTA
+                or USER_QUOTA_UNITS
+            window: Length of the window in seconds
+        """
+        self.limit = limit if limit is not None else getattr(settings, 'GOOGLE_SYNC_USER_QUOTA', USER_QUOTA_UNITS)
+        self.window = window
+        self.key = f'{KEY_PREFIX}quota:{user_id}:{int(time.time() // window)}'
+    
+    def spent(self):
+        """Units spent in the current window."""
+        return cache.get(self.key, 0)
+    
+    def remaining(self):
+        """Units left in the current window."""
+        return max(0, self.limit - self.spent())
+    
+    def spend(self, units):
+        """
+        Charge units against the budget.
+        
+        Returns:
+            True if the budget covered them, False (charging nothing) if it
+            would be exceeded
+        """
+        cache.add(self.key, 0, timeout=self.window)
+        if cache.incr(self.key, units) > self.limit:
+            cache.decr(self.key, units)
+            return False
+        return True
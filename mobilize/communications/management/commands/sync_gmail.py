@@ -18,7 +18,18 @@ class Command(BaseCommand):
             '--days-back',
             type=int,
             default=7,
-            help='Number of days back to sync emails (default: 7)'
+            help='Number of days back to sync emails when there is no sync checkpoint (default: 7)'
+        )
+        parser.add_argument(
+            '--max-messages',
+            type=int,
+            default=100,
+            help='Maximum number of messages fetched per user on a full sync (default: 100)'
+        )
+        parser.add_argument(
+            '--parallel',
+            action='store_true',
+            help='Sync the users side by side as Celery tasks on the sync queue'
         )
         parser.add_argument(
             '--dry-run',
@@ -29,6 +40,7 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         user_id = options.get('user_id')
         days_back = options['days_back']
+        max_messages = options['max_messages']
         dry_run = options['dry_run']
         
         if dry_run:
@@ -55,6 +67,10 @@ class Command(BaseCommand):
                 # Fallback if GoogleToken model doesn't exist
                 users = User.objects.filter(is_active=True)
         
+        if options['parallel'] and not dry_run:
+            self._dispatch(users, days_back, max_messages)
+            return
+        
         total_synced = 0
         users_processed = 0
         
@@ -69,14 +85,24 @@ class Command(BaseCommand):
                     continue
                 
                 if dry_run:
-                    # For dry run, just check authentication
+                    # For dry run, fetch only the headers of the messages that would be
+                    # synced and leave the sync checkpoint where it is
+                    sync = gmail_service.get_new_messages(
+                        days_back=days_back,
+                        max_results=max_messages,
+                        message_format='metadata'
+                    )
+                    mode = 'full window' if sync['full_sync'] else 'since last sync'
                     self.stdout.write(
-                        self.style.SUCCESS(f'User {user.username} ({user.id}) - Ready for sync')
+                        self.style.SUCCESS(
+                            f'User {user.username} ({user.id}) - Ready for sync, '
+                            f'{len(sync["messages"])} new messages found ({mode})'
+                        )
                     )
                     users_processed += 1
                 else:
                     # Actually sync emails
-                    result = gmail_service.sync_emails_to_communications(days_back)
+                    result = gmail_service.sync_emails_to_communications(days_back, max_results=max_messages)
                     
                     if result['success']:
                         synced_count = result['synced_count']
@@ -94,7 +120,7 @@ class Command(BaseCommand):
                                 f'User {user.username} ({user.id}) - Sync failed: {result["error"]}'
                             )
                         )
-                        
+            
             except Exception as e:
                 self.stdout.write(
                     self.style.ERROR(f'User {user.username} ({user.id}) - Error: {str(e)}')
@@ -110,4 +136,32 @@ class Command(BaseCommand):
                 self.style.SUCCESS(
                     f'Gmail sync completed: {total_synced} emails synced for {users_processed} users'
                 )
-            )
\ No newline at end of file
+            )
+    
+    def _dispatch(self, users, days_back, max_messages):
+        """Fan the syncs out as a chord instead of running them one by one."""
+        from mobilize.communications.tasks import dispatch_google_sync
+        
+        user_ids = list(users.values_list('id', flat=True))
+        result = dispatch_google_sync(user_ids, services=['gmail'], days_back=days_back, max_messages=max_messages)
+        if not result.ready():
+            self.stdout.write(
+                self.style.SUCCESS(f'Gmail sync dispatched for {len(user_ids)} users (summary task {result.id})')
+            )
+            return
+        
+        # Eager or already finished: report the summary here instead of its task id
+        summary = result.get(propagate=False)
+        if result.failed():
+            self.stdout.write(self.style.ERROR(f'Gmail sync failed: {summary}'))
+            return
+        
+        gmail = summary['services'].get('gmail', {'synced': 0, 'failed': 0, 'skipped': 0})
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Gmail sync completed: {gmail['synced']} emails synced for {summary['users_synced']} users, "
+                f"{gmail['failed']} failed, {gmail['skipped'] + summary['users_skipped']} skipped"
+            )
+        )
+        for reason, count in sorted(summary['skipped_reasons'].items()):
+            self.stdout.write(self.style.WARNING(f'{count} users skipped: {reason}'))
@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-16 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("communications", "0006_remove_firebase_field"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="communication",
+            index=models.Index(
+                fields=["date", "id"], name="communicati_date_586fba_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-16 20:44
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def clear_duplicate_gmail_ids(apps, schema_editor):
+    """Keep the Gmail message ID on the first copy of each message only."""
+    Communication = apps.get_model("communications", "Communication")
+    duplicates = (
+        Communication.objects.filter(gmail_message_id__gt="")
+        .values("user_id", "gmail_message_id")
+        .annotate(copies=Count("id"), first_id=Min("id"))
+        .filter(copies__gt=1)
+    )
+    for duplicate in duplicates:
+        Communication.objects.filter(
+            user_id=duplicate["user_id"], gmail_message_id=duplicate["gmail_message_id"]
+        ).exclude(id=duplicate["first_id"]).update(gmail_message_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("communications", "0008_gmail_sync_state"),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_gmail_ids, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="communication",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("gmail_message_id__gt", "")),
+                fields=("user", "gmail_message_id"),
+                name="comm_unique_user_gmail_message",
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-16 22:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("communications", "0009_unique_gmail_message"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="gmailsyncstate",
+            name="scope",
+            field=models.CharField(
+                choices=[
+                    ("all", "All messages"),
+                    ("contacts", "Messages about contacts"),
+                ],
+                default="all",
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="gmailsyncstate",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="gmail_sync_states",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="gmailsyncstate",
+            constraint=models.UniqueConstraint(
+                fields=("user", "scope"), name="unique_gmail_sync_scope"
+            ),
+        ),
+    ]
@@ -79,7 +79,7 @@ class EmailSignature(models.Model):
         # If this is the user's first signature, make it default
         if not self.pk and not EmailSignature.objects.filter(user=self.user).exists():
             self.is_default = True
-            
+        
         super().save(*args, **kwargs)
 
 
@@ -156,6 +156,15 @@ class Communication(models.Model):
             models.Index(fields=['office', 'date']),          # Composite for office communications
             models.Index(fields=['gmail_message_id']),        # For Gmail sync lookups
             models.Index(fields=['status']),                  # For Celery task processing
+            models.Index(fields=['date', 'id']),              # Keyset pagination
+        ]
+        constraints = [
+            # Each Gmail message is stored once per mailbox; syncs insert with ignore_conflicts
+            models.UniqueConstraint(
+                fields=['user', 'gmail_message_id'],
+                condition=models.Q(gmail_message_id__gt=''),
+                name='comm_unique_user_gmail_message'
+            ),
         ]
     
     def __str__(self):
@@ -185,3 +194,42 @@ class EmailAttachment(models.Model):
     
     def __str__(self):
         return self.filename
+
+
+class GmailSyncState(models.Model):
+    """
+    Per-user checkpoint of a Gmail sync.
+    
+    history_id is the mailbox historyId up to which messages have been
+    synced; the next sync asks the Gmail history API only for messages added
+    after it. Gmail keeps history for about a week, after which the sync
+    falls back to a full window and starts a new checkpoint.
+    
+    The syncs keep different messages, so each scope has its own checkpoint:
+    one sync moving past a message must not hide it from the other.
+    """
+    SCOPE_CHOICES = (
+        ('all', 'All messages'),
+        ('contacts', 'Messages about contacts'),
+    )
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='gmail_sync_states'
+    )
+    scope = models.CharField(max_length=20, choices=SCOPE_CHOICES, default='all')
+    history_id = models.CharField(max_length=32, blank=True, null=True)
+    last_sync_at = models.DateTimeField(blank=True, null=True)
+    last_full_sync_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'gmail_sync_states'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope'], name='unique_gmail_sync_scope'),
+        ]
+    
+    def __str__(self):
+        return f"Gmail sync of {self.get_scope_display().lower()} for {self.user} at history {self.history_id}"
@@ -9,14 +9,16 @@ import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
 
-from celery import shared_task
+from celery import chord, group, shared_task
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
 from django.db import transaction
 from django.utils import timezone
 
+from . import google_sync
 from .models import Communication, EmailTemplate, EmailSignature
+from .email_matching import EmailMatcher
 from .gmail_service import GmailService
 from mobilize.contacts.models import Contact
 
@@ -48,7 +50,7 @@ def process_pending_emails(self):
                 result = send_email_communication.delay(communication.id)
                 processed_count += 1
                 logger.info(f"Queued email communication {communication.id} for sending")
-                
+            
             except Exception as e:
                 failed_count += 1
                 logger.error(f"Failed to queue email communication {communication.id}: {str(e)}")
@@ -59,7 +61,7 @@ def process_pending_emails(self):
             'failed': failed_count,
             'total': pending_communications.count()
         }
-        
+    
     except Exception as exc:
         logger.error(f"Error processing pending emails: {str(exc)}")
         raise self.retry(exc=exc)
@@ -129,11 +131,11 @@ def send_email_communication(self, communication_id: int):
             'communication_id': communication_id,
             'message_id': message.get('id', '')
         }
-        
+    
     except Communication.DoesNotExist:
         logger.error(f"Communication {communication_id} not found")
         return {'status': 'error', 'reason': 'not_found'}
-        
+    
     except Exception as exc:
         # Mark communication as failed
         try:
@@ -149,74 +151,244 @@ def send_email_communication(self, communication_id: int):
 
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=300)
-def sync_gmail_emails(self, user_id: int, days_back: int = 7):
+def sync_gmail_emails(self, user_id: int, days_back: int = 7, max_results: int = 100):
     """
     Sync emails from Gmail for a specific user.
     
     Args:
         user_id: ID of the user to sync emails for
-        days_back: Number of days back to sync emails
+        days_back: Number of days back to sync emails when there is no
+            usable sync checkpoint
+        max_results: Maximum number of messages fetched for such a full sync
     """
     try:
         user = User.objects.get(id=user_id)
         gmail_service = GmailService(user)
         
-        # Calculate date range
-        since_date = timezone.now() - timedelta(days=days_back)
-        
-        # Get emails from Gmail
-        emails = gmail_service.get_emails(since_date=since_date)
-        
-        synced_count = 0
-        for email_data in emails:
-            try:
-                # Extract email information
-                sender_email = email_data.get('sender_email', '')
-                recipient_emails = email_data.get('recipient_emails', [])
-                
-                # Find related contacts
-                related_contacts = Contact.objects.filter(
-                    email__in=[sender_email] + recipient_emails
-                ).first()
-                
-                if related_contacts:
-                    # Create communication record
-                    communication, created = Communication.objects.get_or_create(
-                        external_id=email_data.get('id', ''),
-                        defaults={
-                            'user': user,
-                            'person': getattr(related_contacts, 'person', None),
-                            'type': 'email',
-                            'subject': email_data.get('subject', ''),
-                            'content': email_data.get('body', ''),
-                            'status': 'sent',
-                            'date_sent': email_data.get('date', timezone.now()),
-                            'created_at': timezone.now(),
-                        }
-                    )
-                    
-                    if created:
-                        synced_count += 1
-                        
-            except Exception as e:
-                logger.error(f"Error syncing email {email_data.get('id', '')}: {str(e)}")
-        
+        # Get the emails added since this sync's last checkpoint, fetched in batch requests
+        sync = gmail_service.get_new_messages(days_back=days_back, max_results=max_results, scope='contacts')
+        emails = [gmail_service.with_addresses(message) for message in sync['messages']]
+        
+        # Match the emails to stored messages and contacts in set queries,
+        # keeping those about a known sender or recipient
+        matcher = EmailMatcher(user, emails)
+        communications = []
+        for email_data in matcher.new_messages():
+            contact = matcher.contact_for(email_data)
+            if contact is None:
+                continue
+            person, church = matcher.person_and_church(contact)
+            communications.append(Communication(
+                user=user,
+                person=person,
+                church=church,
+                type='email',
+                subject=email_data.get('subject', ''),
+                content=email_data.get('body', ''),
+                status='sent',
+                date_sent=email_data.get('sent_at') or timezone.now(),
+                created_at=timezone.now(),
+                gmail_message_id=email_data['id'],
+                gmail_thread_id=email_data.get('thread_id'),
+                external_id=email_data['id'],
+            ))
+        synced_count = matcher.insert(communications)
+        
+        gmail_service.save_sync_checkpoint(sync)
         logger.info(f"Synced {synced_count} emails for user {user_id}")
         return {
             'user_id': user_id,
             'synced_count': synced_count,
-            'total_emails': len(emails)
+            'total_emails': len(emails),
+            'full_sync': sync['full_sync']
         }
-        
+    
     except User.DoesNotExist:
         logger.error(f"User {user_id} not found")
         return {'status': 'error', 'reason': 'user_not_found'}
-        
+    
     except Exception as exc:
         logger.error(f"Error syncing Gmail emails for user {user_id}: {str(exc)}")
         raise self.retry(exc=exc)
 
 
+def google_sync_user_ids():
+    """IDs of the users with a stored Google token."""
+    from mobilize.authentication.models import GoogleToken
+    
+    return list(
+        GoogleToken.objects.filter(access_token__isnull=False)
+        .values_list('user_id', flat=True).distinct().order_by('user_id')
+    )
+
+
+def dispatch_google_sync(user_ids=None, services=google_sync.SERVICES, days_back: int = 7,
+                         max_messages: int = 100):
+    """
+    Fan per-user Google syncs out as a chord on the sync queue.
+    
+    Args:
+        user_ids: Users to sync, defaulting to everyone with a Google token
+        services: Any of 'gmail', 'calendar' and 'contacts'
+        days_back: Days synced by a full Gmail sync
+        max_messages: Messages fetched at most by a full Gmail sync
+    
+    Returns:
+        AsyncResult of the summarize_google_sync callback
+    """
+    if user_ids is None:
+        user_ids = google_sync_user_ids()
+    header = group(
+        sync_google_user.s(user_id, list(services), days_back, max_messages).set(queue='sync')
+        for user_id in user_ids
+    )
+    return chord(header)(summarize_google_sync.s().set(queue='sync'))
+
+
+@shared_task(bind=True)
+def sync_google_accounts(self, user_ids: List[int] = None, services: List[str] = None, days_back: int = 7,
+                         max_messages: int = 100):
+    """
+    Sync the Google integrations of all users in parallel.
+    
+    Each user gets a sync_google_user task, so the run takes as long as the
+    slowest users over the available workers rather than the sum of all
+    users. The summary is returned by the summarize_google_sync callback.
+    
+    Args:
+        user_ids: Users to sync, defaulting to everyone with a Google token
+        services: Any of 'gmail', 'calendar' and 'contacts', defaulting to all
+        days_back: Days synced by a full Gmail sync
+        max_messages: Messages fetched at most by a full Gmail sync
+    """
+    if user_ids is None:
+        user_ids = google_sync_user_ids()
+    if not user_ids:
+        return {'status': 'skipped', 'reason': 'no_users'}
+    
+    result = dispatch_google_sync(user_ids, services or google_sync.SERVICES, days_back, max_messages)
+    logger.info(f"Dispatched Google sync for {len(user_ids)} users")
+    return {'status': 'dispatched', 'users': len(user_ids), 'summary_task_id': result.id}
+
+
+@shared_task(bind=True, max_retries=60, default_retry_delay=30)
+def sync_google_user(self, user_id: int, services: List[str] = None, days_back: int = 7,
+                     max_messages: int = 100):
+    """
+    Sync the Google integrations of one user.
+    
+    The run is skipped when a sync of the user is already running, and
+    retried later while all global sync slots are busy, until it is skipped
+    after max_retries so the chord still summarizes. Each service is
+    charged against the user's quota budget before it runs and skipped when
+    the budget is spent.
+    
+    Args:
+        user_id: ID of the user to sync
+        services: Any of 'gmail', 'calendar' and 'contacts', defaulting to all
+        days_back: Days synced by a full Gmail sync
+        max_messages: Messages fetched at most by a full Gmail sync
+    
+    Returns:
+        Dict with the user_id, a status and a result per service
+    """
+    token = google_sync.acquire_user_lock(user_id)
+    if token is None:
+        return {'user_id': user_id, 'status': 'skipped', 'reason': 'already_running'}
+    
+    slot = None
+    try:
+        slot = google_sync.acquire_slot()
+        if slot is None:
+            if self.request.retries >= self.max_retries:
+                # Failing here would fail the chord and lose the whole summary
+                logger.warning(f"No Google sync slot freed up for user {user_id}, skipping this run")
+                return {'user_id': user_id, 'status': 'skipped', 'reason': 'no_slot'}
+            raise self.retry()
+        
+        user = User.objects.filter(id=user_id).first()
+        if user is None:
+            return {'user_id': user_id, 'status': 'skipped', 'reason': 'user_not_found'}
+        
+        budget = google_sync.QuotaBudget(user_id)
+        results = {}
+        for service in services or google_sync.SERVICES:
+            if not budget.spend(google_sync.sync_cost(service, max_messages)):
+                results[service] = {'success': False, 'skipped': 'quota_exhausted'}
+                continue
+            try:
+                results[service] = _sync_google_service(user, service, days_back, max_messages)
+            except Exception as e:
+                logger.error(f"Error syncing Google {service} for user {user_id}: {str(e)}")
+                results[service] = {'success': False, 'error': str(e)}
+        
+        return {'user_id': user_id, 'status': 'synced', 'services': results}
+    
+    finally:
+        if slot is not None:
+            google_sync.release_slot(*slot)
+        google_sync.release_user_lock(user_id, token)
+
+
+def _sync_google_service(user, service: str, days_back: int, max_messages: int) -> Dict[str, Any]:
+    """Run one service sync for a user."""
+    if service == 'gmail':
+        client = GmailService(user)
+    elif service == 'calendar':
+        from .google_calendar_service import GoogleCalendarService
+        client = GoogleCalendarService(user)
+    elif service == 'contacts':
+        from .google_contacts_service import GoogleContactsService
+        client = GoogleContactsService(user)
+    else:
+        return {'success': False, 'error': f'Unknown Google service: {service}'}
+    
+    if not client.is_authenticated():
+        return {'success': False, 'skipped': 'not_authenticated'}
+    if service == 'gmail':
+        return client.sync_emails_to_communications(days_back, max_results=max_messages)
+    if service == 'calendar':
+        return client.sync_events_to_tasks()
+    return client.sync_contacts_based_on_preference() or {'success': False, 'error': 'Unknown sync preference'}
+
+
+@shared_task
+def summarize_google_sync(results: List[Dict[str, Any]]):
+    """
+    Summarize the per-user results of a Google sync chord.
+    
+    Returns:
+        Dict with the users synced and skipped, the users skipped per reason,
+        and per service the items synced and the users that failed or were
+        skipped
+    """
+    summary = {
+        'users': len(results),
+        'users_synced': 0,
+        'users_skipped': 0,
+        'skipped_reasons': {},
+        'services': {},
+    }
+    for result in results:
+        if result.get('status') != 'synced':
+            summary['users_skipped'] += 1
+            reason = result.get('reason', 'unknown')
+            summary['skipped_reasons'][reason] = summary['skipped_reasons'].get(reason, 0) + 1
+            continue
+        summary['users_synced'] += 1
+        for service, service_result in result['services'].items():
+            totals = summary['services'].setdefault(service, {'synced': 0, 'failed': 0, 'skipped': 0})
+            if service_result.get('success'):
+                totals['synced'] += service_result.get('synced_count', 0)
+            elif service_result.get('skipped'):
+                totals['skipped'] += 1
+            else:
+                totals['failed'] += 1
+    
+    logger.info(f"Google sync finished: {summary}")
+    return summary
+
+
 @shared_task(bind=True)
 def send_bulk_email(self, template_id: int, contact_ids: List[int], user_id: int, subject_override: str = None):
     """
@@ -252,7 +424,7 @@ def send_bulk_email(self, template_id: int, contact_ids: List[int], user_id: int
                 # Queue for sending
                 send_email_communication.delay(communication.id)
                 sent_count += 1
-                
+            
             except Exception as e:
                 failed_count += 1
                 logger.error(f"Failed to create communication for contact {contact.id}: {str(e)}")
@@ -264,11 +436,11 @@ def send_bulk_email(self, template_id: int, contact_ids: List[int], user_id: int
             'failed_count': failed_count,
             'total_contacts': len(contact_ids)
         }
-        
+    
     except (User.DoesNotExist, EmailTemplate.DoesNotExist) as e:
         logger.error(f"Bulk email error: {str(e)}")
         return {'status': 'error', 'reason': str(e)}
-        
+    
     except Exception as exc:
         logger.error(f"Error sending bulk email: {str(exc)}")
         raise self.retry(exc=exc)
@@ -293,7 +465,7 @@ def cleanup_old_communications(self, days_to_keep: int = 90):
         
         logger.info(f"Cleaned up {deleted_count} old communication records")
         return {'deleted_count': deleted_count, 'cutoff_date': cutoff_date.isoformat()}
-        
+    
     except Exception as exc:
         logger.error(f"Error cleaning up communications: {str(exc)}")
         raise self.retry(exc=exc)
@@ -316,7 +488,7 @@ def process_email_bounces(self, user_id: int):
         
         logger.info(f"Processed email bounces for user {user_id}")
         return {'user_id': user_id, 'status': 'completed'}
-        
+    
     except Exception as exc:
         logger.error(f"Error processing email bounces: {str(exc)}")
         raise self.retry(exc=exc)
@@ -356,7 +528,7 @@ def generate_email_analytics(self, user_id: int, date_range_days: int = 30):
         
         logger.info(f"Generated email analytics for user {user_id}")
         return analytics
-        
+    
     except Exception as exc:
         logger.error(f"Error generating email analytics: {str(exc)}")
         raise self.retry(exc=exc)
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""
+A local fake of the Gmail HTTP API for tests.
+
+FakeGmailTransport is passed as the http object of a service built with
+googleapiclient, so requests never leave the process. It serves
+messages.list, messages.get, getProfile, history.list and batch requests
+from an in-memory mailbox and records every HTTP round trip.
+"""
+import base64
+import json
+import threading
+from collections import Counter
+from email.parser import FeedParser
+from urllib.parse import parse_qs, urlparse
+
+import httplib2
+from googleapiclient.discovery import build
+
+MESSAGES_PATH = '/gmail/v1/users/me/messages'
+PROFILE_PATH = '/gmail/v1/users/me/profile'
+HISTORY_PATH = '/gmail/v1/users/me/history'
+
+
+def make_message(message_id, subject='Hello', sender='sender@example.com', to='me@example.com',
+                 body='Message body', date='Mon, 12 Oct 2026 09:30:00 +0000', thread_id=None):
+    """Build a Gmail message resource in full format."""
+    return {
+        'id': message_id,
+        'threadId': thread_id or f'thread-{message_id}',
+        'snippet': body[:50],
+        'payload': {
+            'mimeType': 'text/plain',
+            'headers': [
+                {'name': 'Subject', 'value': subject},
+                {'name': 'From', 'value': sender},
+                {'name': 'To', 'value': to},
+                {'name': 'Date', 'value': date},
+                {'name': 'Message-ID', 'value': f'<{message_id}@example.com>'},
+            ],
+            'body': {'data': base64.urlsafe_b64encode(body.encode()).decode()},
+        },
+    }
+
+
+def build_service(transport):
+    """Build a Gmail service that sends its requests to a fake transport."""
+    return build('gmail', 'v1', http=transport, static_discovery=True, cache_discovery=False)
+
+
+class FakeGmailTransport:
+    """
+    In-memory Gmail API served through the httplib2 request() interface.
+    """
+    
+    def __init__(self, messages=(), rate_limited=None):
+        """
+        Initialize the fake mailbox.
+        
+        Args:
+            messages: Message resources in full format, newest first
+            rate_limited: Dict of message ID to the number of 429 responses
+                returned for it before it is served
+        """
+        self.messages = {message['id']: message for message in messages}
+        self.rate_limited = Counter(rate_limited or {})
+        # Mailbox history: the current historyId, the oldest one still kept
+        # and a (historyId, message ID, labels) record per received message
+        self.history_id = 1000
+        self.oldest_history_id = 1000
+        self.history = []
+        self.requests = []
+        self._lock = threading.Lock()
+    
+    def request(self, uri, method='GET', body=None, headers=None, redirections=None, connection_type=None):
+        """Answer one HTTP round trip."""
+        path = urlparse(uri).path
+        with self._lock:
+            self.requests.append((method, path))
+        if path == '/batch':
+            return self._batch(body, headers)
+        status, payload = self._call(method, uri)
+        return httplib2.Response({'status': status, 'content-type': 'application/json'}), json.dumps(payload).encode()
+    
+    def receive(self, message, labels=('INBOX',)):
+        """Add a new message to the mailbox, recording it in the history."""
+        self.history_id += 1
+        self.messages = {message['id']: message, **self.messages}
+        self.history.append((self.history_id, message['id'], list(labels)))
+    
+    def expire_history(self):
+        """Drop the mailbox history, as Gmail does after about a week."""
+        self.oldest_history_id = self.history_id
+        self.history = []
+    
+    def batch_requests(self):
+        """Number of batch round trips made so far."""
+        return sum(1 for _, path in self.requests if path == '/batch')
+    
+    def _call(self, method, uri):
+        """Answer a single API call with a status and a JSON payload."""
+        url = urlparse(uri)
+        params = parse_qs(url.query)
+        if method == 'GET' and url.path == MESSAGES_PATH:
+            return self._list(params)
+        if method == 'GET' and url.path.startswith(f'{MESSAGES_PATH}/'):
+            return self._get(url.path.rsplit('/', 1)[1], params)
+        if method == 'GET' and url.path == PROFILE_PATH:
+            return 200, {'emailAddress': 'me@example.com', 'messagesTotal': len(self.messages),
+                         'historyId': str(self.history_id)}
+        if method == 'GET' and url.path == HISTORY_PATH:
+            return self._history(params)
+        return 404, {'error': {'code': 404, 'message': f'No fake for {method} {url.path}'}}
+    
+    def _list(self, params):
+        message_ids = list(self.messages)
+        offset = int(params.get('pageToken', ['0'])[0])
+        limit = int(params.get('maxResults', ['100'])[0])
+        page = message_ids[offset:offset + limit]
+        payload = {
+            'messages': [{'id': message_id, 'threadId': self.messages[message_id]['threadId']}
+                         for message_id in page],
+            'resultSizeEstimate': len(message_ids),
+        }
+        if offset + limit < len(message_ids):
+            payload['nextPageToken'] = str(offset + limit)
+        return 200, payload
+    
+    def _history(self, params):
+        start = int(params['startHistoryId'][0])
+        if start < self.oldest_history_id:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        records = [record for record in self.history if record[0] > start]
+        offset = int(params.get('pageToken', ['0'])[0])
+        limit = int(params.get('maxResults', ['100'])[0])
+        payload = {
+            'history': [
+                {'id': str(history_id), 'messagesAdded': [{'message': {
+                    'id': message_id, 'threadId': self.messages[message_id]['threadId'], 'labelIds': labels,
+                }}]}
+                for history_id, message_id, labels in records[offset:offset + limit]
+            ],
+            'historyId': str(self.history_id),
+        }
+        if offset + limit < len(records):
+            payload['nextPageToken'] = str(offset + limit)
+        return 200, payload
+    
+    def _get(self, message_id, params):
+        with self._lock:
+            if self.rate_limited[message_id] > 0:
+                self.rate_limited[message_id] -= 1
+                return 429, {'error': {'code': 429, 'message': 'Too many concurrent requests for user',
+                                       'errors': [{'reason': 'rateLimitExceeded'}]}}
+        if message_id not in self.messages:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        
+        message = json.loads(json.dumps(self.messages[message_id]))
+        message_format = params.get('format', ['full'])[0]
+        if message_format == 'minimal':
+            message.pop('payload')
+        elif message_format == 'metadata':
+            wanted = set(params.get('metadataHeaders', []))
+            payload = message['payload']
+            payload['headers'] = [header for header in payload['headers'] if header['name'] in wanted]
+            payload.pop('body', None)
+            payload.pop('parts', None)
+        return 200, message
+    
+    def _batch(self, body, headers):
+        """Answer a multipart/mixed batch request, one part per call."""
+        if isinstance(body, bytes):
+            body = body.decode()
+        parser = FeedParser()
+        parser.feed(f"content-type: {headers['content-type']}\r\n\r\n{body}")
+        boundary = 'fake-batch-boundary'
+        parts = []
+        for part in parser.close().get_payload():
+            request_line = part.get_payload().lstrip().splitlines()[0]
+            method, path, _ = request_line.split(' ')
+            status, payload = self._call(method, f'https://gmail.googleapis.com{path}')
+            content_id = part['Content-ID'].replace('<', '<response-', 1)
+            parts.append(
+                f'--{boundary}\r\nContent-Type: application/http\r\nContent-ID: {content_id}\r\n\r\n'
+                f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                f'Content-Type: application/json; charset=UTF-8\r\n\r\n{json.dumps(payload)}\r\n'
+            )
+        content = ''.join(parts) + f'--{boundary}--\r\n'
+        response = httplib2.Response({
+            'status': 200, 'content-type': f'multipart/mixed; boundary={boundary}',
+        })
+        return response, content.encode()
@@ -0,0 +1,130 @@
+"""
+Tests for bulk matching of synced Gmail messages
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from mobilize.churches.models import Church
+from mobilize.communications.email_matching import EmailMatcher
+from mobilize.communications.gmail_service import GmailService
+from mobilize.communications.models import Communication
+from mobilize.communications.tasks import sync_gmail_emails
+from mobilize.communications.tests.fake_gmail import FakeGmailTransport, build_service, make_message
+from mobilize.contacts.models import Contact, Person
+from mobilize.core.models import DashboardRollup, SearchDocument
+from mobilize.core.report_jobs import get_model_data_version
+from mobilize.core.rollups import rebuild_rollups
+
+User = get_user_model()
+
+
+def parsed(message_id, sender='', recipients=()):
+    """A message as returned by GmailService.with_addresses()."""
+    return {'id': message_id, 'sender_email': sender, 'recipient_emails': list(recipients)}
+
+
+class EmailMatcherTests(TestCase):
+    """Test cases for EmailMatcher"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='matcher', email='matcher@example.com')
+        contact = Contact.objects.create(type='person', first_name='Ann', last_name='Lee', email='Ann.Lee@Example.com')
+        self.person = Person.objects.create(contact=contact)
+        contact = Contact.objects.create(type='church', church_name='Grace', email='office@grace.org')
+        self.church = Church.objects.create(contact=contact)
+    
+    def test_page_is_resolved_in_two_queries(self):
+        Communication.objects.create(user=self.user, gmail_message_id='m0')
+        Communication.objects.create(user=self.user, external_id='m1')
+        messages = [parsed(f'm{i}', sender='ann.lee@example.com') for i in range(20)]
+        messages.append(parsed('m20', sender='someone@else.com', recipients=['OFFICE@grace.org']))
+        
+        with self.assertNumQueries(2):
+            matcher = EmailMatcher(self.user, messages)
+            new = matcher.new_messages()
+            contacts = [matcher.contact_for(message) for message in new]
+        
+        self.assertEqual([message['id'] for message in new], [f'm{i}' for i in range(2, 21)])
+        self.assertEqual(matcher.person_and_church(contacts[0]), (self.person, None))
+        self.assertEqual(matcher.person_and_church(contacts[-1]), (None, self.church))
+        self.assertIsNone(matcher.contact_for(new[-1], sender_only=True))
+    
+    def test_other_users_messages_are_not_known(self):
+        other = User.objects.create_user(username='other', email='other@example.com')
+        Communication.objects.create(user=other, gmail_message_id='m0')
+        
+        matcher = EmailMatcher(self.user, [parsed('m0'), parsed('m0')])
+        
+        self.assertEqual([message['id'] for message in matcher.new_messages()], ['m0'])
+    
+    def test_insert_skips_messages_stored_meanwhile(self):
+        matcher = EmailMatcher(self.user, [parsed('m0'), parsed('m1')])
+        # A concurrent sync stores m1 after the page was matched
+        Communication.objects.create(user=self.user, gmail_message_id='m1')
+        
+        inserted = matcher.insert([Communication(user=self.user, gmail_message_id=message['id'], type='email')
+                                   for message in matcher.new_messages()])
+        
+        self.assertEqual(inserted, 1)
+        self.assertEqual(Communication.objects.filter(user=self.user).count(), 2)
+    
+    def test_insert_maintains_rollups_search_and_report_versions(self):
+        rebuild_rollups()
+        version = get_model_data_version('communications.Communication')
+        matcher = EmailMatcher(self.user, [parsed('m0', sender='ann.lee@example.com')])
+        
+        matcher.insert([Communication(user=self.user, gmail_message_id='m0', type='email', subject='Hello',
+                                      date=timezone.localdate(), person=self.person)])
+        
+        communication = Communication.objects.get(gmail_message_id='m0')
+        counts = {row.key: row.count for row in DashboardRollup.objects.exclude(key='meta').exclude(count=0)}
+        rebuild_rollups()
+        self.assertEqual(counts, {row.key: row.count for row in DashboardRollup.objects.exclude(key='meta')})
+        self.assertTrue(any(key.startswith('communications|') for key in counts))
+        self.assertTrue(SearchDocument.objects.filter(source='communication', object_id=communication.pk).exists())
+        self.assertGreater(get_model_data_version('communications.Communication'), version)
+
+
+class GmailSyncMatchingTests(TestCase):
+    """Test cases for the Gmail syncs storing pages through EmailMatcher"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='syncer', email='syncer@example.com')
+        contact = Contact.objects.create(type='person', first_name='Ann', last_name='Lee', email='ann@example.com')
+        self.person = Person.objects.create(contact=contact)
+        self.transport = FakeGmailTransport(
+            [make_message(f'a{i}', sender='Ann Lee <ANN@example.com>') for i in range(30)]
+            + [make_message(f'x{i}', sender='stranger@example.com') for i in range(30)]
+        )
+        
+        def initialize(gmail):
+            gmail.service = build_service(self.transport)
+        
+        self.initialize = initialize
+    
+    def test_service_sync_query_count_does_not_grow_with_the_page(self):
+        with mock.patch.object(GmailService, '_initialize_service', self.initialize):
+            gmail = GmailService(self.user)
+            with CaptureQueriesContext(connection) as queries:
+                result = gmail.sync_emails_to_communications(max_results=60)
+        
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(sum('FROM "contacts"' in sql for sql in statements), 1)
+        # The rollup and search index writes for the page are a fixed few more
+        self.assertLess(len(statements), 30)
+        self.assertEqual(result['synced_count'], 60)
+        self.assertEqual(Communication.objects.filter(person=self.person).count(), 30)
+        self.assertEqual(Communication.objects.filter(person__isnull=True).count(), 30)
+    
+    def test_task_links_the_person_and_skips_unknown_senders(self):
+        with mock.patch.object(GmailService, '_initialize_service', self.initialize):
+            result = sync_gmail_emails(self.user.pk, max_results=60)
+        
+        self.assertEqual((result['synced_count'], result['total_emails']), (30, 60))
+        communication = Communication.objects.get(external_id='a0')
+        self.assertEqual((communication.person, communication.gmail_message_id), (self.person, 'a0'))
@@ -0,0 +1,131 @@
+"""
+Tests for batched Gmail message fetching
+"""
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from mobilize.communications.gmail_batch import GmailBatchFetcher
+from mobilize.communications.gmail_service import GmailService
+from mobilize.communications.models import Communication
+from mobilize.communications.tasks import sync_gmail_emails
+from mobilize.communications.tests.fake_gmail import FakeGmailTransport, build_service, make_message
+from mobilize.contacts.models import Contact, Person
+
+User = get_user_model()
+
+
+class GmailBatchFetcherTests(TestCase):
+    """Test cases for GmailBatchFetcher against the fake Gmail transport"""
+    
+    def setUp(self):
+        self.transport = FakeGmailTransport([make_message(f'm{i}') for i in range(120)])
+        self.service = build_service(self.transport)
+        self.message_ids = [f'm{i}' for i in range(120)]
+        self.sleeps = []
+    
+    def test_messages_are_fetched_in_batches(self):
+        messages = GmailBatchFetcher(self.service).fetch(self.message_ids)
+        
+        self.assertEqual([message['id'] for message in messages], self.message_ids)
+        self.assertEqual(self.transport.requests, [('POST', '/batch')] * 3)
+        self.assertIn('body', messages[0]['payload'])
+    
+    def test_concurrent_batches_use_their_own_connections(self):
+        connections = []
+        
+        def http_factory():
+            connections.append(self.transport)
+            return self.transport
+        
+        fetcher = GmailBatchFetcher(self.service, http_factory=http_factory, batch_size=20, max_concurrency=3)
+        messages = fetcher.fetch(self.message_ids)
+        
+        self.assertEqual([message['id'] for message in messages], self.message_ids)
+        self.assertEqual((len(connections), self.transport.batch_requests()), (6, 6))
+    
+    def test_metadata_format_returns_headers_only(self):
+        messages = GmailBatchFetcher(self.service).fetch(['m1'], message_format='metadata')
+        
+        payload = messages[0]['payload']
+        self.assertNotIn('body', payload)
+        self.assertEqual([header['name'] for header in payload['headers']], ['Subject', 'From', 'To', 'Date'])
+        with self.assertRaises(ValueError):
+            GmailBatchFetcher(self.service).fetch(['m1'], message_format='headers')
+    
+    def test_rate_limited_messages_are_retried_with_backoff(self):
+        self.transport.rate_limited.update({'m3': 2, 'm70': 1})
+        fetcher = GmailBatchFetcher(self.service, sleep=self.sleeps.append)
+        
+        messages = fetcher.fetch(self.message_ids + ['missing'])
+        
+        self.assertEqual([message['id'] for message in messages], self.message_ids)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertLess(self.sleeps[0], self.sleeps[1])
+        # Three batches, then one retry batch per backoff round
+        self.assertEqual(self.transport.batch_requests(), 5)
+    
+    def test_messages_still_rate_limited_are_given_up(self):
+        self.transport.rate_limited['m3'] = 10
+        fetcher = GmailBatchFetcher(self.service, max_retries=2, sleep=self.sleeps.append)
+        
+        messages = fetcher.fetch(['m1', 'm3'])
+        
+        self.assertEqual([message['id'] for message in messages], ['m1'])
+        self.assertEqual(len(self.sleeps), 2)
+
+
+class GmailSyncBatchTests(TestCase):
+    """Test cases for the Gmail syncs fetching through batches"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='mailer', email='mailer@example.com')
+        self.transport = FakeGmailTransport([
+            make_message(f'm{i}', subject=f'Subject {i}', sender='Ann Lee <Ann@Example.com>',
+                         to='mailer@example.com, Bob <bob@example.com>')
+            for i in range(100)
+        ])
+        contact = Contact.objects.create(type='person', first_name='Ann', last_name='Lee', email='ann@example.com')
+        self.person = Person.objects.create(contact=contact)
+    
+    def _service(self):
+        gmail = GmailService(self.user)
+        gmail.service = build_service(self.transport)
+        return gmail
+    
+    def test_sync_emails_costs_one_list_and_a_few_batches(self):
+        result = self._service().sync_emails_to_communications(days_back=7)
+        
+        self.assertEqual(result, {'success': True, 'synced_count': 100, 'full_sync': True})
+        self.assertEqual(Communication.objects.filter(gmail_message_id__startswith='m').count(), 100)
+        self.assertEqual(self.transport.requests,
+                         [('GET', '/gmail/v1/users/me/profile'), ('GET', '/gmail/v1/users/me/messages')]
+                         + [('POST', '/batch')] * 2)
+    
+    def test_message_ids_are_listed_across_pages(self):
+        gmail = self._service()
+        gmail.LIST_PAGE_SIZE = 30
+        
+        self.assertEqual(gmail.list_message_ids(max_results=70), [f'm{i}' for i in range(70)])
+        self.assertEqual(len(self.transport.requests), 3)
+    
+    def test_get_emails_parses_addresses_and_dates(self):
+        emails = self._service().get_emails(timezone.now() - timedelta(days=7), max_results=1)
+        
+        self.assertEqual(emails[0]['sender_email'], 'ann@example.com')
+        self.assertEqual(emails[0]['recipient_emails'], ['mailer@example.com', 'bob@example.com'])
+        self.assertEqual(emails[0]['sent_at'].year, 2026)
+    
+    def test_celery_sync_fetches_through_batches(self):
+        def initialize(gmail):
+            gmail.service = build_service(self.transport)
+        
+        with mock.patch.object(GmailService, '_initialize_service', initialize):
+            result = sync_gmail_emails(self.user.pk, max_results=60)
+        
+        self.assertEqual((result['synced_count'], result['total_emails']), (60, 60))
+        self.assertEqual(self.transport.batch_requests(), 2)
+        self.assertEqual(Communication.objects.filter(external_id__startswith='m').count(), 60)
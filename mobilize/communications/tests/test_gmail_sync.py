@@ -0,0 +1,129 @@
+"""
+Tests for the incremental Gmail sync from history checkpoints
+"""
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from mobilize.communications.gmail_service import GmailService
+from mobilize.communications.models import Communication, GmailSyncState
+from mobilize.communications.tasks import sync_gmail_emails
+from mobilize.communications.tests.fake_gmail import FakeGmailTransport, build_service, make_message
+from mobilize.contacts.models import Contact, Person
+
+User = get_user_model()
+
+
+class GmailIncrementalSyncTests(TestCase):
+    """Test cases for syncing only the messages added since the last checkpoint"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='inbox', email='inbox@example.com')
+        self.transport = FakeGmailTransport([make_message(f'old{i}') for i in range(30)])
+    
+    def _service(self):
+        gmail = GmailService(self.user)
+        gmail.service = build_service(self.transport)
+        return gmail
+    
+    def _receive(self, count, prefix='new', **kwargs):
+        for i in range(count):
+            self.transport.receive(make_message(f'{prefix}{i}', sender='Ann <ann@example.com>'), **kwargs)
+    
+    def test_first_sync_covers_the_window_and_saves_a_checkpoint(self):
+        result = self._service().sync_emails_to_communications(days_back=7, max_results=20)
+        
+        self.assertEqual(result, {'success': True, 'synced_count': 20, 'full_sync': True})
+        state = GmailSyncState.objects.get(user=self.user)
+        self.assertEqual(state.history_id, '1000')
+        self.assertIsNotNone(state.last_full_sync_at)
+    
+    def test_later_syncs_fetch_only_new_messages(self):
+        self._service().sync_emails_to_communications(max_results=20)
+        self._receive(3)
+        self._receive(1, prefix='draft', labels=['DRAFT'])
+        self.transport.requests = []
+        
+        result = self._service().sync_emails_to_communications()
+        
+        self.assertEqual(result, {'success': True, 'synced_count': 3, 'full_sync': False})
+        self.assertEqual(self.transport.requests,
+                         [('GET', '/gmail/v1/users/me/history'), ('POST', '/batch')])
+        self.assertEqual(GmailSyncState.objects.get(user=self.user).history_id, '1004')
+        
+        # Nothing new costs a single history call and no batch
+        self.transport.requests = []
+        self.assertEqual(self._service().sync_emails_to_communications()['synced_count'], 0)
+        self.assertEqual(self.transport.requests, [('GET', '/gmail/v1/users/me/history')])
+    
+    def test_history_is_followed_across_pages(self):
+        self._service().sync_emails_to_communications(max_results=5)
+        self._receive(7)
+        gmail = self._service()
+        gmail.HISTORY_PAGE_SIZE = 3
+        
+        message_ids, history_id = gmail.list_history_message_ids('1000')
+        
+        self.assertEqual(message_ids, [f'new{i}' for i in range(7)])
+        self.assertEqual(history_id, '1007')
+        self.assertEqual(gmail.sync_emails_to_communications()['synced_count'], 7)
+    
+    def test_expired_checkpoint_falls_back_to_the_window(self):
+        self._service().sync_emails_to_communications(max_results=10)
+        self._receive(2)
+        self.transport.expire_history()
+        
+        result = self._service().sync_emails_to_communications(max_results=15)
+        
+        # The two new messages and three more from the window not yet stored
+        self.assertEqual(result, {'success': True, 'synced_count': 5, 'full_sync': True})
+        self.assertEqual(GmailSyncState.objects.get(user=self.user).history_id, '1002')
+        self.assertEqual(Communication.objects.filter(user=self.user).count(), 15)
+    
+    def test_checkpoint_is_kept_when_messages_could_not_be_fetched(self):
+        self._service().sync_emails_to_communications(max_results=5)
+        self._receive(2)
+        self.transport.rate_limited['new1'] = 100
+        gmail = self._service()
+        get_batch_fetcher = gmail.get_batch_fetcher
+        
+        with mock.patch.object(gmail, 'get_batch_fetcher', lambda: get_batch_fetcher(sleep=lambda delay: None)):
+            self.assertEqual(gmail.sync_emails_to_communications()['synced_count'], 1)
+        self.assertEqual(GmailSyncState.objects.get(user=self.user).history_id, '1000')
+        
+        self.transport.rate_limited.clear()
+        self.assertEqual(gmail.sync_emails_to_communications()['synced_count'], 1)
+        self.assertEqual(GmailSyncState.objects.get(user=self.user).history_id, '1002')
+    
+    def test_task_and_command_keep_separate_checkpoints(self):
+        contact = Contact.objects.create(type='person', first_name='Ann', last_name='Lee', email='ann@example.com')
+        Person.objects.create(contact=contact)
+        GmailSyncState.objects.create(user=self.user, history_id='1000')
+        GmailSyncState.objects.create(user=self.user, scope='contacts', history_id='1000')
+        self._receive(4)
+        self.transport.receive(make_message('stranger0', sender='stranger@example.com'))
+        
+        def initialize(gmail):
+            gmail.service = build_service(self.transport)
+        
+        with mock.patch.object(GmailService, '_initialize_service', initialize):
+            out = StringIO()
+            call_command('sync_gmail', user_id=self.user.pk, dry_run=True, stdout=out)
+            self.assertIn('5 new messages found (since last sync)', out.getvalue())
+            
+            # The task keeps only the messages about contacts
+            result = sync_gmail_emails(self.user.pk)
+            self.assertEqual((result['synced_count'], result['full_sync']), (4, False))
+            self.assertEqual(GmailSyncState.objects.get(user=self.user, scope='contacts').history_id, '1005')
+            self.assertEqual(GmailSyncState.objects.get(user=self.user, scope='all').history_id, '1000')
+            
+            out = StringIO()
+            call_command('sync_gmail', user_id=self.user.pk, stdout=out)
+        
+        # The command's sync still stores the message the task passed over
+        self.assertIn('Synced 1 emails', out.getvalue())
+        self.assertTrue(Communication.objects.filter(user=self.user, gmail_message_id='stranger0').exists())
+        self.assertEqual(GmailSyncState.objects.get(user=self.user, scope='all').history_id, '1005')
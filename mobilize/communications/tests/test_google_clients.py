@@ -0,0 +1,168 @@
+"""
+Tests for the per-process Google API client cache
+"""
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from google.oauth2.credentials import Credentials
+
+from mobilize.authentication.models import GoogleToken
+from mobilize.communications import google_clients
+from mobilize.communications.google_clients import forget_google_clients, get_google_client, load_user_credentials
+
+User = get_user_model()
+
+
+@override_settings(GOOGLE_CLIENT_CACHE_SIZE=4, GOOGLE_CLIENT_TTL=300)
+class GoogleClientCacheTests(TestCase):
+    """Test cases for get_google_client()"""
+    
+    def setUp(self):
+        forget_google_clients()
+        self.addCleanup(forget_google_clients)
+        self.user = User.objects.create_user(username='cached', email='cached@example.com')
+        self.token = GoogleToken.objects.create(
+            user=self.user,
+            access_token='access',
+            refresh_token='refresh',
+            expires_at=timezone.now() + timedelta(hours=1)
+        )
+        self.built = []
+    
+    def _build(self, api, version, credentials=None):
+        self.built.append((api, version))
+        return mock.Mock(name=f'{api}-{version}')
+    
+    def _client(self, user=None, api='gmail', version='v1'):
+        user = user or self.user
+        return get_google_client(
+            user, api, version,
+            lambda: load_user_credentials(user, []),
+            lambda credentials: google_clients.save_user_credentials(user, credentials),
+            build_client=self._build
+        )
+    
+    def test_cached_client_is_reused_without_queries(self):
+        client, credentials = self._client()
+        
+        with self.assertNumQueries(0):
+            cached_client, cached_credentials = self._client()
+        
+        self.assertIs(cached_client, client)
+        self.assertIs(cached_credentials, credentials)
+        self.assertEqual(self.built, [('gmail', 'v1')])
+    
+    def test_clients_are_kept_per_api_and_user(self):
+        other = User.objects.create_user(username='other', email='other@example.com')
+        GoogleToken.objects.create(user=other, access_token='other-access', refresh_token='refresh',
+                                   expires_at=timezone.now() + timedelta(hours=1))
+        
+        gmail, _ = self._client()
+        calendar, _ = self._client(api='calendar', version='v3')
+        other_gmail, other_credentials = self._client(user=other)
+        
+        self.assertEqual(len({id(gmail), id(calendar), id(other_gmail)}), 3)
+        self.assertEqual(other_credentials.token, 'other-access')
+        self.assertEqual(len(self.built), 3)
+    
+    def test_least_recently_used_client_is_evicted(self):
+        first, _ = self._client(api='api0')
+        for index in range(1, 4):
+            self._client(api=f'api{index}')
+        self._client(api='api0')
+        self._client(api='api4')
+        
+        self.assertIs(self._client(api='api0')[0], first)
+        self._client(api='api1')
+        self.assertEqual(self.built.count(('api1', 'v1')), 2)
+    
+    def test_client_is_rebuilt_after_ttl(self):
+        with mock.patch.object(google_clients.time, 'monotonic', return_value=1000):
+            self._client()
+        with mock.patch.object(google_clients.time, 'monotonic', return_value=1301):
+            self._client()
+        
+        self.assertEqual(len(self.built), 2)
+    
+    @override_settings(GOOGLE_CLIENT_CACHE_SIZE=0)
+    def test_cache_can_be_disabled(self):
+        self._client()
+        self._client()
+        
+        self.assertEqual(len(self.built), 2)
+    
+    def test_user_without_token_gets_no_client(self):
+        self.token.delete()
+        
+        self.assertEqual(self._client(), (None, None))
+        self.assertEqual(self.built, [])
+
+
+@override_settings(GOOGLE_CLIENT_CACHE_SIZE=4)
+class CredentialRefreshTests(TestCase):
+    """Test cases for the proactive, single-flight token refresh"""
+    
+    def setUp(self):
+        forget_google_clients()
+        self.addCleanup(forget_google_clients)
+        cache.clear()
+        self.user = User.objects.create_user(username='refresh', email='refresh@example.com')
+        self.token = GoogleToken.objects.create(
+            user=self.user,
+            access_token='stale',
+            refresh_token='refresh',
+            expires_at=timezone.now() + timedelta(minutes=2)
+        )
+    
+    def _client(self):
+        return get_google_client(
+            self.user, 'gmail', 'v1',
+            lambda: load_user_credentials(self.user, []),
+            lambda credentials: google_clients.save_user_credentials(self.user, credentials),
+            build_client=lambda api, version, credentials=None: mock.Mock()
+        )
+    
+    def test_token_close_to_expiry_is_refreshed_and_stored(self):
+        def refresh(credentials, request):
+            credentials.token = 'fresh'
+            credentials.expiry = datetime.utcnow() + timedelta(hours=1)
+        
+        with mock.patch.object(Credentials, 'refresh', autospec=True, side_effect=refresh) as mock_refresh:
+            _, credentials = self._client()
+        
+        self.assertEqual(mock_refresh.call_count, 1)
+        self.assertEqual(credentials.token, 'fresh')
+        self.token.refresh_from_db()
+        self.assertEqual(self.token.access_token, 'fresh')
+        self.assertGreater(self.token.expires_at, timezone.now() + timedelta(minutes=50))
+    
+    def test_token_refreshed_elsewhere_is_adopted(self):
+        # Another worker holds the refresh lock and stores its new token
+        cache.add(f'google_token_refresh:{self.user.pk}', 1)
+        
+        def sleep(seconds):
+            GoogleToken.objects.filter(pk=self.token.pk).update(
+                access_token='from-worker',
+                expires_at=timezone.now() + timedelta(hours=1)
+            )
+        
+        with mock.patch.object(Credentials, 'refresh', autospec=True) as mock_refresh, \
+                mock.patch.object(google_clients.time, 'sleep', side_effect=sleep):
+            _, credentials = self._client()
+        
+        mock_refresh.assert_not_called()
+        self.assertEqual(credentials.token, 'from-worker')
+    
+    def test_discovery_document_is_read_once(self):
+        google_clients.discovery_document.cache_clear()
+        self.addCleanup(google_clients.discovery_document.cache_clear)
+        
+        with mock.patch.object(google_clients, 'get_static_doc', return_value='{}') as mock_doc:
+            google_clients.discovery_document('gmail', 'v1')
+            google_clients.discovery_document('gmail', 'v1')
+        
+        mock_doc.assert_called_once_with('gmail', 'v1')
@@ -0,0 +1,142 @@
+"""
+Tests for the parallel per-user Google sync
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from celery import states
+from celery.exceptions import Retry
+from celery.result import EagerResult
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from mobilize.authentication.models import GoogleToken
+from mobilize.communications import google_sync
+from mobilize.communications.gmail_service import GmailService
+from mobilize.communications.google_calendar_service import GoogleCalendarService
+from mobilize.communications.google_contacts_service import GoogleContactsService
+from mobilize.communications.models import Communication
+from mobilize.communications.tasks import (
+    dispatch_google_sync, summarize_google_sync, sync_google_accounts, sync_google_user
+)
+from mobilize.communications.tests.fake_gmail import FakeGmailTransport, build_service, make_message
+
+User = get_user_model()
+
+
+class GoogleSyncTests(TestCase):
+    """Test cases for the Google sync chord and its locks, slots and budgets"""
+    
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com') for i in range(3)]
+        self.user_ids = [user.pk for user in self.users]
+        self.mailboxes = {
+            user.pk: FakeGmailTransport([make_message(f'u{user.pk}-m{i}') for i in range(5)])
+            for user in self.users
+        }
+        
+        def initialize(gmail):
+            gmail.service = build_service(self.mailboxes[gmail.user.pk])
+        
+        # Calendar and Contacts stay unauthenticated
+        for patcher in (mock.patch.object(GmailService, '_initialize_service', initialize),
+                        mock.patch.object(GoogleCalendarService, '_initialize_service', lambda service: None),
+                        mock.patch.object(GoogleContactsService, '_initialize_service', lambda service: None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def test_chord_syncs_every_user_and_summarizes(self):
+        summary = dispatch_google_sync(self.user_ids).get()
+        
+        self.assertEqual((summary['users'], summary['users_synced'], summary['users_skipped']), (3, 3, 0))
+        self.assertEqual(summary['services']['gmail'], {'synced': 15, 'failed': 0, 'skipped': 0})
+        self.assertEqual(summary['services']['calendar'], {'synced': 0, 'failed': 0, 'skipped': 3})
+        for user in self.users:
+            self.assertEqual(Communication.objects.filter(user=user).count(), 5)
+        # Locks and slots are all given back
+        self.assertIsNotNone(google_sync.acquire_user_lock(self.user_ids[0]))
+        self.assertEqual(google_sync.acquire_slot()[0], 'google_sync:slot:0')
+    
+    def test_beat_task_dispatches_users_with_google_tokens(self):
+        GoogleToken.objects.create(user=self.users[1], access_token='token',
+                                   expires_at=timezone.now() + timedelta(hours=1))
+        
+        result = sync_google_accounts()
+        
+        self.assertEqual((result['status'], result['users']), ('dispatched', 1))
+        self.assertEqual(Communication.objects.filter(user=self.users[1]).count(), 5)
+        self.assertFalse(Communication.objects.filter(user=self.users[0]).exists())
+    
+    def test_running_user_is_skipped(self):
+        token = google_sync.acquire_user_lock(self.user_ids[0])
+        
+        result = sync_google_user(self.user_ids[0], ['gmail'])
+        
+        self.assertEqual(result['reason'], 'already_running')
+        self.assertEqual(self.mailboxes[self.user_ids[0]].requests, [])
+        # The running sync still holds its lock
+        self.assertEqual(cache.get(f'google_sync:lock:{self.user_ids[0]}'), token)
+    
+    @override_settings(GOOGLE_SYNC_MAX_CONCURRENCY=1)
+    def test_expired_slot_is_not_released_by_its_old_holder(self):
+        key, token = google_sync.acquire_slot()
+        # The slot expired and another worker took it over
+        cache.delete(key)
+        _, other_token = google_sync.acquire_slot()
+        
+        google_sync.release_slot(key, token)
+        
+        self.assertEqual(cache.get(key), other_token)
+        self.assertIsNone(google_sync.acquire_slot())
+    
+    @override_settings(GOOGLE_SYNC_MAX_CONCURRENCY=1)
+    def test_user_waits_for_a_free_slot(self):
+        google_sync.acquire_slot()
+        
+        with self.assertRaises(Retry):
+            sync_google_user(self.user_ids[0], ['gmail'])
+        
+        self.assertEqual(self.mailboxes[self.user_ids[0]].requests, [])
+        self.assertIsNotNone(google_sync.acquire_user_lock(self.user_ids[0]))
+    
+    @override_settings(GOOGLE_SYNC_MAX_CONCURRENCY=1)
+    def test_user_without_a_slot_is_skipped_after_the_last_retry(self):
+        google_sync.acquire_slot()
+        
+        result = sync_google_user.apply(args=(self.user_ids[0], ['gmail']), retries=sync_google_user.max_retries).get()
+        
+        self.assertEqual(result, {'user_id': self.user_ids[0], 'status': 'skipped', 'reason': 'no_slot'})
+        self.assertEqual(self.mailboxes[self.user_ids[0]].requests, [])
+        synced = {'user_id': self.user_ids[1], 'status': 'synced', 'services': {}}
+        summary = summarize_google_sync([result, synced])
+        self.assertEqual((summary['users_synced'], summary['users_skipped']), (1, 1))
+        self.assertEqual(summary['skipped_reasons'], {'no_slot': 1})
+    
+    @override_settings(GOOGLE_SYNC_USER_QUOTA=100)
+    def test_services_beyond_the_quota_budget_are_skipped(self):
+        first = sync_google_user(self.user_ids[0], max_messages=10)
+        second = sync_google_user(self.user_ids[0], max_messages=10)
+        
+        self.assertEqual(first['services']['gmail']['synced_count'], 5)
+        self.assertEqual(second['services']['gmail'], {'success': False, 'skipped': 'quota_exhausted'})
+        self.assertEqual(second['services']['calendar']['skipped'], 'not_authenticated')
+        self.assertEqual(google_sync.QuotaBudget(self.user_ids[0]).spent(), 2 * 15 + 60)
+    
+    def test_command_fans_users_out_in_parallel(self):
+        out = StringIO()
+        call_command('sync_gmail', user_id=self.user_ids[2], parallel=True, stdout=out)
+        
+        self.assertIn('Gmail sync completed: 5 emails synced for 1 users', out.getvalue())
+    
+    def test_command_reports_a_failed_parallel_sync(self):
+        out = StringIO()
+        failed = EagerResult('summary', RuntimeError('summary lost'), states.FAILURE)
+        with mock.patch('mobilize.communications.tasks.dispatch_google_sync', return_value=failed):
+            call_command('sync_gmail', user_id=self.user_ids[2], parallel=True, stdout=out)
+        
+        self.assertIn('Gmail sync failed: summary lost', out.getvalue())
@@ -1,12 +1,13 @@
 """
 Tests for communications app
 """
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from mobilize.admin_panel.models import Office, UserOffice
 from mobilize.communications.models import Communication, EmailTemplate, EmailSignature
-from mobilize.contacts.models import Person
+from mobilize.contacts.models import Contact, Person
 
 User = get_user_model()
 
@@ -20,11 +21,14 @@ class CommunicationModelTests(TestCase):
             email='test@example.com'
         )
         
-        self.contact = Person.objects.create(
+        contact = Contact.objects.create(
+            type='person',
             first_name='John',
             last_name='Doe',
-            email='john@example.com'
+            email='john@example.com',
+            user=self.user
         )
+        self.contact = Person.objects.create(contact=contact)
     
     def test_create_communication(self):
         """Test creating a communication record"""
@@ -199,6 +203,8 @@ class EmailSignatureModelTests(TestCase):
         self.assertEqual(EmailSignature.objects.filter(user=self.user).count(), 2)
 
 
+# The email-or-username backend named in settings does not exist yet
+@override_settings(AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend'])
 class CommunicationViewTests(TestCase):
     """Test cases for communication views"""
     
@@ -209,19 +215,25 @@ class CommunicationViewTests(TestCase):
             email='test@example.com',
             password='testpass123'
         )
+        self.office = Office.objects.create(name='Test Office', code='TEST')
+        UserOffice.objects.create(user=self.user, office=self.office)
         
-        self.contact = Person.objects.create(
+        contact = Contact.objects.create(
+            type='person',
             first_name='John',
             last_name='Doe',
-            email='john@example.com'
+            email='john@example.com',
+            user=self.user
         )
+        self.contact = Person.objects.create(contact=contact)
         
         self.communication = Communication.objects.create(
             subject='Test Communication',
             message='Test message',
             type='email',
             direction='outbound',
-            person=self.contact
+            person=self.contact,
+            user=self.user
         )
     
     def test_communication_list_requires_login(self):
@@ -235,7 +247,7 @@ class CommunicationViewTests(TestCase):
     
     def test_communication_list_view(self):
         """Test communication list view"""
-        self.client.login(username='testuser', password='testpass123')
+        self.client.force_login(self.user)
         url = reverse('communications:communication_list')
         response = self.client.get(url)
         
@@ -245,7 +257,7 @@ class CommunicationViewTests(TestCase):
     
     def test_communication_detail_view(self):
         """Test communication detail view"""
-        self.client.login(username='testuser', password='testpass123')
+        self.client.force_login(self.user)
         url = reverse('communications:communication_detail', kwargs={'pk': self.communication.pk})
         response = self.client.get(url)
         
@@ -255,7 +267,7 @@ class CommunicationViewTests(TestCase):
     
     def test_send_email_view_get(self):
         """Test send email form"""
-        self.client.login(username='testuser', password='testpass123')
+        self.client.force_login(self.user)
         url = reverse('communications:send_email')
         response = self.client.get(url)
         
@@ -264,7 +276,7 @@ class CommunicationViewTests(TestCase):
     
     def test_compose_email_view(self):
         """Test compose email view"""
-        self.client.login(username='testuser', password='testpass123')
+        self.client.force_login(self.user)
         url = reverse('communications:compose_email')
         response = self.client.get(url)
         
@@ -272,6 +284,8 @@ class CommunicationViewTests(TestCase):
         self.assertContains(response, 'Compose Email')
 
 
+# The email-or-username backend named in settings does not exist yet
+@override_settings(AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend'])
 class EmailTemplateViewTests(TestCase):
     """Test cases for email template views"""
     
@@ -282,6 +296,8 @@ class EmailTemplateViewTests(TestCase):
             email='test@example.com',
             password='testpass123'
         )
+        self.office = Office.objects.create(name='Test Office', code='TEST')
+        UserOffice.objects.create(user=self.user, office=self.office)
         
         self.template = EmailTemplate.objects.create(
             name='Test Template',
@@ -292,7 +308,7 @@ class EmailTemplateViewTests(TestCase):
     
     def test_template_list_view(self):
         """Test email template list view"""
-        self.client.login(username='testuser', password='testpass123')
+        self.client.force_login(self.user)
         url = reverse('communications:email_template_list')
         response = self.client.get(url)
         
@@ -302,7 +318,7 @@ class EmailTemplateViewTests(TestCase):
     
     def test_template_create_view(self):
         """Test email template creation"""
-        self.client.login(username='testuser', password='testpass123')
+        self.client.force_login(self.user)
         url = reverse('communications:email_template_create')
         
         template_data = {
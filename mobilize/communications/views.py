@@ -17,6 +17,9 @@ from .forms import EmailTemplateForm, EmailSignatureForm, CommunicationForm, Com
 from .gmail_service import GmailService
 from .google_contacts_service import GoogleContactsService
 from mobilize.authentication.decorators import office_data_filter
+from mobilize.core.pagination import COMMUNICATION_ORDERING, InvalidCursor, paginate_keyset
+from mobilize.core.permission_context import get_permission_context
+from mobilize.core.scoped_queries import scope_communications
 
 
 # Email Template Views
@@ -27,8 +30,10 @@ class EmailTemplateListView(LoginRequiredMixin, ListView):
     paginate_by = 10
     
     def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
         # Check office assignment
-        if request.user.role != 'super_admin' and not request.user.useroffice_set.exists():
+        if request.user.role != 'super_admin' and not get_permission_context(request.user).has_offices:
             raise PermissionDenied("Access denied. User not assigned to any office.")
         return super().dispatch(request, *args, **kwargs)
     
@@ -40,7 +45,7 @@ class EmailTemplateListView(LoginRequiredMixin, ListView):
             return queryset
         
         # Other users see templates from their offices or created by them
-        user_offices = self.request.user.useroffice_set.values_list('office_id', flat=True)
+        user_offices = get_permission_context(self.request.user).office_ids
         
         # Templates are shared within offices
         return queryset.filter(
@@ -62,12 +67,14 @@ class EmailTemplateCreateView(LoginRequiredMixin, CreateView):
     success_url = reverse_lazy('communications:email_template_list')
     
     def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
         # Prevent limited users from creating
         if request.user.role == 'limited_user':
             raise PermissionDenied("Limited users cannot create email templates")
         
         # Check office assignment
-        if request.user.role != 'super_admin' and not request.user.useroffice_set.exists():
+        if request.user.role != 'super_admin' and not get_permission_context(request.user).has_offices:
             raise PermissionDenied("Access denied. User not assigned to any office.")
         
         return super().dispatch(request, *args, **kwargs)
@@ -183,8 +190,10 @@ class CommunicationListView(LoginRequiredMixin, ListView):
     paginate_by = 20
     
     def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
         # Check office assignment
-        if request.user.role != 'super_admin' and not request.user.useroffice_set.exists():
+        if request.user.role != 'super_admin' and not get_permission_context(request.user).has_offices:
             raise PermissionDenied("Access denied. User not assigned to any office.")
         return super().dispatch(request, *args, **kwargs)
     
@@ -194,18 +203,13 @@ class CommunicationListView(LoginRequiredMixin, ListView):
         
         # Apply office-level filtering
         if self.request.user.role != 'super_admin':
-            user_offices = self.request.user.useroffice_set.values_list('office_id', flat=True)
+            user_offices = get_permission_context(self.request.user).office_ids
             
             # Communications visible if:
             # 1. User created the communication
             # 2. Person/church belongs to user's office
             # 3. Communication office matches user's office
-            queryset = queryset.filter(
-                models.Q(user=self.request.user) |
-                models.Q(person__contact__office__in=user_offices) |
-                models.Q(church__contact__office__in=user_offices) |
-                models.Q(office__in=user_offices)
-            ).distinct()
+            queryset = scope_communications(queryset, self.request.user, user_offices)
         
         # Apply filters from GET parameters
         type_filter = self.request.GET.get('type')
@@ -222,22 +226,52 @@ class CommunicationListView(LoginRequiredMixin, ListView):
         
         search_query = self.request.GET.get('search')
         if search_query:
-            from django.db.models import Q
-            queryset = queryset.filter(
-                Q(subject__icontains=search_query) |
-                Q(sender__icontains=search_query) |
-                Q(message__icontains=search_query) |
-                # Search in person names
-                Q(person__contact__first_name__icontains=search_query) |
-                Q(person__contact__last_name__icontains=search_query) |
-                # Search in church names
-                Q(church__contact__church_name__icontains=search_query) |
-                Q(church__name__icontains=search_query)
-            )
+            from mobilize.core.search import filter_by_search
+            queryset = filter_by_search(queryset, search_query, 'communication', [
+                'subject', 'sender', 'message', 'person__contact__first_name', 'person__contact__last_name',
+                'church__contact__church_name', 'church__name',
+            ])
         
         return queryset.order_by('-date')
 
 
+@login_required
+def communication_list_api(request):
+    """
+    JSON API endpoint for cursor-paginated communication lists.
+    
+    Accepts the same filters as the communication list page and orders
+    newest first by (date, id).
+    """
+    if request.user.role != 'super_admin' and not get_permission_context(request.user).has_offices:
+        raise PermissionDenied("Access denied. User not assigned to any office.")
+    
+    view = CommunicationListView()
+    view.setup(request)
+    try:
+        page, pagination = paginate_keyset(
+            request, view.get_queryset().select_related('person__contact'), COMMUNICATION_ORDERING
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    results = [{
+        'id': communication.id,
+        'type': communication.type,
+        'subject': communication.subject,
+        'direction': communication.direction,
+        'date': communication.date.isoformat() if communication.date else None,
+        'person': communication.person.name if communication.person else None,
+        'church': communication.church.name if communication.church else None,
+        'detail_url': reverse('communications:communication_detail', args=[communication.pk]),
+    } for communication in page]
+    
+    return JsonResponse({
+        'results': results,
+        **pagination,
+    })
+
+
 class CommunicationDetailView(LoginRequiredMixin, DetailView):
     model = Communication
     template_name = 'communications/communication_detail.html'
@@ -248,14 +282,9 @@ class CommunicationDetailView(LoginRequiredMixin, DetailView):
         
         # Apply office-level filtering
         if self.request.user.role != 'super_admin':
-            user_offices = self.request.user.useroffice_set.values_list('office_id', flat=True)
+            user_offices = get_permission_context(self.request.user).office_ids
             
-            queryset = queryset.filter(
-                models.Q(user=self.request.user) |
-                models.Q(person__contact__office__in=user_offices) |
-                models.Q(church__contact__office__in=user_offices) |
-                models.Q(office__in=user_offices)
-            ).distinct()
+            queryset = scope_communications(queryset, self.request.user, user_offices)
         
         return queryset
 
@@ -266,12 +295,14 @@ class CommunicationCreateView(LoginRequiredMixin, CreateView):
     template_name = 'communications/communication_form.html'
     
     def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
         # Prevent limited users from creating
         if request.user.role == 'limited_user':
             raise PermissionDenied("Limited users cannot create communications")
         
         # Check office assignment
-        if request.user.role != 'super_admin' and not request.user.useroffice_set.exists():
+        if request.user.role != 'super_admin' and not get_permission_context(request.user).has_offices:
             raise PermissionDenied("Access denied. User not assigned to any office.")
         
         return super().dispatch(request, *args, **kwargs)
@@ -295,6 +326,8 @@ class CommunicationUpdateView(LoginRequiredMixin, UpdateView):
     template_name = 'communications/communication_form.html'
     
     def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
         # Prevent limited users from editing
         if request.user.role == 'limited_user':
             raise PermissionDenied("Limited users cannot edit communications")
@@ -306,14 +339,9 @@ class CommunicationUpdateView(LoginRequiredMixin, UpdateView):
         
         # Apply office-level filtering
         if self.request.user.role != 'super_admin':
-            user_offices = self.request.user.useroffice_set.values_list('office_id', flat=True)
+            user_offices = get_permission_context(self.request.user).office_ids
             
-            queryset = queryset.filter(
-                models.Q(user=self.request.user) |
-                models.Q(person__contact__office__in=user_offices) |
-                models.Q(church__contact__office__in=user_offices) |
-                models.Q(office__in=user_offices)
-            ).distinct()
+            queryset = scope_communications(queryset, self.request.user, user_offices)
         
         return queryset
     
@@ -332,6 +360,8 @@ class CommunicationDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('communications:communication_list')
     
     def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
         # Prevent limited users from deleting
         if request.user.role == 'limited_user':
             raise PermissionDenied("Limited users cannot delete communications")
@@ -343,14 +373,9 @@ class CommunicationDeleteView(LoginRequiredMixin, DeleteView):
         
         # Apply office-level filtering
         if self.request.user.role != 'super_admin':
-            user_offices = self.request.user.useroffice_set.values_list('office_id', flat=True)
+            user_offices = get_permission_context(self.request.user).office_ids
             
-            queryset = queryset.filter(
-                models.Q(user=self.request.user) |
-                models.Q(person__contact__office__in=user_offices) |
-                models.Q(church__contact__office__in=user_offices) |
-                models.Q(office__in=user_offices)
-            ).distinct()
+            queryset = scope_communications(queryset, self.request.user, user_offices)
         
         return queryset
 
@@ -961,32 +986,36 @@ def calendar_disconnect(request):
 
 @login_required
 def get_contacts_json(request):
-    """Get contacts (people and churches) as JSON for dropdowns"""
-    from mobilize.contacts.models import Person
-    from mobilize.churches.models import Church
+    """
+    Typeahead endpoint for the person and church dropdowns.
     
-    people = Person.objects.select_related('contact').all()
-    churches = Church.objects.select_related('contact').all()
+    Returns the contacts the user can see whose name or email starts with
+    ``q``, at most ``limit`` per type. ``type`` restricts the lookup to
+    people or churches, and ``id`` fetches a single preselected contact.
+    """
+    from mobilize.core.permissions import get_data_access_manager
+    from mobilize.core.typeahead import (
+        DEFAULT_LIMIT, MAX_LIMIT, TYPEAHEAD_TYPES, contact_typeahead, get_contact_choice
+    )
     
-    people_data = [
-        {
-            'id': person.contact.id,
-            'name': f"{person.contact.first_name} {person.contact.last_name}".strip() or person.contact.email or f"Person {person.contact.id}"
-        } 
-        for person in people
-    ]
+    access_manager = get_data_access_manager(request)
+    types = [kind for kind in request.GET.getlist('type') if kind in TYPEAHEAD_TYPES] or list(TYPEAHEAD_TYPES)
+    try:
+        limit = max(1, min(int(request.GET.get('limit', DEFAULT_LIMIT)), MAX_LIMIT))
+    except ValueError:
+        limit = DEFAULT_LIMIT
     
-    churches_data = [
-        {
-            'id': church.contact.id,
-            'name': church.contact.church_name or church.contact.email or f"Church {church.contact.id}"
-        }
-        for church in churches
-    ]
+    contact_id = request.GET.get('id')
+    if contact_id:
+        if not contact_id.isdigit():
+            return JsonResponse({'error': 'Invalid contact ID'}, status=400)
+        results = get_contact_choice(int(contact_id), access_manager, types)
+    else:
+        results = contact_typeahead(request.GET.get('q', ''), access_manager, types, limit)
     
     return JsonResponse({
-        'people': people_data,
-        'churches': churches_data
+        'people': results.get('person', []),
+        'churches': results.get('church', []),
     })
 
 
@@ -100,9 +100,8 @@ class PersonForm(forms.ModelForm):
             self.fields['zip_code'].initial = contact.zip_code
             self.fields['country'].initial = contact.country
             self.fields['notes'].initial = contact.notes
-            # Get pipeline stage from the relationship system
-            current_stage = contact.get_current_pipeline_stage()
-            self.fields['pipeline_stage'].initial = current_stage.name if current_stage else None
+            # Stage name from the contact's denormalized main pipeline stage
+            self.fields['pipeline_stage'].initial = contact.get_pipeline_stage_name()
             self.fields['priority'].initial = contact.priority
             self.fields['status'].initial = contact.status
             # Handle tags - convert list to string for display
@@ -113,7 +112,7 @@ class PersonForm(forms.ModelForm):
                     self.fields['tags'].initial = contact.tags
             else:
                 self.fields['tags'].initial = ''
-                
+            
             # Populate church relationship fields from ChurchMembership
             primary_membership = self.instance.church_memberships.filter(
                 is_primary_contact=True, 
@@ -127,7 +126,7 @@ class PersonForm(forms.ModelForm):
                 first_membership = self.instance.church_memberships.filter(status='active').first()
                 self.fields['primary_church'].initial = first_membership.church
                 self.fields['church_role'].initial = first_membership.role
-                
+            
             # Handle languages field - convert JSON list to comma-separated string
             if self.instance.languages:
                 if isinstance(self.instance.languages, list):
@@ -346,7 +345,7 @@ class PersonForm(forms.ModelForm):
                     church=primary_church,
                     is_primary_contact=True
                 ).exclude(person=person).update(is_primary_contact=False)
-                
+            
             elif not primary_church and not church_role:
                 # If both are cleared, remove any existing memberships
                 person.church_memberships.filter(is_primary_contact=True).update(status='inactive')
@@ -367,6 +366,11 @@ class ImportContactsForm(forms.Form):
         help_text='Please upload a CSV file with contact information.',
         validators=[FileExtensionValidator(allowed_extensions=['csv'])]
     )
+    dry_run = forms.BooleanField(
+        label='Preview only',
+        required=False,
+        help_text='Check the file and see what would be created, updated or rejected without saving anything.'
+    )
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -380,13 +384,14 @@ class ImportContactsForm(forms.Form):
         
         self.helper.layout = Layout(
             'csv_file',
+            'dry_run',
             HTML('''
                 <div class="alert alert-info mt-3">
                     <h5>CSV Format Instructions</h5>
                     <p>Your CSV file should have the following columns:</p>
                     <ul>
-                        <li><strong>Required:</strong> first_name, last_name</li>
-                        <li><strong>Optional:</strong> email, phone, address, city, state, zip_code, country, pipeline_stage, priority, notes</li>
+                        <li><strong>Required:</strong> first_name, last_name or email</li>
+                        <li><strong>Optional:</strong> phone, street_address, city, state, zip_code, country, priority, notes, title, profession, organization</li>
                     </ul>
                     <p>Download a <a href="#" class="alert-link">sample CSV template</a>.</p>
                 </div>
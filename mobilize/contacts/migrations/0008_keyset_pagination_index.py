@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-16 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contacts", "0007_add_marital_status_choices"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="contact",
+            index=models.Index(
+                fields=["last_name", "first_name", "id"],
+                name="contacts_last_na_e83042_idx",
+            ),
+        ),
+    ]
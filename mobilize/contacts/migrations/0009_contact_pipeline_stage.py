@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-16 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contacts", "0008_keyset_pagination_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contact",
+            name="pipeline_stage",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="Code of the current main pipeline stage, maintained by the pipeline.",
+                max_length=100,
+                null=True,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contact",
+            index=models.Index(
+                fields=["pipeline_stage"], name="contacts_pipelin_b078f8_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contact",
+            index=models.Index(
+                fields=["type", "pipeline_stage"], name="contacts_type_17ba49_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-16 20:44
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contacts", "0009_contact_pipeline_stage"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="contact",
+            index=models.Index(
+                django.db.models.functions.text.Lower("email"),
+                name="contact_email_lower_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-16 22:05
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Lower
+
+# Main pipeline type of each contact type, as in mobilize.pipeline.contact_stages
+MAIN_PIPELINE_TYPES = {
+    "person": "people",
+    "church": "church",
+}
+
+
+def backfill_pipeline_stage(apps, schema_editor):
+    """Store the main pipeline stage code of every existing contact."""
+    Contact = apps.get_model("contacts", "Contact")
+    PipelineContact = apps.get_model("pipeline", "PipelineContact")
+    for contact_type, pipeline_type in MAIN_PIPELINE_TYPES.items():
+        code = Subquery(
+            PipelineContact.objects.filter(
+                contact_id=OuterRef("pk"),
+                pipeline__is_main_pipeline=True,
+                pipeline__pipeline_type=pipeline_type,
+            ).order_by("pk").annotate(code=Lower("current_stage__name")).values("code")[:1]
+        )
+        Contact.objects.filter(type=contact_type).update(pipeline_stage=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contacts", "0010_contact_email_lower_index"),
+        ("pipeline", "0003_pipelinecontact_contact_alter_pipelinecontact_church_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_pipeline_stage, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.conf import settings
 
@@ -75,7 +76,12 @@ class Contact(models.Model):
     has_conflict = models.BooleanField(blank=True, null=True)
 
     # Fields from mobilize-prompt-django.md for Contact
-    # NOTE: pipeline_stage removed - now tracked via PipelineContact relationship
+    # Stages are tracked via the PipelineContact relationship; this column is a
+    # denormalized copy of the main pipeline stage, see mobilize.pipeline.contact_stages
+    pipeline_stage = models.CharField(
+        max_length=100, blank=True, null=True, editable=False,
+        help_text="Code of the current main pipeline stage, maintained by the pipeline."
+    )
     PRIORITY_CHOICES = [
         ('low', 'Low'),
         ('medium', 'Medium'),
@@ -101,15 +107,19 @@ class Contact(models.Model):
             models.Index(fields=['type']),
             models.Index(fields=['office']),
             models.Index(fields=['email']),
+            models.Index(Lower('email'), name='contact_email_lower_idx'),  # Case-insensitive email matching
             # Performance indexes for common search patterns
             models.Index(fields=['first_name']),
             models.Index(fields=['last_name']),
             models.Index(fields=['priority']),
             models.Index(fields=['status']),
+            models.Index(fields=['pipeline_stage']),
             models.Index(fields=['created_at']),
             # Composite indexes for common filter combinations
             models.Index(fields=['type', 'priority']),
             models.Index(fields=['type', 'office']),
+            models.Index(fields=['type', 'pipeline_stage']),
+            models.Index(fields=['last_name', 'first_name', 'id']),  # Keyset pagination of people
         ]
     
     def __str__(self):
@@ -119,16 +129,6 @@ class Contact(models.Model):
             return self.church_name
         return f"Contact {self.id}"
     
-    def get_current_pipeline_stage(self):
-        """Get the current pipeline stage for this contact."""
-        pipeline_entry = self.pipeline_entries.first()
-        return pipeline_entry.current_stage if pipeline_entry else None
-    
-    def get_pipeline_stage_display(self):
-        """Get the display name of the current pipeline stage."""
-        stage = self.get_current_pipeline_stage()
-        return stage.name if stage else None
-    
     @property
     def full_address(self):
         """Return the full address as a formatted string."""
@@ -172,63 +172,35 @@ class Contact(models.Model):
             return None
     
     def get_current_pipeline_stage(self):
-        """Get the current pipeline stage for this contact."""
+        """Get the current PipelineStage of this contact in its main pipeline."""
         pipeline_contact = self.get_pipeline_contact()
         return pipeline_contact.current_stage if pipeline_contact else None
     
-    def get_pipeline_stage_name(self):
-        """Get the name of the current pipeline stage."""
-        stage = self.get_current_pipeline_stage()
-        return stage.name if stage else None
-    
     def get_pipeline_stage_code(self):
-        """Get the code of the current pipeline stage (for templates)."""
-        stage = self.get_current_pipeline_stage()
-        if not stage:
+        """Get the code of the current main pipeline stage (for templates)."""
+        return self.pipeline_stage
+    
+    def get_pipeline_stage_name(self):
+        """Get the name of the current main pipeline stage."""
+        if not self.pipeline_stage:
             return None
-        
-        # Convert stage name to lowercase code for template comparisons
-        name_to_code = {
-            'Promotion': 'promotion',
-            'Information': 'information', 
-            'Invitation': 'invitation',
-            'Confirmation': 'confirmation',
-            'Automation': 'automation',
-            'EN42': 'en42',
-        }
-        return name_to_code.get(stage.name, stage.name.lower())
+        return dict(ALL_PIPELINE_STAGES).get(self.pipeline_stage, self.pipeline_stage.title())
+    
+    def get_pipeline_stage_display(self):
+        """Get the display name of the current main pipeline stage."""
+        return self.get_pipeline_stage_name()
     
     def set_pipeline_stage(self, stage_name):
         """Set the pipeline stage for this contact."""
-        from mobilize.pipeline.models import PipelineContact, PipelineStage
+        from mobilize.pipeline.transitions import PipelineTransitions
         
         main_pipeline = self.get_main_pipeline()
         if not main_pipeline:
             raise ValueError(f"No main pipeline found for contact type: {self.type}")
         
-        # Find the stage by name
-        try:
-            stage = main_pipeline.stages.get(name=stage_name)
-        except PipelineStage.DoesNotExist:
-            available_stages = [s.name for s in main_pipeline.stages.all()]
-            raise ValueError(f"Stage '{stage_name}' not found. Available stages: {available_stages}")
-        
-        # Get or create PipelineContact using the direct contact relationship
-        pipeline_contact, created = PipelineContact.objects.get_or_create(
-            contact=self,
-            pipeline=main_pipeline,
-            defaults={
-                'contact_type': self.type,
-                'current_stage': stage
-            }
-        )
-        
-        if not created:
-            # Update existing stage
-            pipeline_contact.current_stage = stage
-            pipeline_contact.save()
-        
-        return pipeline_contact
+        # Raises StageNotFound, a ValueError, listing the available stages
+        PipelineTransitions().move_contacts(main_pipeline.pk, [self.pk], stage_name, contact_type=self.type)
+        return self.pipeline_entries.filter(pipeline=main_pipeline).first()
     
     def ensure_pipeline_assignment(self):
         """Ensure this contact is assigned to their main pipeline."""
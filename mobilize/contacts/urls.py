@@ -15,6 +15,7 @@ urlpatterns = [
     path('export/', views.export_contacts, name='export_contacts'),
     path('google-sync/', views.google_sync, name='google_sync'),
     # Bulk operations
+    path('bulk/', views.bulk_operation, name='bulk_operation'),
     path('bulk/delete/', views.bulk_delete, name='bulk_delete'),
     path('bulk/update-priority/', views.bulk_update_priority, name='bulk_update_priority'),
     path('bulk/assign-office/', views.bulk_assign_office, name='bulk_assign_office'),
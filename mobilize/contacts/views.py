@@ -1,13 +1,10 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import JsonResponse
 from django.core.paginator import Paginator
-from django.db.models import Q
 from django.views.decorators.http import require_POST
 from django.urls import reverse
-import csv
-from datetime import datetime
 
 from .models import Person, Contact
 from .forms import PersonForm, ImportContactsForm
@@ -17,6 +14,78 @@ from mobilize.authentication.decorators import (
     can_create_edit_delete,
     ensure_user_office_assignment
 )
+from mobilize.core.exports import EXPORT_DATETIME_FORMAT, export_column, streaming_csv_response
+from mobilize.core.pagination import PEOPLE_ORDERING, InvalidCursor, paginate_keyset
+from mobilize.core.search import filter_by_search
+
+
+# Fields matched by list searches until the search index has been built
+PERSON_SEARCH_FIELDS = ['contact__first_name', 'contact__last_name', 'contact__email', 'contact__phone']
+
+# Query parameters of the people list filters
+PEOPLE_FILTER_PARAMS = ['q', 'priority', 'pipeline_stage', 'office']
+
+# Columns of the people CSV export
+PERSON_EXPORT_COLUMNS = [
+    export_column('First Name', 'contact__first_name'),
+    export_column('Last Name', 'contact__last_name'),
+    export_column('Email', 'contact__email'),
+    export_column('Phone', 'contact__phone'),
+    export_column('Street Address', 'contact__street_address'),
+    export_column('City', 'contact__city'),
+    export_column('State', 'contact__state'),
+    export_column('Zip Code', 'contact__zip_code'),
+    export_column('Country', 'contact__country'),
+    export_column('Priority', 'contact__priority'),
+    export_column('Status', 'contact__status'),
+    export_column('Notes', 'contact__notes'),
+    export_column('Title', 'title'),
+    export_column('Profession', 'profession'),
+    export_column('Organization', 'organization'),
+    export_column('Created At', 'contact__created_at', EXPORT_DATETIME_FORMAT),
+    export_column('Last Updated', 'contact__updated_at', EXPORT_DATETIME_FORMAT),
+]
+
+
+def filter_people(people, user, params):
+    """
+    Apply the people list filters and a user's office scope.
+    
+    Shared by the list pages, the CSV export and bulk operations, so they
+    all act on the same people for the same filters.
+    
+    Args:
+        people: Person queryset to filter
+        user: User whose office scope applies
+        params: Mapping such as request.GET with optional 'q', 'priority',
+            'pipeline_stage' and 'office' values
+    
+    Returns:
+        Filtered Person queryset
+    """
+    query = params.get('q', '')
+    priority = params.get('priority', '')
+    pipeline_stage = params.get('pipeline_stage', '')
+    office = str(params.get('office', ''))
+    
+    # Apply office-level filtering
+    people = office_data_filter(people, user, 'contact__office')
+    
+    if office.isdigit():
+        people = people.filter(contact__office_id=int(office))
+    
+    if query:
+        people = filter_by_search(people, query, 'person', PERSON_SEARCH_FIELDS)
+    
+    if priority:
+        people = people.filter(contact__priority=priority)
+    
+    if pipeline_stage:
+        # Stage codes are kept on the contact, so no pipeline tables are joined
+        from mobilize.pipeline.contact_stages import stage_code
+        people = people.filter(contact__pipeline_stage=stage_code(pipeline_stage.replace('_', ' ')))
+    
+    return people
 
 
 @login_required
@@ -51,34 +120,7 @@ def person_list(request):
     else:
         # Fallback to traditional pagination
         # Start with all people - use select_related to optimize queries
-        people = Person.objects.select_related('contact', 'contact__office').all()
-        
-        # Apply office-level filtering
-        people = office_data_filter(people, request.user, 'contact__office')
-        
-        # Apply filters if provided
-        if query:
-            people = people.filter(
-                Q(contact__first_name__icontains=query) | 
-                Q(contact__last_name__icontains=query) | 
-                Q(contact__email__icontains=query) | 
-                Q(contact__phone__icontains=query)
-            )
-        
-        if priority:
-            people = people.filter(contact__priority=priority)
-        
-        if pipeline_stage:
-            # Filter by pipeline stage
-            from mobilize.pipeline.models import PipelineContact, Pipeline
-            main_pipeline = Pipeline.get_main_people_pipeline()
-            if main_pipeline:
-                # Get all contacts in the specified stage
-                pipeline_contacts = PipelineContact.objects.filter(
-                    pipeline=main_pipeline,
-                    current_stage__name__iexact=pipeline_stage.replace('_', ' ').title()
-                ).values_list('contact_id', flat=True)
-                people = people.filter(contact__id__in=pipeline_contacts)
+        people = filter_people(Person.objects.select_related('contact', 'contact__office'), request.user, request.GET)
         
         # Get items per page from request
         per_page = int(request.GET.get('per_page', 25))
@@ -208,52 +250,18 @@ def person_list_api(request):
     """
     JSON API endpoint for lazy loading person list data.
     """
-    # Get query parameters
-    query = request.GET.get('q', '')
-    priority = request.GET.get('priority', '')
-    pipeline_stage = request.GET.get('pipeline_stage', '')
-    page = int(request.GET.get('page', 1))
-    per_page = int(request.GET.get('per_page', 25))
-    
     # Build queryset with optimizations
-    people = Person.objects.select_related(
+    people = filter_people(Person.objects.select_related(
         'contact', 
         'contact__office',
         'primary_church'
-    ).prefetch_related(
-        'contact__pipeline_entries__current_stage'
-    )
-    
-    # Apply filters
-    if query:
-        people = people.filter(
-            Q(contact__first_name__icontains=query) | 
-            Q(contact__last_name__icontains=query) | 
-            Q(contact__email__icontains=query) | 
-            Q(contact__phone__icontains=query)
-        )
-    
-    if priority:
-        people = people.filter(contact__priority=priority)
+    ), request.user, request.GET)
     
-    if pipeline_stage:
-        # Filter by pipeline stage
-        from mobilize.pipeline.models import PipelineContact, Pipeline
-        main_pipeline = Pipeline.get_main_people_pipeline()
-        if main_pipeline:
-            # Get all contacts in the specified stage
-            pipeline_contacts = PipelineContact.objects.filter(
-                pipeline=main_pipeline,
-                current_stage__name__iexact=pipeline_stage.replace('_', ' ').title()
-            ).values_list('contact_id', flat=True)
-            people = people.filter(contact__id__in=pipeline_contacts)
-    
-    # Order by most recently updated
-    people = people.order_by('-contact__updated_at')
-    
-    # Paginate
-    paginator = Paginator(people, per_page)
-    page_obj = paginator.get_page(page)
+    # Keyset pagination by name, so later pages cost the same as the first
+    try:
+        page_obj, pagination = paginate_keyset(request, people, PEOPLE_ORDERING)
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
     # Build JSON response
     results = []
@@ -273,11 +281,7 @@ def person_list_api(request):
     
     return JsonResponse({
         'results': results,
-        'page': page,
-        'per_page': per_page,
-        'total': paginator.count,
-        'has_next': page_obj.has_next(),
-        'has_previous': page_obj.has_previous(),
+        **pagination,
     })
 
 
@@ -291,190 +295,46 @@ def person_list_api(request):
 def import_contacts(request):
     """
     Import contacts from CSV file.
+    
+    The upload is imported by a background job, matching existing people
+    by email. The page then polls the job for progress and failed rows.
     """
+    from mobilize.core.import_jobs import get_import_office_id, start_import_job
+    from mobilize.core.imports import ImportFormatError
+    from mobilize.core.models import ImportJob
+    
     if request.method == 'POST':
         form = ImportContactsForm(request.POST, request.FILES)
         if form.is_valid():
-            csv_file = request.FILES['csv_file']
-            
-            # Check if file is CSV
-            if not csv_file.name.endswith('.csv'):
-                messages.error(request, 'Please upload a CSV file')
-                return redirect('contacts:import_contacts')
-            
-            # Process CSV file
             try:
-                decoded_file = csv_file.read().decode('utf-8').splitlines()
-                reader = csv.DictReader(decoded_file)
-                
-                # Track import results
-                created_count = 0
-                updated_count = 0
-                error_count = 0
-                
-                for row in reader:
-                    try:
-                        # Check if contact exists by email
-                        email = row.get('email', '').strip()
-                        
-                        # First, handle the Contact creation/update
-                        if email:
-                            # Check if a contact with this email already exists
-                            from .models import Contact
-                            try:
-                                contact = Contact.objects.get(email=email)
-                                created = False
-                                # Update contact fields
-                                contact.first_name = row.get('first_name', '').strip()
-                                contact.last_name = row.get('last_name', '').strip()
-                                contact.phone = row.get('phone', '').strip()
-                                contact.street_address = row.get('street_address', row.get('address_line1', '')).strip()
-                                contact.city = row.get('city', '').strip()
-                                contact.state = row.get('state', '').strip()
-                                contact.zip_code = row.get('zip_code', row.get('postal_code', '')).strip()
-                                contact.country = row.get('country', 'United States').strip()
-                                contact.pipeline_stage = row.get('pipeline_stage', 'new').strip()
-                                contact.priority = row.get('priority', 'medium').strip()
-                                contact.notes = row.get('notes', '').strip()
-                                contact.user = request.user
-                                contact.save()
-                            except Contact.DoesNotExist:
-                                # Create new contact
-                                contact = Contact.objects.create(
-                                    type='person',
-                                    email=email,
-                                    first_name=row.get('first_name', '').strip(),
-                                    last_name=row.get('last_name', '').strip(),
-                                    phone=row.get('phone', '').strip(),
-                                    street_address=row.get('street_address', row.get('address_line1', '')).strip(),
-                                    city=row.get('city', '').strip(),
-                                    state=row.get('state', '').strip(),
-                                    zip_code=row.get('zip_code', row.get('postal_code', '')).strip(),
-                                    country=row.get('country', 'United States').strip(),
-                                    pipeline_stage=row.get('pipeline_stage', 'new').strip(),
-                                    priority=row.get('priority', 'medium').strip(),
-                                    notes=row.get('notes', '').strip(),
-                                    user=request.user,
-                                )
-                                created = True
-                        else:
-                            # No email, create new contact
-                            contact = Contact.objects.create(
-                                type='person',
-                                first_name=row.get('first_name', '').strip(),
-                                last_name=row.get('last_name', '').strip(),
-                                phone=row.get('phone', '').strip(),
-                                street_address=row.get('street_address', row.get('address_line1', '')).strip(),
-                                city=row.get('city', '').strip(),
-                                state=row.get('state', '').strip(),
-                                zip_code=row.get('zip_code', row.get('postal_code', '')).strip(),
-                                country=row.get('country', 'United States').strip(),
-                                pipeline_stage=row.get('pipeline_stage', 'new').strip(),
-                                priority=row.get('priority', 'medium').strip(),
-                                notes=row.get('notes', '').strip(),
-                                user=request.user,
-                            )
-                            created = True
-                        
-                        # Now create or update the Person record
-                        person, person_created = Person.objects.get_or_create(
-                            contact=contact,
-                            defaults={
-                                # Add any person-specific fields from CSV if available
-                                'title': row.get('title', '').strip(),
-                                'profession': row.get('profession', row.get('occupation', '')).strip(),
-                                'organization': row.get('organization', row.get('employer', '')).strip(),
-                            }
-                        )
-                        
-                        if created or person_created:
-                            created_count += 1
-                        else:
-                            updated_count += 1
-                            
-                    except Exception as e:
-                        error_count += 1
-                        print(f"Error importing row: {e}")
-                
-                messages.success(
-                    request, 
-                    f"Import complete: {created_count} created, {updated_count} updated, {error_count} errors"
+                job = start_import_job(
+                    request.user, 'contacts', form.cleaned_data['csv_file'],
+                    {'office_id': get_import_office_id(request)},
+                    dry_run=form.cleaned_data['dry_run'],
                 )
-                return redirect('contacts:person_list')
-            
-            except Exception as e:
-                messages.error(request, f"Error processing CSV file: {str(e)}")
-                return redirect('contacts:import_contacts')
+            except ImportFormatError as e:
+                form.add_error('csv_file', str(e))
+            else:
+                return redirect(f"{reverse('contacts:import_contacts')}?job={job.pk}")
     else:
         form = ImportContactsForm()
     
-    return render(request, 'contacts/import_contacts.html', {'form': form})
+    job_id = request.GET.get('job', '')
+    import_job = ImportJob.objects.filter(pk=job_id, user=request.user).first() if job_id.isdigit() else None
+    
+    return render(request, 'contacts/import_contacts.html', {'form': form, 'import_job': import_job})
 
 
 @login_required
 def export_contacts(request):
     """
-    Export contacts to CSV file.
-    """
-    # Get query parameters for filtering
-    query = request.GET.get('q', '')
-    priority = request.GET.get('priority', '')
-    
-    # Start with all people - use select_related to optimize queries
-    people = Person.objects.select_related('contact', 'contact__office').all()
+    Export the people shown by the list view to a CSV file.
     
-    # Apply filters if provided
-    if query:
-        people = people.filter(
-            Q(contact__first_name__icontains=query) | 
-            Q(contact__last_name__icontains=query) | 
-            Q(contact__email__icontains=query) | 
-            Q(contact__phone__icontains=query)
-        )
-    
-    if priority:
-        people = people.filter(contact__priority=priority)
-    
-    # Create the HttpResponse object with CSV header
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="contacts_export_{timestamp}.csv"'
-    
-    # Create CSV writer
-    writer = csv.writer(response)
-    
-    # Write header row
-    writer.writerow([
-        'First Name', 'Last Name', 'Email', 'Phone', 
-        'Street Address', 'City', 'State', 'Zip Code', 'Country',
-        'Priority', 'Status', 'Notes', 
-        'Title', 'Profession', 'Organization',
-        'Created At', 'Last Updated'
-    ])
-    
-    # Write data rows
-    for person in people:
-        writer.writerow([
-            person.contact.first_name or '',
-            person.contact.last_name or '',
-            person.contact.email or '',
-            person.contact.phone or '',
-            person.contact.street_address or '',
-            person.contact.city or '',
-            person.contact.state or '',
-            person.contact.zip_code or '',
-            person.contact.country or '',
-            person.contact.priority or '',
-            person.contact.status or '',
-            person.contact.notes or '',
-            person.title or '',
-            person.profession or '',
-            person.organization or '',
-            person.contact.created_at.strftime('%Y-%m-%d %H:%M:%S') if person.contact.created_at else '',
-            person.contact.updated_at.strftime('%Y-%m-%d %H:%M:%S') if person.contact.updated_at else ''
-        ])
-    
-    return response
+    Takes the list view's filters and office scope, and streams the rows
+    so large exports start downloading right away.
+    """
+    people = filter_people(Person.objects.all(), request.user, request.GET)
+    return streaming_csv_response(people, PERSON_EXPORT_COLUMNS, 'contacts_export')
 
 
 @login_required
@@ -491,79 +351,70 @@ def google_sync(request):
     return render(request, 'contacts/google_sync.html')
 
 
-@login_required
-@require_POST
-def bulk_delete(request):
+def _apply_bulk_operation(request, operation, value=None):
     """
-    Delete multiple contacts at once.
+    Apply a bulk operation to the posted selection and redirect to the list.
+    
+    The selection is either the posted contact_ids or, when select_all is
+    set, every person matching the posted list filters.
     """
-    contact_ids = request.POST.getlist('contact_ids')
+    from mobilize.core.bulk_operation_jobs import start_bulk_operation
+    from mobilize.core.bulk_operations import OPERATION_CHOICES, BulkOperationError, parse_contact_ids
     
-    if not contact_ids:
-        messages.error(request, "No contacts selected for deletion")
-        return redirect('contacts:person_list')
+    if request.POST.get('select_all') == 'true':
+        contact_ids = None
+        filters = {key: request.POST.get(key, '') for key in PEOPLE_FILTER_PARAMS}
+    else:
+        contact_ids = parse_contact_ids(request.POST.getlist('contact_ids'))
+        filters = None
+        if not contact_ids:
+            messages.error(request, "No contacts selected")
+            return redirect('contacts:person_list')
     
     try:
-        # Get the contacts to delete
-        contacts = Contact.objects.filter(id__in=contact_ids, type='person')
-        count = contacts.count()
-        
-        if count == 0:
-            messages.error(request, "No valid contacts found to delete")
-            return redirect('contacts:person_list')
-        
-        # Delete the contacts (this will cascade to delete Person records)
-        contacts.delete()
-        
-        messages.success(request, f"Successfully deleted {count} contact(s)")
-        
-    except Exception as e:
-        messages.error(request, f"Error deleting contacts: {str(e)}")
+        count, job = start_bulk_operation(request.user, operation, value, contact_ids, filters)
+    except BulkOperationError as e:
+        messages.error(request, str(e))
+        return redirect('contacts:person_list')
     
+    label = dict(OPERATION_CHOICES)[operation]
+    if job is not None:
+        messages.info(request, f"{label} for {count} contacts is running in the background")
+        return redirect(f"{reverse('contacts:person_list')}?bulk_job={job.pk}")
+    if count == 0:
+        messages.error(request, "No valid contacts found")
+    else:
+        messages.success(request, f"{label}: {count} contact(s) updated" if operation != 'delete'
+                         else f"Successfully deleted {count} contact(s)")
     return redirect('contacts:person_list')
 
 
+@login_required
+@require_POST
+def bulk_operation(request):
+    """
+    Apply any bulk operation (delete, priority, office, tags, pipeline stage)
+    to the selected people or to every person matching the list filters.
+    """
+    return _apply_bulk_operation(request, request.POST.get('operation', ''), request.POST.get('value'))
+
+
+@login_required
+@require_POST
+def bulk_delete(request):
+    """
+    Delete multiple contacts at once.
+    """
+    return _apply_bulk_operation(request, 'delete')
+
+
 @login_required
 @require_POST
 def bulk_update_priority(request):
     """
     Update priority for multiple contacts at once.
     """
-    contact_ids = request.POST.getlist('contact_ids')
-    new_priority = request.POST.get('priority')
-    
-    if not contact_ids:
-        messages.error(request, "No contacts selected for update")
-        return redirect('contacts:person_list')
-    
-    if not new_priority:
-        messages.error(request, "Please select a priority")
-        return redirect('contacts:person_list')
-    
-    try:
-        # Get the contacts to update
-        contacts = Contact.objects.filter(id__in=contact_ids, type='person')
-        count = contacts.count()
-        
-        if count == 0:
-            messages.error(request, "No valid contacts found to update")
-            return redirect('contacts:person_list')
-        
-        # Update the priority
-        contacts.update(priority=new_priority)
-        
-        priority_display = dict([
-            ('low', 'Low'),
-            ('medium', 'Medium'),
-            ('high', 'High'),
-        ]).get(new_priority, new_priority)
-        
-        messages.success(request, f"Successfully updated {count} contact(s) to {priority_display} priority")
-        
-    except Exception as e:
-        messages.error(request, f"Error updating contacts: {str(e)}")
-    
-    return redirect('contacts:person_list')
+    return _apply_bulk_operation(request, 'priority', request.POST.get('priority'))
 
 
 @login_required
@@ -572,35 +423,4 @@ def bulk_assign_office(request):
     """
     Assign multiple contacts to an office at once.
     """
-    contact_ids = request.POST.getlist('contact_ids')
-    office_id = request.POST.get('office_id')
-    
-    if not contact_ids:
-        messages.error(request, "No contacts selected for assignment")
-        return redirect('contacts:person_list')
-    
-    if not office_id:
-        messages.error(request, "Please select an office")
-        return redirect('contacts:person_list')
-    
-    try:
-        from mobilize.admin_panel.models import Office
-        office = get_object_or_404(Office, id=office_id)
-        
-        # Get the contacts to update
-        contacts = Contact.objects.filter(id__in=contact_ids, type='person')
-        count = contacts.count()
-        
-        if count == 0:
-            messages.error(request, "No valid contacts found to assign")
-            return redirect('contacts:person_list')
-        
-        # Update the office assignment
-        contacts.update(office=office)
-        
-        messages.success(request, f"Successfully assigned {count} contact(s) to {office.name}")
-        
-    except Exception as e:
-        messages.error(request, f"Error assigning contacts: {str(e)}")
-    
-    return redirect('contacts:person_list')
\ No newline at end of file
+    return _apply_bulk_operation(request, 'office', request.POST.get('office_id'))
@@ -5,3 +5,7 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mobilize.core'
     verbose_name = 'Core'
+    
+    def ready(self):
+        """Import signals when the app is ready."""
+        import mobilize.core.signals
@@ -0,0 +1,123 @@
+"""
+Background bulk operations for the Mobilize CRM.
+
+Small selections are changed during the request. Larger ones are stored as
+a BulkOperationJob and processed by a Celery task, and the browser polls a
+lightweight status endpoint for progress.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from mobilize.core.bulk_operations import BACKGROUND_THRESHOLD, BulkOperation, select_people
+from mobilize.core.models import BulkOperationJob
+
+logger = logging.getLogger(__name__)
+
+
+def start_bulk_operation(user, operation, value=None, contact_ids=None, filters=None):
+    """
+    Apply a bulk operation now, or queue it if the selection is large.
+    
+    Args:
+        user: The requesting user
+        operation: One of OPERATION_CHOICES
+        value: Priority, office ID, tags or pipeline stage code
+        contact_ids: Explicit contact IDs, or None to select by filters
+        filters: Saved people list filters
+    
+    Returns:
+        Tuple of (number of selected people, BulkOperationJob or None when
+        the operation was applied right away)
+    
+    Raises:
+        BulkOperationError: If the operation or value is invalid
+    """
+    bulk_operation = BulkOperation(user, operation, value)
+    selection = select_people(user, contact_ids, filters)
+    count = selection.count()
+    if count <= BACKGROUND_THRESHOLD:
+        return bulk_operation.run(selection), None
+    
+    job = BulkOperationJob.objects.create(
+        user=user,
+        operation=operation,
+        value=value,
+        selection={'contact_ids': list(contact_ids)} if contact_ids is not None else {'filters': dict(filters or {})},
+        total_count=count,
+    )
+    transaction.on_commit(lambda: _dispatch_bulk_operation_job(job))
+    return count, job
+
+
+def _dispatch_bulk_operation_job(job):
+    """Queue the Celery task for a job, failing the job if the broker is down."""
+    from mobilize.core.tasks import process_bulk_operation_job
+    
+    try:
+        result = process_bulk_operation_job.delay(job.pk)
+        BulkOperationJob.objects.filter(pk=job.pk, celery_task_id__isnull=True).update(celery_task_id=result.id)
+    except Exception as e:
+        logger.error(f"Could not queue bulk operation job {job.pk}: {str(e)}")
+        BulkOperationJob.objects.filter(pk=job.pk).update(
+            status='failed',
+            error_message='Bulk operation queue is unavailable. Please try again later.',
+            completed_at=timezone.now(),
+        )
+
+
+def run_bulk_operation_job(job):
+    """
+    Apply a job's operation, recording progress after every chunk.
+    
+    Args:
+        job: BulkOperationJob instance
+    
+    Returns:
+        The updated BulkOperationJob instance
+    
+    Raises:
+        BulkOperationError: If the stored operation is no longer valid, such
+            as a stage that has been removed
+    """
+    bulk_operation = BulkOperation(job.user, job.operation, job.value)
+    selection = select_people(job.user, job.selection.get('contact_ids'), job.selection.get('filters'))
+    
+    job.status = 'running'
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+    
+    def record_progress(bulk_operation):
+        progress = min(99, int(bulk_operation.processed * 100 / job.total_count)) if job.total_count else 0
+        BulkOperationJob.objects.filter(pk=job.pk).update(progress=progress, processed_count=bulk_operation.processed)
+    
+    bulk_operation.run(selection, progress_callback=record_progress)
+    
+    job.processed_count = bulk_operation.processed
+    job.status = 'completed'
+    job.progress = 100
+    job.completed_at = timezone.now()
+    job.save(update_fields=['processed_count', 'status', 'progress', 'completed_at'])
+    return job
+
+
+def get_bulk_operation_status(job):
+    """
+    Serialize a job for the status polling endpoint.
+    
+    Args:
+        job: BulkOperationJob instance
+    
+    Returns:
+        Dict suitable for JsonResponse
+    """
+    return {
+        'job_id': job.pk,
+        'operation': job.operation,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total_count,
+        'processed': job.processed_count,
+        'error': job.error_message,
+    }
@@ -0,0 +1,350 @@
+"""
+Two-tier cache backend for the Mobilize CRM.
+
+A small in-process LRU sits in front of a shared tier. The shared tier is
+Redis when a LOCATION is configured and a process-local LocMemCache
+otherwise, so tests run without a Redis server. LocMemCache is not shared
+between processes, so deployments must configure Redis.
+
+Settings example::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'mobilize.core.cache_backends.TieredCache',
+            'LOCATION': 'redis://localhost:6379/1',  # '' for locmem in tests
+            'TIMEOUT': 3600,
+            'OPTIONS': {
+                'LOCAL_MAX_ENTRIES': 1000,
+                'LOCAL_TIMEOUT': 5,
+                'PREFIX_POLICIES': {
+                    'dashboard_metrics:': {'timeout': 21600},
+                    'dashboard_generation:': {'local': False},
+                },
+            },
+        }
+    }
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger(__name__)
+
+
+# Marker for values missing from a tier, distinct from a cached None
+_MISSING = object()
+
+STAT_NAMES = ('local_hits', 'shared_hits', 'misses', 'sets', 'stampede_waits', 'errors')
+
+
+class LocalLRU:
+    """
+    Thread-safe in-process LRU with per-entry expiry.
+    """
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key, value, timeout):
+        if self.max_entries <= 0 or timeout <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TieredCache(BaseCache):
+    """
+    Cache backend with an in-process LRU in front of a shared Redis tier.
+    
+    Options:
+        LOCAL_MAX_ENTRIES: Size of the in-process LRU (0 disables it)
+        LOCAL_TIMEOUT: Seconds a value may be served from the LRU before the
+            shared tier is consulted again; this bounds cross-process staleness
+        LOCK_TIMEOUT: Seconds a get_or_set() recomputation holds its lock
+        PREFIX_POLICIES: Dict of key prefix to {'timeout': seconds,
+            'local': bool}; the longest matching prefix wins. 'timeout'
+            replaces the timeout given by the caller and 'local': False keeps
+            keys, such as generation counters, out of the LRU.
+    """
+    
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 30)
+        self.prefix_policies = sorted(
+            options.get('PREFIX_POLICIES', {}).items(),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        self.local = LocalLRU(options.get('LOCAL_MAX_ENTRIES', 1000))
+        
+        shared_params = {
+            name: value for name, value in params.items() if name != 'OPTIONS'
+        }
+        if server:
+            from django.core.cache.backends.redis import RedisCache
+            
+            shared_params['OPTIONS'] = options.get('REDIS_OPTIONS', {})
+            self.shared = RedisCache(server, shared_params)
+        else:
+            self.shared = LocMemCache(f'tiered-{id(self)}', shared_params)
+        
+        self._stats = dict.fromkeys(STAT_NAMES, 0)
+        self._stats_lock = threading.Lock()
+        self._key_locks = {}
+        self._key_locks_lock = threading.Lock()
+    
+    # Statistics
+    
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+    
+    def get_stats(self):
+        """
+        Get this process's hit and miss counters.
+        
+        Returns:
+            Dict of counter name to value, plus the overall hit rate
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['local_hits'] + stats['shared_hits']) / lookups, 3) if lookups else None
+        return stats
+    
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = dict.fromkeys(STAT_NAMES, 0)
+    
+    # Policies
+    
+    def _policy(self, key):
+        for prefix, policy in self.prefix_policies:
+            if key.startswith(prefix):
+                return policy
+        return {}
+    
+    def _timeout(self, key, timeout):
+        return self._policy(key).get('timeout', timeout)
+    
+    def _local_timeout(self, key, timeout):
+        """Seconds a value may live in the LRU; never longer than in the shared tier."""
+        if not self._policy(key).get('local', True):
+            return 0
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.local_timeout
+        return max(0, min(self.local_timeout, timeout - time.time()))
+    
+    def _shared(self, method, *args, default=None, **kwargs):
+        """Call the shared tier, treating connection failures as misses."""
+        try:
+            return getattr(self.shared, method)(*args, **kwargs)
+        except Exception as e:
+            if isinstance(self.shared, LocMemCache):
+                raise
+            self._count('errors')
+            logger.warning(f"Shared cache {method} failed: {str(e)}")
+            return default
+    
+    # Cache API
+    
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self.local.get(local_key)
+        if value is not _MISSING:
+            self._count('local_hits')
+            return value
+        
+        value = self._shared('get', key, _MISSING, version=version, default=_MISSING)
+        if value is _MISSING:
+            self._count('misses')
+            return default
+        
+        self._count('shared_hits')
+        self.local.set(local_key, value, self._local_timeout(key, self.default_timeout))
+        return value
+    
+    def get_many(self, keys, version=None):
+        found = {}
+        remaining = []
+        for key in keys:
+            value = self.local.get(self.make_and_validate_key(key, version=version))
+            if value is _MISSING:
+                remaining.append(key)
+            else:
+                found[key] = value
+        self._count('local_hits', len(found))
+        
+        if remaining:
+            shared = self._shared('get_many', remaining, version=version, default={})
+            self._count('shared_hits', len(shared))
+            self._count('misses', len(remaining) - len(shared))
+            for key, value in shared.items():
+                self.local.set(
+                    self.make_and_validate_key(key, version=version), value,
+                    self._local_timeout(key, self.default_timeout),
+                )
+            found.update(shared)
+        return found
+    
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(key, timeout)
+        self._count('sets')
+        self._shared('set', key, value, timeout, version=version)
+        self.local.set(self.make_and_validate_key(key, version=version), value, self._local_timeout(key, timeout))
+    
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(key, timeout)
+        added = self._shared('add', key, value, timeout, version=version, default=False)
+        if added:
+            self._count('sets')
+            self.local.set(self.make_and_validate_key(key, version=version), value, self._local_timeout(key, timeout))
+        return added
+    
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.delete(self.make_and_validate_key(key, version=version))
+        return self._shared('touch', key, self._timeout(key, timeout), version=version, default=False)
+    
+    def delete(self, key, version=None):
+        self.local.delete(self.make_and_validate_key(key, version=version))
+        return self._shared('delete', key, version=version, default=False)
+    
+    def has_key(self, key, version=None):
+        if self.local.get(self.make_and_validate_key(key, version=version)) is not _MISSING:
+            return True
+        return self._shared('has_key', key, version=version, default=False)
+    
+    def incr(self, key, delta=1, version=None):
+        # Counters are read from the shared tier next time so every process agrees
+        self.local.delete(self.make_and_validate_key(key, version=version))
+        try:
+            return self.shared.incr(key, delta, version=version)
+        except ValueError:
+            raise
+        except Exception as e:
+            if isinstance(self.shared, LocMemCache):
+                raise
+            self._count('errors')
+            logger.warning(f"Shared cache incr failed: {str(e)}")
+            raise ValueError(f"Key '{key}' not available in the shared cache")
+    
+    def clear(self):
+        """
+        Drop this cache's entries.
+        
+        On Redis only keys under this cache's KEY_PREFIX are deleted; a
+        FLUSHDB would also take out anything else sharing the database.
+        """
+        self.local.clear()
+        if isinstance(self.shared, LocMemCache):
+            self.shared.clear()
+            return
+        try:
+            client = self.shared._cache.get_client(write=True)
+            keys = []
+            for key in client.scan_iter(match=f'{self.key_prefix}:*', count=1000):
+                keys.append(key)
+                if len(keys) >= 1000:
+                    client.delete(*keys)
+                    keys = []
+            if keys:
+                client.delete(*keys)
+        except Exception as e:
+            self._count('errors')
+            logger.warning(f"Shared cache clear failed: {str(e)}")
+    
+    def close(self, **kwargs):
+        self._shared('close', **kwargs)
+    
+    # Stampede protection
+    
+    def _key_lock(self, key):
+        with self._key_locks_lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+    
+    def _release_key_lock(self, key):
+        # Forget idle locks so the table does not grow with every key ever computed
+        with self._key_locks_lock:
+            lock = self._key_locks.get(key)
+            if lock is not None and not lock.locked():
+                del self._key_locks[key]
+    
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Fetch a key, computing and storing it on a miss.
+        
+        Only one caller recomputes a missing value: threads in this process
+        queue on a local lock, and other processes wait on a short-lived lock
+        key in the shared tier while the first caller fills the value in.
+        """
+        value = self.get(key, _MISSING, version=version)
+        if value is not _MISSING or not callable(default):
+            if value is _MISSING:
+                self.add(key, default, timeout=timeout, version=version)
+                return self.get(key, default, version=version)
+            return value
+        
+        try:
+            with self._key_lock(key):
+                value = self.get(key, _MISSING, version=version)
+                if value is not _MISSING:
+                    return value
+                
+                lock_key = f'{key}:lock'
+                if not self._shared('add', lock_key, 1, self.lock_timeout, version=version, default=True):
+                    value = self._wait_for_value(key, version)
+                    if value is not _MISSING:
+                        return value
+                try:
+                    value = default()
+                    self.set(key, value, timeout=timeout, version=version)
+                finally:
+                    self._shared('delete', lock_key, version=version)
+                return value
+        finally:
+            self._release_key_lock(key)
+    
+    def _wait_for_value(self, key, version):
+        """Poll the shared tier while another process recomputes a value."""
+        self._count('stampede_waits')
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.05
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            value = self._shared('get', key, _MISSING, version=version, default=_MISSING)
+            if value is not _MISSING:
+                return value
+            delay = min(delay * 2, 1.0)
+        return _MISSING
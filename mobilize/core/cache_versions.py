@@ -0,0 +1,72 @@
+"""
+Generation counters for cache invalidation.
+
+Cached values embed the current generation of the data they were built from
+in their cache key. Changing the data bumps the generation, so stale entries
+are simply never read again and expire on their own TTL.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def get_version(key):
+    """
+    Get the current generation stored under a cache key.
+
+    Versions are seeded from the clock so that losing the cache never makes an
+    old version number valid again.
+
+    Args:
+        key: Cache key of the counter
+
+    Returns:
+        Integer version
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(keys):
+    """
+    Get the current generations of several counters in one cache round trip.
+
+    Args:
+        keys: Cache keys of the counters
+
+    Returns:
+        Dict of cache key to integer version
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if versions.get(key) is None:
+            versions[key] = get_version(key)
+    return versions
+
+
+def bump_version(key):
+    """
+    Advance a generation counter, invalidating values built from it.
+
+    Args:
+        key: Cache key of the counter
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Key missing or evicted; start a fresh clock-seeded version
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_versions(keys):
+    """
+    Advance several generation counters.
+
+    Args:
+        keys: Cache keys of the counters
+    """
+    for key in keys:
+        bump_version(key)
@@ -0,0 +1,361 @@
+"""
+Dashboard metrics engine for the Mobilize CRM.
+
+All dashboard widget metrics for a DataAccessManager scope are computed in a
+fixed number of queries: a single read of the dashboard rollups (or, before
+they are built, one combined conditional aggregate per model) plus the two
+short lists shown on the dashboard. The cost of a dashboard load does not
+depend on how many widgets are enabled.
+"""
+import hashlib
+import random
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from mobilize.core.cache_versions import bump_versions, get_versions
+
+
+# Number of days shown on the activity timeline, including today
+TIMELINE_DAYS = 7
+
+# Number of rows shown in the pending task and recent communication lists
+DASHBOARD_LIST_SIZE = 5
+
+# Cached metrics are invalidated by generation counters, so the TTL only
+# bounds memory use; the jitter keeps entries from all expiring together
+DASHBOARD_CACHE_TIMEOUT = 6 * 60 * 60
+DASHBOARD_CACHE_JITTER = 0.2
+
+
+@dataclass
+class DashboardMetrics:
+    """Every metric rendered by the dashboard widgets for one scope."""
+    
+    people_count: int = 0
+    churches_count: int = 0
+    recent_people: int = 0
+    recent_churches: int = 0
+    
+    pending_tasks_count: int = 0
+    overdue_tasks: int = 0
+    upcoming_tasks: int = 0
+    completed_this_week: int = 0
+    communications_this_week: int = 0
+    
+    people_pipeline: List[Dict] = field(default_factory=list)
+    churches_pipeline: List[Dict] = field(default_factory=list)
+    priority_distribution: List[Dict] = field(default_factory=list)
+    activity_timeline: List[Dict] = field(default_factory=list)
+    church_stats: Dict[str, int] = field(default_factory=dict)
+    
+    pending_tasks: List = field(default_factory=list)
+    recent_communications: List = field(default_factory=list)
+
+
+def _single_pass(queryset):
+    """
+    Return a queryset over the same rows that can be aggregated directly.
+    
+    Scopes that OR across joins use DISTINCT, which forces Django to wrap
+    aggregates in a subquery; filtering by primary key keeps the aggregate
+    flat without changing the rows counted.
+    """
+    if queryset.query.distinct:
+        return queryset.model.objects.filter(pk__in=queryset.values('pk'))
+    return queryset
+
+
+def _timeline_days():
+    """Get the dates covered by the activity timeline, oldest first."""
+    today = timezone.localdate()
+    return [today - timedelta(days=offset) for offset in range(TIMELINE_DAYS - 1, -1, -1)]
+
+
+def _day_counts(prefix, lookup, days, condition=None):
+    """
+    Build one conditional count per timeline day.
+    
+    Args:
+        prefix: Prefix for the aggregate aliases
+        lookup: Date lookup to compare each day against
+        days: Dates to count
+        condition: Optional Q that every counted row must also match
+    
+    Returns:
+        Dict of aggregate alias to Count expression
+    """
+    aggregates = {}
+    for index, day in enumerate(days):
+        day_filter = Q(**{lookup: day})
+        if condition is not None:
+            day_filter &= condition
+        aggregates[f'{prefix}_{index}'] = Count('pk', filter=day_filter, distinct=True)
+    return aggregates
+
+
+def _stage_counts(prefix, stages):
+    """
+    Build one conditional count per main pipeline stage.
+    
+    Reads the denormalized stage code on the contact, so no pipeline tables
+    are joined.
+    """
+    return {
+        f'{prefix}_{stage_code}': Count('pk', filter=Q(contact__pipeline_stage=stage_code))
+        for stage_code, stage_name in stages
+    }
+
+
+def _pipeline_distribution(result, prefix, stages):
+    """Convert per-stage aggregate results into the widget's chart rows."""
+    rows = [
+        {
+            'stage_code': stage_code,
+            'stage_name': stage_name,
+            'count': result[f'{prefix}_{stage_code}'],
+        }
+        for stage_code, stage_name in stages
+    ]
+    total = sum(row['count'] for row in rows) or 1
+    for row in rows:
+        row['percentage'] = round((row['count'] / total) * 100, 1)
+    return rows
+
+
+class DashboardMetricsEngine:
+    """
+    Computes dashboard metrics for a DataAccessManager scope.
+    """
+    
+    def __init__(self, access_manager):
+        """
+        Initialize the metrics engine.
+        
+        Args:
+            access_manager: DataAccessManager defining the visible data
+        """
+        self.access_manager = access_manager
+    
+    def compute(self):
+        """
+        Compute every dashboard metric.
+        
+        Counts are read from the dashboard rollups when they have been built,
+        and aggregated from the source tables otherwise.
+        
+        Returns:
+            DashboardMetrics instance
+        """
+        days = _timeline_days()
+        
+        metrics = None
+        if getattr(settings, 'DASHBOARD_USE_ROLLUPS', True):
+            from mobilize.core.rollups import get_rollup_metrics
+            metrics = get_rollup_metrics(self.access_manager, days)
+        if metrics is None:
+            metrics = self._compute_aggregates(days)
+        
+        self._load_lists(metrics)
+        return metrics
+    
+    def _compute_aggregates(self, days):
+        """Aggregate every count from the source tables, one query per model."""
+        week_start = timezone.now() - timedelta(days=7)
+        
+        metrics = DashboardMetrics()
+        people_by_day = self._compute_people(metrics, week_start, days)
+        self._compute_churches(metrics, week_start)
+        tasks_by_day = self._compute_tasks(metrics, week_start, days)
+        comms_by_day = self._compute_communications(metrics, week_start, days)
+        
+        metrics.activity_timeline = [
+            {
+                'date': day.strftime('%m/%d'),
+                'people': people_by_day[index],
+                'tasks': tasks_by_day[index],
+                'communications': comms_by_day[index],
+            }
+            for index, day in enumerate(days)
+        ]
+        return metrics
+    
+    def _compute_people(self, metrics, week_start, days):
+        """Aggregate people counts, pipeline stages and daily additions in one query."""
+        from mobilize.pipeline.models import MAIN_PEOPLE_PIPELINE_STAGES
+        
+        queryset = _single_pass(self.access_manager.get_people_queryset())
+        result = queryset.aggregate(
+            total=Count('pk', distinct=True),
+            recent=Count('pk', filter=Q(contact__created_at__gte=week_start), distinct=True),
+            **_stage_counts('stage', MAIN_PEOPLE_PIPELINE_STAGES),
+            **_day_counts('day', 'contact__created_at__date', days),
+        )
+        
+        metrics.people_count = result['total']
+        metrics.recent_people = result['recent']
+        metrics.people_pipeline = _pipeline_distribution(result, 'stage', MAIN_PEOPLE_PIPELINE_STAGES)
+        return [result[f'day_{index}'] for index in range(len(days))]
+    
+    def _compute_churches(self, metrics, week_start):
+        """Aggregate church counts, activity and pipeline stages in one query."""
+        from mobilize.pipeline.models import MAIN_CHURCH_PIPELINE_STAGES
+        
+        queryset = _single_pass(self.access_manager.get_churches_queryset())
+        result = queryset.aggregate(
+            total=Count('pk', distinct=True),
+            recent=Count('pk', filter=Q(contact__created_at__gte=week_start), distinct=True),
+            with_contacts=Count('pk', filter=Q(main_contact_id__isnull=False), distinct=True),
+            recent_activity=Count('pk', filter=Q(contact__updated_at__gte=week_start), distinct=True),
+            **_stage_counts('stage', MAIN_CHURCH_PIPELINE_STAGES),
+        )
+        
+        metrics.churches_count = result['total']
+        metrics.recent_churches = result['recent']
+        metrics.churches_pipeline = _pipeline_distribution(result, 'stage', MAIN_CHURCH_PIPELINE_STAGES)
+        metrics.church_stats = {
+            'total': result['total'],
+            'with_contacts': result['with_contacts'],
+            'recent_activity': result['recent_activity'],
+        }
+    
+    def _compute_tasks(self, metrics, week_start, days):
+        """Aggregate task status, priority and daily completions in one query."""
+        from mobilize.tasks.models import Task
+        
+        today = timezone.localdate()
+        pending = Q(status='pending')
+        priorities = [code for code, _ in Task.PRIORITY_CHOICES]
+        
+        priority_counts = {
+            f'priority_{code}': Count('pk', filter=pending & Q(priority=code))
+            for code in priorities
+        }
+        priority_counts['priority_none'] = Count('pk', filter=pending & Q(priority__isnull=True))
+        
+        queryset = _single_pass(self.access_manager.get_tasks_queryset())
+        result = queryset.aggregate(
+            pending=Count('pk', filter=pending),
+            overdue=Count('pk', filter=pending & Q(due_date__lt=today)),
+            upcoming=Count('pk', filter=pending & Q(due_date__range=[today, today + timedelta(days=7)])),
+            completed_this_week=Count('pk', filter=Q(status='completed', completed_at__gte=week_start)),
+            **priority_counts,
+            **_day_counts('day', 'completed_at__date', days, condition=Q(status='completed')),
+        )
+        
+        metrics.pending_tasks_count = result['pending']
+        metrics.overdue_tasks = result['overdue']
+        metrics.upcoming_tasks = result['upcoming']
+        metrics.completed_this_week = result['completed_this_week']
+        metrics.priority_distribution = [
+            {'priority': code, 'count': result[f'priority_{code}']}
+            for code in priorities
+            if result[f'priority_{code}']
+        ]
+        if result['priority_none']:
+            metrics.priority_distribution.append({'priority': None, 'count': result['priority_none']})
+        return [result[f'day_{index}'] for index in range(len(days))]
+    
+    def _compute_communications(self, metrics, week_start, days):
+        """Aggregate weekly and daily communication counts in one query."""
+        queryset = _single_pass(self.access_manager.get_communications_queryset())
+        result = queryset.aggregate(
+            this_week=Count('pk', filter=Q(date__gte=week_start.date())),
+            **_day_counts('day', 'date', days),
+        )
+        
+        metrics.communications_this_week = result['this_week']
+        return [result[f'day_{index}'] for index in range(len(days))]
+    
+    def _load_lists(self, metrics):
+        """Load the pending task and recent communication lists."""
+        tasks = _single_pass(self.access_manager.get_tasks_queryset())
+        metrics.pending_tasks = list(
+            tasks.select_related(
+                'created_by', 'assigned_to', 'person', 'church', 'office', 'contact'
+            ).filter(status='pending').order_by('due_date')[:DASHBOARD_LIST_SIZE]
+        )
+        
+        communications = _single_pass(self.access_manager.get_communications_queryset())
+        metrics.recent_communications = list(
+            communications.select_related('person', 'church', 'office').order_by('-date_sent')[:DASHBOARD_LIST_SIZE]
+        )
+
+
+def _generation_key(scope, scope_id=None):
+    if scope_id is None:
+        return f'dashboard_generation:{scope}'
+    return f'dashboard_generation:{scope}:{scope_id}'
+
+
+def get_scope_generation_keys(access_manager):
+    """
+    Get the generation counters a dashboard scope is built from.
+    
+    Args:
+        access_manager: DataAccessManager defining the visible data
+    
+    Returns:
+        List of counter cache keys
+    """
+    user_id = access_manager.user.id
+    if access_manager.user_role == 'super_admin':
+        if access_manager.view_mode == 'my_only':
+            return [_generation_key('user', user_id)]
+        if access_manager.selected_office_id:
+            return [_generation_key('office', access_manager.selected_office_id)]
+        return [_generation_key('all')]
+    
+    # Other roles see their own rows plus office rows (churches, office people)
+    return [_generation_key('user', user_id)] + [
+        _generation_key('office', office_id) for office_id in sorted(access_manager._get_user_offices())
+    ]
+
+
+def bump_dashboard_generations(office_ids=(), user_ids=()):
+    """
+    Invalidate cached dashboard metrics for the scopes touched by a change.
+    
+    The all-offices scope is always invalidated since it sees every row.
+    
+    Args:
+        office_ids: Offices whose data changed
+        user_ids: Users whose data or office membership changed
+    """
+    keys = [_generation_key('all')]
+    keys += [_generation_key('office', office_id) for office_id in sorted(set(office_ids)) if office_id]
+    keys += [_generation_key('user', user_id) for user_id in sorted(set(user_ids)) if user_id]
+    bump_versions(keys)
+
+
+def get_dashboard_metrics(access_manager):
+    """
+    Get dashboard metrics for a data access scope, using the cache when fresh.
+    
+    The cache key embeds the generation counters of every office and user the
+    scope reads from, plus today's date because overdue counts and the
+    timeline are relative to it.
+    
+    Args:
+        access_manager: DataAccessManager defining the visible data
+    
+    Returns:
+        DashboardMetrics instance
+    """
+    generation_keys = get_scope_generation_keys(access_manager)
+    versions = get_versions(generation_keys)
+    fingerprint = '-'.join(str(versions[key]) for key in generation_keys)
+    digest = hashlib.sha256(
+        f'{access_manager.view_mode}:{timezone.localdate().isoformat()}:{fingerprint}'.encode('utf-8')
+    ).hexdigest()
+    cache_key = f'dashboard_metrics:{access_manager.user.id}:{digest}'
+    
+    # get_or_set lets one request recompute a missing entry while concurrent
+    # requests for the same scope wait for it
+    timeout = int(DASHBOARD_CACHE_TIMEOUT * random.uniform(1 - DASHBOARD_CACHE_JITTER, 1 + DASHBOARD_CACHE_JITTER))
+    return cache.get_or_set(cache_key, lambda: DashboardMetricsEngine(access_manager).compute(), timeout)
@@ -66,6 +66,14 @@ DEFAULT_WIDGETS = [
         'order': 7,
         'size': 'full',
     },
+    {
+        'id': 'pipeline_funnel',
+        'name': 'Pipeline Funnel',
+        'description': 'Stage conversion, drop-off and time in stage',
+        'enabled': True,
+        'order': 8,
+        'size': 'full',
+    },
 ]
 
 
@@ -0,0 +1,254 @@
+"""
+Background CSV imports for the Mobilize CRM.
+
+Uploads are stored with an ImportJob and imported by a Celery task, so
+large files don't tie up a web request. The browser polls a lightweight
+status endpoint for progress and the rows that failed.
+
+A dry-run job previews an upload without writing. Once the data looks
+right, the stored upload is imported for real from the preview. Uploads
+hold contact details, so a real import deletes its file once it finishes
+and a nightly task purges old jobs along with any previews never run.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from mobilize.core.imports import IMPORTERS, count_csv_rows, iter_csv_chunks
+from mobilize.core.models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+
+# Maximum number of failed rows kept on a job for the status endpoint
+MAX_REPORTED_ERRORS = 500
+
+
+def start_import_job(user, import_type, upload, options=None, dry_run=False):
+    """
+    Store an upload and queue its import.
+    
+    Args:
+        user: The requesting user, who owns the created contacts
+        import_type: One of IMPORTERS ('contacts', 'churches')
+        upload: Uploaded CSV file
+        options: Dict with an optional 'office_id' for created contacts
+        dry_run: Only preview the import
+    
+    Returns:
+        ImportJob instance
+    
+    Raises:
+        ImportFormatError: If the upload's header is unusable, which is
+            reported right away instead of by a failed job
+    """
+    fieldnames, _ = iter_csv_chunks(upload)
+    IMPORTERS[import_type].check_columns(fieldnames)
+    upload.seek(0)
+    
+    job = ImportJob(
+        user=user,
+        import_type=import_type,
+        filename=upload.name,
+        options={key: value for key, value in (options or {}).items() if value},
+        dry_run=dry_run,
+    )
+    job.file.save(upload.name, upload, save=False)
+    job.save()
+    transaction.on_commit(lambda: _dispatch_import_job(job))
+    return job
+
+
+def start_import_from_preview(preview):
+    """
+    Queue the real import of an upload that was previewed.
+    
+    A preview is imported at most once: the preview row is locked while the
+    import is created, and repeat calls, such as a double-click, get the
+    import already started.
+    
+    Args:
+        preview: Completed dry-run ImportJob
+    
+    Returns:
+        ImportJob sharing the preview's stored upload
+    """
+    with transaction.atomic():
+        preview = ImportJob.objects.select_for_update().get(pk=preview.pk)
+        if preview.import_run_id:
+            return preview.import_run
+        
+        job = ImportJob.objects.create(
+            user=preview.user,
+            import_type=preview.import_type,
+            file=preview.file.name,
+            filename=preview.filename,
+            options=preview.options,
+        )
+        preview.import_run = job
+        preview.save(update_fields=['import_run'])
+        transaction.on_commit(lambda: _dispatch_import_job(job))
+    return job
+
+
+def get_import_office_id(request):
+    """
+    Read the office assigned to imported contacts from a submitted form.
+    
+    Returns:
+        Office ID, or None if none was chosen or the user may not use it
+    """
+    from mobilize.admin_panel.models import Office
+    
+    office_id = request.POST.get('office_id', '')
+    if not office_id.isdigit() or not request.user.has_office_permission(int(office_id)):
+        return None
+    return int(office_id) if Office.objects.filter(pk=office_id).exists() else None
+
+
+def _dispatch_import_job(job):
+    """Queue the Celery task for a job, failing the job if the broker is down."""
+    from mobilize.core.tasks import process_import_job
+    
+    try:
+        result = process_import_job.delay(job.pk)
+        ImportJob.objects.filter(pk=job.pk, celery_task_id__isnull=True).update(celery_task_id=result.id)
+    except Exception as e:
+        logger.error(f"Could not queue import job {job.pk}: {str(e)}")
+        ImportJob.objects.filter(pk=job.pk).update(
+            status='failed',
+            error_message='Import queue is unavailable. Please try again later.',
+            completed_at=timezone.now(),
+        )
+
+
+def _counters(importer):
+    """Get the job fields tracking an importer's progress."""
+    return {
+        'rows_processed': importer.rows_processed,
+        'created_count': importer.created,
+        'updated_count': importer.updated,
+        'unchanged_count': importer.unchanged,
+        'conflict_count': importer.conflict_count,
+        'error_count': importer.error_count,
+        'errors': importer.errors,
+        'conflicts': importer.conflicts,
+        'changes': importer.changes,
+    }
+
+
+def run_import_job(job):
+    """
+    Import a job's upload, recording progress after every chunk.
+    
+    Args:
+        job: ImportJob instance
+    
+    Returns:
+        The updated ImportJob instance
+    
+    Raises:
+        ImportFormatError: If the upload is not a usable CSV file
+    """
+    options = job.options or {}
+    importer = IMPORTERS[job.import_type](
+        job.user, office_id=options.get('office_id'), max_errors=MAX_REPORTED_ERRORS, dry_run=job.dry_run
+    )
+    
+    with job.file.open('rb') as upload:
+        job.total_rows = count_csv_rows(upload)
+    job.status = 'running'
+    job.started_at = timezone.now()
+    job.save(update_fields=['total_rows', 'status', 'started_at'])
+    
+    def record_progress(importer):
+        progress = min(99, int(importer.rows_processed * 100 / job.total_rows)) if job.total_rows else 0
+        ImportJob.objects.filter(pk=job.pk).update(progress=progress, **_counters(importer))
+    
+    with job.file.open('rb') as upload:
+        importer.run(upload, progress_callback=record_progress)
+    
+    for field, value in _counters(importer).items():
+        setattr(job, field, value)
+    job.status = 'completed'
+    job.progress = 100
+    job.completed_at = timezone.now()
+    job.save(update_fields=list(_counters(importer)) + ['status', 'progress', 'completed_at'])
+    return job
+
+
+def discard_import_upload(job):
+    """
+    Delete the upload of a finished import.
+    
+    Dry runs keep theirs until the retention purge so the previewed file
+    can still be imported for real.
+    
+    Args:
+        job: ImportJob instance
+    """
+    if job.dry_run or not job.file:
+        return
+    job.file.delete(save=False)
+    ImportJob.objects.filter(pk=job.pk).update(file='')
+
+
+def purge_expired_import_jobs(retention_days=None):
+    """
+    Delete import jobs older than the retention period, with their uploads.
+    
+    Args:
+        retention_days: Days jobs are kept, defaults to IMPORT_JOB_RETENTION_DAYS
+    
+    Returns:
+        Number of jobs deleted
+    """
+    if retention_days is None:
+        retention_days = settings.IMPORT_JOB_RETENTION_DAYS
+    expired = ImportJob.objects.filter(created_at__lt=timezone.now() - timedelta(days=retention_days))
+    
+    for job in expired.exclude(file='').only('pk', 'file').iterator():
+        job.file.delete(save=False)
+    _, deleted = expired.delete()
+    return deleted.get(ImportJob._meta.label, 0)
+
+
+def get_import_status(job):
+    """
+    Serialize a job for the status polling endpoint.
+    
+    Args:
+        job: ImportJob instance
+    
+    Returns:
+        Dict suitable for JsonResponse
+    """
+    from django.urls import reverse
+    
+    return {
+        'job_id': job.pk,
+        'import_type': job.import_type,
+        'filename': job.filename,
+        'dry_run': job.dry_run,
+        'status': job.status,
+        'progress': job.progress,
+        'total_rows': job.total_rows,
+        'rows_processed': job.rows_processed,
+        'created': job.created_count,
+        'updated': job.updated_count,
+        'unchanged': job.unchanged_count,
+        'conflict_count': job.conflict_count,
+        'error_count': job.error_count,
+        'errors': job.errors or [],
+        'conflicts': job.conflicts or [],
+        'changes': job.changes or [],
+        'error': job.error_message,
+        'status_url': reverse('core:import_job_status', args=[job.pk]),
+        'run_url': (
+            reverse('core:run_import_job', args=[job.pk])
+            if job.dry_run and job.status == 'completed' and not job.import_run_id else None
+        ),
+    }
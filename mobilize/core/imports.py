@@ -0,0 +1,695 @@
+"""
+Chunked CSV imports of people and churches.
+
+Uploads are parsed as a stream and written a chunk of rows at a time. Each
+chunk looks up the records it matches with one query per table, then
+inserts and updates them with bulk_create() and bulk_update(), so the query
+count depends on the number of chunks rather than the number of rows.
+
+Bulk writes skip model signals, so every chunk registers the contacts it
+wrote with the dashboard rollup and search index batches itself.
+
+A dry run takes the same path up to the writes, so its counts of rows to
+create, update, leave unchanged, in conflict and in error match what the
+real import will do as long as the data does not change in between.
+"""
+import codecs
+import csv
+import re
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DataError, IntegrityError, models, transaction
+from django.utils import timezone
+
+from mobilize.core.report_jobs import bump_data_version
+from mobilize.core.rollups import rollup_batch
+from mobilize.core.search import search_index_batch
+
+
+# Rows written per transaction
+CHUNK_SIZE = 500
+
+# Contact fields and the CSV columns they are read from, first match wins
+CONTACT_COLUMNS = {
+    'first_name': ('first_name',),
+    'last_name': ('last_name',),
+    'email': ('email',),
+    'phone': ('phone',),
+    'street_address': ('street_address', 'address_line1'),
+    'city': ('city',),
+    'state': ('state',),
+    'zip_code': ('zip_code', 'postal_code'),
+    'country': ('country',),
+    'priority': ('priority',),
+    'notes': ('notes',),
+}
+
+# Values used for blank cells and for columns missing from new rows
+CONTACT_DEFAULTS = {
+    'country': 'United States',
+    'priority': 'medium',
+}
+
+
+# Digits with optional separators, country code and extension
+PHONE_PATTERN = re.compile(r'^(?P<number>\+?[\d\s().-]+?)(?:\s*(?:x|ext\.?)\s*\d+)?$', re.IGNORECASE)
+
+
+class ImportFormatError(Exception):
+    """Raised when an upload cannot be imported at all, such as a missing column."""
+
+
+class ImportRowError(ValueError):
+    """Raised when a single row cannot be imported."""
+
+
+def iter_csv_chunks(fileobj, chunk_size=CHUNK_SIZE):
+    """
+    Parse a CSV upload lazily into chunks of rows.
+    
+    Args:
+        fileobj: Binary file object with UTF-8 content
+        chunk_size: Maximum rows per chunk
+    
+    Returns:
+        Tuple of (column names, iterator over lists of (line number, row dict))
+    """
+    reader = csv.DictReader(codecs.iterdecode(fileobj, 'utf-8-sig'))
+    try:
+        fieldnames = [name.strip() for name in reader.fieldnames or []]
+    except UnicodeDecodeError:
+        raise ImportFormatError('The file is not UTF-8 encoded text')
+    if not fieldnames:
+        raise ImportFormatError('The CSV file appears to be empty')
+    reader.fieldnames = fieldnames
+    
+    def chunks():
+        chunk = []
+        try:
+            for row in reader:
+                chunk.append((reader.line_num, row))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        except UnicodeDecodeError:
+            raise ImportFormatError(f'Line {reader.line_num + 1} is not UTF-8 encoded text')
+        if chunk:
+            yield chunk
+    
+    return fieldnames, chunks()
+
+
+def count_csv_rows(fileobj):
+    """
+    Count the data rows of a CSV upload.
+    
+    Args:
+        fileobj: Binary file object with UTF-8 content
+    
+    Returns:
+        Number of rows after the header, or None if the file cannot be parsed
+    """
+    try:
+        reader = csv.reader(codecs.iterdecode(fileobj, 'utf-8-sig'))
+        return max(0, sum(1 for _ in reader) - 1)
+    except (UnicodeDecodeError, csv.Error):
+        return None
+
+
+def column_cleaner(field, column):
+    """
+    Build the function converting a column's cells to a model field's values.
+    
+    The checks that apply to the field are worked out once per file rather
+    than once per cell.
+    
+    Args:
+        field: Model field the column is written to
+        column: CSV column name, for error messages
+    
+    Returns:
+        Function taking stripped cell text and returning the field value,
+        raising ImportRowError if the cell is not valid for the field
+    """
+    if isinstance(field, models.IntegerField):
+        def clean_integer(value):
+            if not value:
+                return None
+            try:
+                return int(value.replace(',', ''))
+            except ValueError:
+                raise ImportRowError(f'{column} must be a whole number, not "{value}"')
+        return clean_integer
+    
+    checks = []
+    if field.choices:
+        allowed = [choice[0] for choice in field.choices if choice[0]]
+        
+        def check_choice(value):
+            value = value.lower()
+            if value not in allowed:
+                raise ImportRowError(f'{column} must be one of {", ".join(allowed)}, not "{value}"')
+            return value
+        checks.append(check_choice)
+    if isinstance(field, models.EmailField):
+        def check_email(value):
+            try:
+                validate_email(value)
+            except ValidationError:
+                raise ImportRowError(f'{column} "{value}" is not a valid email address')
+            return value
+        checks.append(check_email)
+    if field.name == 'phone':
+        def check_phone(value):
+            value = ' '.join(value.split())
+            match = PHONE_PATTERN.match(value)
+            if not match or not 7 <= sum(char.isdigit() for char in match.group('number')) <= 15:
+                raise ImportRowError(f'{column} "{value}" is not a valid phone number')
+            return value
+        checks.append(check_phone)
+    if field.max_length:
+        def check_length(value):
+            if len(value) > field.max_length:
+                raise ImportRowError(f'{column} is longer than {field.max_length} characters')
+            return value
+        checks.append(check_length)
+    
+    # Blank unique values would collide with each other
+    blank = None if field.unique else ''
+    
+    def clean_text(value):
+        if not value:
+            return blank
+        for check in checks:
+            value = check(value)
+        return value
+    return clean_text
+
+
+class NewRow:
+    """Field values of a row that will create a contact."""
+    
+    def __init__(self, contact_values, detail_values):
+        self.contact_values = dict(contact_values)
+        self.detail_values = dict(detail_values)
+
+
+class ImportPlan:
+    """
+    What importing a chunk of rows will do, worked out before writing.
+    
+    Each row lands in exactly one of the created, updated, unchanged,
+    conflicts and errors buckets. Rows repeating an earlier row's key are
+    conflicts, but their values are still applied over the earlier row.
+    """
+    
+    def __init__(self):
+        self.new_rows = []
+        self.new_details = []
+        self.changed = {}
+        self.contact_fields = set()
+        self.detail_fields = set()
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+        self.conflicts = []
+        self.changes = []
+        self.seen_keys = {}
+        self.seen_emails = {}
+
+
+class CSVImporter:
+    """
+    Base class for importing one contact type from CSV.
+    
+    Each row becomes a Contact plus a detail row (Person or Church) sharing
+    its primary key. Rows are matched to existing records by a key column;
+    matches are updated with the columns present in the file, other rows
+    are created. Subclasses define the detail model, its columns and how
+    keys are looked up.
+    """
+    contact_type = None
+    detail_model = None
+    detail_columns = {}
+    key_label = None
+    required_columns = ()
+    chunk_size = CHUNK_SIZE
+    
+    # Data versions of these models are bumped once the import finishes
+    data_sources = ('contacts.Contact',)
+    
+    def __init__(self, user, office_id=None, max_errors=500, dry_run=False):
+        """
+        Initialize the importer.
+        
+        Args:
+            user: User who owns the created contacts
+            office_id: Office assigned to created contacts
+            max_errors: Maximum number of errors, conflicts and changes kept
+                for reporting
+            dry_run: Plan the import without writing anything
+        """
+        self.user = user
+        self.office_id = office_id
+        self.max_errors = max_errors
+        self.dry_run = dry_run
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.error_count = 0
+        self.errors = []
+        self.conflict_count = 0
+        self.conflicts = []
+        self.changes = []
+        self.rows_processed = 0
+        self.contact_columns = {}
+        self.detail_columns_used = {}
+        
+        # Row keys and emails already planned, with the line they first appeared on
+        self.seen_keys = {}
+        self.seen_emails = {}
+    
+    def run(self, fileobj, progress_callback=None):
+        """
+        Import every row of a CSV upload.
+        
+        Args:
+            fileobj: Binary file object with UTF-8 content
+            progress_callback: Called with the importer after every chunk
+        
+        Returns:
+            The importer, holding the row counts, errors, conflicts and the
+            changes made to matched records
+        
+        Raises:
+            ImportFormatError: If the file is not a usable CSV file
+        """
+        from mobilize.contacts.models import Contact
+        
+        fieldnames, chunks = iter_csv_chunks(fileobj, self.chunk_size)
+        self.check_columns(fieldnames)
+        self.contact_columns = self._resolve_columns(Contact, CONTACT_COLUMNS, fieldnames)
+        self.detail_columns_used = self._resolve_columns(self.detail_model, self.detail_columns, fieldnames)
+        
+        try:
+            for chunk in chunks:
+                self.import_chunk(chunk)
+                self.rows_processed += len(chunk)
+                if progress_callback:
+                    progress_callback(self)
+        finally:
+            # Bulk writes skip the signals that invalidate cached reports
+            if not self.dry_run and (self.created or self.updated or self.conflict_count):
+                for label in self.data_sources:
+                    bump_data_version(label)
+        return self
+    
+    @classmethod
+    def check_columns(cls, fieldnames):
+        """
+        Check that a file has the columns this importer requires.
+        
+        Args:
+            fieldnames: Column names from the CSV header
+        
+        Raises:
+            ImportFormatError: If a required column is missing
+        """
+        missing = [column for column in cls.required_columns if column not in fieldnames]
+        if missing:
+            raise ImportFormatError(f'Required column "{missing[0]}" not found in CSV file')
+    
+    def _resolve_columns(self, model, columns, fieldnames):
+        """Map the fields of a model to the CSV columns present in the file and their cleaners."""
+        resolved = {}
+        for field_name, candidates in columns.items():
+            for column in candidates:
+                if column in fieldnames:
+                    resolved[field_name] = (column, column_cleaner(model._meta.get_field(field_name), column))
+                    break
+        return resolved
+    
+    def add_error(self, row_number, message):
+        """Record a row that could not be imported."""
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row_number, 'error': message})
+    
+    def clean_row(self, row):
+        """
+        Convert a CSV row to Contact and detail field values.
+        
+        Args:
+            row: Dict of column name to cell text
+        
+        Returns:
+            Tuple of (contact values, detail values) dicts
+        
+        Raises:
+            ImportRowError: If a cell is not valid
+        """
+        def clean(columns):
+            return {
+                field_name: cleaner((row.get(column) or '').strip())
+                for field_name, (column, cleaner) in columns.items()
+            }
+        
+        return clean(self.contact_columns), clean(self.detail_columns_used)
+    
+    def row_key(self, contact_values, detail_values):
+        """Return the value a row is matched to existing records by, if any."""
+        raise NotImplementedError
+    
+    def find_existing(self, keys):
+        """
+        Look up the records matching a set of row keys.
+        
+        Args:
+            keys: Set of row keys
+        
+        Returns:
+            Dict of key to a (Contact, detail or None) tuple, or to an error
+            message for keys that cannot be imported
+        """
+        raise NotImplementedError
+    
+    def find_email_owners(self, emails):
+        """
+        Look up the contacts already using a set of emails.
+        
+        Args:
+            emails: Set of email addresses
+        
+        Returns:
+            Dict of email to contact ID
+        """
+        from mobilize.contacts.models import Contact
+        
+        return dict(Contact.objects.filter(email__in=emails).values_list('email', 'pk'))
+    
+    def import_chunk(self, chunk):
+        """
+        Validate and write a chunk of rows.
+        
+        The chunk is written in one transaction. If the database rejects it,
+        such as when another user added one of its emails after the lookup,
+        its rows are retried one at a time so only the offending rows fail.
+        
+        Args:
+            chunk: List of (line number, row dict) tuples
+        """
+        rows = []
+        for row_number, row in chunk:
+            try:
+                rows.append((row_number, *self.clean_row(row)))
+            except ImportRowError as e:
+                self.add_error(row_number, str(e))
+        if not rows:
+            return
+        
+        try:
+            self._write(rows)
+        except (IntegrityError, DataError):
+            for row in rows:
+                try:
+                    self._write([row])
+                except (IntegrityError, DataError) as e:
+                    self.add_error(row[0], f'Could not be saved: {e}')
+    
+    def _write(self, rows):
+        """Plan rows and, unless previewing, write them in a transaction."""
+        if self.dry_run:
+            plan = self.plan_rows(rows)
+        else:
+            with rollup_batch() as rollups, search_index_batch() as search, transaction.atomic():
+                plan = self.plan_rows(rows)
+                self.apply_plan(plan, rollups, search)
+        self._record(plan)
+    
+    def _record(self, plan):
+        """Add a planned chunk's outcome to the totals once it is final."""
+        self.created += plan.created
+        self.updated += plan.updated
+        self.unchanged += plan.unchanged
+        self.seen_keys.update(plan.seen_keys)
+        self.seen_emails.update(plan.seen_emails)
+        for row_number, message in plan.errors:
+            self.add_error(row_number, message)
+        for row_number, message in plan.conflicts:
+            self.conflict_count += 1
+            if len(self.conflicts) < self.max_errors:
+                self.conflicts.append({'row': row_number, 'conflict': message})
+        for row_number, changes in plan.changes:
+            if len(self.changes) >= self.max_errors:
+                break
+            self.changes.append({'row': row_number, 'changes': changes})
+    
+    def plan_rows(self, rows):
+        """
+        Match a chunk of rows to existing records and work out their changes.
+        
+        Nothing is written. Matched records are modified in memory, while
+        new rows are kept as field values until apply_plan() builds them,
+        so previews don't pay for model instances they never save.
+        
+        Args:
+            rows: List of (line number, contact values, detail values) tuples
+        
+        Returns:
+            ImportPlan instance
+        """
+        keys = {self.row_key(contact_values, detail_values) for _, contact_values, detail_values in rows}
+        existing = self.find_existing(keys - {None})
+        emails = {contact_values['email'] for _, contact_values, _ in rows if contact_values.get('email')}
+        # Email to the ID of the contact using it, or the new row claiming it
+        email_owners = self.find_email_owners(emails)
+        
+        plan = ImportPlan()
+        pending = {}
+        for row_number, contact_values, detail_values in rows:
+            key = self.row_key(contact_values, detail_values)
+            match = (pending.get(key) or existing.get(key)) if key is not None else None
+            if isinstance(match, str):
+                plan.conflicts.append((row_number, match))
+                continue
+            
+            target = match[0].pk if isinstance(match, tuple) else match
+            email = contact_values.get('email')
+            owner = email_owners.get(email) if email else None
+            if owner is not None and owner != target:
+                plan.conflicts.append((row_number, f'{email} is already used by another contact'))
+                continue
+            # Rows of an earlier chunk are only in the database when it was written
+            earlier_email = self.seen_emails.get(email) if email else None
+            if earlier_email and earlier_email[1] != key:
+                plan.conflicts.append((row_number, f'{email} is also used on line {earlier_email[0]}'))
+                continue
+            
+            duplicate_of = (plan.seen_keys.get(key) or self.seen_keys.get(key)) if key is not None else None
+            if duplicate_of:
+                plan.conflicts.append((row_number, f'Same {self.key_label} as line {duplicate_of}; this row replaces it'))
+            
+            if match is None:
+                match = NewRow(contact_values, detail_values)
+                plan.new_rows.append(match)
+                if not duplicate_of:
+                    plan.created += 1
+            elif isinstance(match, NewRow):
+                match.contact_values.update(contact_values)
+                match.detail_values.update(detail_values)
+            else:
+                match = self._plan_update(plan, row_number, match, contact_values, detail_values, duplicate_of)
+            
+            if key is not None:
+                pending[key] = match
+                plan.seen_keys.setdefault(key, row_number)
+            if email:
+                email_owners[email] = match[0].pk if isinstance(match, tuple) else match
+                plan.seen_emails.setdefault(email, (row_number, key))
+        return plan
+    
+    def _plan_update(self, plan, row_number, match, contact_values, detail_values, duplicate_of):
+        """Apply a row to a matched record in memory and count the outcome."""
+        contact, detail = match
+        changes = self._diff(contact, self._with_defaults(contact_values))
+        if detail is None:
+            # Matched contact without its detail row, which is created
+            detail = self.detail_model(contact=contact)
+            plan.new_details.append(detail)
+        elif detail not in plan.new_details:
+            changes.update(self._diff(detail, detail_values))
+        
+        if changes or detail in plan.new_details:
+            plan.changed[contact.pk] = (contact, detail)
+            if not duplicate_of:
+                plan.updated += 1
+                plan.changes.append((row_number, changes))
+        elif not duplicate_of:
+            plan.unchanged += 1
+        
+        self._assign(contact, contact_values)
+        for field_name, value in detail_values.items():
+            setattr(detail, field_name, value)
+        plan.contact_fields |= contact_values.keys()
+        plan.detail_fields |= detail_values.keys()
+        return contact, detail
+    
+    def apply_plan(self, plan, rollups, search):
+        """
+        Write a chunk's planned inserts and updates.
+        
+        Args:
+            plan: ImportPlan from plan_rows()
+            rollups: Open RollupBatch
+            search: Open SearchIndexBatch
+        """
+        from mobilize.contacts.models import Contact
+        
+        if plan.changed:
+            # Record the rollup contributions of matched contacts before they change
+            rollups.touch('contact', list(plan.changed))
+            now = timezone.now()
+            for contact, _ in plan.changed.values():
+                contact.updated_at = now
+            Contact.objects.bulk_update(
+                [contact for contact, _ in plan.changed.values()], sorted(plan.contact_fields | {'updated_at'})
+            )
+            changed_details = [detail for _, detail in plan.changed.values() if detail not in plan.new_details]
+            if plan.detail_fields and changed_details:
+                self.detail_model.objects.bulk_update(changed_details, sorted(plan.detail_fields))
+        
+        new_contacts = [
+            Contact(
+                type=self.contact_type, user=self.user, office_id=self.office_id,
+                **{**CONTACT_DEFAULTS, **self._with_defaults(row.contact_values)},
+            )
+            for row in plan.new_rows
+        ]
+        Contact.objects.bulk_create(new_contacts)
+        rollups.touch('contact', [contact.pk for contact in new_contacts], snapshot=False)
+        
+        new_details = [
+            self.detail_model(contact=contact, **row.detail_values) for contact, row in zip(new_contacts, plan.new_rows)
+        ]
+        self.detail_model.objects.bulk_create(new_details + plan.new_details)
+        
+        search.touch('contact', list(plan.changed) + [contact.pk for contact in new_contacts])
+    
+    def _with_defaults(self, values):
+        """Replace blank cells that have a default with the default."""
+        return {
+            field_name: CONTACT_DEFAULTS[field_name] if value in ('', None) and field_name in CONTACT_DEFAULTS else value
+            for field_name, value in values.items()
+        }
+    
+    def _diff(self, instance, values):
+        """Get the fields whose stored value differs from a row, as [old, new] pairs."""
+        changes = {}
+        for field_name, value in values.items():
+            current = getattr(instance, field_name)
+            if current != value and not (current in ('', None) and value in ('', None)):
+                changes[field_name] = [current, value]
+        return changes
+    
+    def _assign(self, contact, values):
+        """Copy cleaned values to a contact, using the defaults for blank cells."""
+        for field_name, value in self._with_defaults(values).items():
+            setattr(contact, field_name, value)
+
+
+class ContactImporter(CSVImporter):
+    """
+    Imports people, matching existing contacts by email address.
+    """
+    contact_type = 'person'
+    key_label = 'email'
+    detail_columns = {
+        'title': ('title',),
+        'profession': ('profession', 'occupation'),
+        'organization': ('organization', 'employer'),
+    }
+    data_sources = ('contacts.Contact', 'contacts.Person')
+    
+    @property
+    def detail_model(self):
+        from mobilize.contacts.models import Person
+        return Person
+    
+    def clean_row(self, row):
+        contact_values, detail_values = super().clean_row(row)
+        if not any(contact_values.get(field) for field in ('first_name', 'last_name', 'email')):
+            raise ImportRowError('A name or email is required')
+        return contact_values, detail_values
+    
+    def row_key(self, contact_values, detail_values):
+        return contact_values.get('email') or None
+    
+    def find_email_owners(self, emails):
+        # Rows are matched by email, so find_existing() already found every owner
+        return {}
+    
+    def find_existing(self, keys):
+        from mobilize.contacts.models import Contact, Person
+        
+        contacts = list(Contact.objects.filter(email__in=keys))
+        people = Person.objects.in_bulk([contact.pk for contact in contacts if contact.type == 'person'])
+        existing = {}
+        for contact in contacts:
+            if contact.type != 'person':
+                existing[contact.email] = f'{contact.email} belongs to a church'
+            else:
+                existing[contact.email] = (contact, people.get(contact.pk))
+        return existing
+
+
+class ChurchImporter(CSVImporter):
+    """
+    Imports churches, matching existing churches by name.
+    """
+    contact_type = 'church'
+    key_label = 'name'
+    detail_columns = {
+        'name': ('name',),
+        'location': ('location',),
+        'denomination': ('denomination',),
+        'website': ('website',),
+        'congregation_size': ('congregation_size',),
+        'weekly_attendance': ('weekly_attendance',),
+        'church_pipeline': ('church_pipeline',),
+    }
+    required_columns = ('name',)
+    data_sources = ('contacts.Contact', 'churches.Church')
+    
+    @property
+    def detail_model(self):
+        from mobilize.churches.models import Church
+        return Church
+    
+    def clean_row(self, row):
+        contact_values, detail_values = super().clean_row(row)
+        if not detail_values.get('name'):
+            raise ImportRowError('name is required')
+        contact_values['church_name'] = detail_values['name']
+        return contact_values, detail_values
+    
+    def row_key(self, contact_values, detail_values):
+        return detail_values['name']
+    
+    def find_existing(self, keys):
+        from mobilize.churches.models import Church
+        
+        existing = {}
+        for church in Church.objects.select_related('contact').filter(name__in=keys).order_by('pk'):
+            if church.name in existing:
+                existing[church.name] = f'More than one church is named "{church.name}"'
+            else:
+                existing[church.name] = (church.contact, church)
+        return existing
+
+
+IMPORTERS = {
+    'contacts': ContactImporter,
+    'churches': ChurchImporter,
+}
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from mobilize.core.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the dashboard rollup tables from the source data'
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Dashboard rollups rebuilt with {rows} rows'))
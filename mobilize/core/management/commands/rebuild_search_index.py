@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from mobilize.core.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the search document index from the source data'
+    
+    def handle(self, *args, **options):
+        documents = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt with {documents} documents'))
@@ -0,0 +1,98 @@
+# Generated by Django 4.2 on 2026-10-16 18:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReportJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("report_type", models.CharField(max_length=50)),
+                ("format", models.CharField(default="csv", max_length=10)),
+                ("view_mode", models.CharField(default="default", max_length=50)),
+                ("filters", models.JSONField(blank=True, null=True)),
+                ("artifact_key", models.CharField(db_index=True, max_length=64)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "progress",
+                    models.PositiveSmallIntegerField(
+                        default=0, help_text="Percent complete (0-100)"
+                    ),
+                ),
+                ("rows_written", models.PositiveIntegerField(default=0)),
+                ("total_rows", models.PositiveIntegerField(blank=True, null=True)),
+                (
+                    "file",
+                    models.FileField(
+                        blank=True, null=True, upload_to="reports/%Y/%m/%d/"
+                    ),
+                ),
+                ("filename", models.CharField(blank=True, max_length=255, null=True)),
+                ("error_message", models.TextField(blank=True, null=True)),
+                (
+                    "celery_task_id",
+                    models.CharField(blank=True, max_length=255, null=True),
+                ),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="report_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Report Job",
+                "verbose_name_plural": "Report Jobs",
+                "db_table": "report_jobs",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="reportjob",
+            index=models.Index(
+                fields=["artifact_key", "status"], name="report_jobs_artifac_f2147a_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reportjob",
+            index=models.Index(
+                fields=["user", "created_at"], name="report_jobs_user_id_59a7d5_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2 on 2026-10-16 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_report_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DashboardRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=255, unique=True)),
+                ("metric", models.CharField(max_length=50)),
+                (
+                    "scope",
+                    models.CharField(
+                        choices=[
+                            ("cell", "Cell"),
+                            ("office", "Office"),
+                            ("meta", "Meta"),
+                        ],
+                        default="cell",
+                        max_length=10,
+                    ),
+                ),
+                ("office_id", models.IntegerField(default=0)),
+                ("user_id", models.IntegerField(default=0)),
+                ("other_user_id", models.IntegerField(default=0)),
+                ("bucket", models.CharField(blank=True, default="", max_length=100)),
+                ("day", models.DateField(blank=True, null=True)),
+                ("count", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Dashboard Rollup",
+                "verbose_name_plural": "Dashboard Rollups",
+                "db_table": "dashboard_rollups",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="dashboardrollup",
+            index=models.Index(
+                fields=["metric", "scope", "office_id"],
+                name="dashboard_r_metric_de4bcc_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dashboardrollup",
+            index=models.Index(
+                fields=["metric", "scope", "user_id"],
+                name="dashboard_r_metric_654868_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dashboardrollup",
+            index=models.Index(
+                fields=["metric", "scope", "other_user_id"],
+                name="dashboard_r_metric_116897_idx",
+            ),
+        ),
+    ]
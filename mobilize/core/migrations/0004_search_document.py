@@ -0,0 +1,108 @@
+# Generated by Django 4.2 on 2026-10-16 19:09
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+POSTGRES_INDEXES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS search_documents_vector_gin ON search_documents USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS search_documents_document_trgm ON search_documents USING gin (document gin_trgm_ops)",
+]
+
+DROP_POSTGRES_INDEXES = [
+    "DROP INDEX IF EXISTS search_documents_document_trgm",
+    "DROP INDEX IF EXISTS search_documents_vector_gin",
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    """Create the full-text and trigram indexes, which only PostgreSQL supports."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for statement in POSTGRES_INDEXES:
+        schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for statement in DROP_POSTGRES_INDEXES:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_dashboard_rollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[
+                            ("contact", "Contact"),
+                            ("task", "Task"),
+                            ("communication", "Communication"),
+                            ("meta", "Meta"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("object_id", models.IntegerField()),
+                (
+                    "kind",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        help_text="Contact type, such as person or church.",
+                        max_length=20,
+                    ),
+                ),
+                ("office_id", models.IntegerField(default=0)),
+                ("title", models.CharField(blank=True, default="", max_length=255)),
+                ("subtitle", models.CharField(blank=True, default="", max_length=255)),
+                ("text_a", models.TextField(blank=True, default="")),
+                ("text_b", models.TextField(blank=True, default="")),
+                ("text_c", models.TextField(blank=True, default="")),
+                ("document", models.TextField(blank=True, default="")),
+                (
+                    "search_vector",
+                    django.contrib.postgres.search.SearchVectorField(
+                        blank=True, null=True
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Search Document",
+                "verbose_name_plural": "Search Documents",
+                "db_table": "search_documents",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="searchdocument",
+            index=models.Index(
+                fields=["source", "kind", "office_id"],
+                name="search_docu_source_5313ca_idx",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="searchdocument",
+            unique_together={("source", "object_id")},
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
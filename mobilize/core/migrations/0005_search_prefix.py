@@ -0,0 +1,56 @@
+# Generated by Django 4.2 on 2026-10-16 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_search_document"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchPrefix",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("contact_id", models.IntegerField()),
+                ("kind", models.CharField(max_length=20)),
+                ("key", models.CharField(max_length=100)),
+                ("office_id", models.IntegerField(default=0)),
+                ("user_id", models.IntegerField(default=0)),
+                ("label", models.CharField(blank=True, default="", max_length=255)),
+                ("email", models.CharField(blank=True, default="", max_length=255)),
+            ],
+            options={
+                "verbose_name": "Search Prefix",
+                "verbose_name_plural": "Search Prefixes",
+                "db_table": "search_prefixes",
+            },
+        ),
+        migrations.AddField(
+            model_name="searchdocument",
+            name="user_id",
+            field=models.IntegerField(default=0, help_text="Owning or assigned user."),
+        ),
+        migrations.AddIndex(
+            model_name="searchprefix",
+            index=models.Index(
+                fields=["kind", "key"],
+                name="search_prefix_kind_key_idx",
+                opclasses=["varchar_pattern_ops", "varchar_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="searchprefix",
+            index=models.Index(fields=["contact_id"], name="search_prefix_contact_idx"),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-16 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_import_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importjob",
+            name="changes",
+            field=models.JSONField(
+                blank=True,
+                help_text="Field changes to matched records, as {'row', 'changes'} dicts",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="importjob",
+            name="conflict_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="importjob",
+            name="conflicts",
+            field=models.JSONField(
+                blank=True,
+                help_text="Rows clashing with other records, as {'row', 'conflict'} dicts",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="importjob",
+            name="dry_run",
+            field=models.BooleanField(
+                default=False, help_text="Preview the import without writing anything"
+            ),
+        ),
+        migrations.AddField(
+            model_name="importjob",
+            name="unchanged_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
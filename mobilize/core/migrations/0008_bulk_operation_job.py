@@ -0,0 +1,95 @@
+# Generated by Django 4.2 on 2026-10-16 19:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("core", "0007_import_job_preview"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BulkOperationJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("operation", models.CharField(max_length=20)),
+                (
+                    "value",
+                    models.JSONField(
+                        blank=True,
+                        help_text="Priority, office ID, tags or stage for the operation",
+                        null=True,
+                    ),
+                ),
+                (
+                    "selection",
+                    models.JSONField(
+                        help_text="{'contact_ids': [...]} or {'filters': {...}}"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "progress",
+                    models.PositiveSmallIntegerField(
+                        default=0, help_text="Percent complete (0-100)"
+                    ),
+                ),
+                ("total_count", models.PositiveIntegerField(default=0)),
+                ("processed_count", models.PositiveIntegerField(default=0)),
+                ("error_message", models.TextField(blank=True, null=True)),
+                (
+                    "celery_task_id",
+                    models.CharField(blank=True, max_length=255, null=True),
+                ),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="bulk_operation_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Bulk Operation Job",
+                "verbose_name_plural": "Bulk Operation Jobs",
+                "db_table": "bulk_operation_jobs",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="bulkoperationjob",
+            index=models.Index(
+                fields=["user", "created_at"], name="bulk_operat_user_id_8d1d96_idx"
+            ),
+        ),
+    ]
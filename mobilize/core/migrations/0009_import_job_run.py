@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-16 22:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_bulk_operation_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importjob",
+            name="import_run",
+            field=models.OneToOneField(
+                blank=True,
+                help_text="Real import started from this dry-run preview",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="preview",
+                to="core.importjob",
+            ),
+        ),
+    ]
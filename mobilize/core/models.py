@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
+from django.contrib.postgres.search import SearchVectorField
 
 
 class ActivityLog(models.Model):
@@ -186,3 +187,313 @@ class DashboardPreference(models.Model):
         from mobilize.core.dashboard_widgets import DEFAULT_WIDGETS
         self.widget_config = {'widgets': DEFAULT_WIDGETS}
         self.save()
+
+
+class ReportJob(models.Model):
+    """
+    A report rendered in the background by Celery.
+    
+    Finished artifacts are keyed by a hash of the requesting user, view mode,
+    report type, format, filters and the data version of the source tables,
+    so repeat downloads are served from storage until the data changes.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='report_jobs'
+    )
+    report_type = models.CharField(max_length=50)
+    format = models.CharField(max_length=10, default='csv')
+    view_mode = models.CharField(max_length=50, default='default')
+    filters = models.JSONField(blank=True, null=True)
+    artifact_key = models.CharField(max_length=64, db_index=True)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent complete (0-100)")
+    rows_written = models.PositiveIntegerField(default=0)
+    total_rows = models.PositiveIntegerField(blank=True, null=True)
+    file = models.FileField(upload_to='reports/%Y/%m/%d/', blank=True, null=True)
+    filename = models.CharField(max_length=255, blank=True, null=True)
+    error_message = models.TextField(blank=True, null=True)
+    celery_task_id = models.CharField(max_length=255, blank=True, null=True)
+    
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(blank=True, null=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'report_jobs'
+        verbose_name = 'Report Job'
+        verbose_name_plural = 'Report Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['artifact_key', 'status']),
+            models.Index(fields=['user', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.report_type} report ({self.format}) for {self.user} - {self.get_status_display()}"
+    
+    @property
+    def is_finished(self):
+        """Return whether the job has completed or failed."""
+        return self.status in ('completed', 'failed')
+
+
+class ImportJob(models.Model):
+    """
+    A CSV import of people or churches processed in the background by Celery.
+    
+    The upload is kept in file storage while the job runs. Row counters are
+    updated after every chunk, and rows that could not be imported are
+    recorded with their line number and the reason. A dry run only
+    previews the outcome and the changes to matched records.
+    """
+    STATUS_CHOICES = ReportJob.STATUS_CHOICES
+    
+    IMPORT_TYPE_CHOICES = (
+        ('contacts', 'People'),
+        ('churches', 'Churches'),
+    )
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='import_jobs'
+    )
+    import_type = models.CharField(max_length=20, choices=IMPORT_TYPE_CHOICES)
+    file = models.FileField(upload_to='imports/%Y/%m/%d/')
+    filename = models.CharField(max_length=255, blank=True, null=True)
+    options = models.JSONField(blank=True, null=True)
+    dry_run = models.BooleanField(default=False, help_text="Preview the import without writing anything")
+    import_run = models.OneToOneField(
+        'self',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='preview',
+        help_text="Real import started from this dry-run preview"
+    )
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent complete (0-100)")
+    total_rows = models.PositiveIntegerField(blank=True, null=True)
+    rows_processed = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    unchanged_count = models.PositiveIntegerField(default=0)
+    conflict_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(blank=True, null=True, help_text="Rows that failed, as {'row', 'error'} dicts")
+    conflicts = models.JSONField(
+        blank=True, null=True, help_text="Rows clashing with other records, as {'row', 'conflict'} dicts"
+    )
+    changes = models.JSONField(
+        blank=True, null=True, help_text="Field changes to matched records, as {'row', 'changes'} dicts"
+    )
+    error_message = models.TextField(blank=True, null=True)
+    celery_task_id = models.CharField(max_length=255, blank=True, null=True)
+    
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(blank=True, null=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'import_jobs'
+        verbose_name = 'Import Job'
+        verbose_name_plural = 'Import Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+    
+    def __str__(self):
+        kind = 'import preview' if self.dry_run else 'import'
+        return f"{self.get_import_type_display()} {kind} for {self.user} - {self.get_status_display()}"
+    
+    @property
+    def is_finished(self):
+        """Return whether the job has completed or failed."""
+        return self.status in ('completed', 'failed')
+
+
+class BulkOperationJob(models.Model):
+    """
+    A bulk operation on a large selection of people run in the background.
+    
+    The selection is stored as either explicit contact IDs or the people
+    list filters it was made with, and is resolved again when the job runs.
+    """
+    STATUS_CHOICES = ReportJob.STATUS_CHOICES
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='bulk_operation_jobs'
+    )
+    operation = models.CharField(max_length=20)
+    value = models.JSONField(blank=True, null=True, help_text="Priority, office ID, tags or stage for the operation")
+    selection = models.JSONField(help_text="{'contact_ids': [...]} or {'filters': {...}}")
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent complete (0-100)")
+    total_count = models.PositiveIntegerField(default=0)
+    processed_count = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True, null=True)
+    celery_task_id = models.CharField(max_length=255, blank=True, null=True)
+    
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(blank=True, null=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'bulk_operation_jobs'
+        verbose_name = 'Bulk Operation Job'
+        verbose_name_plural = 'Bulk Operation Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Bulk {self.operation} for {self.user} - {self.get_status_display()}"
+    
+    @property
+    def is_finished(self):
+        """Return whether the job has completed or failed."""
+        return self.status in ('completed', 'failed')
+
+
+class DashboardRollup(models.Model):
+    """
+    Pre-aggregated dashboard counter maintained incrementally.
+    
+    Each row holds the number of source rows (people, churches, pipeline
+    entries, tasks, communications) sharing one combination of dimensions.
+    'cell' rows partition their source by office and owning user(s), so any
+    dashboard scope is a sum over matching cells. 'office' rows duplicate
+    tasks and communications into every office they are related to for the
+    office-filtered views. A single 'meta' row marks the table as built.
+    """
+    SCOPE_CHOICES = (
+        ('cell', 'Cell'),
+        ('office', 'Office'),
+        ('meta', 'Meta'),
+    )
+    
+    key = models.CharField(max_length=255, unique=True)
+    metric = models.CharField(max_length=50)
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES, default='cell')
+    
+    # Dimensions are plain integers (0 = none) so the key stays stable if the
+    # referenced office or user is deleted before the nightly reconciliation
+    office_id = models.IntegerField(default=0)
+    user_id = models.IntegerField(default=0)
+    other_user_id = models.IntegerField(default=0)
+    bucket = models.CharField(max_length=100, blank=True, default='')
+    day = models.DateField(blank=True, null=True)
+    
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'dashboard_rollups'
+        verbose_name = 'Dashboard Rollup'
+        verbose_name_plural = 'Dashboard Rollups'
+        indexes = [
+            models.Index(fields=['metric', 'scope', 'office_id']),
+            models.Index(fields=['metric', 'scope', 'user_id']),
+            models.Index(fields=['metric', 'scope', 'other_user_id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.key} = {self.count}"
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalized search text for one contact, task or communication.
+    
+    The searchable fields of a row and of the records it links to are copied
+    into three weighted columns: 'a' holds names and titles, 'b' emails,
+    phone numbers and linked names, 'c' free text such as notes and message
+    bodies. 'document' is their lower-cased concatenation, matched by the
+    trigram index on PostgreSQL and by LIKE elsewhere, and 'search_vector'
+    holds the weighted full-text vector used for ranking on PostgreSQL.
+    A single 'meta' row marks the index as built.
+    """
+    SOURCE_CHOICES = (
+        ('contact', 'Contact'),
+        ('task', 'Task'),
+        ('communication', 'Communication'),
+        ('meta', 'Meta'),
+    )
+    
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    object_id = models.IntegerField()
+    kind = models.CharField(max_length=20, blank=True, default='', help_text="Contact type, such as person or church.")
+    office_id = models.IntegerField(default=0)
+    user_id = models.IntegerField(default=0, help_text="Owning or assigned user.")
+    
+    title = models.CharField(max_length=255, blank=True, default='')
+    subtitle = models.CharField(max_length=255, blank=True, default='')
+    text_a = models.TextField(blank=True, default='')
+    text_b = models.TextField(blank=True, default='')
+    text_c = models.TextField(blank=True, default='')
+    document = models.TextField(blank=True, default='')
+    search_vector = SearchVectorField(blank=True, null=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'search_documents'
+        verbose_name = 'Search Document'
+        verbose_name_plural = 'Search Documents'
+        unique_together = [('source', 'object_id')]
+        indexes = [
+            models.Index(fields=['source', 'kind', 'office_id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.source} {self.object_id}: {self.title}"
+
+
+class SearchPrefix(models.Model):
+    """
+    Normalized name or email of a person or church, for prefix lookups.
+    
+    Each contact has one row per distinct key (full name, last name,
+    preferred name, church name, email), so a typeahead query is a range
+    scan over the key index. The display name and email are copied in so
+    results need no join.
+    """
+    contact_id = models.IntegerField()
+    kind = models.CharField(max_length=20)
+    key = models.CharField(max_length=100)
+    office_id = models.IntegerField(default=0)
+    user_id = models.IntegerField(default=0)
+    label = models.CharField(max_length=255, blank=True, default='')
+    email = models.CharField(max_length=255, blank=True, default='')
+    
+    class Meta:
+        db_table = 'search_prefixes'
+        verbose_name = 'Search Prefix'
+        verbose_name_plural = 'Search Prefixes'
+        indexes = [
+            # Pattern operators let PostgreSQL answer LIKE 'prefix%' from the index
+            models.Index(
+                fields=['kind', 'key'], name='search_prefix_kind_key_idx',
+                opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'],
+            ),
+            models.Index(fields=['contact_id'], name='search_prefix_contact_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} {self.contact_id}: {self.key}"
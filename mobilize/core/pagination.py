@@ -0,0 +1,236 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Offset pagination counts every matching row and then skips over all earlier
+pages, so deep pages get slower as data grows. Keyset pagination instead
+remembers the sort key of the last row served and asks for rows after it,
+which an index on the sort columns answers in the same time for every page.
+
+Cursors are signed tokens carrying that sort key; clients treat them as
+opaque strings and pass them back to fetch the next page.
+"""
+from django.core import signing
+from django.db import connection
+from django.db.models import F, Q
+
+
+# Orderings used by the list endpoints; every ordering ends in a unique column
+PEOPLE_ORDERING = ('contact__last_name', 'contact__first_name', 'pk')
+TASK_ORDERING = ('due_date', 'priority', 'pk')
+COMMUNICATION_ORDERING = ('-date', '-pk')
+
+# Row count above which approximate totals stop counting exactly
+APPROXIMATE_COUNT_LIMIT = 10000
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor is malformed, tampered with or from another list."""
+
+
+def approximate_count(queryset, limit=APPROXIMATE_COUNT_LIMIT):
+    """
+    Estimate the number of rows in a queryset without a full COUNT(*).
+    
+    On PostgreSQL this reads the planner's row estimate. Elsewhere it counts
+    exactly up to a limit and reports the limit beyond it.
+    
+    Args:
+        queryset: QuerySet to estimate
+        limit: Row count at which counting stops
+    
+    Returns:
+        Integer row estimate
+    """
+    if connection.vendor == 'postgresql':
+        import json
+        
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+    return queryset.order_by()[:limit].count()
+
+
+def _is_nullable(model, path):
+    """Check whether a field path, such as 'contact__last_name', can be NULL."""
+    nullable = False
+    for part in path.split('__'):
+        field = model._meta.pk if part == 'pk' else model._meta.get_field(part)
+        nullable = nullable or field.null
+        model = field.related_model
+    return nullable
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated queryset.
+    """
+    
+    def __init__(self, object_list, next_cursor, has_previous):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.has_previous = has_previous
+    
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+    
+    def __iter__(self):
+        return iter(self.object_list)
+    
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by the values of its sort columns.
+    
+    NULLs sort last in both directions, matching the ``nulls_last`` orderings
+    used by the list views.
+    """
+    
+    def __init__(self, queryset, ordering, per_page=25):
+        """
+        Initialize the paginator.
+        
+        Args:
+            queryset: QuerySet to paginate; its own ordering is replaced
+            ordering: Field names, '-' prefixed for descending; the last one
+                must be unique, such as 'pk'
+            per_page: Rows per page
+        """
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = [name.startswith('-') for name in self.ordering]
+        self.nullable = [_is_nullable(queryset.model, field) for field in self.fields]
+        self.per_page = per_page
+        self.queryset = queryset.order_by(*[
+            F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_last=True)
+            for field, descending in zip(self.fields, self.descending)
+        ])
+        self.salt = f'keyset:{queryset.model._meta.label}:{",".join(self.ordering)}'
+    
+    def page(self, cursor=None):
+        """
+        Get the page following a cursor.
+        
+        Args:
+            cursor: Cursor from a previous page, or None for the first page
+        
+        Returns:
+            KeysetPage instance
+        
+        Raises:
+            InvalidCursor: If the cursor cannot be decoded for this ordering
+        """
+        queryset = self.queryset
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+        
+        rows = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1])
+        return KeysetPage(rows, next_cursor, has_previous=bool(cursor))
+    
+    def encode_cursor(self, row):
+        """
+        Build the cursor pointing just after a row.
+        
+        Args:
+            row: Model instance from this paginator's queryset
+        
+        Returns:
+            Opaque cursor string
+        """
+        values = []
+        for field in self.fields:
+            value = row
+            for part in field.split('__'):
+                value = getattr(value, part) if value is not None else None
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return signing.dumps(values, salt=self.salt, compress=True)
+    
+    def decode_cursor(self, cursor):
+        """
+        Read the sort key stored in a cursor.
+        
+        Args:
+            cursor: Cursor string
+        
+        Returns:
+            List of sort key values
+        
+        Raises:
+            InvalidCursor: If the cursor is invalid for this ordering
+        """
+        try:
+            values = signing.loads(cursor, salt=self.salt)
+        except signing.BadSignature:
+            raise InvalidCursor("Invalid pagination cursor")
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor("Invalid pagination cursor")
+        return values
+    
+    def _after(self, values):
+        """
+        Build the filter selecting rows that sort after the given key.
+        
+        For keys (a, b, c) this is a > va OR (a = va AND b > vb) OR
+        (a = va AND b = vb AND c > vc), with NULLs sorting last.
+        """
+        clauses = []
+        equal = Q()
+        for field, descending, nullable, value in zip(self.fields, self.descending, self.nullable, values):
+            if value is not None:
+                later = Q(**{f'{field}__lt' if descending else f'{field}__gt': value})
+                if nullable:
+                    later |= Q(**{f'{field}__isnull': True})
+                clauses.append(equal & later)
+                equal &= Q(**{field: value})
+            else:
+                # Nothing sorts after NULL, so only ties on later columns follow
+                equal &= Q(**{f'{field}__isnull': True})
+        
+        condition = Q(pk__in=[])
+        for clause in clauses:
+            condition |= clause
+        return condition
+
+
+def paginate_keyset(request, queryset, ordering, default_per_page=25, max_per_page=100):
+    """
+    Paginate a queryset for a JSON list endpoint.
+    
+    Reads ``cursor``, ``per_page`` and ``total`` from the query string;
+    ``total=approx`` adds an approximate row count to the metadata.
+    
+    Args:
+        request: Django request object
+        queryset: Filtered QuerySet to paginate
+        ordering: Keyset ordering, such as PEOPLE_ORDERING
+        default_per_page: Rows per page when none is requested
+        max_per_page: Upper bound on the requested page size
+    
+    Returns:
+        Tuple of (KeysetPage, dict of pagination metadata for the response)
+    
+    Raises:
+        InvalidCursor: If the cursor is invalid for this list
+    """
+    try:
+        per_page = int(request.GET.get('per_page', default_per_page))
+    except ValueError:
+        per_page = default_per_page
+    per_page = max(1, min(per_page, max_per_page))
+    
+    page = KeysetPaginator(queryset, ordering, per_page).page(request.GET.get('cursor') or None)
+    meta = {
+        'per_page': per_page,
+        'next_cursor': page.next_cursor,
+        'has_next': page.has_next,
+        'has_previous': page.has_previous,
+    }
+    if request.GET.get('total') == 'approx':
+        meta['total'] = approximate_count(queryset)
+    return page, meta
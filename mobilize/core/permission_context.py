@@ -0,0 +1,159 @@
+"""
+Per-user permission context shared by decorators, views, reports and tasks.
+
+A user's office memberships are loaded once, cached across requests under a
+generation counter that UserOffice saves and deletes advance, and memoized on
+the user object so repeated checks within a request cost no queries.
+"""
+from dataclasses import dataclass, replace
+
+from django.core.cache import cache
+
+from .cache_versions import bump_version, get_version
+
+
+# Kept short so revoked office access is dropped even if a generation bump is lost
+PERMISSION_CACHE_TIMEOUT = 10 * 60
+
+# Attribute holding the memoized context on a user instance
+CONTEXT_ATTR = '_permission_context'
+
+ROLE_HIERARCHY = {
+    'super_admin': 4,
+    'office_admin': 3,
+    'standard_user': 2,
+    'limited_user': 1,
+}
+
+
+@dataclass(frozen=True)
+class PermissionContext:
+    """
+    A user's role and office memberships.
+    """
+    user_id: int
+    role: str
+    office_ids: tuple
+    primary_office_id: int = None
+    
+    @property
+    def is_super_admin(self):
+        return self.role == 'super_admin'
+    
+    @property
+    def has_offices(self):
+        return bool(self.office_ids)
+    
+    def has_role(self, required_role):
+        """
+        Check whether the user's role is at least the given role.
+        
+        Args:
+            required_role: Minimum role, or None for any role
+        
+        Returns:
+            Boolean
+        """
+        if not required_role:
+            return True
+        return ROLE_HIERARCHY.get(self.role, 0) >= ROLE_HIERARCHY.get(required_role, 0)
+    
+    def has_office(self, office_id, required_role=None):
+        """
+        Check whether the user may act in an office.
+        
+        Office permissions are derived from the user's overall role, so a
+        required role is checked against that once membership is confirmed.
+        
+        Args:
+            office_id: ID of the office
+            required_role: Optional minimum role
+        
+        Returns:
+            Boolean
+        """
+        if self.is_super_admin:
+            return True
+        try:
+            office_id = int(office_id)
+        except (TypeError, ValueError):
+            return False
+        return office_id in self.office_ids and self.has_role(required_role)
+
+
+def _version_key(user_id):
+    return f'permission_version:user:{user_id}'
+
+
+def _load_memberships(user_id):
+    from mobilize.admin_panel.models import UserOffice
+    
+    rows = UserOffice.objects.filter(user_id=user_id).order_by('office_id').values_list('office_id', 'is_primary')
+    return [(office_id, is_primary) for office_id, is_primary in rows]
+
+
+def get_permission_context(user):
+    """
+    Get the permission context for a user.
+    
+    The context is memoized on the user instance, so everything sharing
+    request.user (or a user loaded by a Celery task) reuses it.
+    
+    Args:
+        user: User instance
+    
+    Returns:
+        PermissionContext instance
+    """
+    role = getattr(user, 'role', 'standard_user')
+    context = getattr(user, CONTEXT_ATTR, None)
+    if context is not None:
+        if context.role != role:
+            # The role is read from the user, so an in-place role change applies at once
+            context = replace(context, role=role)
+            setattr(user, CONTEXT_ATTR, context)
+        return context
+    
+    if getattr(user, 'id', None) is None:
+        return PermissionContext(user_id=None, role=role, office_ids=())
+    
+    version = get_version(_version_key(user.id))
+    memberships = cache.get_or_set(
+        f'permission_context:{user.id}:{version}',
+        lambda: _load_memberships(user.id),
+        PERMISSION_CACHE_TIMEOUT,
+    )
+    context = PermissionContext(
+        user_id=user.id,
+        role=role,
+        office_ids=tuple(office_id for office_id, _ in memberships),
+        primary_office_id=next((office_id for office_id, is_primary in memberships if is_primary), None),
+    )
+    setattr(user, CONTEXT_ATTR, context)
+    return context
+
+
+def clear_permission_context(user):
+    """
+    Drop the context memoized on a user instance.
+    
+    Args:
+        user: User instance
+    """
+    try:
+        delattr(user, CONTEXT_ATTR)
+    except AttributeError:
+        pass
+
+
+def invalidate_permission_context(user_id, user=None):
+    """
+    Invalidate a user's cached office memberships in every process.
+    
+    Args:
+        user_id: ID of the user whose memberships changed
+        user: Optional user instance whose memoized context is dropped too
+    """
+    bump_version(_version_key(user_id))
+    if user is not None:
+        clear_permission_context(user)
@@ -59,11 +59,9 @@ class DataAccessManager:
                 return Person.objects.filter(contact__user=self.user)
             else:
                 # Office admin viewing all people in their office(s)
-                user_offices = self._get_user_offices()
-                return Person.objects.filter(
-                    Q(contact__office_id__in=user_offices) |
-                    Q(contact__user=self.user)
-                ).distinct()
+                from mobilize.core.scoped_queries import scope_people
+                
+                return scope_people(Person.objects.all(), self.user, self._get_user_offices())
                 
         else:  # standard_user or limited_user
             # Standard/limited users see only their assigned people
@@ -157,13 +155,10 @@ class DataAccessManager:
         Returns:
             List of office IDs the user is assigned to
         """
-        from mobilize.admin_panel.models import UserOffice
+        from mobilize.core.permission_context import get_permission_context
         
         try:
-            user_offices = UserOffice.objects.filter(
-                user_id=str(self.user.id)
-            ).values_list('office_id', flat=True)
-            return list(user_offices)
+            return list(get_permission_context(self.user).office_ids)
         except:
             # Fallback to user's primary office if UserOffice relationship fails
             if hasattr(self.user, 'office_id') and self.user.office_id:
@@ -209,6 +204,9 @@ def get_data_access_manager(request):
     """
     Factory function to create DataAccessManager from request.
     
+    Managers are memoized on the request per view mode, so views, widgets
+    and helpers handling the same request share one instance.
+    
     Args:
         request: Django request object
         
@@ -216,7 +214,13 @@ def get_data_access_manager(request):
         DataAccessManager instance
     """
     view_mode = request.GET.get('view_mode', 'default')
-    return DataAccessManager(request.user, view_mode)
+    managers = getattr(request, '_data_access_managers', None)
+    if managers is None:
+        managers = {}
+        request._data_access_managers = managers
+    if view_mode not in managers:
+        managers[view_mode] = DataAccessManager(request.user, view_mode)
+    return managers[view_mode]
 
 
 def require_role(roles):
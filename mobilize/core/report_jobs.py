@@ -0,0 +1,285 @@
+"""
+Background report generation for the Mobilize CRM.
+
+Reports are rendered by a Celery task into file storage while the browser
+polls a lightweight status endpoint. Finished artifacts are reused for
+identical requests until one of the tables the report reads from changes.
+"""
+import hashlib
+import json
+import logging
+import re
+import tempfile
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from mobilize.core.cache_versions import bump_version, get_version, get_versions
+from mobilize.core.models import ReportJob
+from mobilize.core.reports import ReportGenerator
+
+logger = logging.getLogger(__name__)
+
+
+# Models each report reads from; a change to any of them invalidates the artifact
+REPORT_DATA_SOURCES = {
+    'people': [
+        'contacts.Contact', 'contacts.Person', 'churches.Church', 'pipeline.PipelineContact', 'authentication.User',
+    ],
+    'churches': ['contacts.Contact', 'churches.Church'],
+    'tasks': ['tasks.Task', 'authentication.User'],
+    'communications': ['communications.Communication'],
+    'summary': ['contacts.Contact', 'contacts.Person', 'churches.Church', 'tasks.Task'],
+}
+
+# Office membership changes alter what every office-scoped report contains
+SCOPE_DATA_SOURCES = ['admin_panel.UserOffice']
+
+# Minimum seconds between progress writes to the job row
+PROGRESS_UPDATE_INTERVAL = 1.0
+
+
+def _data_version_key(model_label):
+    return f'report_data_version:{model_label.lower()}'
+
+
+def get_model_data_version(model_label):
+    """
+    Get the current data version for a model.
+    
+    Args:
+        model_label: 'app_label.ModelName' string
+    
+    Returns:
+        Integer version
+    """
+    return get_version(_data_version_key(model_label))
+
+
+def bump_data_version(model_label):
+    """
+    Mark a model's data as changed, invalidating cached report artifacts.
+    
+    Args:
+        model_label: 'app_label.ModelName' string
+    """
+    bump_version(_data_version_key(model_label))
+
+
+def get_report_data_version(report_type):
+    """
+    Get the combined data version of all tables a report reads from.
+    
+    Args:
+        report_type: One of REPORT_TYPES
+    
+    Returns:
+        String version fingerprint
+    """
+    keys = [_data_version_key(label) for label in REPORT_DATA_SOURCES.get(report_type, []) + SCOPE_DATA_SOURCES]
+    versions = get_versions(keys)
+    return '-'.join(str(versions[key]) for key in keys)
+
+
+def build_artifact_key(user, view_mode, report_type, format, filters):
+    """
+    Build the cache key identifying a report artifact.
+    
+    The date is part of the key because filters such as "overdue" and
+    "last N days" are relative to today.
+    
+    Returns:
+        Hex digest string
+    """
+    payload = json.dumps({
+        'user': user.pk,
+        'view_mode': view_mode,
+        'report_type': report_type,
+        'format': format,
+        'filters': filters or {},
+        'data_version': get_report_data_version(report_type),
+        'date': timezone.now().date().isoformat(),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_or_start_report_job(user, report_type, format='csv', view_mode='default', filters=None):
+    """
+    Return a job for the requested report, starting one if needed.
+    
+    A completed job with the same artifact key is returned as-is, and a job
+    already pending or running for that key is shared instead of queuing a
+    duplicate.
+    
+    Args:
+        user: The requesting user
+        report_type: One of REPORT_TYPES
+        format: Export format ('csv', 'excel')
+        view_mode: The viewing mode for data access
+        filters: Dict with optional 'status_filter' and 'date_range'
+    
+    Returns:
+        ReportJob instance
+    """
+    filters = {key: value for key, value in (filters or {}).items() if value}
+    artifact_key = build_artifact_key(user, view_mode, report_type, format, filters)
+    
+    existing = ReportJob.objects.filter(
+        artifact_key=artifact_key,
+        status__in=['pending', 'running', 'completed'],
+    ).order_by('-created_at').first()
+    if existing and (existing.status != 'completed' or _artifact_exists(existing)):
+        return existing
+    
+    job = ReportJob.objects.create(
+        user=user,
+        report_type=report_type,
+        format=format,
+        view_mode=view_mode,
+        filters=filters,
+        artifact_key=artifact_key,
+    )
+    transaction.on_commit(lambda: _dispatch_report_job(job))
+    return job
+
+
+def purge_expired_report_jobs(retention_days=None):
+    """
+    Delete report jobs older than the retention period, with their files.
+    
+    Artifact keys include the date and the data version, so an old artifact
+    is never served again once it has been downloaded.
+    
+    Args:
+        retention_days: Days jobs are kept, defaults to REPORT_JOB_RETENTION_DAYS
+    
+    Returns:
+        Number of jobs deleted
+    """
+    if retention_days is None:
+        retention_days = settings.REPORT_JOB_RETENTION_DAYS
+    expired = ReportJob.objects.filter(created_at__lt=timezone.now() - timedelta(days=retention_days))
+    
+    for job in expired.exclude(file='').exclude(file__isnull=True).only('pk', 'file').iterator():
+        job.file.delete(save=False)
+    _, deleted = expired.delete()
+    return deleted.get(ReportJob._meta.label, 0)
+
+
+def _artifact_exists(job):
+    """Check that a completed job's file is still in storage."""
+    return bool(job.file) and job.file.storage.exists(job.file.name)
+
+
+def _dispatch_report_job(job):
+    """Queue the Celery task for a job, failing the job if the broker is down."""
+    from mobilize.core.tasks import generate_report_job
+    
+    try:
+        result = generate_report_job.delay(job.pk)
+        ReportJob.objects.filter(pk=job.pk, celery_task_id__isnull=True).update(celery_task_id=result.id)
+    except Exception as e:
+        logger.error(f"Could not queue report job {job.pk}: {str(e)}")
+        ReportJob.objects.filter(pk=job.pk).update(
+            status='failed',
+            error_message='Report queue is unavailable. Please try again later.',
+            completed_at=timezone.now(),
+        )
+
+
+def run_report_job(job):
+    """
+    Render a report job into file storage, recording progress as it goes.
+    
+    Args:
+        job: ReportJob instance
+    
+    Returns:
+        The updated ReportJob instance
+    """
+    filters = job.filters or {}
+    state = {'last_update': 0.0}
+    
+    def record_progress(rows_written):
+        now = time.monotonic()
+        if now - state['last_update'] < PROGRESS_UPDATE_INTERVAL:
+            return
+        state['last_update'] = now
+        progress = min(99, int(rows_written * 100 / job.total_rows)) if job.total_rows else 0
+        ReportJob.objects.filter(pk=job.pk).update(rows_written=rows_written, progress=progress)
+    
+    generator = ReportGenerator(
+        job.user, job.view_mode, stream=True, progress_callback=record_progress
+    )
+    
+    if job.report_type == 'summary':
+        job.total_rows = 4
+    else:
+        job.total_rows = generator.get_report_queryset(
+            job.report_type,
+            status_filter=filters.get('status_filter'),
+            date_range=filters.get('date_range'),
+        ).count()
+    job.status = 'running'
+    job.started_at = timezone.now()
+    job.save(update_fields=['total_rows', 'status', 'started_at'])
+    
+    response = generator.generate(
+        job.report_type,
+        job.format,
+        status_filter=filters.get('status_filter'),
+        date_range=filters.get('date_range'),
+    )
+    
+    with tempfile.TemporaryFile() as spool:
+        for chunk in response.streaming_content:
+            spool.write(chunk)
+        response.close()
+        spool.seek(0)
+        
+        filename = _attachment_filename(response) or f'{job.report_type}_report'
+        job.filename = filename
+        job.file.save(filename, File(spool), save=False)
+    
+    job.status = 'completed'
+    job.progress = 100
+    job.rows_written = job.total_rows
+    job.completed_at = timezone.now()
+    job.save(update_fields=['filename', 'file', 'status', 'progress', 'rows_written', 'completed_at'])
+    return job
+
+
+def _attachment_filename(response):
+    """Extract the attachment filename set by ReportGenerator."""
+    match = re.search(r'filename="([^"]+)"', response.get('Content-Disposition', ''))
+    return match.group(1) if match else None
+
+
+def get_job_status(job):
+    """
+    Serialize a job for the status polling endpoint.
+    
+    Args:
+        job: ReportJob instance
+    
+    Returns:
+        Dict suitable for JsonResponse
+    """
+    from django.urls import reverse
+    
+    return {
+        'job_id': job.pk,
+        'report_type': job.report_type,
+        'format': job.format,
+        'status': job.status,
+        'progress': job.progress,
+        'rows_written': job.rows_written,
+        'total_rows': job.total_rows,
+        'error': job.error_message,
+        'status_url': reverse('core:report_job_status', args=[job.pk]),
+        'download_url': reverse('core:report_job_download', args=[job.pk]) if job.status == 'completed' else None,
+    }
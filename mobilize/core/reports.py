@@ -6,42 +6,264 @@ This module provides functionality to generate various reports in different form
 """
 import csv
 import io
-from datetime import datetime, timedelta
-from django.http import HttpResponse
+import itertools
+import logging
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db.models import Count, Q, Value
+from django.db.models.functions import NullIf
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
 from mobilize.core.permissions import get_data_access_manager
 
+logger = logging.getLogger(__name__)
+
+
+REPORT_TYPES = ('people', 'churches', 'tasks', 'communications', 'summary')
+
+# Rows fetched per round trip when iterating report querysets
+DEFAULT_CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Column formats as (CSV strftime pattern, Excel number format)
+DATE_FORMAT = ('%Y-%m-%d', 'yyyy-mm-dd')
+DATETIME_FORMAT = ('%Y-%m-%d %H:%M', 'yyyy-mm-dd hh:mm')
+
+PEOPLE_COLUMNS = [
+    ('ID', None), ('First Name', None), ('Last Name', None), ('Email', None),
+    ('Phone', None), ('Pipeline Stage', None), ('Priority', None), ('Assigned To', None),
+    ('Church', None), ('Status', None), ('Last Contact', DATE_FORMAT), ('Created Date', DATE_FORMAT),
+]
+
+CHURCH_COLUMNS = [
+    ('ID', None), ('Name', None), ('Denomination', None), ('Website', None),
+    ('Congregation Size', None), ('Pastor Name', None), ('Pastor Email', None),
+    ('Pastor Phone', None), ('Address', None), ('Created Date', DATE_FORMAT),
+]
+
+TASK_COLUMNS = [
+    ('ID', None), ('Title', None), ('Description', None), ('Status', None),
+    ('Priority', None), ('Due Date', DATE_FORMAT), ('Assigned To', None), ('Created By', None),
+    ('Created Date', DATETIME_FORMAT), ('Completed Date', DATETIME_FORMAT),
+]
+
+COMMUNICATION_COLUMNS = [
+    ('ID', None), ('Type', None), ('Subject', None), ('Direction', None),
+    ('Date', DATE_FORMAT), ('Sender', None), ('Person ID', None), ('Church ID', None),
+    ('Status', None),
+]
+
+SUMMARY_COLUMNS = [('Metric', None), ('Count', None)]
+
+
+class Echo:
+    """
+    Pseudo-buffer that returns what is written to it.
+    
+    Lets csv.writer produce one encoded line at a time for StreamingHttpResponse.
+    """
+    
+    def write(self, value):
+        return value
+
+
+def _load_stage_names(pipeline):
+    """Return a {stage_code: name} map for the given pipeline in one query."""
+    from mobilize.pipeline.contact_stages import stage_code
+    
+    if not pipeline:
+        return {}
+    return {stage_code(name): name for name in pipeline.stages.values_list('name', flat=True)}
+
+
+def _load_users(*id_querysets):
+    """
+    Load users referenced by the given id subqueries in one query.
+    
+    Returns:
+        Dict of {user_id: {'username', 'first_name', 'last_name'}}
+    """
+    from django.contrib.auth import get_user_model
+    
+    condition = Q()
+    for id_queryset in id_querysets:
+        condition |= Q(id__in=id_queryset)
+    
+    users = get_user_model().objects.filter(condition).values(
+        'id', 'username', 'first_name', 'last_name'
+    )
+    return {user['id']: user for user in users}
+
+
+def _load_church_names(id_queryset):
+    """Return a {church_id: name} map for churches referenced by id_queryset."""
+    from mobilize.churches.models import Church
+    
+    return dict(
+        Church.objects.filter(contact_id__in=id_queryset).values_list('contact_id', 'name')
+    )
+
+
+def _csv_value(value, column_format):
+    """Format a typed value for a CSV cell."""
+    if value is None:
+        return ''
+    if column_format:
+        return value.strftime(column_format[0])
+    return value
+
+
+def _stream_csv(lines, filename_prefix):
+    """
+    Encode CSV lines one at a time for a StreamingHttpResponse.
+    
+    Errors raised while the response is being sent happen after the view
+    has returned, so they are logged here before the connection is dropped.
+    """
+    writer = csv.writer(Echo())
+    try:
+        for line in lines:
+            yield writer.writerow(line)
+    except Exception as e:
+        logger.error(f"Error streaming {filename_prefix}: {str(e)}")
+        raise
+
+
+def _excel_value(value):
+    """
+    Convert a typed value into something openpyxl can store.
+    
+    Excel has no timezone support, so aware datetimes are written as naive UTC,
+    matching the CSV export. Control characters, which synced email subjects
+    and notes often contain, are dropped since openpyxl refuses them.
+    """
+    if isinstance(value, str):
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+        
+        return ILLEGAL_CHARACTERS_RE.sub('', value)
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _full_name(user):
+    """Match User.get_full_name() for a preloaded user dict."""
+    if not user:
+        return None
+    return f"{user['first_name']} {user['last_name']}".strip()
+
 
 class ReportGenerator:
     """
     Generates reports based on user permissions and data access.
+    
+    Rows are read with values_list() projections and related users, churches
+    and pipeline stages are preloaded in bulk, so the number of queries per
+    report does not grow with the number of rows.
     """
     
-    def __init__(self, user, view_mode='default'):
+    def __init__(self, user, view_mode='default', stream=False, chunk_size=DEFAULT_CHUNK_SIZE,
+                 progress_callback=None):
         """
         Initialize the report generator.
         
         Args:
             user: The current user
             view_mode: The viewing mode for data access
+            stream: Return StreamingHttpResponse objects instead of buffering
+                the whole report in memory
+            chunk_size: Rows fetched per round trip from the server-side cursor
+            progress_callback: Optional callable receiving the number of rows
+                written so far, called once per chunk and at the end
         """
         self.user = user
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
         self.access_manager = get_data_access_manager(type('obj', (object,), {
             'user': user, 
             'GET': {'view_mode': view_mode}
         })())
     
+    def generate(self, report_type, format='csv', status_filter=None, date_range=None):
+        """
+        Generate any report type in the specified format.
+        
+        Args:
+            report_type: One of REPORT_TYPES
+            format: Export format ('csv', 'excel')
+            status_filter: Optional status filter for tasks reports
+            date_range: Optional date range filter (days) for communications reports
+        
+        Returns:
+            HttpResponse (StreamingHttpResponse in streaming mode) with the report data
+        """
+        if report_type == 'people':
+            return self.generate_people_report(format)
+        elif report_type == 'churches':
+            return self.generate_churches_report(format)
+        elif report_type == 'tasks':
+            return self.generate_tasks_report(format, status_filter)
+        elif report_type == 'communications':
+            return self.generate_communications_report(format, date_range)
+        elif report_type == 'summary':
+            return self.generate_dashboard_summary(format)
+        raise ValueError(f"Unknown report type: {report_type}")
+    
+    def get_report_queryset(self, report_type, status_filter=None, date_range=None):
+        """
+        Get the filtered queryset a report is built from.
+        
+        Args:
+            report_type: One of 'people', 'churches', 'tasks', 'communications'
+            status_filter: Optional status filter ('pending', 'completed', 'overdue')
+            date_range: Optional date range filter (days)
+        
+        Returns:
+            QuerySet scoped to the user's access level
+        """
+        if report_type == 'people':
+            return self.access_manager.get_people_queryset()
+        elif report_type == 'churches':
+            return self.access_manager.get_churches_queryset()
+        elif report_type == 'tasks':
+            tasks_queryset = self.access_manager.get_tasks_queryset()
+            
+            # Apply status filter
+            if status_filter == 'pending':
+                tasks_queryset = tasks_queryset.filter(status='pending')
+            elif status_filter == 'completed':
+                tasks_queryset = tasks_queryset.filter(status='completed')
+            elif status_filter == 'overdue':
+                tasks_queryset = tasks_queryset.filter(
+                    status='pending',
+                    due_date__lt=datetime.now().date()
+                )
+            return tasks_queryset
+        elif report_type == 'communications':
+            communications_queryset = self.access_manager.get_communications_queryset()
+            
+            # Apply date filter
+            if date_range:
+                start_date = datetime.now().date() - timedelta(days=date_range)
+                communications_queryset = communications_queryset.filter(
+                    date__gte=start_date
+                )
+            return communications_queryset
+        raise ValueError(f"Unknown report type: {report_type}")
+    
     def generate_people_report(self, format='csv'):
         """
         Generate a people report in the specified format.
         
         Args:
             format: Export format ('csv', 'excel')
-            
+        
         Returns:
-            HttpResponse with the report data
+            HttpResponse (StreamingHttpResponse in streaming mode) with the report data
         """
-        people_queryset = self.access_manager.get_people_queryset()
+        people_queryset = self.get_report_queryset('people')
         
         if format == 'csv':
             return self._generate_people_csv(people_queryset)
@@ -56,11 +278,11 @@ class ReportGenerator:
         
         Args:
             format: Export format ('csv', 'excel')
-            
+        
         Returns:
-            HttpResponse with the report data
+            HttpResponse (StreamingHttpResponse in streaming mode) with the report data
         """
-        churches_queryset = self.access_manager.get_churches_queryset()
+        churches_queryset = self.get_report_queryset('churches')
         
         if format == 'csv':
             return self._generate_churches_csv(churches_queryset)
@@ -76,22 +298,11 @@ class ReportGenerator:
         Args:
             format: Export format ('csv', 'excel')
             status_filter: Optional status filter ('pending', 'completed', 'overdue')
-            
+        
         Returns:
-            HttpResponse with the report data
+            HttpResponse (StreamingHttpResponse in streaming mode) with the report data
         """
-        tasks_queryset = self.access_manager.get_tasks_queryset()
-        
-        # Apply status filter
-        if status_filter == 'pending':
-            tasks_queryset = tasks_queryset.filter(status='pending')
-        elif status_filter == 'completed':
-            tasks_queryset = tasks_queryset.filter(status='completed')
-        elif status_filter == 'overdue':
-            tasks_queryset = tasks_queryset.filter(
-                status='pending',
-                due_date__lt=datetime.now().date()
-            )
+        tasks_queryset = self.get_report_queryset('tasks', status_filter=status_filter)
         
         if format == 'csv':
             return self._generate_tasks_csv(tasks_queryset)
@@ -107,18 +318,11 @@ class ReportGenerator:
         Args:
             format: Export format ('csv', 'excel')
             date_range: Optional date range filter (days)
-            
+        
         Returns:
-            HttpResponse with the report data
+            HttpResponse (StreamingHttpResponse in streaming mode) with the report data
         """
-        communications_queryset = self.access_manager.get_communications_queryset()
-        
-        # Apply date filter
-        if date_range:
-            start_date = datetime.now().date() - timedelta(days=date_range)
-            communications_queryset = communications_queryset.filter(
-                date__gte=start_date
-            )
+        communications_queryset = self.get_report_queryset('communications', date_range=date_range)
         
         if format == 'csv':
             return self._generate_communications_csv(communications_queryset)
@@ -133,18 +337,21 @@ class ReportGenerator:
         
         Args:
             format: Export format ('csv', 'excel')
-            
+        
         Returns:
-            HttpResponse with the summary data
+            HttpResponse (StreamingHttpResponse in streaming mode) with the summary data
         """
         # Get summary data
         people_count = self.access_manager.get_people_queryset().count()
         churches_count = self.access_manager.get_churches_queryset().count()
-        pending_tasks = self.access_manager.get_tasks_queryset().filter(status='pending').count()
-        completed_tasks = self.access_manager.get_tasks_queryset().filter(status='completed').count()
+        task_counts = self.access_manager.get_tasks_queryset().aggregate(
+            pending=Count('pk', filter=Q(status='pending')),
+            completed=Count('pk', filter=Q(status='completed')),
+        )
+        pending_tasks = task_counts['pending']
+        completed_tasks = task_counts['completed']
         
         summary_data = [
-            ['Metric', 'Count'],
             ['People', people_count],
             ['Churches', churches_count],
             ['Pending Tasks', pending_tasks],
@@ -152,150 +359,233 @@ class ReportGenerator:
         ]
         
         if format == 'csv':
-            return self._create_csv_response(summary_data, 'dashboard_summary')
+            return self._render_csv(SUMMARY_COLUMNS, summary_data, 'dashboard_summary')
+        elif format == 'excel':
+            return self._render_excel(SUMMARY_COLUMNS, summary_data, 'dashboard_summary', 'Summary')
         else:
             raise ValueError(f"Unsupported format: {format}")
     
     def _generate_people_csv(self, queryset):
         """Generate CSV response for people data."""
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="people_report_{datetime.now().strftime("%Y%m%d")}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'ID', 'First Name', 'Last Name', 'Email', 'Phone', 'Pipeline Stage',
-            'Priority', 'Assigned To', 'Church', 'Status', 'Last Contact', 'Created Date'
-        ])
-        
-        for person in queryset:
-            writer.writerow([
-                person.contact.id,
-                person.contact.first_name or '',
-                person.contact.last_name or '',
-                person.contact.email or '',
-                person.contact.phone or '',
-                person.contact.get_pipeline_stage_name() or '',
-                person.contact.get_priority_display() or '',
-                person.contact.user.username if person.contact.user else '',
-                person.primary_church.name if person.primary_church else '',
-                person.contact.get_status_display() or '',
-                person.contact.last_contact_date.strftime('%Y-%m-%d') if person.contact.last_contact_date else '',
-                person.contact.created_at.strftime('%Y-%m-%d') if person.contact.created_at else '',
-            ])
-        
-        return response
+        return self._render_csv(PEOPLE_COLUMNS, self._people_rows(queryset), 'people_report')
     
     def _generate_churches_csv(self, queryset):
         """Generate CSV response for churches data."""
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="churches_report_{datetime.now().strftime("%Y%m%d")}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'ID', 'Name', 'Denomination', 'Website', 'Congregation Size',
-            'Pastor Name', 'Pastor Email', 'Pastor Phone', 'Address', 'Created Date'
-        ])
-        
-        for church in queryset:
-            writer.writerow([
-                church.contact.id,
-                church.name or '',
-                church.denomination or '',
-                church.website or '',
-                church.congregation_size or '',
-                church.pastor_name or '',
-                church.pastor_email or '',
-                church.pastor_phone or '',
-                church.contact.street_address or '',
-                church.contact.created_at.strftime('%Y-%m-%d') if church.contact.created_at else '',
-            ])
-        
-        return response
+        return self._render_csv(CHURCH_COLUMNS, self._church_rows(queryset), 'churches_report')
     
     def _generate_tasks_csv(self, queryset):
         """Generate CSV response for tasks data."""
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="tasks_report_{datetime.now().strftime("%Y%m%d")}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'ID', 'Title', 'Description', 'Status', 'Priority', 'Due Date',
-            'Assigned To', 'Created By', 'Created Date', 'Completed Date'
-        ])
-        
-        for task in queryset.select_related('assigned_to', 'created_by'):
-            writer.writerow([
-                task.id,
-                task.title or '',
-                task.description or '',
-                task.status or '',
-                task.priority or '',
-                task.due_date.strftime('%Y-%m-%d') if task.due_date else '',
-                task.assigned_to.get_full_name() if task.assigned_to else '',
-                task.created_by.get_full_name() if task.created_by else '',
-                task.created_at.strftime('%Y-%m-%d %H:%M') if task.created_at else '',
-                task.completed_at.strftime('%Y-%m-%d %H:%M') if task.completed_at else '',
-            ])
-        
-        return response
+        return self._render_csv(TASK_COLUMNS, self._task_rows(queryset), 'tasks_report')
     
     def _generate_communications_csv(self, queryset):
         """Generate CSV response for communications data."""
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="communications_report_{datetime.now().strftime("%Y%m%d")}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'ID', 'Type', 'Subject', 'Direction', 'Date', 'Sender',
-            'Person ID', 'Church ID', 'Status'
-        ])
-        
-        for comm in queryset:
-            writer.writerow([
-                comm.id,
-                comm.type or '',
-                comm.subject or '',
-                comm.direction or '',
-                comm.date.strftime('%Y-%m-%d') if comm.date else '',
-                comm.sender or '',
-                comm.person_id or '',
-                comm.church_id or '',
-                comm.email_status or '',
-            ])
+        return self._render_csv(
+            COMMUNICATION_COLUMNS, self._communication_rows(queryset), 'communications_report'
+        )
+    
+    def _generate_people_excel(self, queryset):
+        """Generate Excel response for people data."""
+        return self._render_excel(PEOPLE_COLUMNS, self._people_rows(queryset), 'people_report', 'People')
+    
+    def _generate_churches_excel(self, queryset):
+        """Generate Excel response for churches data."""
+        return self._render_excel(CHURCH_COLUMNS, self._church_rows(queryset), 'churches_report', 'Churches')
+    
+    def _generate_tasks_excel(self, queryset):
+        """Generate Excel response for tasks data."""
+        return self._render_excel(TASK_COLUMNS, self._task_rows(queryset), 'tasks_report', 'Tasks')
+    
+    def _generate_communications_excel(self, queryset):
+        """Generate Excel response for communications data."""
+        return self._render_excel(
+            COMMUNICATION_COLUMNS, self._communication_rows(queryset),
+            'communications_report', 'Communications'
+        )
+    
+    def _render_csv(self, columns, rows, filename_prefix):
+        """
+        Write rows to a CSV response.
+        
+        In streaming mode rows are pulled lazily while the response is being
+        sent, so only one chunk of the queryset is held in memory at a time.
+        
+        Args:
+            columns: List of (header, format) column definitions
+            rows: Iterable of typed data rows
+            filename_prefix: Prefix for the attachment filename
         
+        Returns:
+            HttpResponse or StreamingHttpResponse with the CSV data
+        """
+        formats = [column_format for _, column_format in columns]
+        lines = itertools.chain(
+            [[header for header, _ in columns]],
+            ([_csv_value(value, fmt) for value, fmt in zip(row, formats)] for row in rows),
+        )
+        
+        if self.stream:
+            response = StreamingHttpResponse(_stream_csv(lines, filename_prefix), content_type='text/csv')
+        else:
+            response = HttpResponse(content_type='text/csv')
+            writer = csv.writer(response)
+            for line in lines:
+                writer.writerow(line)
+        
+        response['Content-Disposition'] = f'attachment; filename="{filename_prefix}_{datetime.now().strftime("%Y%m%d")}.csv"'
         return response
     
-    def _create_csv_response(self, data, filename_prefix):
-        """Create a CSV response from data array."""
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{filename_prefix}_{datetime.now().strftime("%Y%m%d")}.csv"'
+    def _render_excel(self, columns, rows, filename_prefix, sheet_title):
+        """
+        Write rows to an XLSX response using a write-only workbook.
         
-        writer = csv.writer(response)
-        for row in data:
-            writer.writerow(row)
+        Write-only worksheets keep memory flat regardless of row count; the
+        finished workbook is spooled to a temporary file and streamed back
+        instead of being held in memory.
         
+        Args:
+            columns: List of (header, format) column definitions
+            rows: Iterable of typed data rows
+            filename_prefix: Prefix for the attachment filename
+            sheet_title: Title of the worksheet
+        
+        Returns:
+            HttpResponse or FileResponse with the workbook
+        """
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+        
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(title=sheet_title)
+        
+        header_font = Font(bold=True)
+        header = []
+        for title, _ in columns:
+            cell = WriteOnlyCell(worksheet, value=title)
+            cell.font = header_font
+            header.append(cell)
+        worksheet.append(header)
+        
+        # Only cells that need a number format are wrapped; everything else is
+        # appended as a plain value, which is the fast path in openpyxl
+        formatted = [
+            (index, column_format[1])
+            for index, (_, column_format) in enumerate(columns) if column_format
+        ]
+        for row in rows:
+            row = [_excel_value(value) for value in row]
+            for index, number_format in formatted:
+                if row[index] is not None:
+                    cell = WriteOnlyCell(worksheet, value=row[index])
+                    cell.number_format = number_format
+                    row[index] = cell
+            worksheet.append(row)
+        
+        spool = tempfile.TemporaryFile()
+        workbook.save(spool)
+        spool.seek(0)
+        
+        filename = f'{filename_prefix}_{datetime.now().strftime("%Y%m%d")}.xlsx'
+        if self.stream:
+            # FileResponse streams the spooled file in blocks and closes it when done
+            response = FileResponse(spool, content_type=XLSX_CONTENT_TYPE)
+        else:
+            with spool:
+                response = HttpResponse(spool.read(), content_type=XLSX_CONTENT_TYPE)
+        
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
     
-    def _generate_people_excel(self, queryset):
-        """Generate Excel response for people data (requires openpyxl)."""
-        # This would require openpyxl package
-        # For now, fallback to CSV
-        return self._generate_people_csv(queryset)
+    def _iterate(self, queryset):
+        """Iterate a values_list queryset in chunks on a server-side cursor."""
+        rows = queryset.iterator(chunk_size=self.chunk_size)
+        if self.progress_callback:
+            return self._report_progress(rows)
+        return rows
     
-    def _generate_churches_excel(self, queryset):
-        """Generate Excel response for churches data (requires openpyxl)."""
-        # This would require openpyxl package
-        # For now, fallback to CSV
-        return self._generate_churches_csv(queryset)
+    def _report_progress(self, rows):
+        """Pass rows through, reporting the running count once per chunk."""
+        count = 0
+        for count, row in enumerate(rows, start=1):
+            yield row
+            if count % self.chunk_size == 0:
+                self.progress_callback(count)
+        self.progress_callback(count)
     
-    def _generate_tasks_excel(self, queryset):
-        """Generate Excel response for tasks data (requires openpyxl)."""
-        # This would require openpyxl package
-        # For now, fallback to CSV
-        return self._generate_tasks_csv(queryset)
+    def _people_rows(self, queryset):
+        """Yield typed rows for people data using a fixed number of queries."""
+        from mobilize.contacts.models import Contact
+        from mobilize.pipeline.models import Pipeline
+        
+        main_pipeline = Pipeline.get_main_people_pipeline()
+        stage_names = _load_stage_names(main_pipeline)
+        usernames = _load_users(queryset.values('contact__user_id'))
+        church_names = _load_church_names(queryset.values('primary_church_id'))
+        priority_labels = dict(Contact.PRIORITY_CHOICES)
+        status_labels = dict(Contact.STATUS_CHOICES)
+        
+        rows = queryset.values_list(
+            'contact_id', 'contact__first_name', 'contact__last_name',
+            'contact__email', 'contact__phone', 'contact__pipeline_stage',
+            'contact__priority', 'contact__user_id', 'primary_church_id',
+            'contact__status', 'contact__last_contact_date', 'contact__created_at',
+        )
+        
+        for (contact_id, first_name, last_name, email, phone, stage, priority,
+             user_id, church_id, status, last_contact_date, created_at) in self._iterate(rows):
+            user = usernames.get(user_id)
+            yield [
+                contact_id,
+                first_name,
+                last_name,
+                email,
+                phone,
+                stage_names.get(stage, stage),
+                priority_labels.get(priority, priority),
+                user['username'] if user else None,
+                church_names.get(church_id),
+                status_labels.get(status, status),
+                last_contact_date,
+                created_at,
+            ]
     
-    def _generate_communications_excel(self, queryset):
-        """Generate Excel response for communications data (requires openpyxl)."""
-        # This would require openpyxl package
-        # For now, fallback to CSV
-        return self._generate_communications_csv(queryset)
\ No newline at end of file
+    def _church_rows(self, queryset):
+        """Yield typed rows for churches data."""
+        # A congregation size of 0 is exported as a blank cell, like a missing one
+        queryset = queryset.annotate(congregation_size_or_blank=NullIf('congregation_size', Value(0)))
+        return self._iterate(queryset.values_list(
+            'contact_id', 'name', 'denomination', 'website', 'congregation_size_or_blank',
+            'pastor_name', 'pastor_email', 'pastor_phone',
+            'contact__street_address', 'contact__created_at',
+        ))
+    
+    def _task_rows(self, queryset):
+        """Yield typed rows for tasks data using a fixed number of queries."""
+        users = _load_users(queryset.values('assigned_to_id'), queryset.values('created_by_id'))
+        
+        rows = queryset.values_list(
+            'id', 'title', 'description', 'status', 'priority', 'due_date',
+            'assigned_to_id', 'created_by_id', 'created_at', 'completed_at',
+        )
+        
+        for (task_id, title, description, status, priority, due_date,
+             assigned_to_id, created_by_id, created_at, completed_at) in self._iterate(rows):
+            yield [
+                task_id,
+                title,
+                description,
+                status,
+                priority,
+                due_date,
+                _full_name(users.get(assigned_to_id)),
+                _full_name(users.get(created_by_id)),
+                created_at,
+                completed_at,
+            ]
+    
+    def _communication_rows(self, queryset):
+        """Yield typed rows for communications data."""
+        return self._iterate(queryset.values_list(
+            'id', 'type', 'subject', 'direction', 'date', 'sender',
+            'person_id', 'church_id', 'email_status',
+        ))
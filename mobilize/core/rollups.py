@@ -0,0 +1,654 @@
+"""
+Incrementally maintained dashboard rollups for the Mobilize CRM.
+
+Dashboard counts are served from the DashboardRollup table instead of
+rescanning contacts, tasks, communications and pipeline entries on every
+load. Each source row contributes +1 to a small set of rollup keys. When rows
+change, the contributions of the affected rows are read before and after the
+change and only the difference is written back. Model signals do this for
+single saves and deletes, bulk code paths wrap their queryset updates in
+rollup_batch(), and a nightly Celery job rebuilds the table from scratch to
+correct any drift.
+"""
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+# Batch size used when reading source rows during a rebuild
+REBUILD_CHUNK_SIZE = 1000
+
+META_KEY = 'meta'
+
+# Rollup metrics grouped by the source scope they are filtered with
+PEOPLE_METRICS = ['people', 'people_stage']
+CHURCH_METRICS = ['churches', 'church_activity', 'church_stage']
+TASK_METRICS = ['tasks', 'pending_tasks', 'completed_tasks']
+COMMUNICATION_METRICS = ['communications']
+
+_local = threading.local()
+
+
+def _local_day(value):
+    """Convert a datetime to the local calendar day used for day buckets."""
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        return timezone.localdate(value)
+    return value.date()
+
+
+def _cell(metric, office_id=None, user_id=None, other_user_id=None, bucket='', day=None):
+    """Build the key tuple for a rollup cell."""
+    return (metric, 'cell', office_id or 0, user_id or 0, other_user_id or 0, bucket or '', day)
+
+
+def _office_keys(metric, office_ids, bucket='', day=None):
+    """Build one office key per distinct related office."""
+    return [
+        (metric, 'office', office_id, 0, 0, bucket or '', day)
+        for office_id in sorted({office_id for office_id in office_ids if office_id})
+    ]
+
+
+def _key_string(key):
+    """Serialize a key tuple into the unique DashboardRollup.key value."""
+    metric, scope, office_id, user_id, other_user_id, bucket, day = key
+    return '|'.join([
+        metric, scope, str(office_id), str(user_id), str(other_user_id),
+        bucket, day.isoformat() if day else '',
+    ])
+
+
+def contact_contributions(contact_ids):
+    """
+    Compute the rollup keys contributed by a set of contacts.
+    
+    Covers the contacts' Person and Church rows and their main pipeline stage,
+    read from the denormalized Contact.pipeline_stage code.
+    
+    Args:
+        contact_ids: Iterable of Contact IDs
+    
+    Returns:
+        Counter of key tuple to count
+    """
+    from mobilize.contacts.models import Person
+    from mobilize.churches.models import Church
+    
+    contact_ids = list(contact_ids)
+    counts = Counter()
+    if not contact_ids:
+        return counts
+    
+    people = Person.objects.filter(contact_id__in=contact_ids).values_list(
+        'contact__office_id', 'contact__user_id', 'contact__created_at', 'contact__pipeline_stage'
+    )
+    for office_id, user_id, created_at, stage_code in people:
+        counts[_cell('people', office_id, user_id, day=_local_day(created_at))] += 1
+        if stage_code:
+            counts[_cell('people_stage', office_id, user_id, bucket=stage_code)] += 1
+    
+    churches = Church.objects.filter(contact_id__in=contact_ids).values_list(
+        'contact__office_id', 'contact__user_id', 'contact__created_at',
+        'contact__updated_at', 'main_contact_id', 'contact__pipeline_stage'
+    )
+    for office_id, user_id, created_at, updated_at, main_contact_id, stage_code in churches:
+        bucket = 'with_contact' if main_contact_id else ''
+        counts[_cell('churches', office_id, user_id, bucket=bucket, day=_local_day(created_at))] += 1
+        counts[_cell('church_activity', office_id, user_id, day=_local_day(updated_at))] += 1
+        if stage_code:
+            counts[_cell('church_stage', office_id, user_id, bucket=stage_code)] += 1
+    
+    return counts
+
+
+def task_contributions(task_ids):
+    """
+    Compute the rollup keys contributed by a set of tasks.
+    
+    Args:
+        task_ids: Iterable of Task IDs
+    
+    Returns:
+        Counter of key tuple to count
+    """
+    from mobilize.tasks.models import Task
+    
+    task_ids = list(task_ids)
+    counts = Counter()
+    if not task_ids:
+        return counts
+    
+    tasks = Task.objects.filter(pk__in=task_ids).values_list(
+        'status', 'priority', 'due_date', 'completed_at', 'assigned_to_id', 'created_by_id',
+        'office_id', 'person__contact__office_id', 'church__contact__office_id'
+    )
+    for status, priority, due_date, completed_at, assigned_to_id, created_by_id, *office_ids in tasks:
+        entries = [('tasks', status or '', None)]
+        if status == 'pending':
+            entries.append(('pending_tasks', priority or '', due_date))
+        elif status == 'completed':
+            entries.append(('completed_tasks', '', _local_day(completed_at)))
+        
+        for metric, bucket, day in entries:
+            counts[_cell(metric, user_id=assigned_to_id, other_user_id=created_by_id, bucket=bucket, day=day)] += 1
+            counts.update(_office_keys(metric, office_ids, bucket=bucket, day=day))
+    
+    return counts
+
+
+def communication_contributions(communication_ids):
+    """
+    Compute the rollup keys contributed by a set of communications.
+    
+    Args:
+        communication_ids: Iterable of Communication IDs
+    
+    Returns:
+        Counter of key tuple to count
+    """
+    from mobilize.communications.models import Communication
+    
+    communication_ids = list(communication_ids)
+    counts = Counter()
+    if not communication_ids:
+        return counts
+    
+    communications = Communication.objects.filter(pk__in=communication_ids).values_list(
+        'date', 'user_id', 'office_id', 'person__contact__office_id', 'church__contact__office_id'
+    )
+    for day, user_id, *office_ids in communications:
+        counts[_cell('communications', user_id=user_id, day=day)] += 1
+        counts.update(_office_keys('communications', office_ids, day=day))
+    
+    return counts
+
+
+def _contact_dependents(contact_ids):
+    """Find the tasks and communications linked to a set of contacts."""
+    from mobilize.tasks.models import Task
+    from mobilize.communications.models import Communication
+    
+    linked = Q(person_id__in=contact_ids) | Q(church_id__in=contact_ids)
+    return {
+        'task': Task.objects.filter(linked).values_list('pk', flat=True),
+        'communication': Communication.objects.filter(linked).values_list('pk', flat=True),
+    }
+
+
+CONTRIBUTION_SOURCES = {
+    'contact': contact_contributions,
+    'task': task_contributions,
+    'communication': communication_contributions,
+}
+
+
+def apply_rollup_deltas(deltas):
+    """
+    Add count deltas to the rollup table.
+    
+    Args:
+        deltas: Mapping of key tuple to the signed change in count
+    """
+    from mobilize.core.models import DashboardRollup
+    
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        key_string = _key_string(key)
+        if DashboardRollup.objects.filter(key=key_string).update(count=F('count') + delta):
+            continue
+        
+        metric, scope, office_id, user_id, other_user_id, bucket, day = key
+        try:
+            with transaction.atomic():
+                DashboardRollup.objects.create(
+                    key=key_string, metric=metric, scope=scope, office_id=office_id,
+                    user_id=user_id, other_user_id=other_user_id, bucket=bucket, day=day, count=delta,
+                )
+        except IntegrityError:
+            # Another process created the row first
+            DashboardRollup.objects.filter(key=key_string).update(count=F('count') + delta)
+
+
+class RollupBatch:
+    """
+    Collects rollup changes for a group of source rows.
+    
+    Rows are registered with touch() before they change, which records their
+    current contributions. flush() reads the contributions again and writes
+    the difference.
+    """
+    
+    def __init__(self):
+        self.touched = {source: set() for source in CONTRIBUTION_SOURCES}
+        self.before = Counter()
+        self.stage_contact_ids = set()
+    
+    def touch_contact_stages(self, contact_ids):
+        """
+        Register contacts whose pipeline entries changed.
+        
+        Their stored stage codes are recomputed once by flush(), before the
+        contributions that read them.
+        
+        Args:
+            contact_ids: IDs of the contacts
+        """
+        self.stage_contact_ids.update(pk for pk in contact_ids if pk is not None)
+    
+    def touch(self, source, ids, snapshot=True, dependents=True):
+        """
+        Register source rows that are about to change.
+        
+        Args:
+            source: 'contact', 'task' or 'communication'
+            ids: IDs of the rows
+            snapshot: False for rows that did not exist before the change
+            dependents: False for contacts that keep their office and links,
+                so their tasks and communications need not be recounted
+        """
+        new_ids = {pk for pk in ids if pk is not None} - self.touched[source]
+        if not new_ids:
+            return
+        if snapshot:
+            self.before.update(CONTRIBUTION_SOURCES[source](new_ids))
+        self.touched[source] |= new_ids
+        
+        # Tasks and communications are bucketed by their contact's office too
+        if source == 'contact' and snapshot and dependents:
+            for dependent_source, dependent_ids in _contact_dependents(new_ids).items():
+                self.touch(dependent_source, dependent_ids)
+    
+    def flush(self):
+        """
+        Write the difference between the current and recorded contributions
+        and invalidate the cached dashboards of the scopes involved.
+        """
+        if self.stage_contact_ids:
+            from mobilize.pipeline.contact_stages import sync_contact_stages
+            
+            sync_contact_stages(self.stage_contact_ids)
+        
+        after = Counter()
+        for source, ids in self.touched.items():
+            if ids:
+                after.update(CONTRIBUTION_SOURCES[source](ids))
+        
+        keys = set(after) | set(self.before)
+        apply_rollup_deltas({key: after[key] - self.before[key] for key in keys})
+        
+        # Every office and user the rows belonged to before or after the change
+        # may be showing different numbers or list entries now
+        from mobilize.core.dashboard_metrics import bump_dashboard_generations
+        
+        if keys:
+            bump_dashboard_generations(
+                office_ids={key[2] for key in keys},
+                user_ids={key[3] for key in keys} | {key[4] for key in keys},
+            )
+        
+        self.touched = {source: set() for source in CONTRIBUTION_SOURCES}
+        self.before = Counter()
+        self.stage_contact_ids = set()
+
+
+def get_active_batch():
+    """Return the batch opened by rollup_batch() on this thread, if any."""
+    return getattr(_local, 'batch', None)
+
+
+@contextmanager
+def rollup_batch():
+    """
+    Defer rollup maintenance until the end of a block of changes.
+    
+    Signal handlers register changed rows with the open batch instead of
+    writing deltas per save, and queryset updates inside the block can
+    register their rows with batch.touch() before updating. Nested blocks
+    share the outermost batch.
+    
+    Yields:
+        RollupBatch instance
+    """
+    batch = get_active_batch()
+    if batch is not None:
+        yield batch
+        return
+    
+    batch = RollupBatch()
+    _local.batch = batch
+    try:
+        yield batch
+    finally:
+        _local.batch = None
+    batch.flush()
+
+
+def _pending_changes():
+    """Get this thread's in-flight single-row changes keyed by (source, id)."""
+    if not hasattr(_local, 'pending'):
+        _local.pending = {}
+    return _local.pending
+
+
+def reset_pending_changes():
+    """Discard in-flight changes left behind by saves that raised."""
+    _local.pending = {}
+
+
+def rollup_pre_change(source, obj_id, dependents=True):
+    """
+    Record a row's contributions before it is saved or deleted.
+    
+    Overlapping changes to the same row, such as a contact delete cascading
+    to its Person, share one snapshot and are written once the outermost
+    change completes.
+    
+    Args:
+        source: Contribution source of the changed instance
+        obj_id: ID of the source row the instance belongs to
+        dependents: Whether the change can move a contact's tasks and
+            communications to other rollup keys
+    """
+    if obj_id is None:
+        return
+    batch = get_active_batch()
+    if batch is not None:
+        batch.touch(source, [obj_id], dependents=dependents)
+        return
+    
+    pending = _pending_changes()
+    entry = pending.get((source, obj_id))
+    if entry is None:
+        batch = RollupBatch()
+        batch.touch(source, [obj_id], dependents=dependents)
+        pending[(source, obj_id)] = [batch, 1]
+    else:
+        entry[1] += 1
+
+
+def rollup_post_change(source, obj_id, created=False):
+    """
+    Write rollup deltas after a row was saved or deleted.
+    
+    Args:
+        source: Contribution source of the changed instance
+        obj_id: ID of the source row the instance belongs to
+        created: Whether the row was newly created
+    """
+    if obj_id is None:
+        return
+    batch = get_active_batch()
+    if batch is not None:
+        # Rows created by this save had nothing to snapshot beforehand
+        batch.touch(source, [obj_id], snapshot=not created)
+        return
+    
+    pending = _pending_changes()
+    entry = pending.get((source, obj_id))
+    if entry is None:
+        batch = RollupBatch()
+        batch.touch(source, [obj_id], snapshot=False)
+        batch.flush()
+        return
+    
+    entry[1] -= 1
+    if entry[1] <= 0:
+        del pending[(source, obj_id)]
+        entry[0].flush()
+
+
+def rebuild_rollups():
+    """
+    Rebuild the rollup table from the source tables.
+    
+    Returns:
+        Number of rollup rows written
+    """
+    from mobilize.contacts.models import Contact
+    from mobilize.tasks.models import Task
+    from mobilize.communications.models import Communication
+    from mobilize.core.models import DashboardRollup
+    
+    sources = [
+        (contact_contributions, Contact.objects.filter(
+            Q(person_details__isnull=False) | Q(church_details__isnull=False)
+        )),
+        (task_contributions, Task.objects.all()),
+        (communication_contributions, Communication.objects.all()),
+    ]
+    
+    totals = Counter()
+    for contributions, queryset in sources:
+        ids = []
+        for pk in queryset.order_by().values_list('pk', flat=True).iterator(chunk_size=REBUILD_CHUNK_SIZE):
+            ids.append(pk)
+            if len(ids) >= REBUILD_CHUNK_SIZE:
+                totals.update(contributions(ids))
+                ids = []
+        totals.update(contributions(ids))
+    
+    rows = [
+        DashboardRollup(
+            key=_key_string(key), metric=key[0], scope=key[1], office_id=key[2], user_id=key[3],
+            other_user_id=key[4], bucket=key[5], day=key[6], count=count,
+        )
+        for key, count in totals.items()
+        if count
+    ]
+    rows.append(DashboardRollup(key=META_KEY, metric=META_KEY, scope='meta', count=1))
+    
+    with transaction.atomic():
+        DashboardRollup.objects.all().delete()
+        DashboardRollup.objects.bulk_create(rows, batch_size=REBUILD_CHUNK_SIZE)
+    
+    return len(rows)
+
+
+def _scope_filters(access_manager):
+    """
+    Translate a DataAccessManager scope into rollup row filters.
+    
+    Mirrors the querysets built by DataAccessManager for each source.
+    
+    Returns:
+        Q object selecting the rollup rows visible to the scope
+    """
+    user_id = access_manager.user.id
+    role = access_manager.user_role
+    my_only = access_manager.view_mode == 'my_only'
+    office_id = access_manager.selected_office_id
+    nothing = Q(pk__in=[])
+    
+    cell = Q(scope='cell')
+    task_owner = Q(user_id=user_id) | Q(other_user_id=user_id)
+    
+    if role == 'super_admin':
+        if my_only:
+            people = Q(user_id=user_id)
+            tasks = cell & task_owner
+            communications = cell & Q(user_id=user_id)
+        elif office_id:
+            people = Q(office_id=office_id)
+            tasks = Q(scope='office', office_id=office_id)
+            communications = Q(scope='office', office_id=office_id)
+        else:
+            people = Q()
+            tasks = cell
+            communications = cell
+        churches = Q(office_id=office_id) if office_id else Q()
+    else:
+        offices = access_manager._get_user_offices()
+        if role == 'office_admin' and not my_only:
+            people = Q(office_id__in=offices) | Q(user_id=user_id)
+        else:
+            people = Q(user_id=user_id)
+        if role in ['office_admin', 'standard_user', 'limited_user']:
+            churches = Q(office_id__in=offices)
+        else:
+            churches = nothing
+        tasks = cell & task_owner
+        communications = cell & Q(user_id=user_id)
+    
+    return (
+        Q(scope='meta')
+        | (Q(metric__in=PEOPLE_METRICS) & cell & people)
+        | (Q(metric__in=CHURCH_METRICS) & cell & churches)
+        | (Q(metric__in=TASK_METRICS) & tasks)
+        | (Q(metric__in=COMMUNICATION_METRICS) & communications)
+    )
+
+
+def _sum(**lookups):
+    return Sum('count', filter=Q(**lookups))
+
+
+def get_rollup_metrics(access_manager, days):
+    """
+    Read dashboard counts for a scope from the rollup table in one query.
+    
+    The pending task and recent communication lists are not included.
+    
+    Args:
+        access_manager: DataAccessManager defining the visible data
+        days: Dates covered by the activity timeline, oldest first
+    
+    Returns:
+        DashboardMetrics instance, or None if the rollups have not been built
+    """
+    from mobilize.core.dashboard_metrics import DashboardMetrics, _pipeline_distribution
+    from mobilize.core.models import DashboardRollup
+    from mobilize.pipeline.models import MAIN_PEOPLE_PIPELINE_STAGES, MAIN_CHURCH_PIPELINE_STAGES
+    from mobilize.tasks.models import Task
+    
+    today = timezone.localdate()
+    week_start = today - timedelta(days=7)
+    priorities = [code for code, _ in Task.PRIORITY_CHOICES]
+    
+    aggregates = {
+        'ready': _sum(scope='meta'),
+        'people': _sum(metric='people'),
+        'recent_people': _sum(metric='people', day__gte=week_start),
+        'churches': _sum(metric='churches'),
+        'recent_churches': _sum(metric='churches', day__gte=week_start),
+        'with_contacts': _sum(metric='churches', bucket='with_contact'),
+        'church_activity': _sum(metric='church_activity', day__gte=week_start),
+        'pending': _sum(metric='pending_tasks'),
+        'overdue': _sum(metric='pending_tasks', day__lt=today),
+        'upcoming': _sum(metric='pending_tasks', day__range=[today, today + timedelta(days=7)]),
+        'completed_this_week': _sum(metric='completed_tasks', day__gte=week_start),
+        'communications_this_week': _sum(metric='communications', day__gte=week_start),
+        'priority_none': _sum(metric='pending_tasks', bucket=''),
+    }
+    for code in priorities:
+        aggregates[f'priority_{code}'] = _sum(metric='pending_tasks', bucket=code)
+    for stage_code, stage_name in MAIN_PEOPLE_PIPELINE_STAGES:
+        aggregates[f'people_stage_{stage_code}'] = _sum(metric='people_stage', bucket=stage_code)
+    for stage_code, stage_name in MAIN_CHURCH_PIPELINE_STAGES:
+        aggregates[f'church_stage_{stage_code}'] = _sum(metric='church_stage', bucket=stage_code)
+    for index, day in enumerate(days):
+        aggregates[f'people_day_{index}'] = _sum(metric='people', day=day)
+        aggregates[f'tasks_day_{index}'] = _sum(metric='completed_tasks', day=day)
+        aggregates[f'communications_day_{index}'] = _sum(metric='communications', day=day)
+    
+    result = DashboardRollup.objects.filter(_scope_filters(access_manager)).aggregate(**aggregates)
+    if not result['ready']:
+        return None
+    result = {name: value or 0 for name, value in result.items()}
+    
+    metrics = DashboardMetrics(
+        people_count=result['people'],
+        churches_count=result['churches'],
+        recent_people=result['recent_people'],
+        recent_churches=result['recent_churches'],
+        pending_tasks_count=result['pending'],
+        overdue_tasks=result['overdue'],
+        upcoming_tasks=result['upcoming'],
+        completed_this_week=result['completed_this_week'],
+        communications_this_week=result['communications_this_week'],
+        people_pipeline=_pipeline_distribution(result, 'people_stage', MAIN_PEOPLE_PIPELINE_STAGES),
+        churches_pipeline=_pipeline_distribution(result, 'church_stage', MAIN_CHURCH_PIPELINE_STAGES),
+        church_stats={
+            'total': result['churches'],
+            'with_contacts': result['with_contacts'],
+            'recent_activity': result['church_activity'],
+        },
+        activity_timeline=[
+            {
+                'date': day.strftime('%m/%d'),
+                'people': result[f'people_day_{index}'],
+                'tasks': result[f'tasks_day_{index}'],
+                'communications': result[f'communications_day_{index}'],
+            }
+            for index, day in enumerate(days)
+        ],
+    )
+    metrics.priority_distribution = [
+        {'priority': code, 'count': result[f'priority_{code}']}
+        for code in priorities
+        if result[f'priority_{code}']
+    ]
+    if result['priority_none']:
+        metrics.priority_distribution.append({'priority': None, 'count': result['priority_none']})
+    return metrics
+
+
+def get_office_rollup_stats(office_members):
+    """
+    Read per-office counts for the cross-office report from the rollups.
+    
+    People are counted when they belong to the office or are owned by one of
+    its users, and pending tasks when they are assigned to or created by one
+    of its users.
+    
+    Args:
+        office_members: Dict of office ID to the set of its user IDs
+    
+    Returns:
+        Tuple (per-office dict, totals dict), or None if the rollups have not
+        been built
+    """
+    from mobilize.core.models import DashboardRollup
+    
+    rollups = DashboardRollup.objects.filter(scope='cell')
+    if not DashboardRollup.objects.filter(key=META_KEY).exists():
+        return None
+    
+    people = rollups.filter(metric='people').values_list('office_id', 'user_id').annotate(total=Sum('count'))
+    churches = rollups.filter(metric='churches').values_list('office_id').annotate(total=Sum('count'))
+    tasks = rollups.filter(metric='tasks').values_list('bucket', 'user_id', 'other_user_id').annotate(total=Sum('count'))
+    
+    people = list(people)
+    churches = dict(churches)
+    tasks = list(tasks)
+    
+    stats = {}
+    for office_id, members in office_members.items():
+        stats[office_id] = {
+            'people_count': sum(
+                total for person_office, owner, total in people
+                if person_office == office_id or owner in members
+            ),
+            'churches_count': churches.get(office_id, 0),
+            'pending_tasks': sum(
+                total for status, assignee, creator, total in tasks
+                if status == 'pending' and (assignee in members or creator in members)
+            ),
+        }
+    
+    totals = {
+        'total_people': sum(total for _, _, total in people),
+        'total_churches': sum(churches.values()),
+        'total_tasks': sum(total for _, _, _, total in tasks),
+    }
+    return stats, totals
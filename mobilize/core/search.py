@@ -0,0 +1,627 @@
+"""
+Search index for people, churches, tasks and communications.
+
+Every searchable row has a SearchDocument holding its own text and the
+names of the records it links to, so a search reads one table instead of
+OR-ing LIKE conditions across several joins. Model signals rebuild the
+document of a row when it is saved or deleted, bulk code paths can defer
+that work with search_index_batch(), and a nightly Celery job rebuilds the
+table from scratch to correct any drift.
+
+On PostgreSQL the lower-cased document column is covered by a trigram GIN
+index that answers the substring matches, and results are ranked with the
+weighted full-text vector. Other databases, such as the SQLite test
+database, run the same substring matches without the indexes and rank by
+which weighted column a term was found in.
+"""
+import logging
+import re
+import threading
+import unicodedata
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, FloatField, Q, Value, When
+
+logger = logging.getLogger(__name__)
+
+
+# Batch size used when reading source rows during a rebuild
+REBUILD_CHUNK_SIZE = 1000
+
+META_SOURCE = 'meta'
+
+# Search result types and the (source, kind) of their documents
+SEARCH_TYPES = {
+    'person': ('contact', 'person'),
+    'church': ('contact', 'church'),
+    'task': ('task', ''),
+    'communication': ('communication', ''),
+}
+
+# Terms shorter than this only match at the start of a word
+MIN_SUBSTRING_TERM = 3
+MAX_TERMS = 8
+
+# Rank added for a term found in the A, B and C columns
+COLUMN_WEIGHTS = (('text_a', 1.0), ('text_b', 0.4), ('text_c', 0.1))
+
+# Long free-text fields, such as email bodies, are truncated before indexing
+MAX_TEXT_LENGTH = 10000
+MAX_PREFIX_KEY_LENGTH = 100
+
+_local = threading.local()
+_SEPARATORS = re.compile(r'[^\w@.+-]+')
+
+
+def normalize_text(value):
+    """
+    Lower-case text, strip accents and collapse punctuation to spaces.
+    
+    Args:
+        value: Text to normalize, or None
+    
+    Returns:
+        Normalized string
+    """
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKD', str(value)[:MAX_TEXT_LENGTH])
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return ' '.join(_SEPARATORS.sub(' ', value.lower()).split())
+
+
+def _join(*values):
+    return ' '.join(text for text in (normalize_text(value) for value in values) if text)
+
+
+def _digits(value):
+    return ''.join(ch for ch in value or '' if ch.isdigit())
+
+
+def _person_name(contact):
+    if contact is None:
+        return ''
+    return ' '.join(part for part in (contact.first_name, contact.last_name) if part)
+
+
+def _church_name(church):
+    if church is None:
+        return ''
+    return church.name or church.contact.church_name or ''
+
+
+def _prefix_keys(*values):
+    """Normalize names and emails into distinct typeahead keys, in order."""
+    keys = []
+    for value in values:
+        key = normalize_text(value)[:MAX_PREFIX_KEY_LENGTH]
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def _document(source, object_id, title, subtitle='', a=(), b=(), c=(), kind='', office_id=None, user_id=None):
+    from mobilize.core.models import SearchDocument
+    
+    text_a, text_b, text_c = _join(*a), _join(*b), _join(*c)
+    return SearchDocument(
+        source=source, object_id=object_id, kind=kind, office_id=office_id or 0, user_id=user_id or 0,
+        title=(title or '')[:255], subtitle=(subtitle or '')[:255],
+        text_a=text_a, text_b=text_b, text_c=text_c,
+        # Leading space lets short terms match at the start of any word
+        document=f' {text_a} {text_b} {text_c} ',
+    )
+
+
+def contact_documents(contact_ids):
+    """
+    Build the search documents of a set of people and churches.
+    
+    Each document also carries the typeahead keys of its contact in a
+    ``prefix_keys`` attribute.
+    
+    Args:
+        contact_ids: IDs of Contact rows
+    
+    Returns:
+        Dict of contact ID to unsaved SearchDocument
+    """
+    from mobilize.contacts.models import Contact
+    
+    contacts = Contact.objects.filter(pk__in=contact_ids).select_related('person_details', 'church_details')
+    documents = {}
+    for contact in contacts:
+        person = getattr(contact, 'person_details', None)
+        church = getattr(contact, 'church_details', None)
+        shared = (contact.email, contact.phone, _digits(contact.phone), contact.city, contact.state)
+        
+        if person is not None:
+            name = _person_name(contact) or person.preferred_name or contact.email or ''
+            document = _document(
+                'contact', contact.pk, name, contact.email, kind='person',
+                office_id=contact.office_id, user_id=contact.user_id,
+                a=(contact.first_name, contact.last_name, person.preferred_name),
+                b=shared + (person.organization, person.profession, person.spouse_first_name, person.spouse_last_name),
+                c=(contact.notes,),
+            )
+            document.prefix_keys = _prefix_keys(
+                _person_name(contact), contact.last_name, person.preferred_name, contact.email
+            )
+        elif church is not None:
+            document = _document(
+                'contact', contact.pk, church.name or contact.church_name, church.location,
+                kind='church', office_id=contact.office_id, user_id=contact.user_id,
+                a=(church.name, contact.church_name),
+                b=shared + (church.location, church.denomination, church.pastor_name),
+                c=(contact.notes,),
+            )
+            document.prefix_keys = _prefix_keys(church.name, contact.church_name, contact.email)
+        else:
+            continue
+        documents[contact.pk] = document
+    return documents
+
+
+def task_documents(task_ids):
+    """
+    Build the search documents of a set of tasks.
+    
+    Args:
+        task_ids: IDs of Task rows
+    
+    Returns:
+        Dict of task ID to unsaved SearchDocument
+    """
+    from mobilize.tasks.models import Task
+    
+    tasks = Task.objects.filter(pk__in=task_ids).select_related('person__contact', 'church__contact')
+    documents = {}
+    for task in tasks:
+        person_name = _person_name(task.person.contact) if task.person else ''
+        church_name = _church_name(task.church)
+        documents[task.pk] = _document(
+            'task', task.pk, task.title, person_name or church_name,
+            office_id=task.office_id, user_id=task.assigned_to_id,
+            a=(task.title,),
+            b=(person_name, church_name, task.category),
+            c=(task.description, task.completion_notes),
+        )
+    return documents
+
+
+def communication_documents(communication_ids):
+    """
+    Build the search documents of a set of communications.
+    
+    Args:
+        communication_ids: IDs of Communication rows
+    
+    Returns:
+        Dict of communication ID to unsaved SearchDocument
+    """
+    from mobilize.communications.models import Communication
+    
+    communications = Communication.objects.filter(pk__in=communication_ids).select_related(
+        'person__contact', 'church__contact'
+    )
+    documents = {}
+    for communication in communications:
+        person_name = _person_name(communication.person.contact) if communication.person else ''
+        church_name = _church_name(communication.church)
+        documents[communication.pk] = _document(
+            'communication', communication.pk,
+            communication.subject or (communication.type or 'communication').title(),
+            person_name or church_name or communication.sender,
+            office_id=communication.office_id, user_id=communication.user_id,
+            a=(communication.subject,),
+            b=(communication.sender, person_name, church_name, communication.type),
+            c=(communication.message, communication.content),
+        )
+    return documents
+
+
+DOCUMENT_SOURCES = {
+    'contact': contact_documents,
+    'task': task_documents,
+    'communication': communication_documents,
+}
+
+
+def _update_vectors(documents):
+    """Fill in the weighted full-text vectors of a SearchDocument QuerySet on PostgreSQL."""
+    if connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.search import SearchVector
+    
+    documents.update(
+        search_vector=(
+            SearchVector('text_a', weight='A', config='simple')
+            + SearchVector('text_b', weight='B', config='simple')
+            + SearchVector('text_c', weight='C', config='simple')
+        )
+    )
+
+
+def _prefix_rows(documents):
+    """Build the unsaved SearchPrefix rows of a set of contact documents."""
+    from mobilize.core.models import SearchPrefix
+    
+    return [
+        SearchPrefix(
+            contact_id=document.object_id, kind=document.kind, key=key,
+            office_id=document.office_id, user_id=document.user_id,
+            label=document.title, email=document.subtitle if document.kind == 'person' else '',
+        )
+        for document in documents
+        for key in document.prefix_keys
+    ]
+
+
+def index_objects(source, ids):
+    """
+    Rebuild the search documents of a set of source rows.
+    
+    Rows that no longer exist or are not searchable lose their document.
+    Contacts also get their typeahead keys rebuilt. When a contact's name
+    changes, the tasks and communications showing that name are reindexed
+    too.
+    
+    Args:
+        source: 'contact', 'task' or 'communication'
+        ids: IDs of the source rows
+    
+    Returns:
+        Number of documents written
+    """
+    from mobilize.core.models import SearchDocument, SearchPrefix
+    
+    ids = {pk for pk in ids if pk is not None}
+    if not ids:
+        return 0
+    
+    documents = DOCUMENT_SOURCES[source](ids)
+    existing = SearchDocument.objects.filter(source=source, object_id__in=ids)
+    old_rows = {
+        pk: (title, office_id, user_id)
+        for pk, title, office_id, user_id in existing.values_list('object_id', 'title', 'office_id', 'user_id')
+    } if source == 'contact' else None
+    
+    with transaction.atomic():
+        existing.delete()
+        SearchDocument.objects.bulk_create(documents.values())
+        _update_vectors(SearchDocument.objects.filter(source=source, object_id__in=documents))
+        if source == 'contact':
+            SearchPrefix.objects.filter(contact_id__in=ids).delete()
+            SearchPrefix.objects.bulk_create(_prefix_rows(documents.values()))
+    
+    if old_rows is not None:
+        from mobilize.core.typeahead import bump_typeahead_generations
+        
+        rows = list(old_rows.values()) + [
+            (document.title, document.office_id, document.user_id) for document in documents.values()
+        ]
+        bump_typeahead_generations(
+            office_ids={office_id for _, office_id, _ in rows},
+            user_ids={user_id for _, _, user_id in rows},
+        )
+        
+        old_titles = {pk: title for pk, (title, _, _) in old_rows.items()}
+        renamed = {
+            pk for pk in ids
+            if old_titles.get(pk) != (documents[pk].title if pk in documents else None)
+        }
+        if renamed:
+            from mobilize.core.rollups import _contact_dependents
+            
+            for dependent_source, dependent_ids in _contact_dependents(renamed).items():
+                index_objects(dependent_source, list(dependent_ids))
+    
+    return len(documents)
+
+
+class SearchIndexBatch:
+    """
+    Collects source rows whose search documents need rebuilding.
+    """
+    
+    def __init__(self):
+        self.touched = {source: set() for source in DOCUMENT_SOURCES}
+    
+    def touch(self, source, ids):
+        """
+        Register changed source rows.
+        
+        Args:
+            source: 'contact', 'task' or 'communication'
+            ids: IDs of the rows
+        """
+        self.touched[source].update(pk for pk in ids if pk is not None)
+    
+    def flush(self):
+        """Rebuild the documents of every registered row."""
+        for source, ids in self.touched.items():
+            ids = list(ids)
+            for start in range(0, len(ids), REBUILD_CHUNK_SIZE):
+                index_objects(source, ids[start:start + REBUILD_CHUNK_SIZE])
+        self.touched = {source: set() for source in DOCUMENT_SOURCES}
+
+
+def get_active_search_batch():
+    """Return the batch opened by search_index_batch() on this thread, if any."""
+    return getattr(_local, 'batch', None)
+
+
+@contextmanager
+def search_index_batch():
+    """
+    Defer search index maintenance until the end of a block of changes.
+    
+    Signal handlers register changed rows with the open batch instead of
+    reindexing per save, and queryset updates inside the block can register
+    their rows with batch.touch(). Nested blocks share the outermost batch.
+    
+    Yields:
+        SearchIndexBatch instance
+    """
+    batch = get_active_search_batch()
+    if batch is not None:
+        yield batch
+        return
+    
+    batch = SearchIndexBatch()
+    _local.batch = batch
+    try:
+        yield batch
+    finally:
+        _local.batch = None
+    batch.flush()
+
+
+def touch_search_documents(source, ids):
+    """
+    Reindex changed source rows now, or when the open batch completes.
+    
+    Args:
+        source: 'contact', 'task' or 'communication'
+        ids: IDs of the changed rows
+    """
+    batch = get_active_search_batch()
+    if batch is not None:
+        batch.touch(source, ids)
+        return
+    index_objects(source, ids)
+
+
+def rebuild_search_index():
+    """
+    Rebuild the search document table from the source tables.
+    
+    Returns:
+        Number of documents written
+    """
+    from mobilize.contacts.models import Contact
+    from mobilize.tasks.models import Task
+    from mobilize.communications.models import Communication
+    from mobilize.core.models import SearchDocument, SearchPrefix
+    from mobilize.core.typeahead import bump_typeahead_index
+    
+    sources = [
+        (contact_documents, Contact.objects.filter(
+            Q(person_details__isnull=False) | Q(church_details__isnull=False)
+        )),
+        (task_documents, Task.objects.all()),
+        (communication_documents, Communication.objects.all()),
+    ]
+    
+    def write(builder, ids):
+        documents = builder(ids).values()
+        SearchDocument.objects.bulk_create(documents, batch_size=REBUILD_CHUNK_SIZE)
+        if builder is contact_documents:
+            SearchPrefix.objects.bulk_create(_prefix_rows(documents), batch_size=REBUILD_CHUNK_SIZE)
+        return len(documents)
+    
+    total = 0
+    # Readers keep seeing the old index until the rebuild commits
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        SearchPrefix.objects.all().delete()
+        for builder, queryset in sources:
+            ids = []
+            for pk in queryset.order_by().values_list('pk', flat=True).iterator(chunk_size=REBUILD_CHUNK_SIZE):
+                ids.append(pk)
+                if len(ids) >= REBUILD_CHUNK_SIZE:
+                    total += write(builder, ids)
+                    ids = []
+            total += write(builder, ids)
+        _update_vectors(SearchDocument.objects.all())
+        SearchDocument.objects.create(source=META_SOURCE, object_id=0)
+    
+    bump_typeahead_index()
+    return total
+
+
+def search_index_ready():
+    """Return whether list views should filter through the search index."""
+    from mobilize.core.models import SearchDocument
+    
+    if not getattr(settings, 'SEARCH_USE_INDEX', True):
+        return False
+    return SearchDocument.objects.filter(source=META_SOURCE, object_id=0).exists()
+
+
+def _terms(query):
+    return normalize_text(query).split()[:MAX_TERMS]
+
+
+def _term_filter(term):
+    if len(term) < MIN_SUBSTRING_TERM:
+        return Q(document__contains=f' {term}')
+    return Q(document__contains=term)
+
+
+def match_documents(query, types=None):
+    """
+    Find the search documents containing every term of a query.
+    
+    Terms of three or more characters match anywhere in the text, shorter
+    ones at the start of a word.
+    
+    Args:
+        query: Search text as typed by the user
+        types: Optional list of SEARCH_TYPES keys to restrict the results to
+    
+    Returns:
+        SearchDocument QuerySet, or None if the query has no searchable terms
+    """
+    from mobilize.core.models import SearchDocument
+    
+    terms = _terms(query)
+    if not terms:
+        return None
+    
+    documents = SearchDocument.objects.exclude(source=META_SOURCE)
+    if types:
+        kinds = Q(pk__in=[])
+        for search_type in types:
+            source, kind = SEARCH_TYPES[search_type]
+            kinds |= Q(source=source, kind=kind)
+        documents = documents.filter(kinds)
+    for term in terms:
+        documents = documents.filter(_term_filter(term))
+    return documents
+
+
+def rank_documents(documents, query):
+    """
+    Annotate matched documents with a relevance rank.
+    
+    Each term scores by the most important column it appears in, and a
+    title starting with the whole query scores extra. On PostgreSQL the
+    full-text rank of the weighted vector is added.
+    
+    Args:
+        documents: QuerySet from match_documents()
+        query: Search text the documents were matched with
+    
+    Returns:
+        QuerySet annotated with 'rank'
+    """
+    terms = _terms(query)
+    rank = Case(
+        When(document__startswith=f' {" ".join(terms)}', then=Value(0.5)),
+        default=Value(0.0), output_field=FloatField(),
+    )
+    for term in terms:
+        rank = rank + Case(
+            *[When(**{f'{column}__contains': term}, then=Value(weight)) for column, weight in COLUMN_WEIGHTS],
+            default=Value(0.0), output_field=FloatField(),
+        )
+    
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        
+        prefix_query = ' & '.join(f"'{term}':*" for term in terms)
+        rank = rank + SearchRank('search_vector', SearchQuery(prefix_query, search_type='raw', config='simple'))
+    
+    return documents.annotate(rank=rank)
+
+
+def sees_all_data(access_manager):
+    """Return whether an access manager's querysets are unfiltered."""
+    return (
+        access_manager.user_role == 'super_admin'
+        and access_manager.view_mode != 'my_only'
+        and not access_manager.selected_office_id
+    )
+
+
+def _visible_documents(documents, access_manager):
+    """Restrict documents to the rows an access manager can see."""
+    if sees_all_data(access_manager):
+        return documents
+    return documents.filter(
+        Q(source='contact', kind='person', object_id__in=access_manager.get_people_queryset().values('pk'))
+        | Q(source='contact', kind='church', object_id__in=access_manager.get_churches_queryset().values('pk'))
+        | Q(source='task', object_id__in=access_manager.get_tasks_queryset().values('pk'))
+        | Q(source='communication', object_id__in=access_manager.get_communications_queryset().values('pk'))
+    )
+
+
+def _result_url(search_type, object_id):
+    from django.urls import reverse
+    
+    names = {
+        'person': 'contacts:person_detail',
+        'church': 'churches:church_detail',
+        'task': 'tasks:task_detail',
+        'communication': 'communications:communication_detail',
+    }
+    return reverse(names[search_type], args=[object_id])
+
+
+def search(query, access_manager, types=None, limit=20):
+    """
+    Search everything a user can see, best matches first.
+    
+    Args:
+        query: Search text as typed by the user
+        access_manager: DataAccessManager of the requesting user
+        types: Optional list of SEARCH_TYPES keys to restrict the results to
+        limit: Maximum number of results
+    
+    Returns:
+        List of result dicts with type, id, title, subtitle, url and rank
+    """
+    documents = match_documents(query, types)
+    if documents is None:
+        return []
+    
+    documents = rank_documents(_visible_documents(documents, access_manager), query)
+    rows = documents.order_by('-rank', 'title', 'pk').values(
+        'source', 'kind', 'object_id', 'title', 'subtitle', 'rank'
+    )[:limit]
+    
+    results = []
+    for row in rows:
+        search_type = row['kind'] if row['source'] == 'contact' else row['source']
+        results.append({
+            'type': search_type,
+            'id': row['object_id'],
+            'title': row['title'],
+            'subtitle': row['subtitle'],
+            'url': _result_url(search_type, row['object_id']),
+            'rank': round(row['rank'], 4),
+        })
+    return results
+
+
+def filter_by_search(queryset, query, search_type, fallback_fields, id_field='pk'):
+    """
+    Filter a list view queryset to the rows matching a search query.
+    
+    Until the index has been built, the rows are matched with icontains
+    over the fallback fields instead.
+    
+    Args:
+        queryset: QuerySet to filter
+        query: Search text as typed by the user
+        search_type: SEARCH_TYPES key of the queryset's rows
+        fallback_fields: Field paths matched when the index is not ready
+        id_field: Field of the queryset holding the indexed row's ID
+    
+    Returns:
+        Filtered QuerySet
+    """
+    query = (query or '').strip()
+    if not query:
+        return queryset
+    
+    documents = match_documents(query, [search_type]) if search_index_ready() else None
+    if documents is None:
+        condition = Q(pk__in=[])
+        for field in fallback_fields:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition)
+    return queryset.filter(**{f'{id_field}__in': documents.values('object_id')})
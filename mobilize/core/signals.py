@@ -0,0 +1,234 @@
+from django.core.signals import request_started
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+
+from .report_jobs import REPORT_DATA_SOURCES, SCOPE_DATA_SOURCES, bump_data_version
+from .rollups import get_active_batch, reset_pending_changes, rollup_pre_change, rollup_post_change
+from .search import touch_search_documents
+
+
+# Every model that feeds a report; saves and deletes invalidate cached artifacts
+TRACKED_MODELS = sorted({
+    label for labels in REPORT_DATA_SOURCES.values() for label in labels
+} | set(SCOPE_DATA_SOURCES))
+
+
+# Fields whose saves never change what a report shows, such as the login
+# timestamp written on every sign-in
+REPORT_IGNORED_FIELDS = frozenset({'last_login'})
+
+
+def invalidate_report_artifacts(sender, update_fields=None, **kwargs):
+    """
+    Signal handler that bumps the report data version of the saved model.
+    """
+    if update_fields and set(update_fields) <= REPORT_IGNORED_FIELDS:
+        return
+    bump_data_version(sender._meta.label)
+
+
+def connect_report_signals():
+    """Connect the invalidation handler to every tracked model."""
+    from django.apps import apps
+    
+    for label in TRACKED_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(invalidate_report_artifacts, sender=model, dispatch_uid=f'report_version_save_{label}')
+        post_delete.connect(invalidate_report_artifacts, sender=model, dispatch_uid=f'report_version_delete_{label}')
+
+
+# Models feeding the dashboard rollups, with the contribution source they
+# belong to and the attribute holding that source row's ID
+ROLLUP_MODELS = {
+    'contacts.Contact': ('contact', 'pk'),
+    'contacts.Person': ('contact', 'contact_id'),
+    'churches.Church': ('contact', 'contact_id'),
+    'pipeline.PipelineContact': ('contact', 'contact_id'),
+    'tasks.Task': ('task', 'pk'),
+    'communications.Communication': ('communication', 'pk'),
+}
+
+
+# Models whose deletion unlinks the tasks and communications of a contact
+UNLINKING_MODELS = {'contacts.Contact', 'contacts.Person', 'churches.Church'}
+
+
+def _contact_office_changed(sender, instance, update_fields=None):
+    """Check whether a contact about to be saved moves to another office."""
+    if instance._state.adding or (update_fields is not None and 'office' not in update_fields):
+        return False
+    stored = list(sender._base_manager.filter(pk=instance.pk).values_list('office_id', flat=True))
+    return bool(stored) and stored[0] != instance.office_id
+
+
+def track_rollup_change(sender, instance, raw=False, signal=None, update_fields=None, **kwargs):
+    """
+    Signal handler that snapshots rollup contributions before a save or delete.
+    
+    A contact's tasks and communications are bucketed by the contact's
+    office, so they are only snapshotted as well when the contact moves
+    office or a delete unlinks them.
+    """
+    if raw:
+        return
+    label = sender._meta.label
+    source, attr = ROLLUP_MODELS[label]
+    if signal is pre_delete:
+        dependents = label in UNLINKING_MODELS
+    else:
+        dependents = label == 'contacts.Contact' and _contact_office_changed(sender, instance, update_fields)
+    rollup_pre_change(source, getattr(instance, attr), dependents=dependents)
+
+
+def apply_rollup_change(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Signal handler that writes rollup deltas after a save or delete.
+    """
+    if raw:
+        return
+    source, attr = ROLLUP_MODELS[sender._meta.label]
+    rollup_post_change(source, getattr(instance, attr), created=created)
+
+
+def invalidate_membership_dashboards(sender, instance, **kwargs):
+    """
+    Signal handler that invalidates a user's cached dashboards when their
+    office membership changes.
+    """
+    from .dashboard_metrics import bump_dashboard_generations
+    
+    bump_dashboard_generations(user_ids=[instance.user_id])
+
+
+def invalidate_membership_permissions(sender, instance, **kwargs):
+    """
+    Signal handler that invalidates a user's cached office memberships.
+    """
+    from .permission_context import invalidate_permission_context
+    
+    # Only drop the memo on a user instance that is already loaded
+    invalidate_permission_context(instance.user_id, instance._state.fields_cache.get('user'))
+
+
+def reset_rollup_state(sender, **kwargs):
+    """
+    Signal handler that clears rollup changes left in flight by a failed save.
+    """
+    reset_pending_changes()
+
+
+def connect_rollup_signals():
+    """Connect the rollup maintenance and dashboard invalidation handlers."""
+    from django.apps import apps
+    
+    for label in ROLLUP_MODELS:
+        model = apps.get_model(label)
+        pre_save.connect(track_rollup_change, sender=model, dispatch_uid=f'rollup_pre_save_{label}')
+        post_save.connect(apply_rollup_change, sender=model, dispatch_uid=f'rollup_save_{label}')
+        pre_delete.connect(track_rollup_change, sender=model, dispatch_uid=f'rollup_pre_delete_{label}')
+        post_delete.connect(apply_rollup_change, sender=model, dispatch_uid=f'rollup_delete_{label}')
+    
+    request_started.connect(reset_rollup_state, dispatch_uid='rollup_reset_pending')
+    
+    user_office = apps.get_model('admin_panel.UserOffice')
+    post_save.connect(invalidate_membership_dashboards, sender=user_office, dispatch_uid='dashboard_membership_save')
+    post_delete.connect(invalidate_membership_dashboards, sender=user_office, dispatch_uid='dashboard_membership_delete')
+    post_save.connect(invalidate_membership_permissions, sender=user_office, dispatch_uid='permission_membership_save')
+    post_delete.connect(invalidate_membership_permissions, sender=user_office, dispatch_uid='permission_membership_delete')
+
+
+# Models whose text feeds a search document, with the document source they
+# belong to and the attribute holding that source row's ID
+SEARCH_MODELS = {
+    'contacts.Contact': ('contact', 'pk'),
+    'contacts.Person': ('contact', 'contact_id'),
+    'churches.Church': ('contact', 'contact_id'),
+    'tasks.Task': ('task', 'pk'),
+    'communications.Communication': ('communication', 'pk'),
+}
+
+
+def update_search_document(sender, instance, raw=False, **kwargs):
+    """
+    Signal handler that rebuilds the search document of a saved or deleted row.
+    """
+    if raw:
+        return
+    source, attr = SEARCH_MODELS[sender._meta.label]
+    touch_search_documents(source, [getattr(instance, attr)])
+
+
+def connect_search_signals():
+    """Connect the search index maintenance handler to every indexed model."""
+    from django.apps import apps
+    
+    for label in SEARCH_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(update_search_document, sender=model, dispatch_uid=f'search_save_{label}')
+        post_delete.connect(update_search_document, sender=model, dispatch_uid=f'search_delete_{label}')
+
+
+def record_stage_transition(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Signal handler that counts a stage history row in the funnel rollups.
+    """
+    if raw or not created:
+        return
+    from mobilize.pipeline.funnel import record_transitions
+    
+    record_transitions([instance.pk])
+
+
+def connect_funnel_signals():
+    """Connect the pipeline funnel rollup maintenance handler."""
+    from django.apps import apps
+    
+    post_save.connect(record_stage_transition, sender=apps.get_model('pipeline.PipelineStageHistory'),
+                      dispatch_uid='funnel_history_save')
+
+
+def sync_entry_contact_stage(sender, instance, raw=False, **kwargs):
+    """
+    Signal handler that recomputes a contact's stage code after its entry changes.
+    
+    Inside rollup_batch(), e.g. for entries cascaded by a bulk contact
+    delete, the contact is synced once with the rest of the batch instead.
+    """
+    if raw or not instance.contact_id:
+        return
+    batch = get_active_batch()
+    if batch is not None:
+        batch.touch_contact_stages([instance.contact_id])
+        return
+    from mobilize.pipeline.contact_stages import sync_contact_stages
+    
+    sync_contact_stages([instance.contact_id])
+
+
+def sync_renamed_stage_contacts(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Signal handler that recomputes the stage codes of a saved stage's contacts.
+    """
+    if raw or created:
+        return
+    from mobilize.pipeline.contact_stages import sync_contact_stages
+    
+    sync_contact_stages(instance.current_contacts.values('contact_id'))
+
+
+def connect_contact_stage_signals():
+    """Connect the handlers keeping Contact.pipeline_stage current."""
+    from django.apps import apps
+    
+    pipeline_contact = apps.get_model('pipeline.PipelineContact')
+    post_save.connect(sync_entry_contact_stage, sender=pipeline_contact, dispatch_uid='contact_stage_entry_save')
+    post_delete.connect(sync_entry_contact_stage, sender=pipeline_contact, dispatch_uid='contact_stage_entry_delete')
+    post_save.connect(sync_renamed_stage_contacts, sender=apps.get_model('pipeline.PipelineStage'),
+                      dispatch_uid='contact_stage_stage_save')
+
+
+connect_report_signals()
+# Before the rollup handlers, which read the stage codes written here
+connect_contact_stage_signals()
+connect_rollup_signals()
+connect_search_signals()
+connect_funnel_signals()
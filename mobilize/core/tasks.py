@@ -0,0 +1,212 @@
+"""
+Celery tasks for core functionality.
+
+This module contains background tasks for:
+- Rendering reports and importing CSV uploads outside the request cycle
+- Running bulk operations on people
+- Rebuilding the dashboard rollups, pipeline funnel rollups and search index nightly
+- Purging expired report and import jobs
+"""
+
+import logging
+
+from celery import shared_task
+from django.utils import timezone
+
+from .models import BulkOperationJob, ImportJob, ReportJob
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True)
+def generate_report_job(self, job_id: int):
+    """
+    Render a queued report into file storage.
+    
+    Args:
+        job_id: ID of the ReportJob to render
+    """
+    from .report_jobs import run_report_job
+    
+    try:
+        job = ReportJob.objects.select_related('user').get(id=job_id)
+    except ReportJob.DoesNotExist:
+        logger.error(f"Report job {job_id} not found")
+        return {'status': 'missing', 'job_id': job_id}
+    
+    if job.is_finished:
+        return {'status': job.status, 'job_id': job_id}
+    
+    try:
+        run_report_job(job)
+        logger.info(f"Report job {job_id} completed with {job.total_rows} rows")
+        return {'status': 'completed', 'job_id': job_id, 'rows': job.total_rows}
+    
+    except Exception as exc:
+        logger.error(f"Error generating report job {job_id}: {str(exc)}")
+        ReportJob.objects.filter(pk=job_id).update(
+            status='failed',
+            error_message=str(exc),
+            completed_at=timezone.now(),
+        )
+        return {'status': 'failed', 'job_id': job_id, 'error': str(exc)}
+
+
+@shared_task(bind=True)
+def process_import_job(self, job_id: int):
+    """
+    Import a queued CSV upload.
+    
+    Args:
+        job_id: ID of the ImportJob to process
+    """
+    from .import_jobs import discard_import_upload, run_import_job
+    
+    try:
+        job = ImportJob.objects.select_related('user').get(id=job_id)
+    except ImportJob.DoesNotExist:
+        logger.error(f"Import job {job_id} not found")
+        return {'status': 'missing', 'job_id': job_id}
+    
+    if job.is_finished:
+        return {'status': job.status, 'job_id': job_id}
+    
+    try:
+        run_import_job(job)
+        logger.info(
+            f"Import job {job_id} completed: {job.created_count} created, "
+            f"{job.updated_count} updated, {job.error_count} errors"
+        )
+        return {'status': 'completed', 'job_id': job_id, 'rows': job.rows_processed}
+    
+    except Exception as exc:
+        logger.error(f"Error processing import job {job_id}: {str(exc)}")
+        ImportJob.objects.filter(pk=job_id).update(
+            status='failed',
+            error_message=str(exc),
+            completed_at=timezone.now(),
+        )
+        return {'status': 'failed', 'job_id': job_id, 'error': str(exc)}
+    
+    finally:
+        discard_import_upload(job)
+
+
+@shared_task(bind=True)
+def process_bulk_operation_job(self, job_id: int):
+    """
+    Apply a queued bulk operation.
+    
+    Args:
+        job_id: ID of the BulkOperationJob to process
+    """
+    from .bulk_operation_jobs import run_bulk_operation_job
+    
+    try:
+        job = BulkOperationJob.objects.select_related('user').get(id=job_id)
+    except BulkOperationJob.DoesNotExist:
+        logger.error(f"Bulk operation job {job_id} not found")
+        return {'status': 'missing', 'job_id': job_id}
+    
+    if job.is_finished:
+        return {'status': job.status, 'job_id': job_id}
+    
+    try:
+        run_bulk_operation_job(job)
+        logger.info(f"Bulk operation job {job_id} completed: {job.operation} on {job.processed_count} contacts")
+        return {'status': 'completed', 'job_id': job_id, 'processed': job.processed_count}
+    
+    except Exception as exc:
+        logger.error(f"Error processing bulk operation job {job_id}: {str(exc)}")
+        BulkOperationJob.objects.filter(pk=job_id).update(
+            status='failed',
+            error_message=str(exc),
+            completed_at=timezone.now(),
+        )
+        return {'status': 'failed', 'job_id': job_id, 'error': str(exc)}
+
+
+@shared_task(bind=True)
+def reconcile_dashboard_rollups(self):
+    """
+    Rebuild the dashboard rollups from the source tables.
+    
+    Runs nightly to correct drift from changes that bypass model signals,
+    such as queryset updates outside rollup_batch() and SET_NULL cascades.
+    The contacts' stored pipeline stage codes, which the stage counts are
+    read from, are resynced first.
+    """
+    from mobilize.pipeline.contact_stages import sync_contact_stages
+    from .rollups import rebuild_rollups
+    
+    try:
+        stages = sync_contact_stages()
+        rows = rebuild_rollups()
+        logger.info(f"Rebuilt dashboard rollups with {rows} rows after syncing {stages} contact stages")
+        return {'status': 'completed', 'rows': rows, 'contact_stages': stages}
+    
+    except Exception as exc:
+        logger.error(f"Error rebuilding dashboard rollups: {str(exc)}")
+        return {'status': 'failed', 'error': str(exc)}
+
+
+@shared_task(bind=True)
+def reconcile_pipeline_funnel(self):
+    """
+    Rebuild the pipeline funnel rollups from the stage history.
+    
+    Runs nightly to correct drift from history rows written or removed
+    without going through the transition service or model signals.
+    """
+    from mobilize.pipeline.funnel import rebuild_transition_rollups
+    
+    try:
+        rows = rebuild_transition_rollups()
+        logger.info(f"Rebuilt pipeline funnel rollups with {rows} rows")
+        return {'status': 'completed', 'rows': rows}
+    
+    except Exception as exc:
+        logger.error(f"Error rebuilding pipeline funnel rollups: {str(exc)}")
+        return {'status': 'failed', 'error': str(exc)}
+
+
+@shared_task(bind=True)
+def reconcile_search_index(self):
+    """
+    Rebuild the search index from the source tables.
+    
+    Runs nightly to correct drift from changes that bypass model signals,
+    such as bulk_create, queryset updates and SET_NULL cascades.
+    """
+    from .search import rebuild_search_index
+    
+    try:
+        documents = rebuild_search_index()
+        logger.info(f"Rebuilt search index with {documents} documents")
+        return {'status': 'completed', 'documents': documents}
+    
+    except Exception as exc:
+        logger.error(f"Error rebuilding search index: {str(exc)}")
+        return {'status': 'failed', 'error': str(exc)}
+
+
+@shared_task(bind=True)
+def purge_expired_jobs(self):
+    """
+    Delete expired report and import jobs and their files.
+    
+    Runs nightly so rendered artifacts and uploaded CSVs do not pile up in
+    media storage.
+    """
+    from .import_jobs import purge_expired_import_jobs
+    from .report_jobs import purge_expired_report_jobs
+    
+    try:
+        reports = purge_expired_report_jobs()
+        imports = purge_expired_import_jobs()
+        logger.info(f"Purged {reports} expired report jobs and {imports} expired import jobs")
+        return {'status': 'completed', 'report_jobs': reports, 'import_jobs': imports}
+    
+    except Exception as exc:
+        logger.error(f"Error purging expired jobs: {str(exc)}")
+        return {'status': 'failed', 'error': str(exc)}
@@ -0,0 +1,177 @@
+"""
+Tests for set-based bulk operations on people
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from mobilize.admin_panel.models import Office, UserOffice
+from mobilize.contacts.models import Contact, Person
+from mobilize.core.bulk_operation_jobs import start_bulk_operation
+from mobilize.core.bulk_operations import BulkOperation, BulkOperationError, select_people
+from mobilize.core.models import ActivityLog, BulkOperationJob, DashboardRollup, SearchDocument
+from mobilize.core.rollups import rebuild_rollups
+from mobilize.pipeline.contact_stages import sync_contact_stages
+from mobilize.pipeline.models import PIPELINE_TYPE_PEOPLE, Pipeline, PipelineContact, PipelineStageHistory
+
+User = get_user_model()
+
+
+class BulkOperationTests(TestCase):
+    """Test cases for the bulk operations engine"""
+    
+    def setUp(self):
+        self.office = Office.objects.create(name='North', code='NORTH')
+        self.other_office = Office.objects.create(name='South', code='SOUTH')
+        self.admin = User.objects.create_user(username='bulk_admin', email='bulk_admin@example.com',
+                                              role='super_admin')
+        self.office_admin = User.objects.create_user(username='bulk_office', email='bulk_office@example.com',
+                                                     role='office_admin')
+        UserOffice.objects.create(user=self.office_admin, office=self.office)
+        
+        pipeline = Pipeline.objects.create(name='Main People Pipeline', pipeline_type=PIPELINE_TYPE_PEOPLE,
+                                           is_main_pipeline=True)
+        self.promotion = pipeline.stages.create(name='Promotion', order=1)
+        self.information = pipeline.stages.create(name='Information', order=2)
+        
+        self.people = [
+            self._person('Ann', 'high', self.office, tags=['donor']),
+            self._person('Ben', 'high', self.office),
+            self._person('Cy', 'low', self.office),
+            self._person('Di', 'high', self.other_office),
+        ]
+        rebuild_rollups()
+    
+    def _person(self, name, priority, office, tags=None):
+        contact = Contact.objects.create(type='person', first_name=name, last_name='Bulk', priority=priority,
+                                         office=office, tags=tags)
+        return Person.objects.create(contact=contact)
+    
+    def _ids(self, *indexes):
+        return [self.people[index].pk for index in indexes]
+    
+    def _assert_rollups_current(self):
+        counts = {row.key: row.count for row in DashboardRollup.objects.exclude(key='meta').exclude(count=0)}
+        rebuild_rollups()
+        self.assertEqual(counts, {row.key: row.count for row in DashboardRollup.objects.exclude(key='meta')})
+    
+    def test_selection_by_ids_keeps_office_scope(self):
+        selection = select_people(self.office_admin, contact_ids=self._ids(0, 3))
+        
+        self.assertEqual(list(selection), self._ids(0))
+    
+    def test_saved_filter_selects_matching_people(self):
+        selection = select_people(self.admin, filters={'priority': 'high', 'office': str(self.office.pk)})
+        
+        self.assertEqual(list(selection), self._ids(0, 1))
+    
+    def test_office_move_by_filter_in_chunks(self):
+        operation = BulkOperation(self.admin, 'office', str(self.other_office.pk), chunk_size=1)
+        selection = select_people(self.admin, filters={'priority': 'high', 'office': str(self.office.pk)})
+        
+        self.assertEqual(operation.run(selection), 2)
+        
+        self.assertEqual(set(Contact.objects.filter(office=self.other_office).values_list('pk', flat=True)),
+                         set(self._ids(0, 1, 3)))
+        self.assertEqual(SearchDocument.objects.get(object_id=self.people[0].pk).office_id, self.other_office.pk)
+        self._assert_rollups_current()
+        
+        log = ActivityLog.objects.get(details__bulk_operation='office')
+        self.assertEqual((log.user, log.action_type, log.details['count']), (self.admin, 'update', 2))
+    
+    def test_tags_are_added_and_removed(self):
+        selection = select_people(self.admin, contact_ids=self._ids(0, 1))
+        
+        BulkOperation(self.admin, 'add_tags', 'donor, volunteer').run(selection)
+        self.assertEqual(Contact.objects.get(pk=self.people[0].pk).tags, ['donor', 'volunteer'])
+        self.assertEqual(Contact.objects.get(pk=self.people[1].pk).tags, ['donor', 'volunteer'])
+        
+        BulkOperation(self.admin, 'remove_tags', ['donor']).run(selection)
+        self.assertEqual(Contact.objects.get(pk=self.people[0].pk).tags, ['volunteer'])
+    
+    def test_stage_move_records_history(self):
+        PipelineContact.objects.create(contact=self.people[0].contact, pipeline=self.promotion.pipeline,
+                                       current_stage=self.promotion)
+        rebuild_rollups()
+        
+        BulkOperation(self.admin, 'stage', 'information').run(select_people(self.admin, self._ids(0, 1)))
+        
+        entries = PipelineContact.objects.filter(contact_id__in=self._ids(0, 1))
+        self.assertEqual(sorted(entries.values_list('current_stage__name', flat=True)), ['Information'] * 2)
+        history = PipelineStageHistory.objects.filter(to_stage=self.information)
+        self.assertEqual({(row.pipeline_contact.contact_id, row.from_stage_id) for row in history},
+                         {(self.people[0].pk, self.promotion.pk), (self.people[1].pk, None)})
+        self.assertEqual({row.created_by for row in history}, {self.admin})
+        self._assert_rollups_current()
+    
+    def test_delete_uses_queries_per_chunk_and_one_log(self):
+        operation = BulkOperation(self.admin, 'delete', chunk_size=2)
+        with CaptureQueriesContext(connection) as queries:
+            operation.run(select_people(self.admin, filters={'office': str(self.office.pk)}))
+        
+        self.assertFalse(Person.objects.filter(pk__in=self._ids(0, 1, 2)).exists())
+        self.assertTrue(Person.objects.filter(pk=self.people[3].pk).exists())
+        self.assertEqual(ActivityLog.objects.filter(details__bulk_operation='delete').count(), 1)
+        self.assertLess(len(queries.captured_queries), 120)
+        self._assert_rollups_current()
+    
+    def test_deleted_pipeline_entries_sync_stages_once(self):
+        for person in self.people[:3]:
+            PipelineContact.objects.create(contact=person.contact, pipeline=self.promotion.pipeline,
+                                           current_stage=self.promotion)
+        rebuild_rollups()
+        
+        with mock.patch('mobilize.pipeline.contact_stages.sync_contact_stages',
+                        wraps=sync_contact_stages) as mock_sync:
+            BulkOperation(self.admin, 'delete', chunk_size=2).run(select_people(self.admin, self._ids(0, 1, 2)))
+        
+        mock_sync.assert_called_once()
+        self.assertEqual(set(mock_sync.call_args.args[0]), set(self._ids(0, 1, 2)))
+        self.assertFalse(PipelineContact.objects.exists())
+        self._assert_rollups_current()
+    
+    def test_invalid_values_are_rejected(self):
+        with self.assertRaises(BulkOperationError):
+            BulkOperation(self.admin, 'priority', 'urgent')
+        with self.assertRaises(BulkOperationError):
+            BulkOperation(self.admin, 'stage', 'nowhere')
+        with self.assertRaisesMessage(BulkOperationError, 'You do not have access to South'):
+            BulkOperation(self.office_admin, 'office', str(self.other_office.pk))
+    
+    def test_large_selections_run_in_the_background(self):
+        with mock.patch('mobilize.core.bulk_operation_jobs.BACKGROUND_THRESHOLD', 2):
+            with self.captureOnCommitCallbacks(execute=True):
+                count, job = start_bulk_operation(self.admin, 'priority', 'medium', filters={'priority': 'high'})
+        
+        job.refresh_from_db()
+        self.assertEqual(count, 3)
+        self.assertEqual((job.status, job.processed_count, job.progress), ('completed', 3, 100))
+        self.assertEqual(job.selection, {'filters': {'priority': 'high'}})
+        self.assertFalse(Contact.objects.filter(pk__in=self._ids(0, 1, 3), priority='high').exists())
+    
+    def test_small_selections_run_right_away(self):
+        count, job = start_bulk_operation(self.admin, 'priority', 'low', contact_ids=self._ids(0))
+        
+        self.assertEqual((count, job), (1, None))
+        self.assertFalse(BulkOperationJob.objects.exists())
+        self.assertEqual(Contact.objects.get(pk=self.people[0].pk).priority, 'low')
+    
+    def test_legacy_priority_view_accepts_comma_separated_ids(self):
+        from mobilize.contacts.views import bulk_update_priority
+        
+        request = RequestFactory().post('/contacts/bulk/update-priority/', {
+            'contact_ids': ','.join(str(pk) for pk in self._ids(0, 2)), 'priority': 'medium',
+        })
+        request.user = self.admin
+        request._dont_enforce_csrf_checks = True
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        
+        response = bulk_update_priority(request)
+        
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(Contact.objects.filter(pk__in=self._ids(0, 2)).values_list('priority', flat=True)),
+                         ['medium', 'medium'])
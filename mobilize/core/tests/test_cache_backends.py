@@ -0,0 +1,143 @@
+"""
+Tests for the two-tier cache backend
+"""
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+from mobilize.core.cache_backends import TieredCache
+
+
+def make_cache(**options):
+    return TieredCache('', {'TIMEOUT': 60, 'OPTIONS': options})
+
+
+class TieredCacheTests(SimpleTestCase):
+    """Test cases for the LRU and shared tiers"""
+    
+    def test_local_tier_serves_repeat_reads(self):
+        """A value read once is served from the LRU afterwards"""
+        cache = make_cache()
+        cache.set('key', 'value')
+        cache.local.clear()
+        
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertIsNone(cache.get('missing'))
+        
+        stats = cache.get_stats()
+        self.assertEqual((stats['shared_hits'], stats['local_hits'], stats['misses']), (1, 1, 1))
+        self.assertEqual(stats['hit_rate'], 0.667)
+    
+    def test_local_tier_expires_before_shared_tier(self):
+        """The LRU only bounds staleness; the shared tier keeps the value"""
+        cache = make_cache(LOCAL_TIMEOUT=0.01)
+        cache.set('key', 'value')
+        time.sleep(0.02)
+        
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(cache.get_stats()['shared_hits'], 1)
+    
+    def test_lru_evicts_least_recently_used(self):
+        """The LRU holds at most LOCAL_MAX_ENTRIES values"""
+        cache = make_cache(LOCAL_MAX_ENTRIES=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        
+        self.assertEqual(list(cache.local._data), [cache.make_key('a'), cache.make_key('c')])
+        self.assertEqual(cache.get('b'), 2)
+    
+    def test_prefix_policies(self):
+        """Prefix policies override timeouts and keep counters out of the LRU"""
+        cache = make_cache(PREFIX_POLICIES={
+            'short:': {'timeout': 0.01},
+            'counter:': {'local': False},
+        })
+        cache.set('short:key', 'value', timeout=3600)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('short:key'))
+        
+        cache.set('counter:key', 1, timeout=None)
+        cache.incr('counter:key')
+        self.assertNotIn(cache.make_key('counter:key'), cache.local._data)
+        self.assertEqual(cache.get('counter:key'), 2)
+    
+    def test_delete_clears_both_tiers(self):
+        """Deleting a key removes the LRU copy as well"""
+        cache = make_cache()
+        cache.set('key', 'value')
+        cache.delete('key')
+        
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.get_many(['key']), {})
+    
+    def test_shared_tier_failure_degrades_to_miss(self):
+        """An unreachable shared tier behaves like an empty cache"""
+        cache = make_cache()
+        cache.shared = mock.Mock()
+        cache.shared.get.side_effect = ConnectionError('down')
+        cache.shared.set.side_effect = ConnectionError('down')
+        
+        cache.set('key', 'value')
+        cache.local.clear()
+        
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.get_stats()['errors'], 2)
+    
+    def test_clear_only_deletes_prefixed_redis_keys(self):
+        """Clearing a Redis tier deletes this cache's keys instead of flushing the database"""
+        cache = TieredCache('', {'TIMEOUT': 60, 'KEY_PREFIX': 'mobilize'})
+        cache.set('key', 'value')
+        cache.shared = mock.Mock()
+        client = cache.shared._cache.get_client.return_value
+        client.scan_iter.return_value = iter([b'mobilize:1:key'])
+        
+        cache.clear()
+        
+        client.scan_iter.assert_called_once_with(match='mobilize:*', count=1000)
+        client.delete.assert_called_once_with(b'mobilize:1:key')
+        cache.shared.clear.assert_not_called()
+        self.assertNotIn(cache.make_key('key'), cache.local._data)
+    
+    def test_get_or_set_computes_once_under_concurrency(self):
+        """Concurrent misses on one key run the computation once"""
+        cache = make_cache()
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'value'
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_set('key', compute)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 5)
+    
+    def test_get_or_set_waits_for_other_process(self):
+        """A caller that finds another process's lock waits for its value"""
+        cache = make_cache(LOCK_TIMEOUT=2)
+        cache.add('key:lock', 1)
+        
+        def fill():
+            time.sleep(0.1)
+            cache.shared.set('key', 'filled')
+        
+        filler = threading.Thread(target=fill)
+        filler.start()
+        value = cache.get_or_set('key', lambda: 'computed')
+        filler.join()
+        
+        self.assertEqual(value, 'filled')
+        self.assertEqual(cache.get_stats()['stampede_waits'], 1)
@@ -0,0 +1,212 @@
+"""
+Tests for the dashboard metrics engine
+"""
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from mobilize.admin_panel.models import Office, UserOffice
+from mobilize.churches.models import Church
+from mobilize.communications.models import Communication
+from mobilize.contacts.models import Contact, Person
+from mobilize.core.dashboard_metrics import DashboardMetrics, get_dashboard_metrics
+from mobilize.core.permissions import DataAccessManager
+from mobilize.tasks.models import Task
+
+User = get_user_model()
+
+
+@override_settings(DASHBOARD_USE_ROLLUPS=False)
+class DashboardMetricsTests(TestCase):
+    """Test cases for single-pass dashboard metrics"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from mobilize.pipeline.models import Pipeline, PIPELINE_TYPE_PEOPLE
+        
+        cache.clear()
+        self.office = Office.objects.create(name='Metrics Office', code='METRICS')
+        self.user = User.objects.create_user(
+            username='metrics',
+            email='metrics@example.com',
+            role='super_admin'
+        )
+        
+        pipeline = Pipeline.objects.create(
+            name='Main People Pipeline',
+            pipeline_type=PIPELINE_TYPE_PEOPLE,
+            is_main_pipeline=True
+        )
+        self.stage = pipeline.stages.create(name='Invitation', order=3)
+        self.pipeline = pipeline
+        
+        church_contact = Contact.objects.create(type='church', church_name='Hope', office=self.office)
+        Church.objects.create(contact=church_contact, name='Hope Church', main_contact_id=1)
+        
+        self._create_person(0)
+        
+        today = timezone.localdate()
+        Task.objects.create(title='Overdue', status='pending', priority='high',
+                            due_date=today - timedelta(days=2), assigned_to=self.user)
+        Task.objects.create(title='Soon', status='pending', priority='low',
+                            due_date=today + timedelta(days=3), assigned_to=self.user)
+        Task.objects.create(title='Done', status='completed', completed_at=timezone.now(),
+                            assigned_to=self.user)
+        Communication.objects.create(type='email', subject='Hello', date=today, user=self.user)
+    
+    def _create_person(self, index):
+        from mobilize.pipeline.models import PipelineContact
+        
+        contact = Contact.objects.create(
+            type='person',
+            first_name=f'First{index}',
+            last_name=f'Last{index}',
+            email=f'metrics{index}@example.com',
+            user=self.user,
+            office=self.office
+        )
+        PipelineContact.objects.get_or_create(
+            contact=contact,
+            pipeline=self.pipeline,
+            defaults={'current_stage': self.stage, 'contact_type': 'person'}
+        )
+        PipelineContact.objects.filter(contact=contact, pipeline=self.pipeline).update(current_stage=self.stage)
+        return Person.objects.create(contact=contact)
+    
+    def test_metrics_values(self):
+        """All widget metrics are computed for the scope"""
+        # Users get their own person record, so count people from the table
+        people_count = Person.objects.count()
+        metrics = get_dashboard_metrics(DataAccessManager(self.user))
+        
+        self.assertIsInstance(metrics, DashboardMetrics)
+        self.assertEqual(metrics.people_count, people_count)
+        self.assertEqual(metrics.recent_people, people_count)
+        self.assertEqual(metrics.churches_count, 1)
+        self.assertEqual(metrics.church_stats, {'total': 1, 'with_contacts': 1, 'recent_activity': 1})
+        self.assertEqual(metrics.pending_tasks_count, 2)
+        self.assertEqual(metrics.overdue_tasks, 1)
+        self.assertEqual(metrics.upcoming_tasks, 1)
+        self.assertEqual(metrics.completed_this_week, 1)
+        self.assertEqual(metrics.communications_this_week, 1)
+        self.assertEqual(
+            metrics.priority_distribution,
+            [{'priority': 'low', 'count': 1}, {'priority': 'high', 'count': 1}]
+        )
+        self.assertEqual([task.title for task in metrics.pending_tasks], ['Overdue', 'Soon'])
+        
+        stages = {row['stage_code']: row for row in metrics.people_pipeline}
+        self.assertEqual(stages['invitation']['count'], 1)
+        self.assertEqual(stages['invitation']['percentage'], 100.0)
+        
+        today = metrics.activity_timeline[-1]
+        self.assertEqual(len(metrics.activity_timeline), 7)
+        self.assertEqual(today['date'], timezone.localdate().strftime('%m/%d'))
+        self.assertEqual((today['people'], today['tasks'], today['communications']), (people_count, 1, 1))
+    
+    def test_query_count_is_constant(self):
+        """Dashboard metrics cost the same number of queries as data grows"""
+        manager = DataAccessManager(self.user)
+        with self.assertNumQueries(6):
+            get_dashboard_metrics(manager)
+        
+        for i in range(1, 6):
+            self._create_person(i)
+        
+        with self.assertNumQueries(6):
+            metrics = get_dashboard_metrics(manager)
+        self.assertEqual(metrics.people_count, Person.objects.count())
+    
+    def test_distinct_office_scope(self):
+        """Office admin scopes with OR-joined filters are counted once per row"""
+        admin = User.objects.create_user(
+            username='office_admin',
+            email='office_admin@example.com',
+            role='office_admin'
+        )
+        UserOffice.objects.create(user=admin, office=self.office)
+        
+        manager = DataAccessManager(admin)
+        metrics = get_dashboard_metrics(manager)
+        
+        self.assertEqual(metrics.people_count, manager.get_people_queryset().count())
+        self.assertEqual(metrics.churches_count, 1)
+        self.assertEqual(metrics.pending_tasks_count, 0)
+    
+    def test_dashboard_renders_from_metrics(self):
+        """Dashboard view passes the metrics object and renders its widgets"""
+        from django.test import RequestFactory
+        from mobilize.core import views
+        
+        request = RequestFactory().get('/dashboard/')
+        request.user = self.user
+        response = views.dashboard(request)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Overdue')
+
+
+@override_settings(DASHBOARD_USE_ROLLUPS=False)
+class DashboardCacheTests(TestCase):
+    """Test cases for generation-based dashboard caching"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        
+        cache.clear()
+        self.office = Office.objects.create(name='Cache Office', code='CACHE')
+        self.other_office = Office.objects.create(name='Other Cache Office', code='OCACHE')
+        self.user = User.objects.create_user(
+            username='cached',
+            email='cached@example.com',
+            role='standard_user'
+        )
+        self.other_user = User.objects.create_user(
+            username='elsewhere',
+            email='elsewhere@example.com',
+            role='standard_user'
+        )
+        UserOffice.objects.create(user=self.user, office=self.office)
+        UserOffice.objects.create(user=self.other_user, office=self.other_office)
+    
+    def test_repeat_load_is_served_from_cache(self):
+        """An unchanged scope is not recomputed"""
+        manager = DataAccessManager(self.user)
+        get_dashboard_metrics(manager)
+        
+        # Office membership comes from the permission context, so no queries remain
+        with self.assertNumQueries(0):
+            get_dashboard_metrics(manager)
+    
+    def test_change_in_scope_invalidates(self):
+        """Saving a row the user can see produces fresh numbers"""
+        manager = DataAccessManager(self.user)
+        self.assertEqual(get_dashboard_metrics(manager).pending_tasks_count, 0)
+        
+        Task.objects.create(title='New', status='pending', assigned_to=self.user)
+        
+        self.assertEqual(get_dashboard_metrics(manager).pending_tasks_count, 1)
+    
+    def test_change_outside_scope_keeps_cache(self):
+        """Changes in another office and user leave the cached entry valid"""
+        manager = DataAccessManager(self.user)
+        get_dashboard_metrics(manager)
+        
+        Task.objects.create(title='Elsewhere', status='pending', assigned_to=self.other_user,
+                            office=self.other_office)
+        church_contact = Contact.objects.create(type='church', church_name='Far', office=self.other_office)
+        Church.objects.create(contact=church_contact, name='Far Church')
+        
+        with self.assertNumQueries(0):
+            get_dashboard_metrics(manager)
+    
+    def test_membership_change_invalidates(self):
+        """Joining an office shows that office's churches"""
+        church_contact = Contact.objects.create(type='church', church_name='Near', office=self.other_office)
+        Church.objects.create(contact=church_contact, name='Near Church')
+        self.assertEqual(get_dashboard_metrics(DataAccessManager(self.user)).churches_count, 0)
+        
+        UserOffice.objects.create(user=self.user, office=self.other_office)
+        
+        self.assertEqual(get_dashboard_metrics(DataAccessManager(self.user)).churches_count, 1)
@@ -0,0 +1,86 @@
+"""
+Tests for streaming CSV exports of the people and church lists
+"""
+import csv
+import io
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from mobilize.admin_panel.models import Office, UserOffice
+from mobilize.churches.models import Church
+from mobilize.churches.views import export_churches
+from mobilize.contacts.models import Contact, Person
+from mobilize.contacts.views import export_contacts
+from mobilize.core.exports import export_column, iter_export_rows
+
+User = get_user_model()
+
+
+def read_csv(response):
+    return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+
+
+class ExportTests(TestCase):
+    """Test cases for the list exports"""
+    
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.admin = User.objects.create_user(username='exporter', email='exporter@example.com', role='super_admin')
+        self.office = Office.objects.create(name='Export Office', code='EXPORT')
+        for index, priority in enumerate(['high', 'low', 'high']):
+            contact = Contact.objects.create(type='person', first_name=f'Person{index}', last_name='Export',
+                                             email=f'export{index}@example.com', priority=priority,
+                                             office=self.office if index == 0 else None)
+            Person.objects.create(contact=contact, title='Dr' if index == 0 else None)
+    
+    def _get(self, view, user, **params):
+        request = self.factory.get('/export/', params)
+        request.user = user
+        return view(request)
+    
+    def test_contacts_export_streams_filtered_rows(self):
+        response = self._get(export_contacts, self.admin, priority='high')
+        
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertTrue(response['Content-Disposition'].startswith('attachment; filename="contacts_export_'))
+        rows = read_csv(response)
+        self.assertEqual(rows[0][:3], ['First Name', 'Last Name', 'Email'])
+        self.assertEqual(sorted(row[0] for row in rows[1:]), ['Person0', 'Person2'])
+        person0 = next(row for row in rows if row[0] == 'Person0')
+        self.assertEqual((person0[9], person0[12]), ('high', 'Dr'))
+        self.assertRegex(person0[15], r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+    
+    def test_contacts_export_keeps_office_scope(self):
+        office_admin = User.objects.create_user(username='office_exporter', email='oe@example.com',
+                                                role='office_admin')
+        UserOffice.objects.create(user=office_admin, office=self.office)
+        
+        rows = read_csv(self._get(export_contacts, office_admin))
+        
+        self.assertEqual([row[0] for row in rows[1:]], ['Person0'])
+    
+    def test_churches_export_uses_list_filters(self):
+        for name, priority in [('Grace', 'high'), ('Hope', 'low')]:
+            contact = Contact.objects.create(type='church', church_name=name, priority=priority,
+                                             street_address='1 Main St')
+            Church.objects.create(contact=contact, name=name, congregation_size=120, church_pipeline='promotion')
+        
+        rows = read_csv(self._get(export_churches, self.admin, priority='high', pipeline_stage='promotion'))
+        
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][:6], ['Grace', '', '', '', '', '1 Main St'])
+        self.assertEqual((rows[1][7], rows[1][11]), ('120', 'high'))
+    
+    def test_rows_are_read_in_chunks_with_one_query_each(self):
+        columns = [export_column('Email', 'contact__email'), export_column('Title', 'title')]
+        
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(iter_export_rows(Person.objects.filter(contact__last_name='Export').order_by('pk'), columns,
+                                       chunk_size=2))
+        
+        self.assertEqual(rows[0], ['export0@example.com', 'Dr'])
+        self.assertEqual(rows[1], ['export1@example.com', ''])
+        self.assertEqual(len(queries.captured_queries), 1)
@@ -0,0 +1,301 @@
+"""
+Tests for chunked CSV imports and background import jobs
+"""
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from mobilize.churches.models import Church
+from mobilize.contacts.models import Contact, Person
+from mobilize.core.import_jobs import purge_expired_import_jobs, start_import_job
+from mobilize.core.imports import ChurchImporter, ContactImporter, ImportFormatError
+from mobilize.core.models import DashboardRollup, ImportJob, SearchDocument
+from mobilize.core.rollups import rebuild_rollups
+
+User = get_user_model()
+
+
+def csv_file(text):
+    return io.BytesIO(text.encode('utf-8'))
+
+
+class ContactImporterTests(TestCase):
+    """Test cases for importing people"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', email='importer@example.com', role='super_admin')
+        existing = Contact.objects.create(type='person', first_name='Old', last_name='Name', email='ann@example.com')
+        self.existing = Person.objects.create(contact=existing, title='Dr')
+    
+    def test_creates_and_updates_people(self):
+        """Rows matching an email update that person, other rows create people"""
+        importer = ContactImporter(self.user).run(csv_file(
+            'first_name,last_name,email,priority,occupation\n'
+            'Ann,Lee,ann@example.com,HIGH,Nurse\n'
+            'Bob,Stone,bob@example.com,,Teacher\n'
+            'Cy,,,low,\n'
+        ))
+        
+        self.assertEqual((importer.created, importer.updated, importer.error_count), (2, 1, 0))
+        ann = Contact.objects.get(email='ann@example.com')
+        self.assertEqual((ann.first_name, ann.last_name, ann.priority), ('Ann', 'Lee', 'high'))
+        self.assertEqual(ann.person_details.profession, 'Nurse')
+        # Columns missing from the file are left alone
+        self.assertEqual(ann.person_details.title, 'Dr')
+        
+        bob = Contact.objects.get(email='bob@example.com')
+        self.assertEqual((bob.type, bob.priority, bob.country, bob.user), ('person', 'medium', 'United States', self.user))
+        self.assertEqual(bob.person_details.profession, 'Teacher')
+        self.assertTrue(Person.objects.filter(contact__first_name='Cy', contact__email__isnull=True).exists())
+    
+    def test_reports_invalid_rows(self):
+        """Invalid rows are reported by line number and the rest are imported"""
+        importer = ContactImporter(self.user).run(csv_file(
+            'first_name,email,priority\n'
+            'Valid,valid@example.com,low\n'
+            'Bad Email,not-an-email,low\n'
+            'Bad Priority,priority@example.com,urgent\n'
+            ',,\n'
+        ))
+        
+        self.assertEqual((importer.created, importer.error_count), (1, 3))
+        self.assertEqual([error['row'] for error in importer.errors], [3, 4, 5])
+        self.assertIn('not a valid email', importer.errors[0]['error'])
+        self.assertIn('must be one of low, medium, high', importer.errors[1]['error'])
+    
+    def test_duplicate_emails_in_one_file(self):
+        """A repeated email is a conflict whose values replace the earlier row"""
+        importer = ContactImporter(self.user).run(csv_file(
+            'first_name,email\n'
+            'First,dup@example.com\n'
+            'Second,dup@example.com\n'
+        ))
+        
+        self.assertEqual((importer.created, importer.updated, importer.conflict_count), (1, 0, 1))
+        self.assertEqual(importer.conflicts, [{'row': 3, 'conflict': 'Same email as line 2; this row replaces it'}])
+        self.assertEqual(list(Contact.objects.filter(email='dup@example.com').values_list('first_name', flat=True)),
+                         ['Second'])
+    
+    def test_church_emails_are_not_taken_over(self):
+        Contact.objects.create(type='church', church_name='Grace', email='office@grace.org')
+        
+        importer = ContactImporter(self.user).run(csv_file('first_name,email\nPat,office@grace.org\n'))
+        
+        self.assertEqual((importer.conflict_count, importer.error_count), (1, 0))
+        self.assertIn('belongs to a church', importer.conflicts[0]['conflict'])
+        self.assertFalse(Person.objects.filter(contact__email='office@grace.org').exists())
+    
+    def test_validates_phone_numbers(self):
+        importer = ContactImporter(self.user).run(csv_file(
+            'first_name,phone\n'
+            'Good,"(555)  123-4567 x89"\n'
+            'Short,555-1234x\n'
+            'Letters,call me\n'
+        ))
+        
+        self.assertEqual((importer.created, importer.error_count), (1, 2))
+        self.assertEqual(Contact.objects.get(first_name='Good').phone, '(555) 123-4567 x89')
+        self.assertIn('not a valid phone number', importer.errors[0]['error'])
+    
+    def test_dry_run_previews_without_writing(self):
+        """A dry run reports the same outcome as the import, and the changes to matched records"""
+        text = (
+            'first_name,last_name,email,priority\n'
+            'Ann,Lee,ann@example.com,high\n'
+            'Old,Name,ann@example.com,\n'
+            'Bob,Stone,bob@example.com,\n'
+            'Bad,Row,bob@,\n'
+            'Bob,Again,bob@example.com,low\n'
+        )
+        contacts = Contact.objects.count()
+        
+        with CaptureQueriesContext(connection) as queries:
+            preview = ContactImporter(self.user, dry_run=True)
+            preview.chunk_size = 2
+            preview.run(csv_file(text))
+        
+        self.assertEqual(Contact.objects.count(), contacts)
+        self.assertFalse([query for query in queries.captured_queries
+                          if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))])
+        self.assertEqual(preview.changes, [
+            {'row': 2, 'changes': {'first_name': ['Old', 'Ann'], 'last_name': ['Name', 'Lee'], 'priority': [None, 'high']}},
+        ])
+        
+        importer = ContactImporter(self.user)
+        importer.chunk_size = 2
+        importer.run(csv_file(text))
+        outcome = ('created', 'updated', 'unchanged', 'conflict_count', 'error_count', 'conflicts', 'errors')
+        self.assertEqual([getattr(preview, name) for name in outcome], [getattr(importer, name) for name in outcome])
+        self.assertEqual((preview.created, preview.updated, preview.conflict_count, preview.error_count), (1, 1, 2, 1))
+        
+        # Importing the same file again changes nothing
+        again = ContactImporter(self.user, dry_run=True).run(csv_file('first_name,last_name,email\nOld,Name,ann@example.com\n'))
+        self.assertEqual((again.updated, again.unchanged), (0, 1))
+    
+    def test_queries_per_chunk_not_per_row(self):
+        """Rows are looked up and written in bulk, a chunk at a time"""
+        rows = ''.join(f'Person{index},person{index}@example.com\n' for index in range(200))
+        importer = ContactImporter(self.user)
+        importer.chunk_size = 100
+        with CaptureQueriesContext(connection) as queries:
+            importer.run(csv_file('first_name,email\n' + rows))
+        
+        self.assertEqual(importer.created, 200)
+        self.assertLess(len(queries.captured_queries), 100)
+    
+    def test_keeps_rollups_and_search_index_current(self):
+        rebuild_rollups()
+        ContactImporter(self.user).run(csv_file('first_name,last_name,email\nZed,Quill,zed@example.com\n'))
+        
+        contact = Contact.objects.get(email='zed@example.com')
+        self.assertTrue(SearchDocument.objects.filter(source='contact', object_id=contact.pk, kind='person').exists())
+        
+        counts = {row.key: row.count for row in DashboardRollup.objects.exclude(key='meta')}
+        rebuild_rollups()
+        self.assertEqual(counts, {row.key: row.count for row in DashboardRollup.objects.exclude(key='meta')})
+    
+    def test_rejects_files_that_are_not_utf8_csv(self):
+        with self.assertRaises(ImportFormatError):
+            ContactImporter(self.user).run(io.BytesIO(b''))
+        with self.assertRaises(ImportFormatError):
+            ContactImporter(self.user).run(io.BytesIO('name\n'.encode('utf-16')))
+
+
+class ChurchImporterTests(TestCase):
+    """Test cases for importing churches"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='church_importer', email='ci@example.com', role='super_admin')
+    
+    def test_creates_and_updates_churches_by_name(self):
+        contact = Contact.objects.create(type='church', church_name='Grace Fellowship')
+        Church.objects.create(contact=contact, name='Grace Fellowship', denomination='Baptist')
+        
+        importer = ChurchImporter(self.user).run(csv_file(
+            'name,denomination,congregation_size,email\n'
+            'Grace Fellowship,Methodist,"1,200",\n'
+            'New Hope,,250,hope@example.org\n'
+            'Bad Size,,lots,\n'
+        ))
+        
+        self.assertEqual((importer.created, importer.updated, importer.error_count), (1, 1, 1))
+        grace = Church.objects.get(name='Grace Fellowship')
+        self.assertEqual((grace.denomination, grace.congregation_size), ('Methodist', 1200))
+        
+        hope = Church.objects.select_related('contact').get(name='New Hope')
+        self.assertEqual((hope.contact.type, hope.contact.church_name, hope.contact.email),
+                         ('church', 'New Hope', 'hope@example.org'))
+        self.assertIn('whole number', importer.errors[0]['error'])
+    
+    def test_requires_name_column(self):
+        with self.assertRaisesMessage(ImportFormatError, 'Required column "name"'):
+            ChurchImporter(self.user).run(csv_file('location\nSpringfield\n'))
+
+
+class ImportJobTests(TestCase):
+    """Test cases for background import jobs"""
+    
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='job_importer', email='ji@example.com', role='super_admin')
+    
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+    
+    def _upload(self, text, name='people.csv'):
+        return SimpleUploadedFile(name, text.encode('utf-8'), content_type='text/csv')
+    
+    def test_job_imports_upload_and_reports_errors(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = start_import_job(self.user, 'contacts', self._upload(
+                'first_name,email\nAnn,ann@example.com\nBad,nope\n'
+            ))
+        upload_name = job.file.name
+        job.refresh_from_db()
+        
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.total_rows, job.rows_processed, job.progress), (2, 2, 100))
+        self.assertEqual((job.created_count, job.updated_count, job.error_count), (1, 0, 1))
+        self.assertEqual(job.errors[0]['row'], 3)
+        # The upload holds contact details and is deleted once imported
+        self.assertEqual(job.file.name, '')
+        self.assertFalse(job.file.storage.exists(upload_name))
+    
+    def test_preview_job_then_run_import(self):
+        from mobilize.core.views import run_import_job
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            preview = start_import_job(self.user, 'contacts', self._upload('first_name,email\nAnn,ann@example.com\n'),
+                                       dry_run=True)
+        preview.refresh_from_db()
+        self.assertEqual((preview.status, preview.created_count), ('completed', 1))
+        self.assertFalse(Contact.objects.filter(email='ann@example.com').exists())
+        
+        request = self.factory.post(f'/imports/jobs/{preview.pk}/run/')
+        request.user = self.user
+        request._dont_enforce_csrf_checks = True
+        with self.captureOnCommitCallbacks(execute=True):
+            response = run_import_job(request, preview.pk)
+        
+        self.assertEqual(response.status_code, 202)
+        job = ImportJob.objects.get(dry_run=False)
+        self.assertEqual((job.status, job.created_count, job.file.name), ('completed', 1, ''))
+        self.assertTrue(Contact.objects.filter(email='ann@example.com').exists())
+        # The shared upload is deleted once the real import has run
+        self.assertFalse(preview.file.storage.exists(preview.file.name))
+        
+        # Posting the preview again returns the same import instead of a second one
+        with self.captureOnCommitCallbacks(execute=True):
+            response = run_import_job(request, preview.pk)
+        self.assertEqual(json.loads(response.content)['job_id'], job.pk)
+        self.assertEqual(ImportJob.objects.filter(dry_run=False).count(), 1)
+        self.assertEqual(Contact.objects.filter(email='ann@example.com').count(), 1)
+    
+    def test_purge_deletes_expired_jobs_and_uploads(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            preview = start_import_job(self.user, 'contacts', self._upload('first_name\nAnn\n'), dry_run=True)
+        ImportJob.objects.filter(pk=preview.pk).update(created_at=timezone.now() - timedelta(days=8))
+        with self.captureOnCommitCallbacks(execute=True):
+            current = start_import_job(self.user, 'contacts', self._upload('first_name\nBen\n'), dry_run=True)
+        
+        self.assertEqual(purge_expired_import_jobs(retention_days=7), 1)
+        self.assertFalse(preview.file.storage.exists(preview.file.name))
+        self.assertEqual(list(ImportJob.objects.values_list('pk', flat=True)), [current.pk])
+        self.assertTrue(current.file.storage.exists(current.file.name))
+    
+    def test_missing_columns_are_reported_before_queuing(self):
+        with self.assertRaises(ImportFormatError):
+            start_import_job(self.user, 'churches', self._upload('location\nSpringfield\n'))
+        self.assertFalse(ImportJob.objects.exists())
+    
+    def test_import_view_starts_job_and_status_endpoint(self):
+        from mobilize.core.views import import_job_status
+        from mobilize.churches.views import import_churches
+        
+        request = self.factory.post('/churches/import/', {'csv_file': self._upload('name\nHill Church\n', 'c.csv')})
+        request.user = self.user
+        request._dont_enforce_csrf_checks = True
+        with self.captureOnCommitCallbacks(execute=True):
+            response = import_churches(request)
+        
+        job = ImportJob.objects.get()
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].endswith(f'?job={job.pk}'))
+        self.assertTrue(Church.objects.filter(name='Hill Church').exists())
+        
+        request = self.factory.get(f'/imports/jobs/{job.pk}/status/')
+        request.user = self.user
+        data = json.loads(import_job_status(request, job.pk).content)
+        self.assertEqual((data['status'], data['created'], data['errors']), ('completed', 1, []))
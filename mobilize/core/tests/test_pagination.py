@@ -0,0 +1,128 @@
+"""
+Tests for keyset pagination
+"""
+import json
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.test import RequestFactory, TestCase
+from mobilize.communications.models import Communication
+from mobilize.contacts.models import Contact, Person
+from mobilize.core.pagination import (
+    COMMUNICATION_ORDERING,
+    TASK_ORDERING,
+    InvalidCursor,
+    KeysetPaginator,
+    approximate_count,
+)
+from mobilize.tasks.models import Task
+
+User = get_user_model()
+
+
+class KeysetPaginatorTests(TestCase):
+    """Test cases for cursor-based pages"""
+    
+    def setUp(self):
+        today = date(2026, 1, 15)
+        # Duplicate sort keys and NULLs exercise the tie-breaking column
+        for index in range(23):
+            Task.objects.create(
+                title=f'Task {index}',
+                due_date=None if index % 5 == 0 else today + timedelta(days=index % 4),
+                priority=['low', 'medium', 'high'][index % 3],
+            )
+            Communication.objects.create(
+                type='email',
+                subject=f'Comm {index}',
+                date=None if index % 6 == 0 else today - timedelta(days=index % 3),
+            )
+    
+    def _walk(self, queryset, ordering, per_page):
+        paginator = KeysetPaginator(queryset, ordering, per_page)
+        ids = []
+        cursor = None
+        while True:
+            page = paginator.page(cursor)
+            ids.extend(row.pk for row in page)
+            if not page.has_next:
+                return ids
+            cursor = page.next_cursor
+    
+    def test_walk_matches_ordered_queryset(self):
+        """Following cursors visits every row once, in sort order"""
+        expected_tasks = list(Task.objects.order_by(
+            F('due_date').asc(nulls_last=True), 'priority', 'pk'
+        ).values_list('pk', flat=True))
+        expected_comms = list(Communication.objects.order_by(
+            F('date').desc(nulls_last=True), '-pk'
+        ).values_list('pk', flat=True))
+        
+        for per_page in (1, 4, 7, 50):
+            self.assertEqual(self._walk(Task.objects.all(), TASK_ORDERING, per_page), expected_tasks)
+            self.assertEqual(self._walk(Communication.objects.all(), COMMUNICATION_ORDERING, per_page), expected_comms)
+    
+    def test_each_page_costs_one_query(self):
+        """Deep pages run the same single query as the first page"""
+        paginator = KeysetPaginator(Task.objects.all(), TASK_ORDERING, 5)
+        with self.assertNumQueries(1):
+            page = paginator.page()
+        for _ in range(3):
+            with self.assertNumQueries(1):
+                page = paginator.page(page.next_cursor)
+        self.assertTrue(page.has_previous)
+    
+    def test_invalid_cursors_are_rejected(self):
+        """Tampered cursors and cursors from another list raise InvalidCursor"""
+        tasks = KeysetPaginator(Task.objects.all(), TASK_ORDERING, 5)
+        cursor = tasks.page().next_cursor
+        
+        with self.assertRaises(InvalidCursor):
+            tasks.page(cursor[:-2] + 'xx')
+        with self.assertRaises(InvalidCursor):
+            KeysetPaginator(Communication.objects.all(), COMMUNICATION_ORDERING, 5).page(cursor)
+    
+    def test_approximate_count(self):
+        """Approximate totals are exact below the counting limit"""
+        self.assertEqual(approximate_count(Task.objects.all()), 23)
+        self.assertEqual(approximate_count(Task.objects.all(), limit=10), 10)
+
+
+class PersonListApiTests(TestCase):
+    """Test cases for the cursor-paginated person list endpoint"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='pager', email='pager@example.com', role='super_admin')
+        for index in range(7):
+            contact = Contact.objects.create(type='person', first_name=f'First{index}', last_name=f'Last{index % 3}')
+            Person.objects.create(contact=contact)
+    
+    def _get(self, **params):
+        from mobilize.contacts.views import person_list_api
+        
+        request = RequestFactory().get('/contacts/api/list/', params)
+        request.user = self.user
+        return person_list_api(request)
+    
+    def test_pages_follow_name_order(self):
+        """Pages are ordered by last name, first name and ID"""
+        expected = list(Person.objects.order_by(
+            F('contact__last_name').asc(nulls_last=True), F('contact__first_name').asc(nulls_last=True), 'pk'
+        ).values_list('pk', flat=True))
+        
+        ids = []
+        params = {'per_page': 3, 'total': 'approx'}
+        while True:
+            data = json.loads(self._get(**params).content)
+            ids.extend(row['id'] for row in data['results'])
+            self.assertEqual(data['total'], len(expected))
+            if not data['has_next']:
+                break
+            params['cursor'] = data['next_cursor']
+        
+        self.assertEqual(ids, expected)
+    
+    def test_bad_cursor_returns_400(self):
+        response = self._get(cursor='not-a-cursor')
+        self.assertEqual(response.status_code, 400)
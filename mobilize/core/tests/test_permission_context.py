@@ -0,0 +1,115 @@
+"""
+Tests for the cached permission context
+"""
+from contextlib import contextmanager
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from mobilize.admin_panel.models import Office, UserOffice
+from mobilize.authentication.decorators import office_data_filter
+from mobilize.contacts.models import Contact
+from mobilize.core.cache_backends import TieredCache
+from mobilize.core.permission_context import get_permission_context
+from mobilize.core.permissions import DataAccessManager, get_data_access_manager
+
+User = get_user_model()
+
+
+class PermissionContextTests(TestCase):
+    """Test cases for memoized office membership"""
+    
+    def setUp(self):
+        cache.clear()
+        self.office = Office.objects.create(name='Context Office', code='CTX')
+        self.other_office = Office.objects.create(name='Other Context Office', code='OCTX')
+        self.user = User.objects.create_user(
+            username='context',
+            email='context@example.com',
+            role='standard_user'
+        )
+        UserOffice.objects.create(user=self.user, office=self.office, is_primary=True)
+    
+    def _fresh_user(self):
+        # A new instance, as each request loads its own user
+        return User.objects.get(pk=self.user.pk)
+    
+    def test_context_values(self):
+        """The context lists memberships and the primary office"""
+        context = get_permission_context(self.user)
+        
+        self.assertEqual(context.office_ids, (self.office.id,))
+        self.assertEqual(context.primary_office_id, self.office.id)
+        self.assertTrue(context.has_office(str(self.office.id)))
+        self.assertFalse(context.has_office(self.other_office.id))
+        self.assertTrue(context.has_office(self.office.id, 'standard_user'))
+        self.assertFalse(context.has_office(self.office.id, 'office_admin'))
+    
+    def test_checks_within_a_request_cost_no_queries(self):
+        """Decorators, the user model and managers share one lookup"""
+        get_permission_context(self.user)
+        
+        with self.assertNumQueries(0):
+            self.assertTrue(self.user.has_office_permission(self.office.id))
+            office_data_filter(Contact.objects.all(), self.user)
+            DataAccessManager(self.user)._get_user_offices()
+    
+    def test_context_is_cached_across_requests(self):
+        """A new user instance reads memberships from the cache"""
+        get_permission_context(self._fresh_user())
+        user = self._fresh_user()
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(get_permission_context(user).office_ids, (self.office.id,))
+    
+    def test_membership_change_invalidates(self):
+        """Adding or removing an office is seen by the next lookup"""
+        get_permission_context(self.user)
+        
+        membership = UserOffice.objects.create(user=self.user, office=self.other_office)
+        self.assertTrue(self.user.has_office_permission(self.other_office.id))
+        self.assertIn(self.other_office.id, get_permission_context(self._fresh_user()).office_ids)
+        
+        membership.delete()
+        self.assertNotIn(self.other_office.id, get_permission_context(self._fresh_user()).office_ids)
+    
+    def test_membership_change_invalidates_other_processes(self):
+        """A revoked office is seen by a process with its own LRU"""
+        options = {'PREFIX_POLICIES': settings.CACHES['default']['OPTIONS']['PREFIX_POLICIES']}
+        web = TieredCache('', {'TIMEOUT': 60, 'OPTIONS': options})
+        worker = TieredCache('', {'TIMEOUT': 60, 'OPTIONS': options})
+        worker.shared = web.shared
+        
+        membership = UserOffice.objects.create(user=self.user, office=self.other_office)
+        with self._in_process(web):
+            self.assertIn(self.other_office.id, get_permission_context(self._fresh_user()).office_ids)
+        
+        with self._in_process(worker):
+            membership.delete()
+        
+        with self._in_process(web):
+            self.assertNotIn(self.other_office.id, get_permission_context(self._fresh_user()).office_ids)
+    
+    @contextmanager
+    def _in_process(self, process_cache):
+        # Point the context and its generation counters at one process's cache
+        with mock.patch('mobilize.core.permission_context.cache', process_cache), \
+                mock.patch('mobilize.core.cache_versions.cache', process_cache):
+            yield
+    
+    def test_role_change_applies_to_memoized_context(self):
+        """The role is read from the user rather than the cache"""
+        get_permission_context(self.user)
+        self.user.role = 'super_admin'
+        
+        self.assertTrue(self.user.has_office_permission(self.other_office.id))
+    
+    def test_data_access_manager_is_memoized_per_request(self):
+        """Views handling one request share a DataAccessManager"""
+        request = RequestFactory().get('/', {'view_mode': 'my_only'})
+        request.user = self.user
+        
+        self.assertIs(get_data_access_manager(request), get_data_access_manager(request))
+        self.assertEqual(get_data_access_manager(request).view_mode, 'my_only')
@@ -0,0 +1,158 @@
+"""
+Tests for background report jobs
+"""
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.test import TestCase, RequestFactory, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from mobilize.core import views
+from mobilize.core.models import ReportJob
+from mobilize.core.report_jobs import get_or_start_report_job, get_report_data_version, purge_expired_report_jobs
+from mobilize.tasks.models import Task
+
+User = get_user_model()
+
+
+class ReportJobTests(TestCase):
+    """Test cases for report job generation and artifact reuse"""
+    
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(
+            username='reporter',
+            email='reporter@example.com',
+            role='super_admin'
+        )
+        Task.objects.create(
+            title='Follow Up',
+            status='pending',
+            assigned_to=self.user,
+            created_by=self.user
+        )
+    
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+    
+    def _start_job(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = get_or_start_report_job(self.user, 'tasks', **kwargs)
+        job.refresh_from_db()
+        return job
+    
+    def test_job_renders_report_to_storage(self):
+        """A queued job renders the report file and records progress"""
+        job = self._start_job()
+        
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(job.total_rows, 1)
+        self.assertTrue(job.filename.startswith('tasks_report_'))
+        
+        with job.file.open('rb') as report_file:
+            content = report_file.read().decode('utf-8')
+        self.assertIn('Follow Up', content)
+    
+    def test_identical_request_reuses_artifact(self):
+        """Repeat requests are served from the finished artifact"""
+        first = self._start_job()
+        second = self._start_job()
+        
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(ReportJob.objects.count(), 1)
+    
+    def test_data_change_invalidates_artifact(self):
+        """Saving a source model produces a new data version and a new job"""
+        version = get_report_data_version('tasks')
+        first = self._start_job()
+        
+        Task.objects.create(title='Another', status='pending', assigned_to=self.user)
+        
+        self.assertNotEqual(version, get_report_data_version('tasks'))
+        second = self._start_job()
+        self.assertNotEqual(first.pk, second.pk)
+        self.assertEqual(second.total_rows, 2)
+    
+    def test_user_change_invalidates_artifact(self):
+        """Renaming a user changes the data version, a login does not"""
+        version = get_report_data_version('tasks')
+        
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(version, get_report_data_version('tasks'))
+        
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        self.assertNotEqual(version, get_report_data_version('tasks'))
+    
+    def test_purge_deletes_expired_jobs_and_files(self):
+        """Jobs past the retention period are deleted with their artifacts"""
+        expired = self._start_job()
+        storage, name = expired.file.storage, expired.file.name
+        ReportJob.objects.filter(pk=expired.pk).update(created_at=timezone.now() - timedelta(days=3))
+        current = self._start_job(filters={'status_filter': 'completed'})
+        
+        self.assertEqual(purge_expired_report_jobs(retention_days=2), 1)
+        self.assertFalse(storage.exists(name))
+        self.assertEqual(list(ReportJob.objects.values_list('pk', flat=True)), [current.pk])
+        self.assertTrue(current.file.storage.exists(current.file.name))
+    
+    def test_filters_are_part_of_artifact_key(self):
+        """Different filters produce separate artifacts"""
+        all_tasks = self._start_job()
+        completed = self._start_job(filters={'status_filter': 'completed'})
+        
+        self.assertNotEqual(all_tasks.artifact_key, completed.artifact_key)
+        self.assertEqual(completed.total_rows, 0)
+    
+    def test_start_and_poll_views(self):
+        """Start endpoint queues a job and status endpoint reports it"""
+        request = self.factory.post('/reports/jobs/tasks/start/', {'format': 'excel'})
+        request.user = self.user
+        with self.captureOnCommitCallbacks(execute=True):
+            response = views.start_report_job(request, 'tasks')
+        
+        data = json.loads(response.content)
+        self.assertIn(data['status'], ['pending', 'completed'])
+        
+        request = self.factory.get(data['status_url'])
+        request.user = self.user
+        status = json.loads(views.report_job_status(request, data['job_id']).content)
+        self.assertEqual(status['status'], 'completed')
+        self.assertIsNotNone(status['download_url'])
+        
+        request = self.factory.get(status['download_url'])
+        request.user = self.user
+        download = views.report_job_download(request, data['job_id'])
+        self.assertIn('.xlsx', download['Content-Disposition'])
+        download.close()
+    
+    def test_status_view_is_scoped_to_owner(self):
+        """Users cannot poll other users' jobs"""
+        from django.http import Http404
+        
+        job = self._start_job()
+        other = User.objects.create_user(username='other', email='other@example.com')
+        request = self.factory.get('/')
+        request.user = other
+        
+        with self.assertRaises(Http404):
+            views.report_job_status(request, job.pk)
+    
+    def test_unknown_report_type_rejected(self):
+        """Start endpoint rejects unknown report types"""
+        request = self.factory.post('/reports/jobs/bogus/start/')
+        request.user = self.user
+        
+        response = views.start_report_job(request, 'bogus')
+        self.assertEqual(response.status_code, 400)
@@ -5,7 +5,7 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.http import HttpResponse
 from mobilize.core.reports import ReportGenerator
-from mobilize.contacts.models import Person
+from mobilize.contacts.models import Contact, Person
 from mobilize.churches.models import Church
 from mobilize.admin_panel.models import Office
 from mobilize.tasks.models import Task
@@ -32,26 +32,28 @@ class ReportGeneratorTests(TestCase):
         )
         
         # Create test data
-        self.person = Person.objects.create(
+        person_contact = Contact.objects.create(
+            type='person',
             first_name='John',
             last_name='Doe',
             email='john@example.com',
-            pipeline_stage='lead',
             priority='high',
-            assigned_to=str(self.user.id),
             status='active',
-            user_id=self.user.id
+            user=self.user,
+            office=self.office
         )
+        self.person = Person.objects.create(contact=person_contact)
         
+        church_contact = Contact.objects.create(type='church', church_name='Test Church', office=self.office)
         self.church = Church.objects.create(
+            contact=church_contact,
             name='Test Church',
             denomination='Baptist',
             website='https://testchurch.com',
             congregation_size=150,
             pastor_name='Pastor Smith',
             pastor_email='pastor@testchurch.com',
-            pastor_phone='555-1234',
-            office_id=self.office.id
+            pastor_phone='555-1234'
         )
         
         self.task = Task.objects.create(
@@ -70,7 +72,7 @@ class ReportGeneratorTests(TestCase):
             direction='outbound',
             date=datetime.now().date(),
             sender='test@example.com',
-            person_id=self.person.id,
+            person=self.person,
             user_id=str(self.user.id)
         )
         
@@ -261,13 +263,16 @@ class ReportGeneratorTests(TestCase):
         self.assertIn('Test Email', content)  # Recent
         self.assertNotIn('Old Email', content)  # Too old
     
-    def test_excel_format_fallback(self):
-        """Test that Excel format falls back to CSV"""
+    def test_excel_format(self):
+        """Test that Excel format produces an XLSX workbook"""
         response = self.report_generator.generate_people_report(format='excel')
         
-        # Should still be CSV format
-        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(
+            response['Content-Type'],
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
         self.assertIn('people_report_', response['Content-Disposition'])
+        self.assertIn('.xlsx', response['Content-Disposition'])
     
     def test_unsupported_format_raises_error(self):
         """Test that unsupported format raises ValueError"""
@@ -307,4 +312,220 @@ class ReportGeneratorTests(TestCase):
         content = response.content.decode('utf-8')
         # Should only include people assigned to this user
         self.assertIn('John', content)
-        self.assertNotIn('Jane', content)
\ No newline at end of file
+        self.assertNotIn('Jane', content)
+
+
+class ReportFixtureMixin:
+    """Shared report data with a main pipeline, church and assigned people"""
+    
+    def setUp(self):
+        from mobilize.contacts.models import Contact
+        from mobilize.pipeline.models import Pipeline, PIPELINE_TYPE_PEOPLE
+        
+        self.office = Office.objects.create(name='Stream Office', code='STREAM')
+        self.user = User.objects.create_user(
+            username='streamer',
+            email='streamer@example.com',
+            first_name='Stream',
+            last_name='User',
+            role='super_admin'
+        )
+        
+        self.pipeline = Pipeline.objects.create(
+            name='Main People Pipeline',
+            pipeline_type=PIPELINE_TYPE_PEOPLE,
+            is_main_pipeline=True
+        )
+        self.stage = self.pipeline.stages.create(name='Information', order=2)
+        
+        church_contact = Contact.objects.create(type='church', church_name='Grace', office=self.office)
+        self.church = Church.objects.create(contact=church_contact, name='Grace Church')
+        
+        for i in range(3):
+            self._create_person(i)
+        
+        Task.objects.create(
+            title='Call Back',
+            status='pending',
+            assigned_to=self.user,
+            created_by=self.user
+        )
+        Communication.objects.create(
+            type='email',
+            subject='Hello',
+            date=datetime.now().date(),
+            user=self.user
+        )
+    
+    def _create_person(self, index):
+        from mobilize.contacts.models import Contact
+        from mobilize.pipeline.models import PipelineContact
+        
+        contact = Contact.objects.create(
+            type='person',
+            first_name=f'First{index}',
+            last_name=f'Last{index}',
+            email=f'person{index}@example.com',
+            priority='high',
+            user=self.user,
+            office=self.office
+        )
+        person = Person.objects.create(contact=contact, primary_church=self.church)
+        PipelineContact.objects.create(
+            contact=contact,
+            pipeline=self.pipeline,
+            current_stage=self.stage,
+            contact_type='person'
+        )
+        return person
+
+
+class StreamingReportTests(ReportFixtureMixin, TestCase):
+    """Test cases for streaming CSV exports"""
+    
+    def _read_rows(self, response):
+        content = b''.join(response.streaming_content).decode('utf-8')
+        return list(csv.reader(io.StringIO(content)))
+    
+    def test_people_report_streams_rows(self):
+        """Streaming people report includes preloaded stage, user and church"""
+        from django.http import StreamingHttpResponse
+        
+        generator = ReportGenerator(self.user, stream=True)
+        response = generator.generate_people_report(format='csv')
+        
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertIn('people_report_', response['Content-Disposition'])
+        
+        rows = self._read_rows(response)
+        self.assertEqual(rows[0][5], 'Pipeline Stage')
+        data = {row[1]: row for row in rows[1:]}
+        self.assertEqual(data['First0'][5], 'Information')
+        self.assertEqual(data['First0'][6], 'High')
+        self.assertEqual(data['First0'][7], 'streamer')
+        self.assertEqual(data['First0'][8], 'Grace Church')
+    
+    def test_people_report_query_count_is_constant(self):
+        """Query count does not grow with the number of people"""
+        generator = ReportGenerator(self.user, stream=True)
+        
+        with self.assertNumQueries(5):
+            self._read_rows(generator.generate_people_report(format='csv'))
+        
+        for i in range(3, 10):
+            self._create_person(i)
+        
+        with self.assertNumQueries(5):
+            rows = self._read_rows(generator.generate_people_report(format='csv'))
+        self.assertEqual(len([row for row in rows[1:] if row[1].startswith('First')]), 10)
+    
+    def test_tasks_report_resolves_user_names(self):
+        """Tasks report resolves assignee names from preloaded users"""
+        generator = ReportGenerator(self.user, stream=True)
+        rows = self._read_rows(generator.generate_tasks_report(format='csv'))
+        
+        self.assertEqual(rows[1][1], 'Call Back')
+        self.assertEqual(rows[1][6], 'Stream User')
+        self.assertEqual(rows[1][7], 'Stream User')
+    
+    def test_all_report_types_stream(self):
+        """Churches, communications and summary reports also stream"""
+        generator = ReportGenerator(self.user, stream=True)
+        
+        churches = self._read_rows(generator.generate_churches_report(format='csv'))
+        self.assertIn('Grace Church', [row[1] for row in churches])
+        
+        communications = self._read_rows(generator.generate_communications_report(format='csv'))
+        self.assertEqual(communications[1][2], 'Hello')
+        
+        summary = self._read_rows(generator.generate_dashboard_summary(format='csv'))
+        metrics = {row[0]: row[1] for row in summary[1:]}
+        self.assertEqual(metrics['Pending Tasks'], '1')
+    
+    def test_zero_congregation_size_is_blank(self):
+        """A congregation size of 0 exports as an empty cell"""
+        Church.objects.filter(pk=self.church.pk).update(congregation_size=0)
+        generator = ReportGenerator(self.user, stream=True)
+        
+        rows = self._read_rows(generator.generate_churches_report(format='csv'))
+        self.assertEqual(rows[1][4], '')
+    
+    def test_errors_while_streaming_are_logged(self):
+        """Errors raised after the response was returned are logged"""
+        from unittest import mock
+        
+        generator = ReportGenerator(self.user, stream=True)
+        response = generator.generate_people_report(format='csv')
+        
+        with mock.patch('mobilize.core.reports.Echo.write', side_effect=RuntimeError('lost connection')):
+            with self.assertLogs('mobilize.core.reports', level='ERROR') as logs:
+                with self.assertRaises(RuntimeError):
+                    self._read_rows(response)
+        self.assertIn('lost connection', logs.output[0])
+    
+    def test_buffered_mode_matches_streaming(self):
+        """Buffered and streaming exports produce the same rows"""
+        buffered = ReportGenerator(self.user).generate_people_report(format='csv')
+        streamed = ReportGenerator(self.user, stream=True).generate_people_report(format='csv')
+        
+        buffered_rows = list(csv.reader(io.StringIO(buffered.content.decode('utf-8'))))
+        self.assertEqual(buffered_rows, self._read_rows(streamed))
+
+
+class ExcelReportTests(ReportFixtureMixin, TestCase):
+    """Test cases for XLSX exports"""
+    
+    def _read_workbook(self, response):
+        from openpyxl import load_workbook
+        
+        if hasattr(response, 'streaming_content'):
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        return load_workbook(io.BytesIO(content), read_only=True).active
+    
+    def test_people_report_excel(self):
+        """People workbook has typed cells and resolved lookups"""
+        from django.http import FileResponse
+        
+        response = ReportGenerator(self.user, stream=True).generate_people_report(format='excel')
+        self.assertIsInstance(response, FileResponse)
+        self.assertIn('people_report_', response['Content-Disposition'])
+        
+        rows = list(self._read_workbook(response).iter_rows(values_only=True))
+        self.assertEqual(rows[0][0], 'ID')
+        data = {row[1]: row for row in rows[1:]}
+        self.assertIsInstance(data['First0'][0], int)
+        self.assertEqual(data['First0'][5], 'Information')
+        self.assertEqual(data['First0'][8], 'Grace Church')
+        self.assertIsInstance(data['First0'][11], datetime)
+    
+    def test_tasks_report_excel_buffered(self):
+        """Buffered XLSX export returns the workbook content"""
+        response = ReportGenerator(self.user).generate_tasks_report(format='excel')
+        
+        rows = list(self._read_workbook(response).iter_rows(values_only=True))
+        self.assertEqual(rows[1][1], 'Call Back')
+        self.assertEqual(rows[1][6], 'Stream User')
+    
+    def test_control_characters_are_dropped(self):
+        """Control characters in synced text do not break the workbook"""
+        Communication.objects.create(
+            type='email',
+            subject='Line\x0bbreak',
+            date=datetime.now().date(),
+            user=self.user
+        )
+        
+        response = ReportGenerator(self.user, stream=True).generate_communications_report(format='excel')
+        
+        subjects = [row[2] for row in self._read_workbook(response).iter_rows(values_only=True)]
+        self.assertIn('Linebreak', subjects)
+    
+    def test_summary_excel(self):
+        """Dashboard summary can be exported as XLSX"""
+        response = ReportGenerator(self.user).generate_dashboard_summary(format='excel')
+        
+        rows = list(self._read_workbook(response).iter_rows(values_only=True))
+        self.assertEqual(rows[0], ('Metric', 'Count'))
+        self.assertIn(('Pending Tasks', 1), rows)
@@ -0,0 +1,205 @@
+"""
+Tests for incrementally maintained dashboard rollups
+"""
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from mobilize.admin_panel.models import Office, UserOffice
+from mobilize.churches.models import Church
+from mobilize.communications.models import Communication
+from mobilize.contacts.models import Contact, Person
+from mobilize.core.dashboard_metrics import DashboardMetricsEngine, _timeline_days
+from mobilize.core.permissions import DataAccessManager
+from mobilize.core.rollups import get_rollup_metrics, rebuild_rollups, rollup_batch
+from mobilize.tasks.models import Task
+
+User = get_user_model()
+
+COUNT_FIELDS = [
+    'people_count', 'churches_count', 'recent_people', 'recent_churches',
+    'pending_tasks_count', 'overdue_tasks', 'upcoming_tasks', 'completed_this_week',
+    'communications_this_week', 'people_pipeline', 'churches_pipeline',
+    'priority_distribution', 'activity_timeline', 'church_stats',
+]
+
+
+class DashboardRollupTests(TestCase):
+    """Test cases for rollup maintenance and dashboard reads"""
+    
+    def setUp(self):
+        from mobilize.pipeline.models import Pipeline, PIPELINE_TYPE_PEOPLE
+        
+        self.office = Office.objects.create(name='Rollup Office', code='ROLLUP')
+        self.other_office = Office.objects.create(name='Other Office', code='OTHER')
+        self.admin = User.objects.create_user(
+            username='rollup_admin',
+            email='rollup_admin@example.com',
+            role='super_admin'
+        )
+        self.office_admin = User.objects.create_user(
+            username='rollup_office_admin',
+            email='rollup_office_admin@example.com',
+            role='office_admin'
+        )
+        self.standard = User.objects.create_user(
+            username='rollup_user',
+            email='rollup_user@example.com',
+            role='standard_user'
+        )
+        UserOffice.objects.create(user=self.office_admin, office=self.office)
+        UserOffice.objects.create(user=self.standard, office=self.office)
+        
+        pipeline = Pipeline.objects.create(
+            name='Main People Pipeline',
+            pipeline_type=PIPELINE_TYPE_PEOPLE,
+            is_main_pipeline=True
+        )
+        self.stage = pipeline.stages.create(name='Promotion', order=1)
+        self.pipeline = pipeline
+        
+        church_contact = Contact.objects.create(type='church', church_name='Grace', office=self.office)
+        self.church = Church.objects.create(contact=church_contact, name='Grace Church')
+        
+        self.person = self._create_person('Ann', self.standard, self.office)
+        self._create_person('Ben', self.office_admin, self.other_office)
+        
+        today = timezone.localdate()
+        Task.objects.create(title='Call', status='pending', priority='high', due_date=today,
+                            assigned_to=self.standard, created_by=self.office_admin, office=self.office)
+        Task.objects.create(title='Visit', status='completed', completed_at=timezone.now(),
+                            assigned_to=self.office_admin, person=self.person)
+        Communication.objects.create(type='email', subject='Hi', date=today, user=self.standard,
+                                     church=self.church)
+    
+    def _create_person(self, name, user, office):
+        from mobilize.pipeline.models import PipelineContact
+        
+        contact = Contact.objects.create(type='person', first_name=name, last_name='Rollup', user=user, office=office)
+        person = Person.objects.create(contact=contact)
+        PipelineContact.objects.update_or_create(
+            contact=contact,
+            pipeline=self.pipeline,
+            defaults={'current_stage': self.stage, 'contact_type': 'person'}
+        )
+        return person
+    
+    def _managers(self):
+        return [
+            DataAccessManager(self.admin),
+            DataAccessManager(self.admin, 'my_only'),
+            DataAccessManager(self.admin, f'office_{self.office.id}'),
+            DataAccessManager(self.office_admin),
+            DataAccessManager(self.office_admin, 'my_only'),
+            DataAccessManager(self.standard),
+        ]
+    
+    def assertRollupsMatchLive(self):
+        days = _timeline_days()
+        for manager in self._managers():
+            live = DashboardMetricsEngine(manager)._compute_aggregates(days)
+            rolled = get_rollup_metrics(manager, days)
+            self.assertIsNotNone(rolled)
+            for name in COUNT_FIELDS:
+                self.assertEqual(
+                    getattr(rolled, name), getattr(live, name),
+                    f'{name} differs for {manager.user.username} ({manager.view_mode})'
+                )
+    
+    def test_not_ready_until_rebuilt(self):
+        """Rollups are ignored until the first rebuild marks them ready"""
+        self.assertIsNone(get_rollup_metrics(DataAccessManager(self.admin), _timeline_days()))
+        
+        rebuild_rollups()
+        self.assertIsNotNone(get_rollup_metrics(DataAccessManager(self.admin), _timeline_days()))
+    
+    def test_rebuild_matches_live_aggregates(self):
+        """A rebuilt rollup table gives the same numbers as the source tables"""
+        rebuild_rollups()
+        self.assertRollupsMatchLive()
+    
+    def test_signals_maintain_rollups(self):
+        """Saves and deletes after a rebuild keep the rollups in step"""
+        rebuild_rollups()
+        
+        carl = self._create_person('Carl', self.standard, self.office)
+        task = Task.objects.create(title='Email', status='pending', priority='low',
+                                   due_date=timezone.localdate() - timedelta(days=3), assigned_to=self.standard)
+        Communication.objects.create(type='call', subject='Call', date=timezone.localdate(), user=self.admin)
+        self.assertRollupsMatchLive()
+        
+        task.status = 'completed'
+        task.completed_at = timezone.now()
+        task.save()
+        carl.contact.office = self.other_office
+        carl.contact.save()
+        self.church.main_contact_id = carl.pk
+        self.church.save()
+        self.assertRollupsMatchLive()
+        
+        # Deleting a contact cascades to its Person and pipeline entries
+        carl.contact.delete()
+        task.delete()
+        self.assertRollupsMatchLive()
+    
+    def test_contact_edit_skips_dependents_unless_office_changes(self):
+        """Tasks and communications are only recounted when their contact moves office"""
+        rebuild_rollups()
+        contact = self.person.contact
+        
+        contact.priority = 'high'
+        with CaptureQueriesContext(connection) as queries:
+            contact.save()
+        self.assertFalse([
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "tasks"' in query['sql'] or 'FROM "communications"' in query['sql']
+        ])
+        
+        contact.office = self.other_office
+        contact.save()
+        self.assertRollupsMatchLive()
+    
+    def test_bulk_update_in_batch(self):
+        """Queryset updates registered with a rollup batch are applied once"""
+        rebuild_rollups()
+        contacts = Contact.objects.filter(type='person')
+        
+        with rollup_batch() as batch:
+            batch.touch('contact', contacts.values_list('id', flat=True))
+            contacts.update(office=self.other_office)
+        
+        self.assertRollupsMatchLive()
+    
+    def test_dashboard_reads_rollups(self):
+        """Dashboard metrics come from one rollup query plus the two lists"""
+        rebuild_rollups()
+        engine = DashboardMetricsEngine(DataAccessManager(self.admin))
+        
+        with self.assertNumQueries(3):
+            metrics = engine.compute()
+        self.assertEqual(metrics.people_count, Person.objects.count())
+        self.assertEqual([task.title for task in metrics.pending_tasks], ['Call'])
+    
+    def test_cross_office_report_reads_rollups(self):
+        """Cross-office report counts match with and without rollups"""
+        from mobilize.admin_panel.views import CrossOfficeReportView
+        
+        view = CrossOfficeReportView()
+        offices = Office.objects.order_by('name')
+        
+        with override_settings(DASHBOARD_USE_ROLLUPS=False):
+            live_data, live_totals = view._get_live_stats(offices)
+        
+        rebuild_rollups()
+        stats, totals = view._get_rollup_stats(offices)
+        
+        for row in live_data:
+            office_stats = stats[row['office'].id]
+            self.assertEqual(office_stats['people_count'], row['people_count'])
+            self.assertEqual(office_stats['churches_count'], row['churches_count'])
+            self.assertEqual(office_stats['pending_tasks'], row['pending_tasks'])
+        for name, value in totals.items():
+            self.assertEqual(value, live_totals[name])
@@ -0,0 +1,112 @@
+"""
+Tests for the UNION ALL scoped queryset builder
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.test import TestCase
+from mobilize.admin_panel.models import Office, UserOffice
+from mobilize.churches.models import Church
+from mobilize.communications.models import Communication
+from mobilize.contacts.models import Contact, Person
+from mobilize.core.permissions import DataAccessManager
+from mobilize.core.scoped_queries import scope_communications, scope_people, scope_tasks
+from mobilize.tasks.models import Task
+
+User = get_user_model()
+
+
+class ScopedQueryTests(TestCase):
+    """Scoped querysets return the same rows as the OR + DISTINCT filters"""
+    
+    def setUp(self):
+        self.office = Office.objects.create(name='Scope Office', code='SCOPE')
+        self.other_office = Office.objects.create(name='Other Scope Office', code='OSCOPE')
+        self.admin = User.objects.create_user(username='scope_admin', email='scope_admin@example.com',
+                                              role='office_admin')
+        self.other = User.objects.create_user(username='scope_other', email='scope_other@example.com',
+                                              role='standard_user')
+        self.loner = User.objects.create_user(username='scope_loner', email='scope_loner@example.com',
+                                              role='standard_user')
+        UserOffice.objects.create(user=self.admin, office=self.office)
+        UserOffice.objects.create(user=self.other, office=self.other_office)
+        
+        people = []
+        for index, (office, owner) in enumerate([
+            (self.office, None), (self.other_office, self.admin), (self.other_office, self.other),
+            (self.office, self.admin), (None, self.loner),
+        ]):
+            contact = Contact.objects.create(type='person', first_name=f'Scope{index}', office=office, user=owner)
+            people.append(Person.objects.create(contact=contact))
+        church_contact = Contact.objects.create(type='church', church_name='Scope', office=self.office)
+        church = Church.objects.create(contact=church_contact, name='Scope Church')
+        other_church_contact = Contact.objects.create(type='church', church_name='Far', office=self.other_office)
+        other_church = Church.objects.create(contact=other_church_contact, name='Far Church')
+        
+        # Rows matching no rule, one rule and several rules at once
+        links = [
+            {}, {'office': self.office}, {'person': people[0]}, {'church': church},
+            {'person': people[2]}, {'church': other_church}, {'office': self.other_office},
+            {'person': people[0], 'church': church, 'office': self.office},
+        ]
+        for index, link in enumerate(links):
+            Task.objects.create(title=f'Task {index}', **link)
+            Communication.objects.create(type='email', subject=f'Comm {index}', **link)
+        Task.objects.create(title='Assigned', assigned_to=self.admin, office=self.office)
+        Task.objects.create(title='Created', created_by=self.admin, person=people[2])
+        Task.objects.create(title='Both', assigned_to=self.loner, created_by=self.loner)
+        Communication.objects.create(type='email', subject='Own', user=self.admin, office=self.office)
+        Communication.objects.create(type='email', subject='Loner', user=self.loner)
+    
+    def _office_ids(self, user):
+        return list(UserOffice.objects.filter(user=user).values_list('office_id', flat=True))
+    
+    def _ids(self, queryset):
+        ids = list(queryset.values_list('pk', flat=True))
+        self.assertEqual(len(ids), len(set(ids)))
+        return sorted(ids)
+    
+    def test_tasks_match_or_distinct(self):
+        """Task visibility matches the previous filter for every user"""
+        for user in (self.admin, self.other, self.loner):
+            offices = self._office_ids(user)
+            expected = Task.objects.filter(
+                Q(assigned_to=user) | Q(created_by=user) |
+                Q(person__contact__office__in=offices) |
+                Q(church__contact__office__in=offices) |
+                Q(office__in=offices)
+            ).distinct()
+            self.assertEqual(self._ids(scope_tasks(Task.objects.all(), user, offices)), self._ids(expected))
+    
+    def test_communications_match_or_distinct(self):
+        """Communication visibility matches the previous filter for every user"""
+        for user in (self.admin, self.other, self.loner):
+            offices = self._office_ids(user)
+            expected = Communication.objects.filter(
+                Q(user=user) |
+                Q(person__contact__office__in=offices) |
+                Q(church__contact__office__in=offices) |
+                Q(office__in=offices)
+            ).distinct()
+            self.assertEqual(
+                self._ids(scope_communications(Communication.objects.all(), user, offices)),
+                self._ids(expected)
+            )
+    
+    def test_people_match_or_distinct(self):
+        """Office admin people visibility matches the previous filter"""
+        for user in (self.admin, self.other, self.loner):
+            offices = self._office_ids(user)
+            expected = Person.objects.filter(
+                Q(contact__office_id__in=offices) | Q(contact__user=user)
+            ).distinct()
+            self.assertEqual(self._ids(scope_people(Person.objects.all(), user, offices)), self._ids(expected))
+        
+        manager = DataAccessManager(self.admin)
+        self.assertFalse(manager.get_people_queryset().query.distinct)
+    
+    def test_scoped_queryset_stays_composable(self):
+        """Further filters, counts and slices apply to the scoped result"""
+        scoped = scope_tasks(Task.objects.all(), self.admin, self._office_ids(self.admin))
+        
+        self.assertEqual(scoped.filter(title='Assigned').count(), 1)
+        self.assertEqual(len(scoped.order_by('title')[:2]), 2)
@@ -0,0 +1,143 @@
+"""
+Tests for the search document index
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+from mobilize.churches.models import Church
+from mobilize.communications.models import Communication
+from mobilize.contacts.models import Contact, Person
+from mobilize.core.models import SearchDocument
+from mobilize.core.permissions import DataAccessManager
+from mobilize.core.search import (
+    filter_by_search,
+    normalize_text,
+    rebuild_search_index,
+    search,
+    search_index_batch,
+)
+from mobilize.tasks.models import Task
+
+User = get_user_model()
+
+
+class SearchIndexTests(TestCase):
+    """Test cases for building and querying search documents"""
+    
+    def setUp(self):
+        self.admin = User.objects.create_user(username='searcher', email='searcher@example.com', role='super_admin')
+        self.access = DataAccessManager(self.admin)
+        self.person = self._person('José', 'Álvarez', email='jose@example.com', phone='(555) 123-4567')
+        church_contact = Contact.objects.create(type='church', church_name='Grace Fellowship')
+        self.church = Church.objects.create(contact=church_contact, name='Grace Fellowship', location='Springfield')
+        self.task = Task.objects.create(title='Send newsletter', person=self.person, description='Quarterly update')
+        self.communication = Communication.objects.create(
+            type='email', subject='Welcome', message='Thanks for visiting Grace', church=self.church,
+        )
+    
+    def _person(self, first_name, last_name, **fields):
+        contact = Contact.objects.create(type='person', first_name=first_name, last_name=last_name, **fields)
+        return Person.objects.create(contact=contact)
+    
+    def _ids(self, query, **kwargs):
+        return [(row['type'], row['id']) for row in search(query, self.access, **kwargs)]
+    
+    def test_normalize_text(self):
+        self.assertEqual(normalize_text('  José  ÁLVAREZ, (555)!'), 'jose alvarez 555')
+        self.assertEqual(normalize_text(None), '')
+    
+    def test_saves_keep_documents_current(self):
+        """Documents follow creates, edits and deletes through model signals"""
+        self.assertEqual(self._ids('alvarez', types=['person']), [('person', self.person.pk)])
+        self.assertEqual(self._ids('jose@example'), [('person', self.person.pk)])
+        self.assertEqual(self._ids('5551234567'), [('person', self.person.pk)])
+        
+        contact = self.person.contact
+        contact.last_name = 'Ramirez'
+        contact.save()
+        self.assertEqual(self._ids('alvarez'), [])
+        self.assertEqual(self._ids('ramirez'), [('person', self.person.pk), ('task', self.task.pk)])
+        
+        self.task.delete()
+        self.assertFalse(SearchDocument.objects.filter(source='task', object_id=self.task.pk).exists())
+    
+    def test_renaming_a_contact_reindexes_linked_rows(self):
+        """Tasks are found by the current name of their person"""
+        self.assertIn(('task', self.task.pk), self._ids('alvarez newsletter'))
+        
+        contact = self.person.contact
+        contact.last_name = 'Ramirez'
+        contact.save()
+        self.assertEqual(self._ids('ramirez newsletter'), [('task', self.task.pk)])
+    
+    def test_results_are_ranked_and_typed(self):
+        """Title matches rank above matches in linked names and bodies"""
+        ids = self._ids('grace')
+        self.assertEqual(ids, [('church', self.church.pk), ('communication', self.communication.pk)])
+        self.assertEqual(self._ids('grace', types=['communication']), [('communication', self.communication.pk)])
+        
+        result = search('grace', self.access)[0]
+        self.assertEqual(result['title'], 'Grace Fellowship')
+        self.assertEqual(result['url'], f'/churches/{self.church.pk}/')
+    
+    def test_short_terms_match_word_starts(self):
+        self.assertEqual(self._ids('al', types=['person']), [('person', self.person.pk)])
+        self.assertEqual(self._ids('va', types=['person']), [])
+    
+    def test_results_respect_data_access(self):
+        """Standard users only find the people assigned to them"""
+        user = User.objects.create_user(username='standard', email='standard@example.com', role='standard_user')
+        own = self._person('Alvaro', 'Owned', user=user)
+        
+        results = search('alv', DataAccessManager(user), types=['person'])
+        self.assertEqual([row['id'] for row in results], [own.pk])
+    
+    def test_office_admins_only_find_their_offices(self):
+        from mobilize.admin_panel.models import Office, UserOffice
+        
+        office = Office.objects.create(name='Search Office', code='SEARCH')
+        admin = User.objects.create_user(username='office_searcher', email='office_searcher@example.com',
+                                         role='office_admin')
+        UserOffice.objects.create(user=admin, office=office)
+        local = self._person('Alvin', 'Local', office=office)
+        
+        results = search('alv', DataAccessManager(admin), types=['person'])
+        self.assertEqual([row['id'] for row in results], [local.pk])
+    
+    def test_batch_defers_indexing(self):
+        with search_index_batch():
+            person = self._person('Deferred', 'Person')
+            self.assertEqual(self._ids('deferred'), [])
+        self.assertEqual(self._ids('deferred'), [('person', person.pk)])
+    
+    def test_filter_by_search_falls_back_until_built(self):
+        """List filters use icontains until the index is rebuilt, then the index"""
+        fields = ['contact__first_name', 'contact__last_name']
+        Contact.objects.filter(pk=self.person.pk).update(last_name='Bypassed')
+        
+        # Queryset updates skip the signals, so only the fallback sees the change
+        self.assertEqual(list(filter_by_search(Person.objects.all(), 'bypassed', 'person', fields)), [self.person])
+        
+        rebuild_search_index()
+        self.assertEqual(list(filter_by_search(Person.objects.all(), 'bypassed', 'person', fields)), [self.person])
+        self.assertEqual(list(filter_by_search(Person.objects.all(), 'jose@', 'person', fields)), [self.person])
+        self.assertEqual(list(filter_by_search(Person.objects.all(), 'missing', 'person', fields)), [])
+
+
+class SearchViewTests(TestCase):
+    """Test cases for the global search endpoint"""
+    
+    def test_search_endpoint(self):
+        from mobilize.core.views import search as search_view
+        
+        user = User.objects.create_user(username='viewer', email='viewer@example.com', role='super_admin')
+        contact = Contact.objects.create(type='person', first_name='Marta', last_name='Quinn')
+        Person.objects.create(contact=contact)
+        
+        request = RequestFactory().get('/search/', {'q': 'quinn'})
+        request.user = user
+        data = json.loads(search_view(request).content)
+        
+        self.assertEqual(data['query'], 'quinn')
+        self.assertEqual([(row['type'], row['id']) for row in data['results']], [('person', contact.pk)])
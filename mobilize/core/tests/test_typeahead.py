@@ -0,0 +1,87 @@
+"""
+Tests for the contact typeahead
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from mobilize.admin_panel.models import Office, UserOffice
+from mobilize.churches.models import Church
+from mobilize.contacts.models import Contact, Person
+from mobilize.core.permissions import DataAccessManager
+from mobilize.core.typeahead import contact_typeahead
+from mobilize.tasks.models import Task
+
+User = get_user_model()
+
+
+class ContactTypeaheadTests(TestCase):
+    """Test cases for prefix lookups of people and churches"""
+    
+    def setUp(self):
+        cache.clear()
+        self.office = Office.objects.create(name='Typeahead Office', code='TYPE')
+        self.other_office = Office.objects.create(name='Other Typeahead Office', code='TYPE2')
+        self.admin = User.objects.create_user(username='typer', email='typer@example.com', role='super_admin')
+        self.access = DataAccessManager(self.admin)
+        self.marta = self._person('Marta', 'Quinlan', email='mq@example.com', office=self.office)
+        self.mark = self._person('Mark', 'Olsen', email='olsen@example.com', office=self.other_office)
+        church_contact = Contact.objects.create(type='church', church_name='Mariners Church', office=self.office)
+        self.church = Church.objects.create(contact=church_contact, name='Mariners Church')
+    
+    def _person(self, first_name, last_name, **fields):
+        contact = Contact.objects.create(type='person', first_name=first_name, last_name=last_name, **fields)
+        return Person.objects.create(contact=contact)
+    
+    def _ids(self, query, access=None, **kwargs):
+        results = contact_typeahead(query, access or self.access, **kwargs)
+        return {kind: [row['id'] for row in rows] for kind, rows in results.items()}
+    
+    def test_matches_name_and_email_prefixes(self):
+        self.assertEqual(self._ids('mar'), {'person': [self.mark.pk, self.marta.pk], 'church': [self.church.pk]})
+        self.assertEqual(self._ids('quin')['person'], [self.marta.pk])
+        self.assertEqual(self._ids('olsen@ex')['person'], [self.mark.pk])
+        # Prefixes only match the start of a key
+        self.assertEqual(self._ids('arta')['person'], [])
+    
+    def test_results_respect_data_access(self):
+        admin = User.objects.create_user(username='office_typer', email='office_typer@example.com',
+                                         role='office_admin')
+        UserOffice.objects.create(user=admin, office=self.office)
+        
+        self.assertEqual(self._ids('mar', DataAccessManager(admin))['person'], [self.marta.pk])
+    
+    def test_hot_prefixes_are_cached_until_contacts_change(self):
+        self._ids('ma')
+        with self.assertNumQueries(0):
+            self.assertEqual(self._ids('ma', types=('person',))['person'], [self.mark.pk, self.marta.pk])
+        
+        maria = self._person('Maria', 'Alvarez', office=self.office)
+        self.assertEqual(self._ids('ma', types=('person',))['person'], [maria.pk, self.mark.pk, self.marta.pk])
+    
+    def test_endpoint_returns_people_and_churches(self):
+        from mobilize.communications.views import get_contacts_json
+        
+        def get(**params):
+            request = RequestFactory().get('/communications/api/contacts/', params)
+            request.user = self.admin
+            return json.loads(get_contacts_json(request).content)
+        
+        data = get(q='mari', type='church')
+        self.assertEqual(data, {'people': [], 'churches': [
+            {'id': self.church.pk, 'name': 'Mariners Church', 'email': ''},
+        ]})
+        
+        data = get(id=str(self.marta.pk))
+        self.assertEqual(data['people'], [{'id': self.marta.pk, 'name': 'Marta Quinlan', 'email': 'mq@example.com'}])
+    
+    def test_task_form_renders_only_the_selected_person(self):
+        from mobilize.tasks.forms import TaskForm
+        
+        task = Task.objects.create(title='Call', person=self.marta)
+        html = str(TaskForm(instance=task, user=self.admin)['person'])
+        
+        self.assertIn(f'value="{self.marta.pk}" selected', html)
+        self.assertNotIn(f'value="{self.mark.pk}"', html)
+        self.assertIn('data-typeahead-type="person"', html)
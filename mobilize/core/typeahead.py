@@ -0,0 +1,196 @@
+"""
+Prefix typeahead for people and churches.
+
+Dropdowns that pick a contact ask for the few names or emails starting with
+what the user has typed so far, instead of loading every contact up front.
+Lookups are range scans over SearchPrefix keys, which the search index
+keeps current as contacts change.
+
+Short prefixes match the most rows and are typed by everyone, so their
+results are cached per office scope. The cache key embeds generation
+counters that contact changes bump for the contact's office and owner.
+"""
+from django.core.cache import cache
+from django.db import connection
+
+from .cache_versions import bump_versions, get_versions
+from .search import MAX_PREFIX_KEY_LENGTH, normalize_text, sees_all_data
+
+
+TYPEAHEAD_TYPES = ('person', 'church')
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# Prefixes up to this length are cached
+HOT_PREFIX_LENGTH = 3
+
+# Office scopes also see contacts linked through tasks and communications,
+# which don't bump the office generation, so cached results expire quickly
+CACHE_TIMEOUT = 300
+
+
+def _generation_key(scope, scope_id=None):
+    if scope_id is None:
+        return f'typeahead_generation:{scope}'
+    return f'typeahead_generation:{scope}:{scope_id}'
+
+
+def bump_typeahead_generations(office_ids=(), user_ids=()):
+    """
+    Invalidate cached typeahead results for the scopes touched by a change.
+    
+    The all-offices scope is always invalidated since it sees every contact.
+    
+    Args:
+        office_ids: Offices whose contacts were added, edited or removed
+        user_ids: Owners of those contacts
+    """
+    keys = [_generation_key('all')]
+    keys += [_generation_key('office', office_id) for office_id in sorted(set(office_ids)) if office_id]
+    keys += [_generation_key('user', user_id) for user_id in sorted(set(user_ids)) if user_id]
+    bump_versions(keys)
+
+
+def bump_typeahead_index():
+    """Invalidate every cached typeahead result, such as after a rebuild."""
+    bump_versions([_generation_key('index')])
+
+
+def get_scope_generation_keys(access_manager):
+    """
+    Get the generation counters a typeahead scope is cached under.
+    
+    Args:
+        access_manager: DataAccessManager defining the visible contacts
+    
+    Returns:
+        List of cache keys, or None for scopes limited to one user's own
+        contacts, which are not cached
+    """
+    if access_manager.view_mode == 'my_only':
+        return None
+    
+    # Every scope embeds the index generation so a rebuild invalidates them all
+    keys = [_generation_key('index')]
+    if sees_all_data(access_manager):
+        return keys + [_generation_key('all')]
+    if access_manager.user_role == 'super_admin' and access_manager.selected_office_id:
+        return keys + [_generation_key('office', access_manager.selected_office_id)]
+    if access_manager.user_role == 'office_admin':
+        # Office admins also see the contacts they own in other offices
+        return keys + [_generation_key('user', access_manager.user.id)] + [
+            _generation_key('office', office_id) for office_id in sorted(access_manager._get_user_offices())
+        ]
+    return None
+
+
+def _visible_rows(rows, access_manager, kind):
+    """Restrict prefix rows to the contacts an access manager can see."""
+    if sees_all_data(access_manager):
+        return rows
+    if kind == 'person':
+        return rows.filter(contact_id__in=access_manager.get_people_queryset().values('pk'))
+    return rows.filter(contact_id__in=access_manager.get_churches_queryset().values('pk'))
+
+
+def _prefix_upper_bound(prefix):
+    """Return the smallest string greater than every string starting with prefix."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def lookup_prefix(prefix, access_manager, kind, limit=DEFAULT_LIMIT):
+    """
+    Find the contacts of one type with a name or email starting with a prefix.
+    
+    Args:
+        prefix: Normalized prefix
+        access_manager: DataAccessManager defining the visible contacts
+        kind: 'person' or 'church'
+        limit: Maximum number of contacts
+    
+    Returns:
+        List of dicts with id, name and email, ordered by matching key
+    """
+    from mobilize.core.models import SearchPrefix
+    
+    rows = SearchPrefix.objects.filter(kind=kind, key__startswith=prefix)
+    if connection.vendor != 'postgresql':
+        # A key range lets databases without pattern operator classes use the index
+        rows = rows.filter(key__gte=prefix, key__lt=_prefix_upper_bound(prefix))
+    rows = _visible_rows(rows, access_manager, kind).order_by('key', 'contact_id')
+    
+    # A contact can match on several keys, such as both its name and email
+    results = {}
+    for row in rows.values('contact_id', 'label', 'email')[:limit * 4]:
+        if row['contact_id'] not in results:
+            results[row['contact_id']] = {'id': row['contact_id'], 'name': row['label'], 'email': row['email']}
+            if len(results) >= limit:
+                break
+    return list(results.values())
+
+
+def contact_typeahead(query, access_manager, types=TYPEAHEAD_TYPES, limit=DEFAULT_LIMIT):
+    """
+    Get the people and churches matching a typed prefix.
+    
+    Args:
+        query: Text typed so far
+        access_manager: DataAccessManager of the requesting user
+        types: Contact types to look up
+        limit: Maximum number of contacts per type
+    
+    Returns:
+        Dict of contact type to list of matches
+    """
+    prefix = normalize_text(query)[:MAX_PREFIX_KEY_LENGTH]
+    if not prefix:
+        return {kind: [] for kind in types}
+    
+    generation_keys = None
+    if len(prefix) <= HOT_PREFIX_LENGTH:
+        generation_keys = get_scope_generation_keys(access_manager)
+    if generation_keys is None:
+        return {kind: lookup_prefix(prefix, access_manager, kind, limit) for kind in types}
+    
+    versions = get_versions(generation_keys)
+    scope = ','.join(key.split(':', 1)[1] for key in generation_keys)
+    fingerprint = '-'.join(str(versions[key]) for key in generation_keys)
+    results = {}
+    for kind in types:
+        cache_key = f'typeahead:{scope}:{fingerprint}:{kind}:{limit}:{prefix}'
+        results[kind] = cache.get_or_set(
+            cache_key, lambda kind=kind: lookup_prefix(prefix, access_manager, kind, limit), CACHE_TIMEOUT
+        )
+    return results
+
+
+def get_contact_choice(contact_id, access_manager, types=TYPEAHEAD_TYPES):
+    """
+    Look up one visible contact in typeahead format, such as a preselected value.
+    
+    Args:
+        contact_id: Contact ID
+        access_manager: DataAccessManager of the requesting user
+        types: Contact types to look in
+    
+    Returns:
+        Dict of contact type to a list holding the contact, if visible
+    """
+    from mobilize.core.models import SearchDocument
+    
+    results = {kind: [] for kind in types}
+    document = SearchDocument.objects.filter(
+        source='contact', kind__in=types, object_id=contact_id
+    ).values('kind', 'title', 'subtitle').first()
+    if document is None:
+        return results
+    
+    kind = document['kind']
+    if kind == 'person':
+        visible = access_manager.get_people_queryset().filter(pk=contact_id).exists()
+    else:
+        visible = access_manager.get_churches_queryset().filter(pk=contact_id).exists()
+    if visible:
+        email = document['subtitle'] if kind == 'person' else ''
+        results[kind].append({'id': contact_id, 'name': document['title'], 'email': email})
+    return results
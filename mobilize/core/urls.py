@@ -9,5 +9,12 @@ urlpatterns = [
     path('settings/', views.settings, name='settings'),
     path('reports/', views.reports, name='reports'),
     path('export/<str:report_type>/', views.export_report, name='export_report'),
+    path('reports/jobs/<str:report_type>/start/', views.start_report_job, name='start_report_job'),
+    path('reports/jobs/<int:job_id>/status/', views.report_job_status, name='report_job_status'),
+    path('reports/jobs/<int:job_id>/download/', views.report_job_download, name='report_job_download'),
+    path('imports/jobs/<int:job_id>/status/', views.import_job_status, name='import_job_status'),
+    path('imports/jobs/<int:job_id>/run/', views.run_import_job, name='run_import_job'),
+    path('bulk/jobs/<int:job_id>/status/', views.bulk_operation_job_status, name='bulk_operation_job_status'),
+    path('search/', views.search, name='search'),
     path('customize-dashboard/', views.customize_dashboard, name='customize_dashboard'),
 ]
@@ -1,10 +1,9 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Q
+from django.http import FileResponse, Http404, JsonResponse
+from django.views.decorators.http import require_POST
 from django.contrib import messages
-from django.core.cache import cache
 from django.utils.http import urlencode
-from datetime import datetime, timedelta
 from mobilize.authentication.decorators import ensure_user_office_assignment
 
 
@@ -28,212 +27,15 @@ def dashboard(request):
     - Recent activity
     - Overdue tasks
     """
-    from mobilize.contacts.models import Person
-    from mobilize.churches.models import Church
-    from mobilize.tasks.models import Task
-    from mobilize.communications.models import Communication
     from mobilize.core.permissions import get_data_access_manager
+    from mobilize.core.dashboard_metrics import get_dashboard_metrics
     from mobilize.core.dashboard_widgets import get_user_dashboard_config, organize_widgets_by_row, get_widget_css_class
-    from django.db.models import Count, Q
-    from datetime import datetime, timedelta
     
     # Get data access manager based on user role and view preferences
     access_manager = get_data_access_manager(request)
     
-    # Create cache key based on user and view mode for performance
-    cache_key = f'dashboard_data_{request.user.id}_{access_manager.view_mode}_{datetime.now().strftime("%Y%m%d_%H")}'
-    cached_data = cache.get(cache_key)
-    
-    if cached_data:
-        # Use cached data for better performance (1-hour cache)
-        people_count = cached_data['people_count']
-        churches_count = cached_data['churches_count']
-        people_queryset = access_manager.get_people_queryset()
-        churches_queryset = access_manager.get_churches_queryset()
-        tasks_queryset = access_manager.get_tasks_queryset()
-        communications_queryset = access_manager.get_communications_queryset()
-    else:
-        # Get filtered querysets based on user permissions
-        people_queryset = access_manager.get_people_queryset()
-        churches_queryset = access_manager.get_churches_queryset()
-        tasks_queryset = access_manager.get_tasks_queryset()
-        communications_queryset = access_manager.get_communications_queryset()
-        
-        # Get counts for dashboard widgets
-        people_count = people_queryset.count()
-        churches_count = churches_queryset.count()
-        
-        # Cache the basic counts for 1 hour
-        cache.set(cache_key, {
-            'people_count': people_count,
-            'churches_count': churches_count,
-        }, 3600)
-    
-    # Get pending tasks for current user (always user-specific) with optimization
-    pending_tasks = tasks_queryset.select_related(
-        'created_by', 'assigned_to', 'person', 'church', 'office'
-    ).filter(
-        status='pending'
-    ).order_by('due_date')[:5]
-    
-    # Get task counts using aggregation for efficiency
-    task_stats = tasks_queryset.aggregate(
-        overdue_tasks=Count('pk', filter=Q(
-            status='pending',
-            due_date__lt=datetime.now().date()
-        )),
-        upcoming_tasks=Count('pk', filter=Q(
-            status='pending',
-            due_date__range=[datetime.now().date(), datetime.now().date() + timedelta(days=7)]
-        )),
-        completed_this_week=Count('pk', filter=Q(
-            status='completed',
-            completed_at__gte=datetime.now() - timedelta(days=7)
-        ))
-    )
-    
-    # Get recent communications (user-specific) with optimization
-    recent_communications = communications_queryset.select_related(
-        'person', 'church', 'office'
-    ).order_by('-date_sent')[:5]
-    
-    # Get pipeline distribution for people and churches
-    from mobilize.pipeline.models import MAIN_PEOPLE_PIPELINE_STAGES, MAIN_CHURCH_PIPELINE_STAGES
-    from django.db.models import Count, Case, When, CharField, Value
-    
-    # Get people pipeline distribution - OPTIMIZED with database aggregation
-    from mobilize.pipeline.models import PipelineContact, PipelineStage
-    
-    # Get all pipeline stage names for mapping
-    stage_name_map = dict(MAIN_PEOPLE_PIPELINE_STAGES)
-    
-    # Use database aggregation instead of Python loops
-    people_pipeline_raw = people_queryset.select_related('contact').prefetch_related(
-        'contact__pipeline_entries__current_stage'
-    ).annotate(
-        pipeline_stage_name=Case(
-            *[When(contact__pipeline_entries__current_stage__name=stage_name, then=Value(stage_code))
-              for stage_code, stage_name in MAIN_PEOPLE_PIPELINE_STAGES],
-            default=Value('unknown'),
-            output_field=CharField()
-        )
-    ).values('pipeline_stage_name').annotate(count=Count('contact_id'))
-    
-    # Convert to expected format
-    people_pipeline_data = []
-    pipeline_counts = {item['pipeline_stage_name']: item['count'] for item in people_pipeline_raw}
-    for stage_code, stage_name in MAIN_PEOPLE_PIPELINE_STAGES:
-        count = pipeline_counts.get(stage_code, 0)
-        people_pipeline_data.append({
-            'stage_code': stage_code,
-            'stage_name': stage_name,
-            'count': count
-        })
-    
-    # Get churches pipeline distribution - OPTIMIZED with database aggregation
-    church_stage_name_map = dict(MAIN_CHURCH_PIPELINE_STAGES)
-    
-    churches_pipeline_raw = churches_queryset.select_related('contact').prefetch_related(
-        'contact__pipeline_entries__current_stage'
-    ).annotate(
-        pipeline_stage_name=Case(
-            *[When(contact__pipeline_entries__current_stage__name=stage_name, then=Value(stage_code))
-              for stage_code, stage_name in MAIN_CHURCH_PIPELINE_STAGES],
-            default=Value('unknown'),
-            output_field=CharField()
-        )
-    ).values('pipeline_stage_name').annotate(count=Count('contact_id'))
-    
-    # Convert to expected format
-    churches_pipeline_data = []
-    church_pipeline_counts = {item['pipeline_stage_name']: item['count'] for item in churches_pipeline_raw}
-    for stage_code, stage_name in MAIN_CHURCH_PIPELINE_STAGES:
-        count = church_pipeline_counts.get(stage_code, 0)
-        churches_pipeline_data.append({
-            'stage_code': stage_code,
-            'stage_name': stage_name,
-            'count': count
-        })
-    
-    # Calculate percentages
-    people_total = sum(item['count'] for item in people_pipeline_data) or 1
-    for item in people_pipeline_data:
-        item['percentage'] = round((item['count'] / people_total) * 100, 1)
-    
-    churches_total = sum(item['count'] for item in churches_pipeline_data) or 1
-    for item in churches_pipeline_data:
-        item['percentage'] = round((item['count'] / churches_total) * 100, 1)
-    
-    # Get activity summary for this week (based on access level) using aggregation
-    week_start = datetime.now() - timedelta(days=7)
-    activity_stats = {
-        'recent_people': people_queryset.filter(
-            contact__created_at__gte=week_start.date()
-        ).count(),
-        'recent_churches': churches_queryset.filter(
-            contact__created_at__gte=week_start.date()
-        ).count()
-    }
-    
-    # Prepare priority distribution (user-specific tasks)
-    priority_tasks = tasks_queryset.filter(
-        status='pending'
-    ).values('priority').annotate(count=Count('pk')).order_by('priority')
-    
-    # Get activity timeline data (last 7 days) - OPTIMIZED with single queries and proper date handling
-    from django.db.models import DateField
-    from django.db.models.functions import TruncDate
-    
-    # Get date range for last 7 days
-    end_date = datetime.now().date()
-    start_date = end_date - timedelta(days=6)
-    
-    # Get all people created in last 7 days, grouped by date - OPTIMIZED
-    people_by_date = people_queryset.select_related('contact').filter(
-        contact__created_at__date__range=[start_date, end_date]
-    ).annotate(
-        created_date=TruncDate('contact__created_at')
-    ).values('created_date').annotate(count=Count('contact_id'))
-    people_counts = {item['created_date']: item['count'] for item in people_by_date}
-    
-    # Get all tasks completed in last 7 days, grouped by date - OPTIMIZED
-    tasks_by_date = tasks_queryset.select_related('assigned_to', 'created_by').filter(
-        status='completed',
-        completed_at__date__range=[start_date, end_date]
-    ).annotate(
-        task_date=TruncDate('completed_at')
-    ).values('task_date').annotate(count=Count('pk'))
-    task_counts = {item['task_date']: item['count'] for item in tasks_by_date}
-    
-    # Get all communications sent in last 7 days, grouped by date - OPTIMIZED
-    comms_by_date = communications_queryset.select_related('person', 'church', 'user').filter(
-        date__range=[start_date, end_date]
-    ).annotate(
-        comm_date=TruncDate('date')
-    ).values('comm_date').annotate(count=Count('pk'))
-    comm_counts = {item['comm_date']: item['count'] for item in comms_by_date}
-    
-    # Build timeline data efficiently
-    activity_timeline = []
-    for i in range(6, -1, -1):
-        date = datetime.now().date() - timedelta(days=i)
-        activity_timeline.append({
-            'date': date.strftime('%m/%d'),
-            'people': people_counts.get(date, 0),
-            'tasks': task_counts.get(date, 0),
-            'communications': comm_counts.get(date, 0),
-        })
-    
-    # Get church activity summary
-    church_stats = {
-        'total': churches_queryset.count(),
-        'with_contacts': churches_queryset.filter(
-            main_contact_id__isnull=False
-        ).count(),
-        'recent_activity': churches_queryset.filter(
-            contact__updated_at__gte=week_start
-        ).count(),
-    }
+    # Compute every widget metric for this scope in a fixed number of queries
+    metrics = get_dashboard_metrics(access_manager)
     
     # Get user's dashboard widget configuration
     dashboard_config = get_user_dashboard_config(request.user)
@@ -247,20 +49,23 @@ def dashboard(request):
         all_offices = Office.objects.all().order_by('name')
     
     context = {
-        'people_count': people_count,
-        'churches_count': churches_count,
-        'pending_tasks': pending_tasks,
-        'overdue_tasks': task_stats['overdue_tasks'],
-        'upcoming_tasks': task_stats['upcoming_tasks'],
-        'recent_communications': recent_communications,
-        'people_pipeline_data': people_pipeline_data,
-        'churches_pipeline_data': churches_pipeline_data,
-        'completed_this_week': task_stats['completed_this_week'],
-        'recent_people': activity_stats['recent_people'],
-        'recent_churches': activity_stats['recent_churches'],
-        'priority_tasks': priority_tasks,
-        'activity_timeline': activity_timeline,
-        'church_stats': church_stats,
+        'dashboard_metrics': metrics,
+        'people_count': metrics.people_count,
+        'churches_count': metrics.churches_count,
+        'pending_tasks': metrics.pending_tasks,
+        'pending_tasks_count': metrics.pending_tasks_count,
+        'overdue_tasks': metrics.overdue_tasks,
+        'upcoming_tasks': metrics.upcoming_tasks,
+        'recent_communications': metrics.recent_communications,
+        'communications_this_week': metrics.communications_this_week,
+        'people_pipeline_data': metrics.people_pipeline,
+        'churches_pipeline_data': metrics.churches_pipeline,
+        'completed_this_week': metrics.completed_this_week,
+        'recent_people': metrics.recent_people,
+        'recent_churches': metrics.recent_churches,
+        'priority_tasks': metrics.priority_distribution,
+        'activity_timeline': metrics.activity_timeline,
+        'church_stats': metrics.church_stats,
         # Add view mode controls
         'can_toggle_view': access_manager.can_view_all_data(),
         'current_view_mode': access_manager.view_mode,
@@ -384,38 +189,168 @@ def export_report(request, report_type):
     Args:
         report_type: Type of report to export (people, churches, tasks, communications, summary)
     """
-    from mobilize.core.reports import ReportGenerator
+    from mobilize.core.reports import ReportGenerator, REPORT_TYPES
     
     # Get format and filters from request
     format = request.GET.get('format', 'csv')
     view_mode = request.GET.get('view_mode', 'default')
     
-    # Create report generator
-    generator = ReportGenerator(request.user, view_mode)
+    if report_type not in REPORT_TYPES:
+        messages.error(request, f'Unknown report type: {report_type}')
+        return redirect('core:reports')
+    
+    # Create report generator; rows are streamed so large exports use flat memory
+    generator = ReportGenerator(request.user, view_mode, stream=True)
     
     try:
-        if report_type == 'people':
-            return generator.generate_people_report(format)
-        elif report_type == 'churches':
-            return generator.generate_churches_report(format)
-        elif report_type == 'tasks':
-            status_filter = request.GET.get('status')
-            return generator.generate_tasks_report(format, status_filter)
-        elif report_type == 'communications':
-            date_range = request.GET.get('date_range')
-            date_range = int(date_range) if date_range else None
-            return generator.generate_communications_report(format, date_range)
-        elif report_type == 'summary':
-            return generator.generate_dashboard_summary(format)
-        else:
-            messages.error(request, f'Unknown report type: {report_type}')
-            return redirect('core:reports')
-            
+        filters = _get_report_filters(request)
+        return generator.generate(report_type, format, **filters)
+    
     except Exception as e:
         messages.error(request, f'Error generating report: {str(e)}')
         return redirect('core:reports')
 
 
+def _get_report_filters(request):
+    """Read the optional report filters from the query string."""
+    date_range = request.GET.get('date_range')
+    return {
+        'status_filter': request.GET.get('status') or None,
+        'date_range': int(date_range) if date_range else None,
+    }
+
+
+@login_required
+@require_POST
+def start_report_job(request, report_type):
+    """
+    Queue a report for background generation.
+    
+    Returns the job status immediately; if an identical report was already
+    generated and the data has not changed since, the finished job is returned
+    and can be downloaded right away.
+    
+    Args:
+        report_type: Type of report to export (people, churches, tasks, communications, summary)
+    """
+    from mobilize.core.reports import REPORT_TYPES
+    from mobilize.core.report_jobs import get_or_start_report_job, get_job_status
+    
+    format = request.POST.get('format', 'csv')
+    view_mode = request.POST.get('view_mode', 'default')
+    
+    if report_type not in REPORT_TYPES:
+        return JsonResponse({'error': f'Unknown report type: {report_type}'}, status=400)
+    if format not in ('csv', 'excel'):
+        return JsonResponse({'error': f'Unsupported format: {format}'}, status=400)
+    
+    date_range = request.POST.get('date_range')
+    try:
+        date_range = int(date_range) if date_range else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date range'}, status=400)
+    
+    job = get_or_start_report_job(
+        request.user,
+        report_type,
+        format=format,
+        view_mode=view_mode,
+        filters={
+            'status_filter': request.POST.get('status'),
+            'date_range': date_range,
+        },
+    )
+    return JsonResponse(get_job_status(job), status=202 if not job.is_finished else 200)
+
+
+@login_required
+def report_job_status(request, job_id):
+    """
+    Lightweight polling endpoint for a background report job.
+    """
+    from mobilize.core.models import ReportJob
+    from mobilize.core.report_jobs import get_job_status
+    
+    job = get_object_or_404(ReportJob, pk=job_id, user=request.user)
+    return JsonResponse(get_job_status(job))
+
+
+@login_required
+def report_job_download(request, job_id):
+    """
+    Download the artifact produced by a completed report job.
+    """
+    from mobilize.core.models import ReportJob
+    
+    job = get_object_or_404(ReportJob, pk=job_id, user=request.user, status='completed')
+    if not job.file:
+        raise Http404("Report file not found")
+    
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.filename)
+
+
+@login_required
+def import_job_status(request, job_id):
+    """
+    Lightweight polling endpoint for a background CSV import.
+    """
+    from mobilize.core.models import ImportJob
+    from mobilize.core.import_jobs import get_import_status
+    
+    job = get_object_or_404(ImportJob, pk=job_id, user=request.user)
+    return JsonResponse(get_import_status(job))
+
+
+@login_required
+@require_POST
+def run_import_job(request, job_id):
+    """
+    Import an upload for real after reviewing its dry-run preview.
+    
+    Posting the same preview again returns the import it already started.
+    """
+    from mobilize.core.models import ImportJob
+    from mobilize.core.import_jobs import get_import_status, start_import_from_preview
+    
+    preview = get_object_or_404(ImportJob, pk=job_id, user=request.user, dry_run=True, status='completed')
+    job = start_import_from_preview(preview)
+    return JsonResponse(get_import_status(job), status=202)
+
+
+@login_required
+def bulk_operation_job_status(request, job_id):
+    """
+    Lightweight polling endpoint for a background bulk operation.
+    """
+    from mobilize.core.models import BulkOperationJob
+    from mobilize.core.bulk_operation_jobs import get_bulk_operation_status
+    
+    job = get_object_or_404(BulkOperationJob, pk=job_id, user=request.user)
+    return JsonResponse(get_bulk_operation_status(job))
+
+
+@login_required
+def search(request):
+    """
+    JSON endpoint for the global search box.
+    
+    Returns the best matching people, churches, tasks and communications the
+    user can see. ``type`` may be repeated to restrict the result types.
+    """
+    from mobilize.core.permissions import get_data_access_manager
+    from mobilize.core.search import SEARCH_TYPES, search as search_index
+    
+    query = request.GET.get('q', '').strip()
+    types = [search_type for search_type in request.GET.getlist('type') if search_type in SEARCH_TYPES]
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 50))
+    except ValueError:
+        limit = 20
+    
+    results = search_index(query, get_data_access_manager(request), types=types or None, limit=limit)
+    return JsonResponse({'query': query, 'results': results})
+
+
 @login_required
 def customize_dashboard(request):
     """
@@ -434,12 +369,12 @@ def customize_dashboard(request):
             enabled = request.POST.get('enabled') == 'true'
             toggle_widget(request.user, widget_id, enabled)
             messages.success(request, f'Widget {"enabled" if enabled else "disabled"} successfully.')
-            
+        
         elif action == 'reorder_widgets':
             widget_order = json.loads(request.POST.get('widget_order', '[]'))
             reorder_widgets(request.user, widget_order)
             messages.success(request, 'Widget order updated successfully.')
-            
+        
         elif action == 'reset_defaults':
             dashboard_config.reset_to_defaults()
             messages.success(request, 'Dashboard reset to default configuration.')
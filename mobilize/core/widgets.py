@@ -0,0 +1,44 @@
+"""
+Form widgets shared across the Mobilize CRM apps.
+"""
+from django import forms
+from django.urls import reverse_lazy
+
+
+class ContactTypeaheadSelect(forms.Select):
+    """
+    Select for a person or church that loads its options as the user types.
+    
+    Only the empty choice and the current value are rendered, so the page
+    does not list every contact. static/js/contact-typeahead.js fills in
+    the matching options from the contacts typeahead endpoint.
+    """
+    
+    def __init__(self, contact_type, attrs=None):
+        """
+        Initialize the widget.
+        
+        Args:
+            contact_type: 'person' or 'church'
+            attrs: Extra HTML attributes
+        """
+        attrs = {
+            'class': 'form-select',
+            'data-typeahead-url': reverse_lazy('communications:get_contacts_json'),
+            'data-typeahead-type': contact_type,
+            **(attrs or {}),
+        }
+        super().__init__(attrs)
+        self.contact_type = contact_type
+    
+    def optgroups(self, name, value, attrs=None):
+        choices = self.choices
+        queryset = getattr(choices, 'queryset', None)
+        if queryset is not None:
+            selected = [pk for pk in value if str(pk).isdigit()]
+            empty = [('', choices.field.empty_label)] if choices.field.empty_label is not None else []
+            self.choices = empty + [choices.choice(obj) for obj in queryset.filter(pk__in=selected)]
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
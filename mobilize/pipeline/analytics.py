@@ -0,0 +1,233 @@
+"""
+Pipeline board analytics.
+
+The pipeline board shows, for every stage, how many contacts sit in it and
+how long they have been there (average, median and 90th percentile). These
+are computed in the database with one grouped aggregate over the pipeline's
+entries instead of loading every entry into Python, and each stage column
+shows one keyset page of cards, so the board costs the same however many
+contacts a stage holds.
+
+Everything is scoped by a DataAccessManager: users only see pipelines shared
+with or owned by their offices, and only the entries of contacts they can
+see.
+"""
+from django.db import connection
+from django.db.models import (
+    Aggregate, Avg, Count, DateTimeField, DurationField, ExpressionWrapper, F, Q, Value, Window
+)
+from django.db.models.functions import Ceil, RowNumber
+from django.utils import timezone
+
+from mobilize.core.pagination import KeysetPaginator
+
+
+# Cards shown per stage column before "Load more"
+STAGE_PAGE_SIZE = 25
+
+# Longest-waiting contacts first; entries without an entry date sort last
+STAGE_ORDERING = ('entered_at', 'pk')
+
+# Percentiles of time in stage shown on the board, by result key
+STAGE_PERCENTILES = (('median_duration', 0.5), ('p90_duration', 0.9))
+
+
+class PercentileDisc(Aggregate):
+    """
+    PostgreSQL's ordered-set PERCENTILE_DISC aggregate.
+    
+    Returns the first value whose position in the sorted group reaches the
+    given fraction, that is the value at rank ceil(fraction * count).
+    """
+    
+    function = 'PERCENTILE_DISC'
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    
+    def __init__(self, expression, fraction, **extra):
+        super().__init__(expression, fraction=float(fraction), **extra)
+
+
+def _duration_in_stage(now):
+    """Build the expression for how long an entry has been in its stage."""
+    return ExpressionWrapper(Value(now, output_field=DateTimeField()) - F('entered_at'),
+                             output_field=DurationField())
+
+
+class PipelineAnalytics:
+    """
+    Computes the pipeline board for a DataAccessManager scope.
+    """
+    
+    def __init__(self, access_manager):
+        """
+        Initialize the analytics.
+        
+        Args:
+            access_manager: DataAccessManager of the requesting user
+        """
+        self.access_manager = access_manager
+    
+    def get_pipelines(self):
+        """
+        Get the pipelines visible in this scope.
+        
+        Main pipelines are shared by every office; custom pipelines are only
+        visible to their own office, or to super admins.
+        
+        Returns:
+            Pipeline QuerySet
+        """
+        from mobilize.core.permission_context import get_permission_context
+        from mobilize.pipeline.models import Pipeline
+        
+        pipelines = Pipeline.objects.order_by('-is_main_pipeline', 'name', 'pk')
+        if self.access_manager.selected_office_id:
+            return pipelines.filter(Q(office__isnull=True) | Q(office_id=self.access_manager.selected_office_id))
+        if self.access_manager.user_role == 'super_admin':
+            return pipelines
+        office_ids = get_permission_context(self.access_manager.user).office_ids
+        return pipelines.filter(Q(office__isnull=True) | Q(office_id__in=office_ids))
+    
+    def get_pipeline(self, pipeline_id=None):
+        """
+        Get a visible pipeline, or the default one.
+        
+        Args:
+            pipeline_id: Pipeline ID, or None for the main people pipeline
+                (or the first visible pipeline if there is none)
+        
+        Returns:
+            Pipeline instance, or None if it is not visible or none exist
+        """
+        from mobilize.pipeline.models import PIPELINE_TYPE_PEOPLE
+        
+        pipelines = self.get_pipelines()
+        if pipeline_id is not None:
+            return pipelines.filter(pk=pipeline_id).first()
+        return (pipelines.filter(is_main_pipeline=True, pipeline_type=PIPELINE_TYPE_PEOPLE).first()
+                or pipelines.first())
+    
+    def get_entries(self, pipeline):
+        """
+        Get the entries of a pipeline whose contacts are visible in this scope.
+        
+        Args:
+            pipeline: Pipeline instance
+        
+        Returns:
+            PipelineContact QuerySet
+        """
+        from mobilize.pipeline.models import PIPELINE_TYPE_CHURCH, PIPELINE_TYPE_PEOPLE, PipelineContact
+        
+        # Person and Church share their contact's primary key
+        people = Q(contact_type='person', contact_id__in=self.access_manager.get_people_queryset().values('pk'))
+        churches = Q(contact_type='church', contact_id__in=self.access_manager.get_churches_queryset().values('pk'))
+        scope = {
+            PIPELINE_TYPE_PEOPLE: people,
+            PIPELINE_TYPE_CHURCH: churches,
+        }.get(pipeline.pipeline_type, people | churches)
+        return PipelineContact.objects.filter(scope, pipeline=pipeline)
+    
+    def stage_statistics(self, pipeline, now=None):
+        """
+        Compute per-stage counts and time-in-stage statistics.
+        
+        Args:
+            pipeline: Pipeline instance
+            now: Time durations are measured to, defaulting to now
+        
+        Returns:
+            Dict mapping stage ID to a dict with count, average_duration,
+            median_duration and p90_duration; stages without entries are
+            missing, and durations are None when no entry has an entry date
+        """
+        now = now or timezone.now()
+        duration = _duration_in_stage(now)
+        aggregates = {'count': Count('pk'), 'average_duration': Avg(duration)}
+        if connection.vendor == 'postgresql':
+            for key, fraction in STAGE_PERCENTILES:
+                aggregates[key] = PercentileDisc(duration, fraction, output_field=DurationField())
+        
+        entries = self.get_entries(pipeline)
+        statistics = {
+            row.pop('current_stage_id'): row
+            for row in entries.order_by().values('current_stage_id').annotate(**aggregates)
+        }
+        if connection.vendor != 'postgresql':
+            self._add_percentiles(entries, statistics, now)
+        return statistics
+    
+    def _add_percentiles(self, entries, statistics, now):
+        """
+        Add percentiles of time in stage where PERCENTILE_DISC is unavailable.
+        
+        Ranks each stage's entries by time in stage with window functions and
+        reads back only the entries at the percentile ranks, in one query.
+        """
+        for row in statistics.values():
+            row.update({key: None for key, _ in STAGE_PERCENTILES})
+        
+        ranked = entries.filter(entered_at__isnull=False).annotate(
+            duration=_duration_in_stage(now),
+            rank=Window(RowNumber(), partition_by=F('current_stage_id'), order_by=F('entered_at').desc()),
+            stage_count=Window(Count('pk'), partition_by=F('current_stage_id')),
+        )
+        ranks = {key: Ceil(F('stage_count') * fraction) for key, fraction in STAGE_PERCENTILES}
+        condition = Q()
+        for key, rank in ranks.items():
+            ranked = ranked.annotate(**{f'{key}_rank': rank})
+            condition |= Q(rank=F(f'{key}_rank'))
+        
+        for row in ranked.filter(condition).values('current_stage_id', 'duration', 'rank', *[
+            f'{key}_rank' for key in ranks
+        ]):
+            for key in ranks:
+                if row['rank'] == row[f'{key}_rank']:
+                    statistics[row['current_stage_id']][key] = row['duration']
+    
+    def stage_page(self, pipeline, stage, cursor=None, per_page=STAGE_PAGE_SIZE):
+        """
+        Get one page of a stage column's cards.
+        
+        Args:
+            pipeline: Pipeline instance
+            stage: PipelineStage of the pipeline
+            cursor: Cursor from the previous page, or None for the first page
+            per_page: Cards per page
+        
+        Returns:
+            KeysetPage of PipelineContact instances with their contacts
+        
+        Raises:
+            InvalidCursor: If the cursor is invalid for this column
+        """
+        entries = self.get_entries(pipeline).filter(current_stage=stage).select_related('contact')
+        return KeysetPaginator(entries, STAGE_ORDERING, per_page).page(cursor)
+    
+    def board(self, pipeline, now=None):
+        """
+        Build every stage column of the board.
+        
+        Args:
+            pipeline: Pipeline instance
+            now: Time durations are measured to, defaulting to now
+        
+        Returns:
+            List of dicts with the stage, its statistics, the first page of
+            contacts and the cursor of the next page, in stage order
+        """
+        statistics = self.stage_statistics(pipeline, now)
+        columns = []
+        for stage in pipeline.stages.order_by('order'):
+            page = self.stage_page(pipeline, stage)
+            columns.append({
+                'stage': stage,
+                'count': 0,
+                'average_duration': None,
+                'median_duration': None,
+                'p90_duration': None,
+                **statistics.get(stage.pk, {}),
+                'contacts': page.object_list,
+                'next_cursor': page.next_cursor,
+            })
+        return columns
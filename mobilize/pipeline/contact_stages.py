@@ -0,0 +1,134 @@
+"""
+Denormalized main pipeline stage of contacts.
+
+Contact.pipeline_stage holds the code of the stage a contact is at in the
+main pipeline of its type ('promotion', 'en42', ...). Lists, filters,
+exports and dashboard counts read and filter on that indexed column instead
+of joining pipeline entries and stages for every row.
+
+Migration contacts/0011 fills the column for existing contacts.
+PipelineTransitions writes it with every batched move, signals recompute it
+when entries or stages are saved one at a time, and the
+backfill_contact_stages command recomputes and verifies it for every
+contact.
+"""
+from django.db.models import F, OuterRef, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce, Lower
+
+from mobilize.pipeline.models import PIPELINE_TYPE_CHURCH, PIPELINE_TYPE_PEOPLE
+
+# Main pipeline type of each contact type
+MAIN_PIPELINE_TYPES = {
+    'person': PIPELINE_TYPE_PEOPLE,
+    'church': PIPELINE_TYPE_CHURCH,
+}
+
+
+def stage_code(stage_name):
+    """
+    Convert a stage name to the code stored on contacts.
+    
+    Matches the codes of MAIN_PEOPLE_PIPELINE_STAGES and
+    MAIN_CHURCH_PIPELINE_STAGES, e.g. 'EN42' -> 'en42'.
+    """
+    return stage_name.lower() if stage_name else None
+
+
+def main_stage_code(contact_type):
+    """
+    Build a subquery selecting a contact's stage code in its main pipeline.
+    
+    Takes the first main pipeline entry by id, like
+    Contact.get_pipeline_contact().
+    
+    Args:
+        contact_type: 'person' or 'church'
+    
+    Returns:
+        Subquery expression to use on a Contact queryset
+    """
+    from mobilize.pipeline.models import PipelineContact
+    
+    return Subquery(
+        PipelineContact.objects.filter(
+            contact_id=OuterRef('pk'),
+            pipeline__is_main_pipeline=True,
+            pipeline__pipeline_type=MAIN_PIPELINE_TYPES[contact_type],
+        ).order_by('pk').annotate(code=Lower('current_stage__name')).values('code')[:1]
+    )
+
+
+def stale_contact_stages(contact_type, contact_ids=None):
+    """
+    Find contacts whose stored stage code differs from their main pipeline.
+    
+    Args:
+        contact_type: 'person' or 'church'
+        contact_ids: Contact IDs or ID queryset to check, or None for all
+    
+    Returns:
+        Contact QuerySet annotated with the expected code, '' for none
+    """
+    from mobilize.contacts.models import Contact
+    
+    contacts = Contact.objects.filter(type=contact_type)
+    if contact_ids is not None:
+        contacts = contacts.filter(pk__in=contact_ids)
+    # Compare with NULLs as '' so contacts outside the pipeline match too
+    return contacts.annotate(
+        stored_stage=Coalesce('pipeline_stage', Value('')),
+        expected_stage=Coalesce(main_stage_code(contact_type), Value('')),
+    ).exclude(stored_stage=F('expected_stage'))
+
+
+def sync_contact_stages(contact_ids=None):
+    """
+    Recompute the stored stage code of contacts from their pipeline entries.
+    
+    Only contacts whose code is stale are written.
+    
+    Args:
+        contact_ids: Contact IDs or ID queryset to sync, or None for all
+    
+    Returns:
+        Number of contacts updated
+    """
+    from mobilize.contacts.models import Contact
+    
+    if contact_ids is not None and not isinstance(contact_ids, QuerySet):
+        contact_ids = list(contact_ids)
+        if not contact_ids:
+            return 0
+    updated = 0
+    for contact_type in MAIN_PIPELINE_TYPES:
+        stale = stale_contact_stages(contact_type, contact_ids).values('pk')
+        updated += Contact.objects.filter(pk__in=stale).update(pipeline_stage=main_stage_code(contact_type))
+    return updated
+
+
+def set_contact_stages(stage, contact_ids):
+    """
+    Store the stage code of contacts just moved to a stage.
+    
+    Does nothing unless the stage belongs to a main pipeline.
+    
+    Args:
+        stage: PipelineStage the contacts were moved to, with its pipeline
+        contact_ids: IDs of the moved contacts
+    
+    Returns:
+        Number of contacts updated
+    """
+    from mobilize.contacts.models import Contact
+    
+    pipeline = stage.pipeline
+    contact_ids = [contact_id for contact_id in contact_ids if contact_id]
+    if not pipeline.is_main_pipeline or not contact_ids:
+        return 0
+    contact_types = [
+        contact_type for contact_type, pipeline_type in MAIN_PIPELINE_TYPES.items()
+        if pipeline_type == pipeline.pipeline_type
+    ]
+    return Contact.objects.filter(pk__in=contact_ids, type__in=contact_types).update(
+        pipeline_stage=stage_code(stage.name)
+    )
@@ -0,0 +1,300 @@
+"""
+Pipeline funnel and velocity analytics.
+
+Every stage move is recorded in PipelineStageHistory. Reading conversion
+rates and time in stage straight from that table means scanning years of
+history, so each move is also counted in PipelineTransitionRollup: one row
+per pipeline, office, day and pair of stages, holding the number of moves
+and the time the contacts had spent in the stage they left. Funnel, drop-off
+and velocity reports sum a few of those rows.
+
+The transition service records its bulk moves directly, a signal records
+history rows saved one at a time, and a nightly Celery job rebuilds the
+table from the history to correct any drift.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+# Batch size used when reading history rows during a rebuild
+REBUILD_CHUNK_SIZE = 1000
+
+# Days covered by a funnel when no start date is given
+DEFAULT_FUNNEL_DAYS = 90
+
+TREND_PERIODS = {
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def _local_day(value):
+    """Convert a datetime to the local calendar day used for day buckets."""
+    if timezone.is_aware(value):
+        return timezone.localdate(value)
+    return value.date()
+
+
+def _add_transition(totals, row, previous_at):
+    """
+    Add one history row to per-key totals.
+    
+    Args:
+        totals: Counter keyed by (key tuple, field name)
+        row: Tuple (pipeline_id, office_id, from_stage_id, to_stage_id, created_at)
+        previous_at: When the contact entered the stage it left, if known
+    """
+    pipeline_id, office_id, from_stage_id, to_stage_id, created_at = row
+    key = (pipeline_id, office_id or 0, _local_day(created_at), from_stage_id or 0, to_stage_id)
+    totals[key, 'count'] += 1
+    if from_stage_id and previous_at is not None and created_at >= previous_at:
+        totals[key, 'timed_count'] += 1
+        totals[key, 'seconds_in_stage'] += int((created_at - previous_at).total_seconds())
+
+
+def _history_values(queryset):
+    """Read the fields a transition rollup needs from history rows."""
+    return queryset.values_list(
+        'pipeline_contact_id', 'pipeline_contact__pipeline_id', 'pipeline_contact__contact__office_id',
+        'from_stage_id', 'to_stage_id', 'created_at',
+    )
+
+
+def _group_totals(totals):
+    """Regroup (key, field) totals into a dict of key to field values."""
+    grouped = defaultdict(dict)
+    for (key, field), value in totals.items():
+        grouped[key][field] = value
+    return grouped
+
+
+def apply_transition_deltas(totals):
+    """
+    Add transition counts to the rollup table.
+    
+    Args:
+        totals: Counter keyed by (key tuple, field name), as built by
+            _add_transition()
+    """
+    from mobilize.pipeline.models import PipelineTransitionRollup
+    
+    for key, values in _group_totals(totals).items():
+        pipeline_id, office_id, day, from_stage_id, to_stage_id = key
+        lookup = dict(pipeline_id=pipeline_id, office_id=office_id, day=day,
+                      from_stage_id=from_stage_id, to_stage_id=to_stage_id)
+        increments = {field: F(field) + value for field, value in values.items()}
+        if PipelineTransitionRollup.objects.filter(**lookup).update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                PipelineTransitionRollup.objects.create(**lookup, **values)
+        except IntegrityError:
+            # Another process created the row first
+            PipelineTransitionRollup.objects.filter(**lookup).update(**increments)
+
+
+def record_transitions(history_ids):
+    """
+    Count newly written history rows in the transition rollups.
+    
+    The time a contact spent in the stage it left is measured from its
+    previous history row, read for every entry involved in one query.
+    
+    Args:
+        history_ids: IDs of PipelineStageHistory rows that were just created
+    """
+    from mobilize.pipeline.models import PipelineStageHistory
+    
+    history_ids = list(history_ids)
+    if not history_ids:
+        return
+    
+    rows = sorted(_history_values(PipelineStageHistory.objects.filter(pk__in=history_ids)),
+                  key=lambda row: (row[0], row[5]))
+    entry_ids = {row[0] for row in rows}
+    previous = dict(
+        PipelineStageHistory.objects.filter(pipeline_contact_id__in=entry_ids).exclude(pk__in=history_ids)
+        .order_by().values('pipeline_contact_id').annotate(last=Max('created_at'))
+        .values_list('pipeline_contact_id', 'last')
+    )
+    
+    totals = Counter()
+    for entry_id, *row in rows:
+        _add_transition(totals, row, previous.get(entry_id))
+        previous[entry_id] = row[-1]
+    apply_transition_deltas(totals)
+
+
+def rebuild_transition_rollups():
+    """
+    Rebuild the transition rollup table from the stage history.
+    
+    Returns:
+        Number of rollup rows written
+    """
+    from mobilize.pipeline.models import PipelineStageHistory, PipelineTransitionRollup
+    
+    history = _history_values(PipelineStageHistory.objects.order_by('pipeline_contact_id', 'created_at', 'pk'))
+    totals = Counter()
+    last_entry_id, previous_at = None, None
+    for entry_id, *row in history.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+        if entry_id != last_entry_id:
+            last_entry_id, previous_at = entry_id, None
+        _add_transition(totals, row, previous_at)
+        previous_at = row[-1]
+    
+    rows = [
+        PipelineTransitionRollup(
+            pipeline_id=key[0], office_id=key[1], day=key[2], from_stage_id=key[3], to_stage_id=key[4],
+            count=values.get('count', 0), timed_count=values.get('timed_count', 0),
+            seconds_in_stage=values.get('seconds_in_stage', 0),
+        )
+        for key, values in _group_totals(totals).items()
+    ]
+    with transaction.atomic():
+        PipelineTransitionRollup.objects.all().delete()
+        PipelineTransitionRollup.objects.bulk_create(rows, batch_size=REBUILD_CHUNK_SIZE)
+    return len(rows)
+
+
+def _days(seconds, count):
+    """Average a total number of seconds into days, rounded for display."""
+    return round(seconds / count / 86400, 1) if count else None
+
+
+class FunnelAnalytics:
+    """
+    Reads funnel and velocity reports for a DataAccessManager scope.
+    
+    Transitions are bucketed by office rather than by contact owner, so
+    users see the funnel of every office they belong to.
+    """
+    
+    def __init__(self, access_manager):
+        """
+        Initialize the analytics.
+        
+        Args:
+            access_manager: DataAccessManager of the requesting user
+        """
+        self.access_manager = access_manager
+    
+    def _scope(self):
+        """Build the filter selecting the rollup rows visible to the scope."""
+        from mobilize.core.permission_context import get_permission_context
+        
+        if self.access_manager.selected_office_id:
+            return Q(office_id=self.access_manager.selected_office_id)
+        if self.access_manager.user_role == 'super_admin':
+            return Q()
+        return Q(office_id__in=get_permission_context(self.access_manager.user).office_ids)
+    
+    def _rollups(self, pipeline, start, end):
+        from mobilize.pipeline.models import PipelineTransitionRollup
+        
+        return PipelineTransitionRollup.objects.filter(self._scope(), pipeline_id=pipeline.pk,
+                                                       day__gte=start, day__lte=end)
+    
+    def _period(self, start, end):
+        """Resolve the reported date range, defaulting to the last 90 days."""
+        end = end or timezone.localdate()
+        return start or end - timedelta(days=DEFAULT_FUNNEL_DAYS - 1), end
+    
+    def funnel(self, pipeline, start=None, end=None):
+        """
+        Compute the stage funnel of a pipeline over a date range.
+        
+        For every stage: how many contacts entered it, how many of those
+        moves were followed by a move to a later stage, the conversion rate
+        and drop-off that implies, and the average days spent in the stage
+        before leaving it.
+        
+        Args:
+            pipeline: Pipeline instance
+            start: First day included, defaulting to 90 days before end
+            end: Last day included, defaulting to today
+        
+        Returns:
+            Dict with the date range and one dict per stage in stage order
+        """
+        start, end = self._period(start, end)
+        stages = list(pipeline.stages.order_by('order'))
+        order = {stage.pk: index for index, stage in enumerate(stages)}
+        
+        entered, advanced, timed, seconds = Counter(), Counter(), Counter(), Counter()
+        rows = self._rollups(pipeline, start, end).order_by().values('from_stage_id', 'to_stage_id').annotate(
+            moves=Sum('count'), timed=Sum('timed_count'), seconds=Sum('seconds_in_stage'),
+        )
+        for row in rows:
+            from_stage_id, to_stage_id = row['from_stage_id'], row['to_stage_id']
+            entered[to_stage_id] += row['moves']
+            if from_stage_id in order:
+                timed[from_stage_id] += row['timed']
+                seconds[from_stage_id] += row['seconds']
+                if order.get(to_stage_id, -1) > order[from_stage_id]:
+                    advanced[from_stage_id] += row['moves']
+        
+        results = []
+        for index, stage in enumerate(stages):
+            # Nothing converts out of the last stage
+            last = index == len(stages) - 1
+            rate = round(advanced[stage.pk] / entered[stage.pk] * 100, 1) if entered[stage.pk] and not last else None
+            results.append({
+                'stage_id': stage.pk,
+                'stage_name': stage.name,
+                'entered': entered[stage.pk],
+                'advanced': advanced[stage.pk],
+                'conversion_rate': rate,
+                'drop_off': None if last else max(entered[stage.pk] - advanced[stage.pk], 0),
+                'average_days': _days(seconds[stage.pk], timed[stage.pk]),
+            })
+        return {'start': start, 'end': end, 'stages': results}
+    
+    def trend(self, pipeline, start=None, end=None, period='month'):
+        """
+        Compute stage entries and velocity per week or month.
+        
+        Args:
+            pipeline: Pipeline instance
+            start: First day included, defaulting to 90 days before end
+            end: Last day included, defaulting to today
+            period: 'week' or 'month'
+        
+        Returns:
+            List of dicts, one per period with transitions, oldest first,
+            each with per-stage entries and average days in stage
+        """
+        start, end = self._period(start, end)
+        stages = list(pipeline.stages.order_by('order'))
+        rows = self._rollups(pipeline, start, end).annotate(
+            period=TREND_PERIODS[period]('day')
+        ).order_by().values('period', 'from_stage_id', 'to_stage_id').annotate(
+            moves=Sum('count'), timed=Sum('timed_count'), seconds=Sum('seconds_in_stage'),
+        )
+        
+        buckets = defaultdict(lambda: {'entered': Counter(), 'timed': Counter(), 'seconds': Counter()})
+        for row in rows:
+            bucket = buckets[row['period']]
+            bucket['entered'][row['to_stage_id']] += row['moves']
+            bucket['timed'][row['from_stage_id']] += row['timed']
+            bucket['seconds'][row['from_stage_id']] += row['seconds']
+        
+        return [
+            {
+                'period': period_start,
+                'stages': [
+                    {
+                        'stage_id': stage.pk,
+                        'stage_name': stage.name,
+                        'entered': bucket['entered'][stage.pk],
+                        'average_days': _days(bucket['seconds'][stage.pk], bucket['timed'][stage.pk]),
+                    }
+                    for stage in stages
+                ],
+            }
+            for period_start, bucket in sorted(buckets.items())
+        ]
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mobilize.core.report_jobs import bump_data_version
+from mobilize.core.rollups import rebuild_rollups
+from mobilize.pipeline.contact_stages import MAIN_PIPELINE_TYPES, stale_contact_stages, sync_contact_stages
+
+
+class Command(BaseCommand):
+    help = 'Backfills and verifies the main pipeline stage code stored on contacts'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only report contacts whose stored stage is stale, failing if there are any'
+        )
+    
+    def handle(self, *args, **options):
+        if options['verify']:
+            stale = sum(stale_contact_stages(contact_type).count() for contact_type in MAIN_PIPELINE_TYPES)
+            if stale:
+                raise CommandError(f'{stale} contacts have a stale pipeline stage')
+            self.stdout.write(self.style.SUCCESS('All contact pipeline stages are current'))
+            return
+        
+        updated = sync_contact_stages()
+        if updated:
+            # The dashboard stage counts are read from the stored codes
+            rebuild_rollups()
+            bump_data_version('contacts.Contact')
+        self.stdout.write(self.style.SUCCESS(f'Pipeline stage backfilled for {updated} contacts'))
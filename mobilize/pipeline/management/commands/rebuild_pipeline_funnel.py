@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from mobilize.pipeline.funnel import rebuild_transition_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the pipeline funnel rollups from the stage history'
+
+    def handle(self, *args, **options):
+        rows = rebuild_transition_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Pipeline funnel rollups rebuilt with {rows} rows'))
@@ -0,0 +1,61 @@
+# Generated by Django 4.2 on 2026-10-16 20:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "pipeline",
+            "0003_pipelinecontact_contact_alter_pipelinecontact_church_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PipelineTransitionRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("pipeline_id", models.IntegerField()),
+                ("office_id", models.IntegerField(default=0)),
+                (
+                    "from_stage_id",
+                    models.IntegerField(
+                        default=0, help_text="0 for contacts entering the pipeline"
+                    ),
+                ),
+                ("to_stage_id", models.IntegerField()),
+                ("day", models.DateField()),
+                ("count", models.IntegerField(default=0)),
+                ("timed_count", models.IntegerField(default=0)),
+                ("seconds_in_stage", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Pipeline Transition Rollup",
+                "verbose_name_plural": "Pipeline Transition Rollups",
+                "db_table": "pipeline_transition_rollups",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="pipelinetransitionrollup",
+            index=models.Index(
+                fields=["pipeline_id", "day"], name="pipeline_tr_pipelin_727518_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="pipelinetransitionrollup",
+            unique_together={
+                ("pipeline_id", "office_id", "day", "from_stage_id", "to_stage_id")
+            },
+        ),
+    ]
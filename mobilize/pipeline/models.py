@@ -198,7 +198,7 @@ class PipelineContact(models.Model):
         else:
             contact_name = self.person if self.contact_type == 'person' else self.church
         return f"{contact_name} in {self.pipeline.name} at {self.current_stage.name}"
-        
+    
     def get_contact_object(self):
         """Return the actual contact object (preferred: direct contact, fallback: person/church)"""
         if self.contact:
@@ -248,3 +248,39 @@ class PipelineStageHistory(models.Model):
     
     def __str__(self):
         return f"{self.pipeline_contact.contact} moved from {self.from_stage or 'None'} to {self.to_stage}"
+
+
+class PipelineTransitionRollup(models.Model):
+    """
+    Daily count of pipeline stage transitions, maintained incrementally.
+    
+    Each row counts the moves from one stage to another made on one day by
+    contacts of one office, with the total time those contacts had spent in
+    the stage they left. Funnel and velocity reports sum these rows instead
+    of scanning PipelineStageHistory.
+    """
+    # Dimensions are plain integers (0 = none) so the key stays stable if the
+    # referenced office or stage is deleted before the nightly reconciliation
+    pipeline_id = models.IntegerField()
+    office_id = models.IntegerField(default=0)
+    from_stage_id = models.IntegerField(default=0, help_text="0 for contacts entering the pipeline")
+    to_stage_id = models.IntegerField()
+    day = models.DateField()
+    
+    count = models.IntegerField(default=0)
+    # Transitions whose time in the previous stage is known, and that time
+    timed_count = models.IntegerField(default=0)
+    seconds_in_stage = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'pipeline_transition_rollups'
+        verbose_name = 'Pipeline Transition Rollup'
+        verbose_name_plural = 'Pipeline Transition Rollups'
+        unique_together = [('pipeline_id', 'office_id', 'day', 'from_stage_id', 'to_stage_id')]
+        indexes = [
+            models.Index(fields=['pipeline_id', 'day']),
+        ]
+    
+    def __str__(self):
+        return f"{self.count} move(s) from stage {self.from_stage_id} to {self.to_stage_id} on {self.day}"
@@ -0,0 +1,130 @@
+"""
+Tests for the pipeline board analytics
+"""
+import json
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import Http404
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from mobilize.admin_panel.models import Office, UserOffice
+from mobilize.contacts.models import Contact, Person
+from mobilize.core.permissions import DataAccessManager
+from mobilize.pipeline.analytics import PipelineAnalytics
+from mobilize.pipeline.models import PIPELINE_TYPE_PEOPLE, Pipeline, PipelineContact
+from mobilize.pipeline.views import pipeline_visualization, stage_contacts
+
+User = get_user_model()
+
+
+class PipelineAnalyticsTests(TestCase):
+    """Test cases for stage statistics, stage pages and scoping"""
+    
+    def setUp(self):
+        self.office = Office.objects.create(name='North', code='NORTH')
+        self.other_office = Office.objects.create(name='South', code='SOUTH')
+        self.admin = User.objects.create_user(username='board_admin', email='board_admin@example.com',
+                                              role='super_admin')
+        self.office_admin = User.objects.create_user(username='board_office', email='board_office@example.com',
+                                                     role='office_admin')
+        UserOffice.objects.create(user=self.office_admin, office=self.office)
+        
+        self.pipeline = Pipeline.objects.create(name='Main People Pipeline', pipeline_type=PIPELINE_TYPE_PEOPLE,
+                                                is_main_pipeline=True)
+        self.promotion = self.pipeline.stages.create(name='Promotion', order=1)
+        self.information = self.pipeline.stages.create(name='Information', order=2)
+        self.now = timezone.now()
+    
+    def _enter(self, stage, days, office=None):
+        contact = Contact.objects.create(type='person', first_name=f'Board{days}', last_name='Stage',
+                                         office=office or self.office)
+        Person.objects.create(contact=contact)
+        return PipelineContact.objects.create(contact=contact, pipeline=self.pipeline, current_stage=stage,
+                                              entered_at=self.now - timedelta(days=days))
+    
+    def _analytics(self, user):
+        return PipelineAnalytics(DataAccessManager(user))
+    
+    def test_stage_statistics(self):
+        for days in range(1, 11):
+            self._enter(self.promotion, days)
+        self._enter(self.information, 4)
+        
+        statistics = self._analytics(self.admin).stage_statistics(self.pipeline, now=self.now)
+        
+        promotion = statistics[self.promotion.pk]
+        self.assertEqual(promotion['count'], 10)
+        self.assertEqual(promotion['average_duration'], timedelta(days=5.5))
+        self.assertEqual(promotion['median_duration'], timedelta(days=5))
+        self.assertEqual(promotion['p90_duration'], timedelta(days=9))
+        self.assertEqual(statistics[self.information.pk]['count'], 1)
+        self.assertEqual(statistics[self.information.pk]['p90_duration'], timedelta(days=4))
+    
+    def test_statistics_are_scoped_to_visible_contacts(self):
+        self._enter(self.promotion, 1)
+        self._enter(self.promotion, 2, office=self.other_office)
+        
+        self.assertEqual(self._analytics(self.admin).stage_statistics(self.pipeline)[self.promotion.pk]['count'], 2)
+        self.assertEqual(
+            self._analytics(self.office_admin).stage_statistics(self.pipeline)[self.promotion.pk]['count'], 1
+        )
+    
+    def test_custom_pipelines_of_other_offices_are_hidden(self):
+        custom = Pipeline.objects.create(name='South Custom', office=self.other_office)
+        
+        self.assertIsNone(self._analytics(self.office_admin).get_pipeline(custom.pk))
+        self.assertEqual(self._analytics(self.office_admin).get_pipeline(), self.pipeline)
+        self.assertEqual(self._analytics(self.admin).get_pipeline(custom.pk), custom)
+    
+    def test_board_queries_do_not_grow_with_stage_size(self):
+        def board_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self._analytics(self.admin).board(self.pipeline)
+            return len(queries.captured_queries)
+        
+        self._enter(self.promotion, 1)
+        small = board_queries()
+        for days in range(2, 60):
+            self._enter(self.promotion, days)
+        
+        self.assertEqual(board_queries(), small)
+    
+    def test_stage_pages_follow_the_cursor(self):
+        for days in range(1, 6):
+            self._enter(self.promotion, days)
+        analytics = self._analytics(self.admin)
+        
+        first = analytics.stage_page(self.pipeline, self.promotion, per_page=3)
+        second = analytics.stage_page(self.pipeline, self.promotion, first.next_cursor, per_page=3)
+        
+        # Longest in stage first
+        self.assertEqual([entry.contact.first_name for entry in first], ['Board5', 'Board4', 'Board3'])
+        self.assertEqual([entry.contact.first_name for entry in second], ['Board2', 'Board1'])
+        self.assertIsNone(second.next_cursor)
+    
+    def test_board_view_hides_other_offices_pipelines(self):
+        custom = Pipeline.objects.create(name='South Custom', office=self.other_office)
+        request = RequestFactory().get(f'/pipeline/{custom.pk}/')
+        request.user = self.office_admin
+        
+        with self.assertRaises(Http404):
+            pipeline_visualization(request, pipeline_id=custom.pk)
+    
+    def test_stage_contacts_endpoint_renders_cards(self):
+        entry = self._enter(self.promotion, 3)
+        request = RequestFactory().get(f'/pipeline/{self.pipeline.pk}/stages/{self.promotion.pk}/contacts/')
+        request.user = self.admin
+        
+        response = stage_contacts(request, self.pipeline.pk, self.promotion.pk)
+        
+        data = json.loads(response.content)
+        self.assertIn(f'data-pipeline-contact-id="{entry.pk}"', data['html'])
+        self.assertFalse(data['has_next'])
+        
+        request = RequestFactory().get('/pipeline/', {'cursor': 'bogus'})
+        request.user = self.admin
+        self.assertEqual(stage_contacts(request, self.pipeline.pk, self.promotion.pk).status_code, 400)
@@ -0,0 +1,132 @@
+"""
+Tests for the denormalized main pipeline stage stored on contacts
+"""
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from mobilize.contacts.models import Contact, Person
+from mobilize.contacts.views import filter_people
+from mobilize.core.models import DashboardRollup
+from mobilize.core.rollups import rebuild_rollups
+from mobilize.pipeline.contact_stages import stale_contact_stages, sync_contact_stages
+from mobilize.pipeline.models import (
+    PIPELINE_TYPE_CHURCH, PIPELINE_TYPE_PEOPLE, Pipeline, PipelineContact, PipelineStage
+)
+from mobilize.pipeline.transitions import PipelineTransitions
+
+User = get_user_model()
+
+
+class ContactStageTests(TestCase):
+    """Test cases for keeping Contact.pipeline_stage in sync"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='stager', email='stager@example.com', role='super_admin')
+        self.pipeline = Pipeline.objects.create(name='Main People Pipeline', pipeline_type=PIPELINE_TYPE_PEOPLE,
+                                                is_main_pipeline=True)
+        self.promotion = self.pipeline.stages.create(name='Promotion', order=1)
+        self.information = self.pipeline.stages.create(name='Information', order=2)
+        self.custom = Pipeline.objects.create(name='Custom')
+        self.custom_stage = self.custom.stages.create(name='Follow Up', order=1)
+        
+        self.people = []
+        for i in range(5):
+            contact = Contact.objects.create(type='person', first_name=f'Stage{i}', last_name='Code')
+            self.people.append(Person.objects.create(contact=contact))
+        self.contact_ids = [person.pk for person in self.people]
+    
+    def _codes(self):
+        return dict(Contact.objects.filter(pk__in=self.contact_ids).values_list('pk', 'pipeline_stage'))
+    
+    def test_transitions_store_the_main_pipeline_stage(self):
+        transitions = PipelineTransitions(self.user)
+        transitions.move_contacts(self.pipeline.pk, self.contact_ids[:3], 'promotion')
+        transitions.move_contacts(self.custom.pk, self.contact_ids, self.custom_stage)
+        
+        codes = self._codes()
+        self.assertEqual([codes[pk] for pk in self.contact_ids], ['promotion'] * 3 + [None] * 2)
+        
+        entries = PipelineContact.objects.filter(pipeline=self.pipeline, contact_id__in=self.contact_ids[:2])
+        transitions.move(self.pipeline.pk, entries.values_list('pk', flat=True), self.information)
+        
+        self.assertEqual(Contact.objects.get(pk=self.contact_ids[0]).get_pipeline_stage_code(), 'information')
+        self.assertEqual(Contact.objects.get(pk=self.contact_ids[0]).get_pipeline_stage_name(), 'Information')
+        self.assertFalse(stale_contact_stages('person').exists())
+    
+    def test_single_saves_deletes_and_renames_are_synced(self):
+        contact = self.people[0].contact
+        entry = PipelineContact.objects.create(contact=contact, pipeline=self.pipeline, current_stage=self.promotion)
+        contact.refresh_from_db()
+        self.assertEqual(contact.pipeline_stage, 'promotion')
+        
+        self.promotion.name = 'Outreach'
+        self.promotion.save()
+        contact.refresh_from_db()
+        self.assertEqual(contact.pipeline_stage, 'outreach')
+        
+        entry.delete()
+        contact.refresh_from_db()
+        self.assertIsNone(contact.pipeline_stage)
+    
+    def test_church_stages_use_the_church_pipeline(self):
+        church_pipeline = Pipeline.objects.create(name='Main Church Pipeline', pipeline_type=PIPELINE_TYPE_CHURCH,
+                                                  is_main_pipeline=True)
+        church_pipeline.stages.create(name='EN42', order=1)
+        church = Contact.objects.create(type='church', church_name='Grace')
+        
+        PipelineTransitions().move_contacts(church_pipeline.pk, [church.pk, self.contact_ids[0]], 'en42',
+                                            contact_type='church')
+        
+        self.assertEqual(Contact.objects.get(pk=church.pk).pipeline_stage, 'en42')
+        # A person does not take the stage of the church pipeline
+        self.assertIsNone(self._codes()[self.contact_ids[0]])
+    
+    def test_backfill_command_repairs_and_verifies(self):
+        PipelineTransitions().move_contacts(self.pipeline.pk, self.contact_ids, 'information')
+        rebuild_rollups()
+        # Queryset updates bypass the transition service and the signals
+        PipelineContact.objects.filter(contact_id__in=self.contact_ids[:2]).update(current_stage=self.promotion)
+        Contact.objects.filter(pk=self.contact_ids[4]).update(pipeline_stage='automation')
+        
+        with self.assertRaisesMessage(CommandError, '3 contacts have a stale pipeline stage'):
+            call_command('backfill_contact_stages', verify=True, stdout=StringIO())
+        
+        out = StringIO()
+        call_command('backfill_contact_stages', stdout=out)
+        
+        self.assertIn('backfilled for 3 contacts', out.getvalue())
+        codes = self._codes()
+        self.assertEqual([codes[pk] for pk in self.contact_ids], ['promotion'] * 2 + ['information'] * 3)
+        self.assertEqual(sync_contact_stages(), 0)
+        call_command('backfill_contact_stages', verify=True, stdout=StringIO())
+        # Rollups are rebuilt from the repaired codes
+        promotion = DashboardRollup.objects.get(key__startswith='people_stage|cell', key__endswith='|promotion|')
+        self.assertEqual(promotion.count, 2)
+    
+    def test_migration_backfills_existing_contacts(self):
+        PipelineTransitions().move_contacts(self.pipeline.pk, self.contact_ids[:3], 'information')
+        # Contacts as they were before the column existed
+        Contact.objects.update(pipeline_stage=None)
+        
+        migration = import_module('mobilize.contacts.migrations.0011_backfill_contact_pipeline_stage')
+        migration.backfill_pipeline_stage(apps, None)
+        
+        codes = self._codes()
+        self.assertEqual([codes[pk] for pk in self.contact_ids], ['information'] * 3 + [None] * 2)
+        self.assertFalse(stale_contact_stages('person').exists())
+    
+    def test_people_filter_reads_the_column(self):
+        PipelineTransitions().move_contacts(self.pipeline.pk, self.contact_ids[:2], 'information')
+        
+        people = filter_people(Person.objects.all(), self.user, {'pipeline_stage': 'information'})
+        
+        self.assertEqual(set(people.values_list('pk', flat=True)), set(self.contact_ids[:2]))
+        sql = str(people.query)
+        self.assertNotIn(PipelineContact._meta.db_table, sql)
+        self.assertNotIn(PipelineStage._meta.db_table, sql)
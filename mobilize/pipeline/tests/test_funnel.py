@@ -0,0 +1,150 @@
+"""
+Tests for the pipeline funnel and velocity analytics
+"""
+import json
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from mobilize.admin_panel.models import Office, UserOffice
+from mobilize.contacts.models import Contact, Person
+from mobilize.core.permissions import DataAccessManager
+from mobilize.pipeline.funnel import FunnelAnalytics, rebuild_transition_rollups
+from mobilize.pipeline.models import (
+    PIPELINE_TYPE_PEOPLE, Pipeline, PipelineContact, PipelineStageHistory, PipelineTransitionRollup
+)
+from mobilize.pipeline.transitions import PipelineTransitions
+from mobilize.pipeline.views import pipeline_funnel
+
+User = get_user_model()
+
+
+class FunnelAnalyticsTests(TestCase):
+    """Test cases for the transition rollups and the funnel reports"""
+    
+    def setUp(self):
+        self.office = Office.objects.create(name='North', code='NORTH')
+        self.other_office = Office.objects.create(name='South', code='SOUTH')
+        self.admin = User.objects.create_user(username='funnel_admin', email='funnel_admin@example.com',
+                                              role='super_admin')
+        self.office_admin = User.objects.create_user(username='funnel_office', email='funnel_office@example.com',
+                                                     role='office_admin')
+        UserOffice.objects.create(user=self.office_admin, office=self.office)
+        
+        self.pipeline = Pipeline.objects.create(name='Main People Pipeline', pipeline_type=PIPELINE_TYPE_PEOPLE,
+                                                is_main_pipeline=True)
+        self.promotion = self.pipeline.stages.create(name='Promotion', order=1)
+        self.information = self.pipeline.stages.create(name='Information', order=2)
+        self.invitation = self.pipeline.stages.create(name='Invitation', order=3)
+        self.start = timezone.now() - timedelta(days=30)
+    
+    def _entry(self, office=None):
+        contact = Contact.objects.create(type='person', first_name='Funnel', last_name='Person',
+                                         office=office or self.office)
+        Person.objects.create(contact=contact)
+        return PipelineContact.objects.create(contact=contact, pipeline=self.pipeline, current_stage=self.promotion)
+    
+    def _history(self, entry, stages_and_days):
+        """Write an entry's history one row at a time, as moves made days after self.start."""
+        from_stage = None
+        for stage, days in stages_and_days:
+            PipelineStageHistory.objects.create(pipeline_contact=entry, from_stage=from_stage, to_stage=stage,
+                                                created_at=self.start + timedelta(days=days))
+            from_stage = stage
+    
+    def _funnel(self, user=None):
+        analytics = FunnelAnalytics(DataAccessManager(user or self.admin))
+        return {row['stage_name']: row for row in analytics.funnel(self.pipeline)['stages']}
+    
+    def _rollup_rows(self):
+        return set(PipelineTransitionRollup.objects.values_list(
+            'pipeline_id', 'office_id', 'day', 'from_stage_id', 'to_stage_id', 'count', 'timed_count',
+            'seconds_in_stage',
+        ))
+    
+    def test_funnel_from_single_history_rows(self):
+        self._history(self._entry(), [(self.promotion, 0), (self.information, 2), (self.invitation, 6)])
+        self._history(self._entry(), [(self.promotion, 1), (self.information, 5)])
+        self._history(self._entry(), [(self.promotion, 1)])
+        
+        funnel = self._funnel()
+        
+        self.assertEqual((funnel['Promotion']['entered'], funnel['Promotion']['advanced']), (3, 2))
+        self.assertEqual(funnel['Promotion']['conversion_rate'], 66.7)
+        self.assertEqual(funnel['Promotion']['drop_off'], 1)
+        self.assertEqual(funnel['Promotion']['average_days'], 3.0)
+        self.assertEqual(funnel['Information']['conversion_rate'], 50.0)
+        self.assertEqual(funnel['Information']['average_days'], 4.0)
+        self.assertEqual(funnel['Invitation']['entered'], 1)
+        self.assertIsNone(funnel['Invitation']['conversion_rate'])
+    
+    def test_bulk_moves_are_counted(self):
+        entries = [self._entry() for _ in range(5)]
+        
+        PipelineTransitions(self.admin).move(self.pipeline.pk, [entry.pk for entry in entries], self.information)
+        
+        funnel = self._funnel()
+        self.assertEqual(funnel['Information']['entered'], 5)
+        self.assertEqual(funnel['Promotion']['advanced'], 5)
+    
+    def test_rebuild_matches_incremental_rollups(self):
+        self._history(self._entry(), [(self.promotion, 0), (self.information, 2), (self.invitation, 6)])
+        self._history(self._entry(self.other_office), [(self.promotion, 1), (self.information, 5)])
+        PipelineTransitions().move(self.pipeline.pk, [self._entry().pk], self.invitation)
+        incremental = self._rollup_rows()
+        
+        rebuild_transition_rollups()
+        
+        self.assertEqual(self._rollup_rows(), incremental)
+    
+    def test_funnel_is_scoped_by_office(self):
+        self._history(self._entry(), [(self.promotion, 0)])
+        self._history(self._entry(self.other_office), [(self.promotion, 0)])
+        
+        self.assertEqual(self._funnel()['Promotion']['entered'], 2)
+        self.assertEqual(self._funnel(self.office_admin)['Promotion']['entered'], 1)
+    
+    def test_funnel_reads_rollups_in_constant_queries(self):
+        for _ in range(10):
+            self._history(self._entry(), [(self.promotion, 0), (self.information, 3)])
+        analytics = FunnelAnalytics(DataAccessManager(self.admin))
+        
+        with CaptureQueriesContext(connection) as queries:
+            analytics.funnel(self.pipeline)
+            analytics.trend(self.pipeline, period='week')
+        
+        self.assertLessEqual(len(queries.captured_queries), 4)
+    
+    def test_trend_groups_by_period(self):
+        self._history(self._entry(), [(self.promotion, 0), (self.information, 2)])
+        self._history(self._entry(), [(self.promotion, 20)])
+        analytics = FunnelAnalytics(DataAccessManager(self.admin))
+        
+        trend = analytics.trend(self.pipeline, period='week')
+        
+        self.assertEqual(sum(row['stages'][0]['entered'] for row in trend), 2)
+        self.assertGreaterEqual(len(trend), 2)
+        self.assertEqual([row['period'] for row in trend], sorted(row['period'] for row in trend))
+    
+    def test_funnel_endpoint(self):
+        self._history(self._entry(), [(self.promotion, 0), (self.information, 2)])
+        request = RequestFactory().get('/pipeline/funnel/', {'pipeline': 'people', 'period': 'week'})
+        request.user = self.admin
+        
+        data = json.loads(pipeline_funnel(request).content)
+        
+        self.assertEqual(data['pipeline']['id'], self.pipeline.pk)
+        self.assertEqual([stage['entered'] for stage in data['stages']], [1, 1, 0])
+        self.assertTrue(data['trend'])
+        
+        request = RequestFactory().get('/pipeline/funnel/', {'start': '2024-02-30'})
+        request.user = self.admin
+        self.assertEqual(pipeline_funnel(request).status_code, 400)
+        
+        request = RequestFactory().get('/pipeline/funnel/', {'pipeline': 'church'})
+        request.user = self.admin
+        self.assertEqual(pipeline_funnel(request).status_code, 404)
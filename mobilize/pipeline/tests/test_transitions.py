@@ -0,0 +1,137 @@
+"""
+Tests for batched pipeline stage transitions
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from mobilize.admin_panel.models import Office, UserOffice
+from mobilize.contacts.models import Contact, Person
+from mobilize.core.models import DashboardRollup
+from mobilize.core.rollups import rebuild_rollups
+from mobilize.pipeline.models import (
+    PIPELINE_TYPE_PEOPLE, Pipeline, PipelineContact, PipelineStage, PipelineStageHistory
+)
+from mobilize.pipeline.transitions import PipelineTransitions, StageNotFound
+from mobilize.pipeline.views import move_pipeline_contacts
+
+User = get_user_model()
+
+
+class PipelineTransitionsTests(TestCase):
+    """Test cases for the PipelineTransitions service"""
+    
+    def setUp(self):
+        self.office = Office.objects.create(name='North', code='NORTH')
+        self.other_office = Office.objects.create(name='South', code='SOUTH')
+        self.user = User.objects.create_user(username='mover', email='mover@example.com', role='super_admin')
+        
+        self.pipeline = Pipeline.objects.create(name='Main People Pipeline', pipeline_type=PIPELINE_TYPE_PEOPLE,
+                                                is_main_pipeline=True)
+        self.promotion = self.pipeline.stages.create(name='Promotion', order=1)
+        self.information = self.pipeline.stages.create(name='Information', order=2)
+        
+        self.people = []
+        for i in range(20):
+            contact = Contact.objects.create(type='person', first_name=f'Mover{i}', last_name='Stage',
+                                             office=self.office if i % 2 else self.other_office)
+            self.people.append(Person.objects.create(contact=contact))
+        self.entries = [
+            PipelineContact.objects.create(contact=person.contact, pipeline=self.pipeline,
+                                           current_stage=self.promotion)
+            for person in self.people[:10]
+        ]
+        rebuild_rollups()
+    
+    def _assert_rollups_current(self):
+        counts = {row.key: row.count for row in DashboardRollup.objects.exclude(key='meta').exclude(count=0)}
+        rebuild_rollups()
+        self.assertEqual(counts, {row.key: row.count for row in DashboardRollup.objects.exclude(key='meta')})
+    
+    def test_bulk_move_writes_history_in_constant_queries(self):
+        transitions = PipelineTransitions(self.user)
+        transitions.stages(self.pipeline.pk)
+        
+        with CaptureQueriesContext(connection) as queries:
+            moved = transitions.move(self.pipeline.pk, [entry.pk for entry in self.entries], 'information')
+        
+        self.assertEqual(len(moved), 10)
+        self.assertEqual(PipelineContact.objects.filter(current_stage=self.information).count(), 10)
+        history = PipelineStageHistory.objects.filter(to_stage=self.information)
+        self.assertEqual(history.count(), 10)
+        self.assertEqual({(row.from_stage_id, row.created_by_id) for row in history},
+                         {(self.promotion.pk, self.user.pk)})
+        self.assertEqual(history.first().notes, 'Moved from Promotion to Information by mover.')
+        # The same handful of statements whatever the number of entries
+        self.assertLess(len(queries.captured_queries), 40)
+        self._assert_rollups_current()
+    
+    def test_stages_are_loaded_once(self):
+        transitions = PipelineTransitions()
+        transitions.move(self.pipeline.pk, [self.entries[0].pk], 'information')
+        
+        with CaptureQueriesContext(connection) as queries:
+            transitions.move(self.pipeline.pk, [self.entries[0].pk], 'Promotion')
+        
+        stage_table = f'FROM "{PipelineStage._meta.db_table}"'
+        self.assertFalse([query for query in queries.captured_queries if stage_table in query['sql']])
+    
+    def test_entries_already_in_the_stage_are_skipped(self):
+        moved = PipelineTransitions().move(self.pipeline.pk, [self.entries[0].pk], self.promotion)
+        
+        self.assertEqual(moved, [])
+        self.assertFalse(PipelineStageHistory.objects.exists())
+    
+    def test_move_contacts_adds_missing_entries(self):
+        contact_ids = [person.pk for person in self.people[8:12]]
+        
+        moved = PipelineTransitions(self.user).move_contacts(self.pipeline.pk, contact_ids, self.information.pk)
+        
+        self.assertEqual(len(moved), 4)
+        self.assertEqual(set(PipelineContact.objects.filter(current_stage=self.information)
+                             .values_list('contact_id', flat=True)), set(contact_ids))
+        history = PipelineStageHistory.objects.filter(pipeline_contact__contact_id__in=contact_ids[2:])
+        self.assertEqual({row.from_stage_id for row in history}, {None})
+        self.assertEqual(history.first().notes, 'Added to Information by mover.')
+        self._assert_rollups_current()
+    
+    def test_unknown_stage_is_rejected(self):
+        with self.assertRaisesMessage(StageNotFound, "Stage 'nowhere' not found"):
+            PipelineTransitions().move(self.pipeline.pk, [self.entries[0].pk], 'nowhere')
+        with self.assertRaises(ValueError):
+            self.people[0].contact.set_pipeline_stage('nowhere')
+    
+    def test_set_pipeline_stage_uses_the_service(self):
+        entry = self.people[15].contact.set_pipeline_stage('information')
+        
+        self.assertEqual(entry.current_stage, self.information)
+        self.assertEqual(PipelineStageHistory.objects.get(pipeline_contact=entry).to_stage, self.information)
+    
+    def test_json_endpoint_moves_selected_entries_in_scope(self):
+        office_user = User.objects.create_user(username='office_mover', email='office_mover@example.com',
+                                               role='office_admin')
+        UserOffice.objects.create(user=office_user, office=self.office)
+        request = RequestFactory().post('/pipeline/move-contacts/', json.dumps({
+            'pipeline_contact_ids': [entry.pk for entry in self.entries[:4]],
+            'target_stage_id': self.information.pk,
+        }), content_type='application/json')
+        request.user = office_user
+        request._dont_enforce_csrf_checks = True
+        
+        response = move_pipeline_contacts(request)
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        # Only the entries of the user's office are moved
+        self.assertEqual(data['moved'], 2)
+        self.assertEqual(set(data['pipeline_contact_ids']), {self.entries[1].pk, self.entries[3].pk})
+    
+    def test_json_endpoint_requires_entries_and_stage(self):
+        request = RequestFactory().post('/pipeline/move-contacts/', {'target_stage_id': self.information.pk})
+        request.user = self.user
+        request._dont_enforce_csrf_checks = True
+        
+        self.assertEqual(move_pipeline_contacts(request).status_code, 400)
@@ -0,0 +1,189 @@
+"""
+Batched pipeline stage transitions.
+
+Moving contacts between stages used to save one PipelineContact and write
+one PipelineStageHistory row per contact. PipelineTransitions moves any
+number of contacts of a pipeline in one transaction: the entries are
+loaded with one query, changed with one bulk_update, missing entries are
+added with one bulk_create, and all history rows are written with another.
+Stages are loaded once per pipeline and reused for every later move, so
+imports and syncs can keep one instance for a whole run. Moves in a main
+pipeline also update the contacts' denormalized stage code with one query.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from mobilize.core.report_jobs import bump_data_version
+from mobilize.core.rollups import rollup_batch
+from mobilize.pipeline.contact_stages import set_contact_stages
+from mobilize.pipeline.funnel import record_transitions
+
+
+class StageNotFound(ValueError):
+    """Raised when a stage does not belong to the pipeline."""
+
+
+class PipelineTransitions:
+    """
+    Moves pipeline entries between stages in bulk.
+    """
+    
+    def __init__(self, user=None):
+        """
+        Initialize the service.
+        
+        Args:
+            user: User recorded as the author of the history rows, if any
+        """
+        self.user = user
+        self._stages = {}
+    
+    def stages(self, pipeline_id):
+        """
+        Get the stages of a pipeline, loading them on first use.
+        
+        Args:
+            pipeline_id: Pipeline ID
+        
+        Returns:
+            List of PipelineStage instances in stage order
+        """
+        from mobilize.pipeline.models import PipelineStage
+        
+        if pipeline_id not in self._stages:
+            self._stages[pipeline_id] = list(
+                PipelineStage.objects.filter(pipeline_id=pipeline_id).select_related('pipeline').order_by('order')
+            )
+        return self._stages[pipeline_id]
+    
+    def get_stage(self, pipeline_id, stage):
+        """
+        Resolve a stage of a pipeline.
+        
+        Args:
+            pipeline_id: Pipeline ID
+            stage: PipelineStage, stage ID, stage name or stage code such as
+                'promotion'
+        
+        Returns:
+            PipelineStage instance
+        
+        Raises:
+            StageNotFound: If the pipeline has no such stage
+        """
+        stages = self.stages(pipeline_id)
+        stage = getattr(stage, 'pk', stage)
+        if isinstance(stage, int) or str(stage).isdigit():
+            matches = [candidate for candidate in stages if candidate.pk == int(stage)]
+        else:
+            name = str(stage).replace('_', ' ').lower()
+            matches = [candidate for candidate in stages if candidate.name.lower() == name]
+        if matches:
+            return matches[0]
+        raise StageNotFound(
+            f"Stage '{stage}' not found. "
+            f"Available stages: {[candidate.name for candidate in stages]}"
+        )
+    
+    def move(self, pipeline_id, entry_ids, stage, notes=None):
+        """
+        Move existing entries of a pipeline to one of its stages.
+        
+        Args:
+            pipeline_id: Pipeline ID
+            entry_ids: PipelineContact IDs; entries of other pipelines are ignored
+            stage: Target stage, as accepted by get_stage()
+            notes: History note, instead of the default "Moved from ... to ..."
+        
+        Returns:
+            List of the PipelineContact instances that changed stage
+        
+        Raises:
+            StageNotFound: If the pipeline has no such stage
+        """
+        from mobilize.pipeline.models import PipelineContact
+        
+        stage = self.get_stage(pipeline_id, stage)
+        entries = PipelineContact.objects.filter(pipeline_id=pipeline_id, pk__in=list(entry_ids)).only(
+            'pk', 'contact_id', 'pipeline_id', 'current_stage_id'
+        )
+        return self._transition(pipeline_id, list(entries), [], stage, 'person', notes)
+    
+    def move_contacts(self, pipeline_id, contact_ids, stage, contact_type='person', notes=None):
+        """
+        Move contacts to a stage of a pipeline, adding them if not yet in it.
+        
+        Args:
+            pipeline_id: Pipeline ID
+            contact_ids: Contact IDs
+            stage: Target stage, as accepted by get_stage()
+            contact_type: 'person' or 'church', for entries that are added
+            notes: History note, instead of the default "Moved from ... to ..."
+        
+        Returns:
+            List of the PipelineContact instances that changed stage or were
+            added
+        
+        Raises:
+            StageNotFound: If the pipeline has no such stage
+        """
+        from mobilize.pipeline.models import PipelineContact
+        
+        stage = self.get_stage(pipeline_id, stage)
+        contact_ids = list(dict.fromkeys(contact_ids))
+        entries = list(PipelineContact.objects.filter(pipeline_id=pipeline_id, contact_id__in=contact_ids).only(
+            'pk', 'contact_id', 'pipeline_id', 'current_stage_id'
+        ))
+        entered = {entry.contact_id for entry in entries}
+        missing = [contact_id for contact_id in contact_ids if contact_id not in entered]
+        return self._transition(pipeline_id, entries, missing, stage, contact_type, notes)
+    
+    def _transition(self, pipeline_id, entries, new_contact_ids, stage, contact_type, notes):
+        """Write the stage changes, new entries and history rows in one transaction."""
+        from mobilize.pipeline.models import PipelineContact, PipelineStageHistory
+        
+        moving = [entry for entry in entries if entry.current_stage_id != stage.pk]
+        if not moving and not new_contact_ids:
+            return []
+        
+        now = timezone.now()
+        stage_names = {candidate.pk: candidate.name for candidate in self.stages(pipeline_id)}
+        author = f" by {self.user.username}" if self.user else ''
+        from_stages = {}
+        for entry in moving:
+            from_stages[entry.pk] = entry.current_stage_id
+            entry.current_stage = stage
+            entry.entered_at = now
+            entry.last_updated = now
+        
+        contact_ids = [entry.contact_id for entry in moving] + new_contact_ids
+        
+        # Bulk writes skip the signals that keep rollups and stage codes current
+        with rollup_batch() as rollups, transaction.atomic():
+            # Stage moves keep each contact's office, so its tasks and communications are not recounted
+            rollups.touch('contact', contact_ids, dependents=False)
+            PipelineContact.objects.bulk_update(moving, ['current_stage', 'entered_at', 'last_updated'])
+            set_contact_stages(stage, contact_ids)
+            added = PipelineContact.objects.bulk_create([
+                PipelineContact(contact_id=contact_id, contact_type=contact_type, pipeline_id=pipeline_id,
+                                current_stage=stage, entered_at=now)
+                for contact_id in new_contact_ids
+            ])
+            history = PipelineStageHistory.objects.bulk_create([
+                PipelineStageHistory(
+                    pipeline_contact=entry,
+                    from_stage_id=from_stages.get(entry.pk),
+                    to_stage=stage,
+                    created_by=self.user,
+                    created_at=now,
+                    notes=notes or (
+                        f"Moved from {stage_names.get(from_stages[entry.pk])} to {stage.name}{author}."
+                        if entry.pk in from_stages else f"Added to {stage.name}{author}."
+                    ),
+                )
+                for entry in moving + added
+            ])
+            # bulk_create skips the signal that counts single history rows
+            record_transitions([row.pk for row in history])
+        bump_data_version('pipeline.PipelineContact')
+        return moving + added
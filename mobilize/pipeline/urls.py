@@ -6,7 +6,10 @@ app_name = 'pipeline'
 urlpatterns = [
     path('', views.pipeline_visualization, name='pipeline_visualization_default'),
     path('<int:pipeline_id>/', views.pipeline_visualization, name='pipeline_visualization'),
+    path('<int:pipeline_id>/stages/<int:stage_id>/contacts/', views.stage_contacts, name='stage_contacts'),
     path('move-contact/', views.move_pipeline_contact, name='move_pipeline_contact'),
+    path('move-contacts/', views.move_pipeline_contacts, name='move_pipeline_contacts'),
+    path('funnel/', views.pipeline_funnel, name='pipeline_funnel'),
 ]
 
     # Add other pipeline-related URLs here as needed
@@ -2,49 +2,70 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.contrib import messages
-from django.utils import timezone
-from .models import Pipeline, PipelineStage, PipelineContact, PipelineStageHistory
+from django.http import Http404, JsonResponse
+from django.template.loader import render_to_string
+from django.utils.dateparse import parse_date
+from mobilize.authentication.decorators import office_data_filter
+from mobilize.core.bulk_operations import parse_contact_ids
+from mobilize.core.pagination import InvalidCursor
+from mobilize.core.permissions import get_data_access_manager
+from .analytics import PipelineAnalytics
+from .models import PIPELINE_TYPE_PEOPLE, PipelineStage, PipelineContact
+from .transitions import PipelineTransitions
 
-# Create your views here.
 
 @login_required
 def pipeline_visualization(request, pipeline_id=None):
-    # If no pipeline_id is provided, try to get the main pipeline for the user's office
-    # This logic will need to be refined based on how you determine the "current" or "default" pipeline
-    if pipeline_id:
-        pipeline = get_object_or_404(Pipeline, pk=pipeline_id)
-    else:
-        # Placeholder: Get the first pipeline available or the one marked as main for the user's office
-        # You'll need to implement logic to get the user's office and then the main pipeline for that office.
-        pipeline = Pipeline.objects.first() # Replace with more specific logic
-
-    stages_with_contacts = []
-    if pipeline:
-        for stage in pipeline.stages.all().order_by('order'):
-            contacts_in_stage = PipelineContact.objects.filter(current_stage=stage, pipeline=pipeline)
-            total_duration_in_stage = timezone.timedelta(0)
-            contacts_count = contacts_in_stage.count()
+    """
+    Show a pipeline as a board of stage columns.
 
-            if contacts_count > 0:
-                for contact in contacts_in_stage:
-                    if contact.entered_at:
-                        total_duration_in_stage += (timezone.now() - contact.entered_at)
-                average_duration_in_stage = total_duration_in_stage / contacts_count
-            else:
-                average_duration_in_stage = None
-            
-            stages_with_contacts.append({
-                'stage': stage, 
-                'contacts': contacts_in_stage, 
-                'average_duration': average_duration_in_stage})
+    Stage counts and time-in-stage statistics come from one grouped
+    aggregate, and each column shows the first page of its cards; the rest
+    are loaded on demand from stage_contacts.
+    """
+    analytics = PipelineAnalytics(get_data_access_manager(request))
+    pipeline = analytics.get_pipeline(pipeline_id)
+    if pipeline is None and pipeline_id is not None:
+        raise Http404("Pipeline not found")
 
     context = {
         'pipeline': pipeline,
-        'stages_with_contacts': stages_with_contacts,
-        'all_pipelines': Pipeline.objects.all() # Or filter by user's office
+        'stages_with_contacts': analytics.board(pipeline) if pipeline else [],
+        'stages': list(pipeline.stages.order_by('order')) if pipeline else [],
+        'all_pipelines': analytics.get_pipelines(),
     }
     return render(request, 'pipeline/pipeline_visualization.html', context)
 
+@login_required
+def stage_contacts(request, pipeline_id, stage_id):
+    """
+    JSON endpoint returning the next page of a stage column's cards.
+    
+    The cards are rendered with the board's own card template, so pages
+    loaded later look the same as the first one.
+    """
+    analytics = PipelineAnalytics(get_data_access_manager(request))
+    pipeline = analytics.get_pipeline(pipeline_id)
+    if pipeline is None:
+        raise Http404("Pipeline not found")
+    stage = get_object_or_404(PipelineStage, pk=stage_id, pipeline=pipeline)
+    
+    try:
+        page = analytics.stage_page(pipeline, stage, request.GET.get('cursor') or None)
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    html = render_to_string('pipeline/_stage_cards.html', {
+        'contacts': page.object_list,
+        'stage': stage,
+        'stages': list(pipeline.stages.order_by('order')),
+    }, request=request)
+    return JsonResponse({
+        'html': html,
+        'next_cursor': page.next_cursor,
+        'has_next': page.has_next,
+    })
+
 @login_required
 @require_POST
 def move_pipeline_contact(request):
@@ -63,19 +84,97 @@ def move_pipeline_contact(request):
         messages.info(request, f"{pipeline_contact.contact} is already in {target_stage.name}.")
         return redirect('pipeline:pipeline_visualization', pipeline_id=pipeline_contact.pipeline.id)
 
-    # Update contact's stage and entry date
-    pipeline_contact.current_stage = target_stage
-    pipeline_contact.entered_at = timezone.now()
-    pipeline_contact.save()
-
-    # Log the history
-    PipelineStageHistory.objects.create(
-        pipeline_contact=pipeline_contact,
-        from_stage=from_stage,
-        to_stage=target_stage,
-        created_by=request.user,
-        notes=f"Moved from {from_stage.name} to {target_stage.name} by {request.user.username}."
-    )
+    PipelineTransitions(request.user).move(pipeline_contact.pipeline_id, [pipeline_contact.pk], target_stage)
 
     messages.success(request, f"{pipeline_contact.contact} moved to {target_stage.name}.")
     return redirect('pipeline:pipeline_visualization', pipeline_id=pipeline_contact.pipeline.id)
+
+@login_required
+@require_POST
+def move_pipeline_contacts(request):
+    """
+    Move several pipeline entries to one stage, for drag-select on the board.
+    
+    Accepts a JSON body or form fields with pipeline_contact_ids (a list or a
+    comma-separated string) and target_stage_id.
+    """
+    import json
+    
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON body.'}, status=400)
+        entry_ids = data.get('pipeline_contact_ids') or []
+        if not isinstance(entry_ids, list):
+            entry_ids = [entry_ids]
+        target_stage_id = data.get('target_stage_id')
+    else:
+        entry_ids = request.POST.getlist('pipeline_contact_ids')
+        target_stage_id = request.POST.get('target_stage_id')
+    
+    entry_ids = parse_contact_ids(entry_ids)
+    if not entry_ids or not str(target_stage_id or '').isdigit():
+        return JsonResponse({'error': 'Missing contacts or target stage information.'}, status=400)
+    
+    target_stage = get_object_or_404(PipelineStage, pk=target_stage_id)
+    entries = office_data_filter(
+        PipelineContact.objects.filter(pk__in=entry_ids, pipeline_id=target_stage.pipeline_id),
+        request.user, 'contact__office'
+    )
+    moved = PipelineTransitions(request.user).move(
+        target_stage.pipeline_id, entries.values_list('pk', flat=True), target_stage
+    )
+    return JsonResponse({
+        'moved': len(moved),
+        'pipeline_contact_ids': [entry.pk for entry in moved],
+        'target_stage_id': target_stage.pk,
+    })
+
+
+@login_required
+def pipeline_funnel(request):
+    """
+    JSON endpoint for the funnel and velocity of a pipeline.
+    
+    Query parameters: pipeline ('people', 'church' or a pipeline ID,
+    defaulting to the main people pipeline), start and end (ISO dates) and
+    period ('week' or 'month') for the trend.
+    """
+    from mobilize.pipeline.funnel import TREND_PERIODS, FunnelAnalytics
+    
+    access_manager = get_data_access_manager(request)
+    pipelines = PipelineAnalytics(access_manager).get_pipelines()
+    choice = request.GET.get('pipeline', PIPELINE_TYPE_PEOPLE)
+    if choice.isdigit():
+        pipeline = pipelines.filter(pk=choice).first()
+    else:
+        pipeline = pipelines.filter(is_main_pipeline=True, pipeline_type=choice).first()
+    if pipeline is None:
+        return JsonResponse({'error': 'Pipeline not found.'}, status=404)
+    
+    dates = {}
+    for name in ('start', 'end'):
+        value = request.GET.get(name)
+        try:
+            dates[name] = parse_date(value) if value else None
+        except ValueError:
+            dates[name] = None
+        if value and dates[name] is None:
+            return JsonResponse({'error': f'Invalid {name} date.'}, status=400)
+    period = request.GET.get('period', 'month')
+    if period not in TREND_PERIODS:
+        return JsonResponse({'error': 'Invalid period.'}, status=400)
+    
+    analytics = FunnelAnalytics(access_manager)
+    funnel = analytics.funnel(pipeline, dates['start'], dates['end'])
+    return JsonResponse({
+        'pipeline': {'id': pipeline.pk, 'name': pipeline.name},
+        'start': funnel['start'].isoformat(),
+        'end': funnel['end'].isoformat(),
+        'stages': funnel['stages'],
+        'trend': [
+            {'period': row['period'].isoformat(), 'stages': row['stages']}
+            for row in analytics.trend(pipeline, funnel['start'], funnel['end'], period)
+        ],
+    })
@@ -5,6 +5,8 @@ Django settings for mobilize project.
 import os
 import sys
 from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -174,14 +176,37 @@ COMPRESS_JS_FILTERS = ['compressor.filters.jsmin.rJSMinFilter']
 COMPRESS_OFFLINE = not DEBUG  # Pre-compress files in production
 
 # Caching Configuration for Performance
+# An in-process LRU fronts a shared Redis tier. The shared tier must be seen by
+# every web and Celery process, so without CACHE_REDIS_URL it uses the Redis
+# already configured for Celery, but in database 1 so it never shares a
+# keyspace with the broker queues in database 0; only the test settings use
+# local memory.
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+if not CACHE_REDIS_URL:
+    _broker_redis_url = urlsplit(
+        os.environ.get('REDIS_URL')
+        or os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+    )
+    CACHE_REDIS_URL = urlunsplit(_broker_redis_url._replace(path='/1'))
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
-        'LOCATION': 'django_cache_table',
+        'BACKEND': 'mobilize.core.cache_backends.TieredCache',
+        'LOCATION': CACHE_REDIS_URL,
         'TIMEOUT': 3600,  # 1 hour default timeout
+        'KEY_PREFIX': 'mobilize',
         'OPTIONS': {
-            'MAX_ENTRIES': 1000,
-            'CULL_FREQUENCY': 3,  # Fraction of entries that are culled
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,  # Seconds a value is served without asking Redis
+            'LOCK_TIMEOUT': 30,  # Seconds a get_or_set() recomputation holds its lock
+            'PREFIX_POLICIES': {
+                # Generation counters must be read fresh by every process
+                'dashboard_generation:': {'local': False},
+                'report_data_version:': {'local': False},
+                'permission_version:': {'local': False},
+                'typeahead_generation:': {'local': False},
+                # Sync locks, slots and quota counters are shared by all workers
+                'google_sync:': {'local': False},
+            },
         },
     }
 }
@@ -357,8 +382,52 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': 300.0,  # Every 5 minutes
         'options': {'queue': 'email'},
     },
+    # Full rebuilds run off-peak, staggered so they never overlap
+    'reconcile-dashboard-rollups': {
+        'task': 'mobilize.core.tasks.reconcile_dashboard_rollups',
+        'schedule': crontab(hour=2, minute=0),  # Nightly, 02:00 UTC
+    },
+    'reconcile-search-index': {
+        'task': 'mobilize.core.tasks.reconcile_search_index',
+        'schedule': crontab(hour=2, minute=30),  # Nightly, 02:30 UTC
+    },
+    'reconcile-pipeline-funnel': {
+        'task': 'mobilize.core.tasks.reconcile_pipeline_funnel',
+        'schedule': crontab(hour=3, minute=0),  # Nightly, 03:00 UTC
+    },
+    'purge-expired-jobs': {
+        'task': 'mobilize.core.tasks.purge_expired_jobs',
+        'schedule': crontab(hour=3, minute=30),  # Nightly, 03:30 UTC
+    },
+    'sync-google-accounts-hourly': {
+        'task': 'mobilize.communications.tasks.sync_google_accounts',
+        'schedule': 3600.0,  # Every hour
+        'options': {'queue': 'sync'},
+    },
 }
 
+# Users whose Google syncs run at the same time, over all workers
+GOOGLE_SYNC_MAX_CONCURRENCY = int(os.environ.get('GOOGLE_SYNC_MAX_CONCURRENCY', '8'))
+
+# Google API quota units each user's syncs may spend per hour
+GOOGLE_SYNC_USER_QUOTA = int(os.environ.get('GOOGLE_SYNC_USER_QUOTA', '10000'))
+
+# Built Google API clients kept per process, and seconds each is reused
+GOOGLE_CLIENT_CACHE_SIZE = int(os.environ.get('GOOGLE_CLIENT_CACHE_SIZE', '128'))
+GOOGLE_CLIENT_TTL = int(os.environ.get('GOOGLE_CLIENT_TTL', '300'))
+
+# Days rendered report jobs and their files are kept before the nightly purge
+REPORT_JOB_RETENTION_DAYS = int(os.environ.get('REPORT_JOB_RETENTION_DAYS', '2'))
+
+# Days import jobs, and the uploads of previews never imported, are kept
+IMPORT_JOB_RETENTION_DAYS = int(os.environ.get('IMPORT_JOB_RETENTION_DAYS', '7'))
+
+# Serve dashboard counts from the incrementally maintained rollup tables
+DASHBOARD_USE_ROLLUPS = os.environ.get('DASHBOARD_USE_ROLLUPS', 'True') == 'True'
+
+# Filter list view searches through the search document index once it is built
+SEARCH_USE_INDEX = os.environ.get('SEARCH_USE_INDEX', 'True') == 'True'
+
 # Worker configuration
 CELERY_WORKER_SEND_TASK_EVENTS = True
 CELERY_TASK_SEND_SENT_EVENT = True
@@ -398,9 +467,14 @@ if 'test' in sys.argv or 'pytest' in sys.modules:
     
     # Use simple cache for tests
     CACHES['default'] = {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'mobilize.core.cache_backends.TieredCache',
+        'LOCATION': '',
+        'OPTIONS': {'PREFIX_POLICIES': CACHES['default']['OPTIONS']['PREFIX_POLICIES']},
     }
     
+    # Build Google clients afresh so patched credentials never leak between tests
+    GOOGLE_CLIENT_CACHE_SIZE = 0
+    
     # Make Celery run synchronously in tests
     CELERY_TASK_ALWAYS_EAGER = True
     CELERY_TASK_EAGER_PROPAGATES = True
@@ -9,6 +9,8 @@ from mobilize.authentication.models import User
 from mobilize.contacts.models import Person
 from mobilize.churches.models import Church # Assuming Office is in admin_panel.models
 from mobilize.admin_panel.models import Office
+from mobilize.core.permission_context import get_permission_context
+from mobilize.core.widgets import ContactTypeaheadSelect
 
 
 class TaskForm(forms.ModelForm):
@@ -74,6 +76,9 @@ class TaskForm(forms.ModelForm):
             'due_time': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
             'reminder_time': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
             'description': forms.Textarea(attrs={'rows': 3, 'class': 'form-control'}),
+            # People and churches are loaded as the user types
+            'person': ContactTypeaheadSelect('person'),
+            'church': ContactTypeaheadSelect('church'),
             # 'recurrence_end_date' is handled by custom form field widget
         }
 
@@ -87,7 +92,7 @@ class TaskForm(forms.ModelForm):
                 self.fields['assigned_to'].queryset = User.objects.all()
             else:
                 # Assuming UserOffice model links users to offices
-                user_offices = user.useroffice_set.values_list('office_id', flat=True)
+                user_offices = get_permission_context(user).office_ids
                 self.fields['assigned_to'].queryset = User.objects.filter(
                     useroffice__office_id__in=user_offices
                 ).distinct()
@@ -249,7 +254,7 @@ class TaskFilterForm(forms.Form):
                 self.fields['office'].queryset = Office.objects.all()
             else:
                 # Assuming UserOffice model links users to offices
-                user_offices = user.useroffice_set.values_list('office_id', flat=True)
+                user_offices = get_permission_context(user).office_ids
                 self.fields['assigned_to'].queryset = User.objects.filter(
                     useroffice__office_id__in=user_offices
                 ).distinct()
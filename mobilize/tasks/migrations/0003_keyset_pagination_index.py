@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-16 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0002_task_notification_sent_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["due_date", "priority", "id"], name="tasks_due_dat_ca6abf_idx"
+            ),
+        ),
+    ]
@@ -115,6 +115,7 @@ class Task(models.Model):
             models.Index(fields=['assigned_to', 'status']),   # Composite for user tasks
             models.Index(fields=['created_by', 'status']),    # Composite for created tasks
             models.Index(fields=['office', 'status']),        # Composite for office tasks
+            models.Index(fields=['due_date', 'priority', 'id']),  # Keyset pagination
         ]
     
     def __str__(self):
@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
 from django.urls import reverse_lazy, reverse
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.utils import timezone
 from django.db import models
@@ -11,6 +12,9 @@ from django.core.exceptions import PermissionDenied
 from .models import Task
 from .forms import TaskForm
 from mobilize.authentication.decorators import office_data_filter
+from mobilize.core.pagination import TASK_ORDERING, InvalidCursor, paginate_keyset
+from mobilize.core.permission_context import get_permission_context
+from mobilize.core.scoped_queries import scope_tasks
 
 
 class TaskListView(LoginRequiredMixin, ListView):
@@ -21,7 +25,7 @@ class TaskListView(LoginRequiredMixin, ListView):
 
     def dispatch(self, request, *args, **kwargs):
         # Check if user has office assignment (except super_admin)
-        if request.user.role != 'super_admin' and not request.user.useroffice_set.exists():
+        if request.user.role != 'super_admin' and not get_permission_context(request.user).has_offices:
             raise PermissionDenied("Access denied. User not assigned to any office.")
         return super().dispatch(request, *args, **kwargs)
 
@@ -33,20 +37,14 @@ class TaskListView(LoginRequiredMixin, ListView):
         
         # Apply office-level filtering based on person/church office or task office
         if self.request.user.role != 'super_admin':
-            user_offices = self.request.user.useroffice_set.values_list('office_id', flat=True)
+            user_offices = get_permission_context(self.request.user).office_ids
             
             # Filter tasks based on:
             # 1. Tasks assigned to user
             # 2. Tasks created by user
             # 3. Tasks where person/church belongs to user's office
             # 4. Tasks directly assigned to user's office
-            queryset = queryset.filter(
-                models.Q(assigned_to=self.request.user) |
-                models.Q(created_by=self.request.user) |
-                models.Q(person__contact__office__in=user_offices) |
-                models.Q(church__contact__office__in=user_offices) |
-                models.Q(office__in=user_offices)
-            ).distinct()
+            queryset = scope_tasks(queryset, self.request.user, user_offices)
         
         # Apply filters from GET parameters
         status_filter = self.request.GET.get('status')
@@ -80,15 +78,11 @@ class TaskListView(LoginRequiredMixin, ListView):
         # General search
         search_query = self.request.GET.get('search')
         if search_query:
-            from django.db.models import Q
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(person__contact__first_name__icontains=search_query) |
-                Q(person__contact__last_name__icontains=search_query) |
-                Q(church__contact__church_name__icontains=search_query) |
-                Q(church__name__icontains=search_query)
-            )
+            from mobilize.core.search import filter_by_search
+            queryset = filter_by_search(queryset, search_query, 'task', [
+                'title', 'description', 'person__contact__first_name', 'person__contact__last_name',
+                'church__contact__church_name', 'church__name',
+            ])
         
         # Custom sort: incomplete tasks first, then completed tasks.
         # Within incomplete, sort by due_date (nulls last), then priority.
@@ -113,6 +107,40 @@ class TaskListView(LoginRequiredMixin, ListView):
         return context
 
 
+@login_required
+def task_list_api(request):
+    """
+    JSON API endpoint for cursor-paginated task lists.
+    
+    Accepts the same filters as the task list page and orders by
+    (due_date, priority, id).
+    """
+    if request.user.role != 'super_admin' and not get_permission_context(request.user).has_offices:
+        raise PermissionDenied("Access denied. User not assigned to any office.")
+    
+    view = TaskListView()
+    view.setup(request)
+    try:
+        page, pagination = paginate_keyset(request, view.get_queryset(), TASK_ORDERING)
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    results = [{
+        'id': task.id,
+        'title': task.title,
+        'status': task.status,
+        'priority': task.priority,
+        'due_date': task.due_date.isoformat() if task.due_date else None,
+        'assigned_to': task.assigned_to.get_full_name() if task.assigned_to else None,
+        'detail_url': reverse('tasks:task_detail', args=[task.pk]),
+    } for task in page]
+    
+    return JsonResponse({
+        'results': results,
+        **pagination,
+    })
+
+
 class TaskDetailView(LoginRequiredMixin, DetailView):
     model = Task
     template_name = 'tasks/task_detail.html'
@@ -125,15 +153,9 @@ class TaskDetailView(LoginRequiredMixin, DetailView):
         
         # Apply office-level filtering
         if self.request.user.role != 'super_admin':
-            user_offices = self.request.user.useroffice_set.values_list('office_id', flat=True)
+            user_offices = get_permission_context(self.request.user).office_ids
             
-            queryset = queryset.filter(
-                models.Q(assigned_to=self.request.user) |
-                models.Q(created_by=self.request.user) |
-                models.Q(person__contact__office__in=user_offices) |
-                models.Q(church__contact__office__in=user_offices) |
-                models.Q(office__in=user_offices)
-            ).distinct()
+            queryset = scope_tasks(queryset, self.request.user, user_offices)
         
         return queryset
 
@@ -146,7 +168,7 @@ class TaskCreateView(LoginRequiredMixin, CreateView):
             raise PermissionDenied("Limited users cannot create tasks")
         
         # Check office assignment
-        if request.user.role != 'super_admin' and not request.user.useroffice_set.exists():
+        if request.user.role != 'super_admin' and not get_permission_context(request.user).has_offices:
             raise PermissionDenied("Access denied. User not assigned to any office.")
         
         return super().dispatch(request, *args, **kwargs)
@@ -251,7 +273,7 @@ class TaskUpdateView(LoginRequiredMixin, UpdateView):
             raise PermissionDenied("Limited users cannot edit tasks")
         
         # Check office assignment
-        if request.user.role != 'super_admin' and not request.user.useroffice_set.exists():
+        if request.user.role != 'super_admin' and not get_permission_context(request.user).has_offices:
             raise PermissionDenied("Access denied. User not assigned to any office.")
         
         return super().dispatch(request, *args, **kwargs)
@@ -264,15 +286,9 @@ class TaskUpdateView(LoginRequiredMixin, UpdateView):
         
         # Apply office-level filtering
         if self.request.user.role != 'super_admin':
-            user_offices = self.request.user.useroffice_set.values_list('office_id', flat=True)
+            user_offices = get_permission_context(self.request.user).office_ids
             
-            queryset = queryset.filter(
-                models.Q(assigned_to=self.request.user) |
-                models.Q(created_by=self.request.user) |
-                models.Q(person__contact__office__in=user_offices) |
-                models.Q(church__contact__office__in=user_offices) |
-                models.Q(office__in=user_offices)
-            ).distinct()
+            queryset = scope_tasks(queryset, self.request.user, user_offices)
         
         return queryset
 
@@ -365,7 +381,7 @@ class TaskDeleteView(LoginRequiredMixin, DeleteView):
             raise PermissionDenied("Limited users cannot delete tasks")
         
         # Check office assignment
-        if request.user.role != 'super_admin' and not request.user.useroffice_set.exists():
+        if request.user.role != 'super_admin' and not get_permission_context(request.user).has_offices:
             raise PermissionDenied("Access denied. User not assigned to any office.")
         
         return super().dispatch(request, *args, **kwargs)
@@ -378,15 +394,9 @@ class TaskDeleteView(LoginRequiredMixin, DeleteView):
         
         # Apply office-level filtering
         if self.request.user.role != 'super_admin':
-            user_offices = self.request.user.useroffice_set.values_list('office_id', flat=True)
+            user_offices = get_permission_context(self.request.user).office_ids
             
-            queryset = queryset.filter(
-                models.Q(assigned_to=self.request.user) |
-                models.Q(created_by=self.request.user) |
-                models.Q(person__contact__office__in=user_offices) |
-                models.Q(church__contact__office__in=user_offices) |
-                models.Q(office__in=user_offices)
-            ).distinct()
+            queryset = scope_tasks(queryset, self.request.user, user_offices)
         
         return queryset
     
@@ -0,0 +1,60 @@
+"""
+Benchmarks for streaming list exports
+"""
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+
+from mobilize.contacts.models import Contact, Person
+from mobilize.contacts.views import export_contacts
+
+User = get_user_model()
+
+
+class StreamingExportBenchmark(TestCase):
+    """Exports start right away and hold one chunk of rows at a time"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='bench_export', email='bench_export@example.com',
+                                             role='super_admin')
+        contacts = Contact.objects.bulk_create([
+            Contact(type='person', first_name=f'First{i}', last_name=f'Last{i}', email=f'export{i}@example.com',
+                    notes='x' * 200)
+            for i in range(30000)
+        ])
+        Person.objects.bulk_create([Person(contact=contact, title='Dr') for contact in contacts])
+    
+    def _stream(self, limit=None):
+        """Stream the export, returning (first byte time, total time, peak memory, line count)."""
+        request = RequestFactory().get('/contacts/export/')
+        request.user = self.user
+        
+        tracemalloc.start()
+        start_time = time.time()
+        response = export_contacts(request)
+        first_byte = None
+        lines = 0
+        for line in response.streaming_content:
+            if first_byte is None:
+                first_byte = time.time() - start_time
+            lines += 1
+            if limit and lines >= limit:
+                break
+        elapsed_time = time.time() - start_time
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return first_byte, elapsed_time, peak, lines
+    
+    def test_export_of_30k_people(self):
+        first_byte, elapsed_time, peak, lines = self._stream()
+        _, _, small_peak, _ = self._stream(limit=5000)
+        print(f"Export of {lines - 1} people took {elapsed_time:.2f} s, first byte after {first_byte * 1000:.0f} ms, "
+              f"peak {peak / 1024 / 1024:.1f} MB (5000 rows: {small_peak / 1024 / 1024:.1f} MB)")
+        
+        self.assertEqual(lines, 30002)
+        self.assertLess(first_byte, 0.5)
+        # Memory is bounded by the chunk size, not by the number of rows written
+        self.assertLess(peak, small_peak * 2)
+        self.assertLess(elapsed_time, 15.0)
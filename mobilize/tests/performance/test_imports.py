@@ -0,0 +1,44 @@
+"""
+Benchmarks for previewing large CSV imports
+"""
+import io
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from mobilize.contacts.models import Contact, Person
+from mobilize.core.imports import ContactImporter
+
+User = get_user_model()
+
+
+class ImportPreviewBenchmark(TestCase):
+    """Dry runs of large files finish in seconds without writing"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='bench_import', email='bench_import@example.com',
+                                             role='super_admin')
+        contacts = Contact.objects.bulk_create([
+            Contact(type='person', first_name=f'Existing{i}', email=f'person{i}@example.com') for i in range(10000)
+        ])
+        Person.objects.bulk_create([Person(contact=contact) for contact in contacts])
+    
+    def test_preview_of_50k_rows(self):
+        rows = ''.join(
+            f'First{i},Last{i},person{i}@example.com,555-010-{i % 10000:04d},{("low", "high", "urgent")[i % 3]}\n'
+            for i in range(50000)
+        )
+        upload = io.BytesIO(('first_name,last_name,email,phone,priority\n' + rows).encode('utf-8'))
+        contacts = Contact.objects.count()
+        
+        start_time = time.time()
+        preview = ContactImporter(self.user, dry_run=True).run(upload)
+        elapsed_time = time.time() - start_time
+        print(f"Import preview of 50000 rows took {elapsed_time:.2f} s")
+        
+        self.assertEqual(preview.rows_processed, 50000)
+        self.assertEqual(preview.error_count, 16666)
+        self.assertEqual(preview.created + preview.updated + preview.unchanged + preview.error_count, 50000)
+        self.assertEqual(Contact.objects.count(), contacts)
+        self.assertLess(elapsed_time, 15.0)
@@ -0,0 +1,75 @@
+"""
+Benchmarks for office-scoped querysets as data grows
+"""
+import time
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from mobilize.admin_panel.models import Office, UserOffice
+from mobilize.communications.models import Communication
+from mobilize.contacts.models import Contact, Person
+from mobilize.core.scoped_queries import scope_communications, scope_people, scope_tasks
+from mobilize.tasks.models import Task
+
+User = get_user_model()
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Plan assertions read SQLite EXPLAIN QUERY PLAN output')
+class ScopedQueryPlanBenchmark(TestCase):
+    """Scoped querysets keep index-only plans at every data size"""
+    
+    def setUp(self):
+        self.offices = [Office.objects.create(name=f'Bench {i}', code=f'BENCH{i}') for i in range(4)]
+        self.user = User.objects.create_user(username='bench', email='bench@example.com', role='office_admin')
+        UserOffice.objects.create(user=self.user, office=self.offices[0])
+        self.office_ids = [self.offices[0].id]
+        self.seeded = 0
+    
+    def _seed(self, total):
+        """Grow the data set to the given number of contacts, tasks and communications."""
+        contacts = Contact.objects.bulk_create([
+            Contact(type='person', first_name=f'Bench{i}', office=self.offices[i % 4],
+                    user=self.user if i % 7 == 0 else None)
+            for i in range(self.seeded, total)
+        ])
+        Person.objects.bulk_create([Person(contact=contact) for contact in contacts])
+        Task.objects.bulk_create([
+            Task(title=f'Bench {i}', person_id=contact.id, office=self.offices[(i + 1) % 4],
+                 assigned_to=self.user if i % 11 == 0 else None)
+            for i, contact in enumerate(contacts)
+        ])
+        Communication.objects.bulk_create([
+            Communication(type='email', subject=f'Bench {i}', person_id=contact.id, office=self.offices[(i + 2) % 4])
+            for i, contact in enumerate(contacts)
+        ])
+        self.seeded = total
+    
+    def _full_scans(self, queryset):
+        # Each plan line is "<id> <parent> <notused> <detail>"
+        details = [line.split(maxsplit=3)[-1] for line in queryset.explain().splitlines()]
+        return [detail for detail in details if detail.startswith('SCAN')]
+    
+    def test_plans_stay_indexed_as_data_grows(self):
+        querysets = {
+            'people': lambda: scope_people(Person.objects.all(), self.user, self.office_ids),
+            'tasks': lambda: scope_tasks(Task.objects.all(), self.user, self.office_ids),
+            'communications': lambda: scope_communications(Communication.objects.all(), self.user, self.office_ids),
+        }
+        
+        for total in (200, 2000):
+            self._seed(total)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            
+            for name, build in querysets.items():
+                # Without an ORDER BY, which SQLite may satisfy by walking a sort index
+                queryset = build().order_by()
+                self.assertEqual(self._full_scans(queryset), [], f'{name} plan scans a table at {total} rows')
+                
+                start_time = time.time()
+                count = queryset.count()
+                elapsed_time = time.time() - start_time
+                print(f"Scoped {name} count of {count} over {total} rows took {elapsed_time * 1000:.1f} ms")
@@ -0,0 +1,172 @@
+/**
+ * Contact Typeahead
+ * Loads person and church options as the user types instead of all at once
+ */
+
+class ContactTypeahead {
+    constructor(select, options = {}) {
+        this.select = select;
+        this.url = options.url || select.dataset.typeaheadUrl;
+        this.type = options.type || select.dataset.typeaheadType;
+        this.limit = options.limit || 20;
+        this.delay = options.delay || 250;
+        this.timer = null;
+        this.controller = null;
+        
+        this.input = this.createInput();
+        select.parentNode.insertBefore(this.input, select);
+        select.contactTypeahead = this;
+    }
+    
+    createInput() {
+        const input = document.createElement('input');
+        input.type = 'search';
+        input.className = 'form-control form-control-sm mb-1';
+        input.placeholder = `Type to search ${this.type === 'church' ? 'churches' : 'people'}...`;
+        input.autocomplete = 'off';
+        input.addEventListener('input', () => {
+            clearTimeout(this.timer);
+            this.timer = setTimeout(() => this.search(input.value), this.delay);
+        });
+        return input;
+    }
+    
+    fetchContacts(params) {
+        // Only the latest request updates the options
+        if (this.controller) {
+            this.controller.abort();
+        }
+        this.controller = new AbortController();
+        
+        const query = new URLSearchParams({type: this.type, ...params});
+        return fetch(`${this.url}?${query}`, {signal: this.controller.signal})
+            .then(response => response.json())
+            .then(data => (this.type === 'church' ? data.churches : data.people) || []);
+    }
+    
+    search(text) {
+        if (!text.trim()) {
+            this.render([]);
+            return;
+        }
+        this.fetchContacts({q: text, limit: this.limit})
+            .then(contacts => this.render(contacts))
+            .catch(error => {
+                if (error.name !== 'AbortError') {
+                    console.error('Error loading contacts:', error);
+                }
+            });
+    }
+    
+    render(contacts) {
+        // Keep the empty choice and the current selection
+        const keep = Array.from(this.select.options).filter(option => !option.value || option.selected);
+        this.select.innerHTML = '';
+        keep.forEach(option => this.select.appendChild(option));
+        
+        contacts.forEach(contact => {
+            if (keep.some(option => option.value === String(contact.id))) {
+                return;
+            }
+            this.select.appendChild(this.createOption(contact));
+        });
+    }
+    
+    createOption(contact) {
+        const option = document.createElement('option');
+        option.value = contact.id;
+        option.textContent = contact.email ? `${contact.name} (${contact.email})` : contact.name;
+        return option;
+    }
+    
+    preselect(contactId) {
+        return this.fetchContacts({id: contactId}).then(contacts => {
+            if (!contacts.length) {
+                return false;
+            }
+            let option = Array.from(this.select.options).find(existing => existing.value === String(contactId));
+            if (!option) {
+                option = this.createOption(contacts[0]);
+                this.select.appendChild(option);
+            }
+            option.selected = true;
+            return true;
+        });
+    }
+}
+
+/**
+ * Suggests email addresses for the contact being typed into a
+ * comma-separated recipients field
+ */
+class RecipientTypeahead {
+    constructor(input, options = {}) {
+        this.input = input;
+        this.url = options.url || input.dataset.typeaheadRecipients;
+        this.delay = options.delay || 250;
+        this.timer = null;
+        
+        this.menu = document.createElement('div');
+        this.menu.className = 'list-group position-absolute shadow-sm';
+        this.menu.style.zIndex = 1050;
+        this.menu.style.display = 'none';
+        input.parentNode.style.position = 'relative';
+        input.parentNode.appendChild(this.menu);
+        
+        input.addEventListener('input', () => {
+            clearTimeout(this.timer);
+            this.timer = setTimeout(() => this.search(), this.delay);
+        });
+        input.addEventListener('blur', () => setTimeout(() => this.hide(), 200));
+    }
+    
+    currentToken() {
+        return this.input.value.split(',').pop().trim();
+    }
+    
+    search() {
+        const token = this.currentToken();
+        if (!token) {
+            this.hide();
+            return;
+        }
+        
+        const query = new URLSearchParams({type: 'person', q: token, limit: 8});
+        fetch(`${this.url}?${query}`)
+            .then(response => response.json())
+            .then(data => this.render((data.people || []).filter(person => person.email)))
+            .catch(error => console.error('Error loading recipients:', error));
+    }
+    
+    render(people) {
+        this.menu.innerHTML = '';
+        people.forEach(person => {
+            const item = document.createElement('button');
+            item.type = 'button';
+            item.className = 'list-group-item list-group-item-action py-1';
+            item.textContent = `${person.name} <${person.email}>`;
+            item.addEventListener('mousedown', event => {
+                event.preventDefault();
+                this.choose(person.email);
+            });
+            this.menu.appendChild(item);
+        });
+        this.menu.style.display = people.length ? 'block' : 'none';
+    }
+    
+    choose(email) {
+        const parts = this.input.value.split(',').slice(0, -1).map(part => part.trim()).filter(Boolean);
+        this.input.value = [...parts, email].join(', ') + ', ';
+        this.input.focus();
+        this.hide();
+    }
+    
+    hide() {
+        this.menu.style.display = 'none';
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('select[data-typeahead-url]').forEach(select => new ContactTypeahead(select));
+    document.querySelectorAll('[data-typeahead-recipients]').forEach(input => new RecipientTypeahead(input));
+});
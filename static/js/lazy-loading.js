@@ -9,6 +9,7 @@ class LazyLoader {
         this.apiUrl = options.apiUrl;
         this.perPage = options.perPage || 25;
         this.currentPage = 1;
+        this.cursor = null;
         this.isLoading = false;
         this.hasMore = true;
         this.searchParams = new URLSearchParams(window.location.search);
@@ -113,16 +114,20 @@ class LazyLoader {
         try {
             // Build API URL with current search params
             const url = new URL(this.apiUrl, window.location.origin);
-            url.searchParams.set('page', this.currentPage);
             url.searchParams.set('per_page', this.perPage);
             
             // Add search/filter params
             for (const [key, value] of this.searchParams) {
-                if (key !== 'page') {
+                if (key !== 'page' && key !== 'cursor') {
                     url.searchParams.set(key, value);
                 }
             }
             
+            // Continue after the last row served (keyset pagination)
+            if (this.cursor) {
+                url.searchParams.set('cursor', this.cursor);
+            }
+            
             const response = await fetch(url, {
                 headers: {
                     'X-Requested-With': 'XMLHttpRequest',
@@ -141,6 +146,7 @@ class LazyLoader {
             
             // Update pagination state
             this.currentPage++;
+            this.cursor = data.next_cursor;
             this.hasMore = data.has_next;
             
             // Update URL without page reload
@@ -244,6 +250,7 @@ class LazyLoader {
         
         // Reset pagination
         this.currentPage = 1;
+        this.cursor = null;
         this.hasMore = true;
         
         // Load first page